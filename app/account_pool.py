@@ -8,7 +8,7 @@ import time
 import hashlib
 import random
 from datetime import datetime, timedelta
-from typing import Dict, Optional, List, Any
+from typing import Dict, Optional, List, Any, Set
 from dataclasses import dataclass
 from collections import deque
 from contextlib import asynccontextmanager
@@ -20,6 +20,16 @@ from loguru import logger
 
 from config import settings
 from app.connection_pool import ConnectionManager, ConnectionType
+from app.circuit_breaker import (
+    CircuitBreakerConfig, CircuitBreakerRegistry, CircuitOpenError, EndpointClass
+)
+from app.metrics import REGISTRY, MetricFamily, pool_wait_seconds, observe_duration
+from app.rate_limit import TokenBucket
+
+
+# Wait for an account connection lock / for market data key budget
+_account_wait = pool_wait_seconds.labels("account")
+_data_key_wait = pool_wait_seconds.labels("data_key")
 
 
 @dataclass
@@ -35,6 +45,47 @@ class AccountConfig:
     enabled: bool = True
 
 
+@dataclass
+class DataKeyConfig:
+    """Market data key configuration (data-only, never used for orders)"""
+    key_id: str
+    api_key: str
+    secret_key: str
+    paper_trading: bool = True
+    rate_limit_per_minute: int = 200
+    enabled: bool = True
+
+
+class DataKeyConnection:
+    """Single market data key with its own client and rate budget"""
+    
+    def __init__(self, data_key_config: DataKeyConfig, client=None):
+        from app.alpaca_client import AlpacaClient
+        
+        self.data_key_config = data_key_config
+        # One long-lived client per data key, shared by all market data requests
+        # (fallback accounts pass in the client their AccountConnection already holds)
+        self.client = client or AlpacaClient(
+            api_key=data_key_config.api_key,
+            secret_key=data_key_config.secret_key,
+            paper_trading=data_key_config.paper_trading
+        )
+        self.rate_limiter = TokenBucket(data_key_config.rate_limit_per_minute)
+        self.request_count = 0
+        self.throttled_count = 0
+        self.last_used: Optional[datetime] = None
+    
+    def get_stats(self) -> Dict[str, Any]:
+        """Get data key statistics"""
+        return {
+            "rate_limit_per_minute": self.rate_limiter.capacity,
+            "tokens_available": round(self.rate_limiter.tokens, 2),
+            "request_count": self.request_count,
+            "throttled_count": self.throttled_count,
+            "last_used": self.last_used.isoformat() if self.last_used else None
+        }
+
+
 class AccountConnection:
     """Single account connection wrapper"""
     
@@ -50,6 +101,9 @@ class AccountConnection:
             paper_trading=account_config.paper_trading
         )
         
+        # Shared AlpacaClient built lazily on the connection manager's SDK clients
+        self._alpaca_client = None
+        
         # Connection state
         self._lock = asyncio.Lock()
         self._in_use = False
@@ -114,13 +168,20 @@ class AccountConnection:
     
     @property
     def alpaca_client(self):
-        """Get AlpacaClient compatible interface"""
-        from app.alpaca_client import AlpacaClient
-        return AlpacaClient(
-            api_key=self.account_config.api_key,
-            secret_key=self.account_config.secret_key,
-            paper_trading=self.account_config.paper_trading
-        )
+        """Get AlpacaClient compatible interface (one shared instance per account)"""
+        if self._alpaca_client is None:
+            from app.alpaca_client import AlpacaClient
+            self._alpaca_client = AlpacaClient(
+                api_key=self.account_config.api_key,
+                secret_key=self.account_config.secret_key,
+                paper_trading=self.account_config.paper_trading,
+                trading_client=self.connection_manager.get_client(ConnectionType.TRADING_CLIENT),
+                stock_data_client=self.connection_manager.get_client(ConnectionType.STOCK_DATA),
+                option_data_client=self.connection_manager.get_client(ConnectionType.OPTION_DATA)
+            )
+        else:
+            self.connection_manager.mark_used(ConnectionType.TRADING_CLIENT)
+        return self._alpaca_client
     
     async def get_trading_client(self):
         """Get trading client from connection manager"""
@@ -176,28 +237,53 @@ class AccountConnection:
     
     async def shutdown(self):
         """Shutdown connection"""
+        self._alpaca_client = None
         await self.connection_manager.shutdown()
 
 
 class AccountPool:
-    """Modern account connection pool"""
+    """Modern account connection pool
     
-    def __init__(self, health_check_interval_seconds: int = 300):
+    The only connection pool in the service: owns every account's ConnectionManager,
+    the shared AlpacaClient per account, the market data key pool, and a single
+    maintenance scheduler for health checks and idle stream cleanup.
+    """
+    
+    def __init__(self, health_check_interval_seconds: int = 300,
+                 maintenance_interval_seconds: int = 60,
+                 max_idle_minutes: float = 30):
         self.health_check_interval_seconds = health_check_interval_seconds
+        self.maintenance_interval_seconds = maintenance_interval_seconds
+        self.max_idle_minutes = max_idle_minutes
         
         # Account configurations and connections
         self.account_configs: Dict[str, AccountConfig] = {}
         self.account_connections: Dict[str, AccountConnection] = {}
         self.usage_queues: Dict[str, deque[AccountConnection]] = {}
         
+        # Shared clients for configured accounts without a live connection (failed startup test)
+        self._standalone_clients: Dict[str, Any] = {}
+        
         # Account lookup maps
         self.account_id_list: List[str] = []
         self.account_name_to_id: Dict[str, str] = {}
         
+        # Market data key pool (separate from trading accounts)
+        self.data_key_configs: Dict[str, DataKeyConfig] = {}
+        self.data_key_connections: Dict[str, DataKeyConnection] = {}
+        self.data_key_id_list: List[str] = []
+        self.data_key_max_wait_seconds: float = 5.0
+        self._data_key_round_robin = 0
+        
+        # Circuit breakers per (account or data key, endpoint class)
+        self.circuit_breakers = CircuitBreakerRegistry(self._load_circuit_breaker_config())
+        
         # Async components
         self._global_lock = None
         self._background_tasks = []
         self._initialized = False
+        self.last_health_check: Optional[datetime] = None
+        self.last_cleanup: Optional[datetime] = None
         
     async def initialize(self):
         """Initialize the account pool"""
@@ -209,16 +295,38 @@ class AccountPool:
         await self._ensure_async_components()
         await self._load_account_configs()
         await self._create_connections()
+        self._load_data_key_configs()
+        self._create_data_key_connections()
         self._start_background_tasks()
         
         self._initialized = True
-        logger.info(f"Account pool initialized: {len(self.account_configs)} accounts, {sum(conn.connection_count for conn in self.account_connections.values())} connections")
+        logger.info(f"Account pool initialized: {len(self.account_configs)} accounts, {sum(conn.connection_count for conn in self.account_connections.values())} connections, "
+                    f"{len(self.data_key_connections)} market data keys")
+    
+    async def load_configs(self):
+        """Load account configurations only - no connections, data keys or background tasks
+        
+        For callers that exercise every account themselves (e.g. healthcheck.py); a no-op
+        once the pool is initialized.
+        """
+        if self._initialized:
+            return
+        await self._load_account_configs()
     
     async def _ensure_async_components(self):
         """Ensure async components are initialized"""
         if self._global_lock is None:
             self._global_lock = asyncio.Lock()
     
+    @staticmethod
+    def _load_circuit_breaker_config() -> CircuitBreakerConfig:
+        """Build circuit breaker thresholds from settings (unknown keys are ignored)"""
+        breaker_settings = getattr(settings, 'circuit_breaker', None)
+        if not isinstance(breaker_settings, dict):
+            return CircuitBreakerConfig()
+        known_fields = CircuitBreakerConfig.__dataclass_fields__.keys()
+        return CircuitBreakerConfig(**{k: v for k, v in breaker_settings.items() if k in known_fields})
+    
     async def _load_account_configs(self):
         """Load account configurations"""
         accounts_config = getattr(settings, 'accounts', {})
@@ -261,6 +369,70 @@ class AccountPool:
         
         logger.info(f"Loaded {len(self.account_configs)} account configurations")
     
+    def _load_data_key_configs(self):
+        """Load market data key configurations
+        
+        Keys come from ``market_data.keys`` in secrets.yml. When none are configured,
+        the dedicated ``market_data.fallback_accounts`` (default: stock_ws, option_ws)
+        are reused as data keys so data traffic still stays off trading accounts.
+        """
+        data_config = getattr(settings, 'market_data', None)
+        if not isinstance(data_config, dict):
+            data_config = {}
+        
+        default_rate_limit = data_config.get('rate_limit_per_minute', 200)
+        self.data_key_max_wait_seconds = float(data_config.get('max_wait_seconds', 5.0))
+        
+        self.data_key_configs.clear()
+        for key_id, config in (data_config.get('keys') or {}).items():
+            if config is None:
+                logger.error(f"Market data key {key_id} has invalid configuration (None)")
+                continue
+            if not config.get('enabled', True):
+                logger.info(f"Skipping disabled market data key: {key_id}")
+                continue
+            
+            self.data_key_configs[key_id] = DataKeyConfig(
+                key_id=key_id,
+                api_key=config['api_key'],
+                secret_key=config['secret_key'],
+                paper_trading=config.get('paper_trading', True),
+                rate_limit_per_minute=config.get('rate_limit_per_minute', default_rate_limit),
+                enabled=True
+            )
+        
+        if not self.data_key_configs:
+            for account_id in data_config.get('fallback_accounts', ['stock_ws', 'option_ws']):
+                account_config = self.account_configs.get(account_id)
+                if not account_config or not account_config.enabled:
+                    continue
+                self.data_key_configs[account_id] = DataKeyConfig(
+                    key_id=account_id,
+                    api_key=account_config.api_key,
+                    secret_key=account_config.secret_key,
+                    paper_trading=account_config.paper_trading,
+                    rate_limit_per_minute=default_rate_limit
+                )
+        
+        self.data_key_id_list = list(self.data_key_configs.keys())
+        
+        if not self.data_key_id_list:
+            logger.warning("No market data keys configured - market data requests will fail")
+        else:
+            logger.info(f"Loaded {len(self.data_key_id_list)} market data keys: {self.data_key_id_list}")
+    
+    def _create_data_key_connections(self):
+        """Create one shared client per market data key"""
+        self.data_key_connections.clear()
+        for key_id, data_key_config in self.data_key_configs.items():
+            try:
+                account_connection = self.account_connections.get(key_id)
+                shared_client = account_connection.alpaca_client if account_connection else None
+                self.data_key_connections[key_id] = DataKeyConnection(data_key_config, client=shared_client)
+            except Exception as e:
+                logger.error(f"Failed to create market data client for key {key_id}: {e}")
+        self.data_key_id_list = [key_id for key_id in self.data_key_id_list if key_id in self.data_key_connections]
+    
     async def _create_connections(self):
         """Create account connections"""
         logger.info("Creating account connections...")
@@ -293,38 +465,28 @@ class AccountPool:
     def _start_background_tasks(self):
         """Start background maintenance tasks"""
         try:
-            loop = asyncio.get_running_loop()
-            
-            # Health check task
-            health_check_task = asyncio.create_task(self._health_check_loop())
-            self._background_tasks.append(health_check_task)
-            
-            # Cleanup task
-            cleanup_task = asyncio.create_task(self._cleanup_loop())
-            self._background_tasks.append(cleanup_task)
+            # Single maintenance scheduler (idle cleanup + health checks)
+            maintenance_task = asyncio.create_task(self._maintenance_loop())
+            self._background_tasks.append(maintenance_task)
             
             logger.info("Background tasks started")
             
         except RuntimeError:
             logger.info("No running event loop, background tasks will start later")
     
-    async def _health_check_loop(self):
-        """Health check loop"""
+    async def _maintenance_loop(self):
+        """Maintenance loop - idle cleanup every tick, health checks on their own interval"""
+        next_health_check = time.monotonic() + self.health_check_interval_seconds
         while True:
             try:
-                await asyncio.sleep(self.health_check_interval_seconds)
-                await self._perform_health_checks()
-            except Exception as e:
-                logger.error(f"Health check loop error: {e}")
-                
-    async def _cleanup_loop(self):
-        """Cleanup loop"""
-        while True:
-            try:
-                await asyncio.sleep(60)  # Every minute
+                await asyncio.sleep(self.maintenance_interval_seconds)
                 await self._cleanup_idle_connections()
+                
+                if time.monotonic() >= next_health_check:
+                    next_health_check = time.monotonic() + self.health_check_interval_seconds
+                    await self._perform_health_checks()
             except Exception as e:
-                logger.error(f"Cleanup loop error: {e}")
+                logger.error(f"Maintenance loop error: {e}")
     
     async def _perform_health_checks(self):
         """Perform health checks"""
@@ -337,6 +499,7 @@ class AccountPool:
         # Wait for all health checks to complete
         if tasks:
             await asyncio.gather(*tasks, return_exceptions=True)
+        self.last_health_check = datetime.utcnow()
     
     async def _health_check_account(self, account_id: str, connection: AccountConnection):
         """Health check for a single account"""
@@ -356,18 +519,15 @@ class AccountPool:
         # Wait for all cleanup operations to complete
         if tasks:
             await asyncio.gather(*tasks, return_exceptions=True)
+        self.last_cleanup = datetime.utcnow()
     
     async def _cleanup_account(self, account_id: str, connection: AccountConnection):
         """Cleanup for a single account"""
         try:
-            # Get connection stats for cleanup decisions
-            stats = connection.get_connection_stats()
-            logger.debug(f"Account {account_id} connection stats: {stats.get('total_connections', 0)} connections")
-            
-            # Cleanup if connection has been idle for too long
-            if stats.get('idle_time_seconds', 0) > 300:  # 5 minutes
-                logger.info(f"Cleaning up idle connection for account {account_id}")
-                await connection.cleanup_idle_connections()
+            # Close stream connections idle for too long (shared REST clients are kept)
+            closed = await connection.connection_manager.cleanup_idle_connections(self.max_idle_minutes)
+            if closed:
+                logger.info(f"Closed idle connections for account {account_id}: {[conn_type.value for conn_type in closed]}")
                 
         except Exception as e:
             logger.error(f"Failed to cleanup connections for account {account_id}: {e}")
@@ -413,6 +573,89 @@ class AccountPool:
         
         return self.account_id_list[0]
     
+    def _data_key_candidates(self, routing_key: Optional[str] = None, key_id: Optional[str] = None) -> List[str]:
+        """Order data keys by preference: pinned key, hashed routing key, then the rest
+        
+        Keys whose market data circuit breaker would reject a call (open, or half-open with
+        its probe slot taken) are dropped from routing.
+        """
+        if key_id and key_id in self.data_key_connections:
+            key_ids = [key_id]
+        else:
+            key_ids = self.data_key_id_list
+            if routing_key:
+                hash_value = hashlib.md5(routing_key.encode()).hexdigest()
+                start = int(hash_value, 16) % len(key_ids)
+            else:
+                start = self._data_key_round_robin % len(key_ids)
+                self._data_key_round_robin += 1
+            key_ids = key_ids[start:] + key_ids[:start]
+        
+        return [
+            candidate_id for candidate_id in key_ids
+            if not self.circuit_breakers.rejects(candidate_id, EndpointClass.MARKET_DATA)
+        ]
+    
+    def data_key_paper_trading(self, key_id: Optional[str] = None) -> Set[bool]:
+        """paper_trading flags of the data keys a request pinned to key_id (or routed by the pool) may use"""
+        key_ids = [key_id] if key_id and key_id in self.data_key_connections else self.data_key_id_list
+        return {self.data_key_configs[candidate_id].paper_trading for candidate_id in key_ids}
+    
+    async def acquire_data_key(self, routing_key: Optional[str] = None, key_id: Optional[str] = None):
+        """Get a market data key and its client from the data key pool within its rate budget
+        
+        The routing key (usually the symbol) picks a preferred key; if that key has
+        no budget left the next key with budget is used. When every key is exhausted
+        the call waits for the earliest refill, up to ``data_key_max_wait_seconds``.
+        
+        Returns:
+            (key_id, AlpacaClient) tuple
+        """
+        if not self._initialized:
+            await self.initialize()
+        
+        if not self.data_key_id_list:
+            raise Exception("No market data keys configured. Configure market_data.keys in secrets.yml.")
+        
+        if key_id and key_id not in self.data_key_connections:
+            logger.debug(f"'{key_id}' is not a market data key, routing by data key pool")
+        
+        candidates = self._data_key_candidates(routing_key, key_id)
+        if not candidates:
+            # Every eligible key is tripped - fail fast with the soonest retry time
+            tripped = [key_id] if key_id in self.data_key_connections else self.data_key_id_list
+            retry_after = min(
+                self.circuit_breakers.get(tripped_id, EndpointClass.MARKET_DATA).retry_after_seconds()
+                for tripped_id in tripped
+            )
+            raise CircuitOpenError(tripped[0], EndpointClass.MARKET_DATA, retry_after)
+        
+        deadline = time.monotonic() + self.data_key_max_wait_seconds
+        
+        with observe_duration(_data_key_wait):
+            while True:
+                for candidate_id in candidates:
+                    connection = self.data_key_connections[candidate_id]
+                    if connection.rate_limiter.try_acquire():
+                        connection.request_count += 1
+                        connection.last_used = datetime.utcnow()
+                        return candidate_id, connection.client
+                
+                wait_seconds = min(
+                    self.data_key_connections[candidate_id].rate_limiter.seconds_until_available()
+                    for candidate_id in candidates
+                )
+                if time.monotonic() + wait_seconds > deadline:
+                    raise Exception(f"Market data rate budget exhausted for keys {candidates}")
+                
+                self.data_key_connections[candidates[0]].throttled_count += 1
+                await asyncio.sleep(wait_seconds)
+    
+    async def acquire_data_client(self, routing_key: Optional[str] = None, key_id: Optional[str] = None):
+        """Get a market data client from the data key pool (see ``acquire_data_key``)"""
+        _, client = await self.acquire_data_key(routing_key=routing_key, key_id=key_id)
+        return client
+    
     def resolve_account_id(self, account_identifier: Optional[str]) -> Optional[str]:
         """Resolve account identifier to account ID"""
         if not account_identifier:
@@ -448,6 +691,27 @@ class AccountPool:
         
         return self.account_configs.get(resolved_account_id) if resolved_account_id else None
 
+    def get_alpaca_client(self, account_id: Optional[str] = None, routing_key: Optional[str] = None):
+        """获取账户共享的AlpacaClient - 无锁，用于HTTP请求（不再每次请求新建客户端）"""
+        config = self.get_account_config(account_id, routing_key)
+        if not config:
+            return None
+        
+        connection = self.account_connections.get(config.account_id)
+        if connection is not None:
+            return connection.alpaca_client
+        
+        client = self._standalone_clients.get(config.account_id)
+        if client is None:
+            from app.alpaca_client import AlpacaClient
+            client = AlpacaClient(
+                api_key=config.api_key,
+                secret_key=config.secret_key,
+                paper_trading=config.paper_trading
+            )
+            self._standalone_clients[config.account_id] = client
+        return client
+    
     async def get_connection(self, account_id: Optional[str] = None, routing_key: Optional[str] = None) -> AccountConnection:
         """Get account connection"""
         if not self._initialized:
@@ -480,7 +744,8 @@ class AccountPool:
         if not connection.is_available:
             logger.warning(f"Connection busy, waiting for availability (account: {resolved_account_id})")
         
-        await connection.acquire()
+        with observe_duration(_account_wait):
+            await connection.acquire()
         
         # Update usage queue (atomic operation with connection's own lock)
         if connection in usage_queue:
@@ -515,6 +780,14 @@ class AccountPool:
             "total_accounts": len(self.account_configs),
             "active_accounts": len([acc for acc in self.account_configs.values() if acc.enabled]),
             "total_connections": total_connections,
+            "standalone_clients": len(self._standalone_clients),
+            "maintenance": {
+                "interval_seconds": self.maintenance_interval_seconds,
+                "health_check_interval_seconds": self.health_check_interval_seconds,
+                "max_idle_minutes": self.max_idle_minutes,
+                "last_health_check": self.last_health_check.isoformat() if self.last_health_check else None,
+                "last_cleanup": self.last_cleanup.isoformat() if self.last_cleanup else None
+            },
             "account_stats": {}
         }
         
@@ -528,10 +801,27 @@ class AccountPool:
                 "connection_count": connection.connection_count,
                 "is_available": connection.is_available,
                 "paper_trading": account_config.paper_trading if account_config else True,
-                "connection_details": connection_stats.get('connections', {})
+                "connection_details": connection_stats.get('connections', {}),
+                "circuit_breakers": self.circuit_breakers.get_account_stats(account_id)
             }
             stats["account_stats"][account_id] = account_stats
         
+        stats["data_keys"] = {
+            key_id: {
+                **connection.get_stats(),
+                "routable": not self.circuit_breakers.rejects(key_id, EndpointClass.MARKET_DATA),
+                "circuit_breakers": self.circuit_breakers.get_account_stats(key_id)
+            }
+            for key_id, connection in self.data_key_connections.items()
+        }
+        from app.order_book import order_book_manager
+        stats["order_books"] = order_book_manager.get_stats()
+        stats["open_circuits"] = [
+            f"{account_id}/{endpoint_class.value}"
+            for endpoint_class in EndpointClass
+            for account_id in self.circuit_breakers.open_accounts(endpoint_class)
+        ]
+        
         return stats
     
     async def get_all_accounts(self) -> Dict[str, Any]:
@@ -563,6 +853,9 @@ class AccountPool:
                 self.account_connections.clear()
                 self.usage_queues.clear()
         
+        self.data_key_connections.clear()
+        self._standalone_clients.clear()
+        
         logger.info("Account pool shutdown complete")
 
 
@@ -574,3 +867,30 @@ account_pool = AccountPool(health_check_interval_seconds=300)
 def get_account_pool() -> AccountPool:
     """Get account pool instance"""
     return account_pool
+
+
+def collect_pool_metrics():
+    """Prometheus families for /metrics (read at scrape time)"""
+    accounts = MetricFamily("alpaca_pool_accounts", "gauge", "Configured trading accounts by state")
+    accounts.add({"state": "enabled"}, sum(1 for config in account_pool.account_configs.values() if config.enabled))
+    accounts.add({"state": "disabled"}, sum(1 for config in account_pool.account_configs.values() if not config.enabled))
+    busy = MetricFamily("alpaca_pool_account_connections_busy", "gauge",
+                        "Account connections currently acquired")
+    busy.add(None, sum(1 for connection in account_pool.account_connections.values() if connection._in_use))
+    data_requests = MetricFamily("alpaca_data_key_requests_total", "counter", "Requests routed to a market data key")
+    data_throttled = MetricFamily("alpaca_data_key_throttled_total", "counter",
+                                  "Waits for market data key budget (counted on the preferred key)")
+    data_tokens = MetricFamily("alpaca_data_key_tokens", "gauge", "Rate budget tokens left per market data key")
+    for key_id, connection in list(account_pool.data_key_connections.items()):
+        labels = {"key": key_id}
+        data_requests.add(labels, connection.request_count)
+        data_throttled.add(labels, connection.throttled_count)
+        data_tokens.add(labels, connection.rate_limiter.tokens)
+    open_circuits = MetricFamily("alpaca_circuit_open", "gauge", "Open circuit breakers by endpoint class")
+    for endpoint_class in EndpointClass:
+        open_circuits.add({"endpoint_class": endpoint_class.value},
+                          len(account_pool.circuit_breakers.open_accounts(endpoint_class)))
+    return [accounts, busy, data_requests, data_throttled, data_tokens, open_circuits]
+
+
+REGISTRY.register_collector("account_pool", collect_pool_metrics)
@@ -7,11 +7,22 @@ from alpaca.data.requests import StockLatestQuoteRequest, StockBarsRequest, Opti
 from alpaca.data.timeframe import TimeFrame
 
 from loguru import logger
-from typing import Optional, List, Dict, Any
+from typing import Optional, List, Dict, Any, Callable, Awaitable, Tuple
 import asyncio
 import time
 import arrow
 
+from app.circuit_breaker import EndpointClass, CircuitOpenError, is_upstream_failure
+from app.upstream_metrics import upstream_metrics, instrument_rest_client
+from app.metrics import pool_calls_in_flight
+
+
+def rest_data_feed(paper_trading: bool, is_option: bool = False) -> str:
+    """REST行情数据源 - 模拟盘Key为IEX/indicative，实盘Key为SIP/OPRA"""
+    if is_option:
+        return "indicative" if paper_trading else "opra"
+    return "iex" if paper_trading else "sip"
+
 
 def convert_utc_to_eastern(utc_timestamp_str: str) -> str:
     """
@@ -38,8 +49,61 @@ def convert_utc_to_eastern(utc_timestamp_str: str) -> str:
         return utc_timestamp_str  # 返回原始字符串
 
 
+# Order statuses that the "open" keyword maps to
+OPEN_ORDER_STATUSES = {'new', 'accepted', 'pending_new', 'accepted_for_bidding', 'pending_cancel',
+                       'pending_replace'}
+
+# Statuses covered by Alpaca's own status=open query (it also returns partially filled orders)
+ALPACA_OPEN_ORDER_STATUSES = OPEN_ORDER_STATUSES | {'partially_filled'}
+
+
+def expand_order_status_filter(status: Optional[str]) -> Optional[set]:
+    """
+    将订单状态过滤参数展开为状态集合
+    
+    Supports comma-separated statuses; "open" expands to OPEN_ORDER_STATUSES.
+    Returns None when every status is requested (None or "all").
+    """
+    if status is None or status == "all":
+        return None
+    requested_statuses = set()
+    for raw in [s.strip() for s in status.split(',') if s.strip()]:
+        if raw == 'open':
+            requested_statuses.update(OPEN_ORDER_STATUSES)
+        else:
+            requested_statuses.add(raw)
+    return requested_statuses
+
+
+def order_to_dict(order) -> Dict[str, Any]:
+    """将Alpaca订单对象转换为API返回格式"""
+    return {
+        "id": str(order.id),  # 确保ID是字符串类型
+        "client_order_id": str(order.client_order_id) if order.client_order_id else None,
+        "symbol": order.symbol,
+        "asset_id": str(order.asset_id) if order.asset_id else None,
+        "asset_class": order.asset_class.value if order.asset_class else None,
+        "qty": float(order.qty),
+        "side": order.side.value,
+        "order_type": order.order_type.value,
+        "time_in_force": order.time_in_force.value if order.time_in_force else None,
+        "status": order.status.value,
+        "filled_qty": float(order.filled_qty) if order.filled_qty else 0,
+        "filled_avg_price": float(order.filled_avg_price) if order.filled_avg_price else None,
+        "limit_price": float(order.limit_price) if order.limit_price else None,
+        "stop_price": float(order.stop_price) if order.stop_price else None,
+        "created_at": convert_utc_to_eastern(str(order.created_at)) if order.created_at else None,
+        "updated_at": convert_utc_to_eastern(str(order.updated_at)) if order.updated_at else None,
+        "submitted_at": convert_utc_to_eastern(str(order.submitted_at)) if order.submitted_at else None,
+        "filled_at": convert_utc_to_eastern(str(order.filled_at)) if order.filled_at else None
+    }
+
+
 class AlpacaClient:
-    def __init__(self, api_key: str, secret_key: str, paper_trading: bool = True):
+    def __init__(self, api_key: str, secret_key: str, paper_trading: bool = True,
+                 trading_client: Optional[TradingClient] = None,
+                 stock_data_client: Optional[StockHistoricalDataClient] = None,
+                 option_data_client: Optional[OptionHistoricalDataClient] = None):
         # Use provided credentials (required in clean architecture)
         self.api_key = api_key
         self.secret_key = secret_key
@@ -50,25 +114,29 @@ class AlpacaClient:
         if not self.api_key or not self.secret_key:
             raise ValueError("Alpaca API credentials are required")
 
-        # Initialize trading client
-        self.trading_client = TradingClient(
+        # Initialize trading client (reuse the pooled one when provided)
+        self.trading_client = trading_client or TradingClient(
             api_key=self.api_key,
             secret_key=self.secret_key,
             paper=self.paper_trading
         )
 
         # Initialize data clients
-        self.stock_data_client = StockHistoricalDataClient(
+        self.stock_data_client = stock_data_client or StockHistoricalDataClient(
             api_key=self.api_key,
             secret_key=self.secret_key
         )
 
         # Initialize options data client
-        self.option_data_client = OptionHistoricalDataClient(
+        self.option_data_client = option_data_client or OptionHistoricalDataClient(
             api_key=self.api_key,
             secret_key=self.secret_key
         )
 
+        # Attribute host and SDK-internal retries to the tracked upstream call
+        for client in (self.trading_client, self.stock_data_client, self.option_data_client):
+            instrument_rest_client(client)
+
     async def test_connection(self) -> Dict[str, Any]:
         """Test connection to Alpaca API"""
         try:
@@ -177,7 +245,7 @@ class AlpacaClient:
                 end_date = end_dt.strftime("%Y-%m-%d")
 
             # Use different feed for paper trading vs live trading
-            feed_type = "iex" if self.paper_trading else "sip"
+            feed_type = rest_data_feed(self.paper_trading)
 
             request = StockBarsRequest(
                 symbol_or_symbols=[symbol],
@@ -409,7 +477,8 @@ class AlpacaClient:
             logger.error(f"Error validating option symbol {option_symbol}: {e}")
             return False
 
-    def _parse_option_symbol(self, option_symbol: str):
+    @staticmethod
+    def _parse_option_symbol(option_symbol: str):
         """Parse option symbol to extract components for real data validation"""
         try:
             # Find where the date starts by looking for the first digit after letters
@@ -721,9 +790,16 @@ class AlpacaClient:
             # Handle multiple statuses - GetOrdersRequest doesn't support comma-separated values
             # So we need to get all orders and filter manually
             # Check if status contains comma-separated values
+            # Build requested statuses set (supports comma-separated list)
+            requested_statuses = expand_order_status_filter(status)
+
             if status is not None and isinstance(status, str) and ',' in status:
-                # For multiple statuses, get all orders and filter manually
-                request_params = GetOrdersRequest(limit=limit, status="all")
+                # Open-only lists are served by Alpaca's status=open, so closed orders cannot crowd out the limit
+                if requested_statuses <= ALPACA_OPEN_ORDER_STATUSES:
+                    request_params = GetOrdersRequest(limit=limit, status="open")
+                else:
+                    # For multiple statuses, get all orders and filter manually
+                    request_params = GetOrdersRequest(limit=limit, status="all")
             else:
                 # For single status, pass it directly to GetOrdersRequest
                 request_params = GetOrdersRequest(limit=limit, status=status)
@@ -731,25 +807,10 @@ class AlpacaClient:
 
             logger.debug(f"Retrieved {len(orders)} total orders from Alpaca API (status filter: {status})")
 
-            # Define open order statuses that should be considered "open"
-            open_statuses = {'new', 'accepted', 'pending_new', 'accepted_for_bidding', 'pending_cancel',
-                             'pending_replace'}
-
             order_list = []
             filtered_count = 0
             status_counts = {}
 
-            # Build requested statuses set (supports comma-separated list)
-            requested_statuses: Optional[set] = None
-            if status is not None and status != "all":
-                requested_statuses = set()
-                # Split by comma and normalize
-                for raw in [s.strip() for s in status.split(',') if s.strip()]:
-                    if raw == 'open':
-                        requested_statuses.update(open_statuses)
-                    else:
-                        requested_statuses.add(raw)
-
             for order in orders:
                 # Track order status counts for debugging
                 order_status = order.status.value
@@ -762,26 +823,7 @@ class AlpacaClient:
 
                 if include_order:
                     filtered_count += 1
-                    order_list.append({
-                        "id": str(order.id),  # 确保ID是字符串类型
-                        "client_order_id": str(order.client_order_id) if order.client_order_id else None,
-                        "symbol": order.symbol,
-                        "asset_id": str(order.asset_id) if order.asset_id else None,
-                        "asset_class": order.asset_class.value if order.asset_class else None,
-                        "qty": float(order.qty),
-                        "side": order.side.value,
-                        "order_type": order.order_type.value,
-                        "time_in_force": order.time_in_force.value if order.time_in_force else None,
-                        "status": order.status.value,
-                        "filled_qty": float(order.filled_qty) if order.filled_qty else 0,
-                        "filled_avg_price": float(order.filled_avg_price) if order.filled_avg_price else None,
-                        "limit_price": float(order.limit_price) if order.limit_price else None,
-                        "stop_price": float(order.stop_price) if order.stop_price else None,
-                        "created_at": convert_utc_to_eastern(str(order.created_at)) if order.created_at else None,
-                        "updated_at": convert_utc_to_eastern(str(order.updated_at)) if order.updated_at else None,
-                        "submitted_at": convert_utc_to_eastern(str(order.submitted_at)) if order.submitted_at else None,
-                        "filled_at": convert_utc_to_eastern(str(order.filled_at)) if order.filled_at else None
-                    })
+                    order_list.append(order_to_dict(order))
 
             # Log detailed debugging information
             # logger.debug(f"Order status breakdown: {status_counts}")
@@ -802,6 +844,20 @@ class AlpacaClient:
             logger.error(f"Error cancelling order {order_id}: {e}")
             return {"error": str(e)}
 
+    async def cancel_all_orders(self) -> Dict[str, Any]:
+        """Cancel all open orders in one request (Alpaca bulk cancel)"""
+        try:
+            responses = self.trading_client.cancel_orders()
+            cancelled = [str(r.id) for r in responses if r.status < 300]
+            failed = [
+                {"order_id": str(r.id), "status": r.status, "body": r.body}
+                for r in responses if r.status >= 300
+            ]
+            return {"status": "cancelled", "cancelled_order_ids": cancelled, "failed": failed}
+        except Exception as e:
+            logger.error(f"Error cancelling all orders: {e}")
+            return {"error": str(e)}
+
     async def get_trading_history(self, days: int = 30) -> Dict[str, Any]:
         """Get trading history with daily PnL summary"""
         try:
@@ -1065,71 +1121,253 @@ class PooledAlpacaClient:
         return self._pool
 
     def _get_http_client(self, account_id: Optional[str] = None, routing_key: Optional[str] = None) -> AlpacaClient:
-        """获取HTTP客户端 - 无锁，使用预加载配置"""
-        # 获取账户配置（无锁）
-        config = self.pool.get_account_config(account_id, routing_key)
-        if not config:
+        """获取HTTP客户端 - 无锁，复用账户池中共享的客户端"""
+        client = self.pool.get_alpaca_client(account_id, routing_key)
+        if client is None:
             if account_id:
                 raise Exception(f"Account ID '{account_id}' not found.")
             else:
                 raise Exception(f"No account configuration available for routing_key={routing_key}")
-        
-        # 创建新的HTTP客户端实例
-        return AlpacaClient(
-            api_key=config.api_key,
-            secret_key=config.secret_key,
-            paper_trading=config.paper_trading
-        )
+        return client
+
+    async def _get_data_client(self, account_id: Optional[str] = None,
+                               routing_key: Optional[str] = None) -> Tuple[str, AlpacaClient]:
+        """获取行情数据客户端 - 使用独立的行情Key池，不占用交易账户的请求额度"""
+        return await self.pool.acquire_data_key(routing_key=routing_key, key_id=account_id)
 
     async def _get_websocket_connection(self, account_id: Optional[str] = None, routing_key: Optional[str] = None):
         """获取WebSocket连接 - 使用连接池（有锁）"""
         return await self.pool.get_connection(account_id, routing_key)
 
+    @staticmethod
+    def _extract_error(result: Any) -> Optional[str]:
+        """提取AlpacaClient返回结果中的错误信息（dict或[dict]格式）"""
+        if isinstance(result, dict):
+            return result.get("error")
+        if isinstance(result, list) and result and isinstance(result[0], dict):
+            return result[0].get("error")
+        return None
+
+    async def _guarded(self, breaker_id: str, endpoint_class: EndpointClass,
+                       call: Callable[[], Awaitable[Any]]) -> Any:
+        """通过熔断器执行上游调用 - 熔断打开时立即失败，不等待SDK超时"""
+        breaker = self.pool.circuit_breakers.get(breaker_id, endpoint_class)
+        if not breaker.allow_request():
+            raise CircuitOpenError(breaker_id, endpoint_class, breaker.retry_after_seconds())
+
+        in_flight = pool_calls_in_flight.labels(breaker_id, endpoint_class.value)
+        in_flight.inc()
+        with upstream_metrics.track() as upstream_call:
+            start_time = time.monotonic()
+            try:
+                result = await call()
+            except Exception as e:
+                elapsed = time.monotonic() - start_time
+                failed = is_upstream_failure(e) or is_upstream_failure(upstream_call.error)
+                breaker.record(elapsed, failed=failed, error=str(e))
+                upstream_metrics.record(breaker_id, endpoint_class, upstream_call, elapsed, error=str(e),
+                                        upstream_failure=failed)
+                raise
+            except BaseException:
+                # Cancelled (timeout, client disconnect): no outcome, but a half-open probe slot must be returned
+                breaker.release_probe()
+                raise
+            finally:
+                in_flight.dec()
+
+        elapsed = time.monotonic() - start_time
+        error = self._extract_error(result)
+        # AlpacaClient turns exceptions into error results; the SDK exception behind one is kept on the call
+        failed = bool(error) and is_upstream_failure(upstream_call.error)
+        breaker.record(elapsed, failed=failed, error=error)
+        upstream_metrics.record(breaker_id, endpoint_class, upstream_call, elapsed, error=error,
+                                upstream_failure=failed)
+        return result
+
+    async def _run_account_call(self, account_id: Optional[str], routing_key: Optional[str],
+                                endpoint_class: EndpointClass, call: Callable[[AlpacaClient], Awaitable[Any]],
+                                error_as_list: bool = False) -> Any:
+        """使用交易账户执行调用（账户/订单流量）"""
+        client = self._get_http_client(account_id, routing_key)
+        breaker_id = self.pool.resolve_account_id(account_id) or account_id
+        try:
+            return await self._guarded(breaker_id, endpoint_class, lambda: call(client))
+        except CircuitOpenError as e:
+            return [e.to_error_dict()] if error_as_list else e.to_error_dict()
+
+    async def _run_data_call(self, account_id: Optional[str], routing_key: Optional[str],
+                             call: Callable[[AlpacaClient], Awaitable[Any]]) -> Any:
+        """使用行情Key池执行调用（行情流量）"""
+        try:
+            key_id, client = await self._get_data_client(account_id, routing_key)
+            return await self._guarded(key_id, EndpointClass.MARKET_DATA, lambda: call(client))
+        except CircuitOpenError as e:
+            return e.to_error_dict()
+
+    def _stream_matches_rest_feed(self, account_id: Optional[str], is_option: bool = False) -> bool:
+        """实时流与REST使用同一行情源时才可用流数据代替REST（如IEX流不能代替实盘Key的SIP行情）"""
+        from app.ws_cache import stream_feed
+
+        feed = stream_feed(is_option)
+        paper_flags = self.pool.data_key_paper_trading(account_id)
+        return bool(paper_flags) and all(rest_data_feed(paper, is_option) == feed for paper in paper_flags)
+
+    @staticmethod
+    def _cached_quote(symbol: str, is_option: bool = False) -> Optional[Dict[str, Any]]:
+        """从WebSocket最新值缓存获取报价 - 仅在符号正被实时订阅时命中，格式与REST结果一致"""
+        from app.ws_cache import last_value_cache
+
+        quote = last_value_cache.get_quote(symbol)
+        if quote is None:
+            return None
+
+        prices = {
+            "bid_price": float(quote.bid_price) if quote.bid_price else None,
+            "ask_price": float(quote.ask_price) if quote.ask_price else None,
+            "bid_size": quote.bid_size,
+            "ask_size": quote.ask_size
+        }
+        timestamp = convert_utc_to_eastern(str(quote.timestamp)) if quote.timestamp else None
+
+        if not is_option:
+            return {"symbol": symbol, **prices, "timestamp": timestamp, "source": "stream"}
+
+        underlying, strike_price, exp_date, option_type = AlpacaClient._parse_option_symbol(symbol)
+        if not underlying or not strike_price or not option_type:
+            return None
+        trade = last_value_cache.get_trade(symbol)
+        return {
+            "symbol": symbol,
+            "underlying_symbol": underlying,
+            "strike_price": strike_price,
+            "expiration_date": exp_date,
+            "option_type": option_type,
+            **prices,
+            "last_price": float(trade.price) if trade and trade.price else None,
+            "implied_volatility": None,
+            "timestamp": timestamp,
+            "source": "stream"
+        }
+
     async def get_stock_quote(self, symbol: str, account_id: Optional[str] = None, routing_key: Optional[str] = None) -> \
     Dict[str, Any]:
-        """获取股票报价 - 使用HTTP客户端（无锁）"""
-        client = self._get_http_client(account_id, routing_key or symbol)
-        return await client.get_stock_quote(symbol)
+        """获取股票报价 - 实时流与REST行情源一致时优先使用WebSocket最新值缓存，否则使用行情Key池"""
+        cached = self._cached_quote(symbol) if self._stream_matches_rest_feed(account_id) else None
+        if cached is not None:
+            return cached
+        return await self._run_data_call(
+            account_id, routing_key or symbol,
+            lambda client: client.get_stock_quote(symbol)
+        )
 
     async def get_multiple_stock_quotes(self, symbols: List[str], account_id: Optional[str] = None,
                                         routing_key: Optional[str] = None) -> Dict[str, Any]:
-        """获取多个股票报价 - 使用HTTP客户端（无锁）"""
-        client = self._get_http_client(account_id, routing_key or symbols[0] if symbols else None)
-        return await client.get_multiple_stock_quotes(symbols)
+        """获取多个股票报价 - 缓存命中的符号不再请求REST（仅在实时流与REST行情源一致时）"""
+        cached = {}
+        if self._stream_matches_rest_feed(account_id):
+            cached = {symbol: quote for symbol in symbols or [] if (quote := self._cached_quote(symbol)) is not None}
+        missing = [symbol for symbol in symbols or [] if symbol not in cached]
+        if cached and not missing:
+            return {"quotes": [cached[symbol] for symbol in symbols], "count": len(symbols), "requested_symbols": symbols}
+
+        quotes_data = await self._run_data_call(
+            account_id, routing_key or (missing[0] if missing else None),
+            lambda client: client.get_multiple_stock_quotes(missing)
+        )
+        if not cached or "error" in quotes_data:
+            return quotes_data
+
+        # REST结果与请求的符号顺序一致（失败项也占位）
+        fetched = dict(zip(missing, quotes_data.get("quotes", [])))
+        results = [cached.get(symbol) or fetched.get(symbol) for symbol in symbols]
+        return {"quotes": results, "count": len(results), "requested_symbols": symbols}
 
     async def get_stock_bars(self, symbol: str, timeframe: str = "1Day", limit: int = 100,
                              start_date: Optional[str] = None, end_date: Optional[str] = None,
                              account_id: Optional[str] = None, routing_key: Optional[str] = None) -> Dict[str, Any]:
-        """获取股票K线数据 - 使用HTTP客户端（无锁）"""
-        client = self._get_http_client(account_id, routing_key or symbol)
-        return await client.get_stock_bars(symbol, timeframe, limit, start_date, end_date)
+        """获取股票K线数据 - 当日分钟/小时K线在实时流与REST行情源一致时优先使用WebSocket成交聚合，否则使用行情Key池"""
+        from app.ws_bars import bar_aggregator
+
+        if self._stream_matches_rest_feed(account_id):
+            streamed = bar_aggregator.intraday_bars(symbol, timeframe, limit, start_date, end_date)
+            if streamed is not None:
+                return streamed
+        return await self._run_data_call(
+            account_id, routing_key or symbol,
+            lambda client: client.get_stock_bars(symbol, timeframe, limit, start_date, end_date)
+        )
 
     async def get_options_chain(self, underlying_symbol: str, expiration_date: Optional[str] = None,
                                 account_id: Optional[str] = None, routing_key: Optional[str] = None) -> Dict[str, Any]:
-        """获取期权链 - 使用HTTP客户端（无锁）"""
-        client = self._get_http_client(account_id, routing_key or underlying_symbol)
-        return await client.get_options_chain(underlying_symbol, expiration_date)
+        """获取期权链 - 使用行情Key池"""
+        return await self._run_data_call(
+            account_id, routing_key or underlying_symbol,
+            lambda client: client.get_options_chain(underlying_symbol, expiration_date)
+        )
 
     async def get_option_quote(self, option_symbol: str, account_id: Optional[str] = None,
                                routing_key: Optional[str] = None) -> Dict[str, Any]:
-        """获取期权报价 - 使用HTTP客户端（无锁）"""
-        client = self._get_http_client(account_id, routing_key or option_symbol)
-        return await client.get_option_quote(option_symbol)
+        """获取期权报价 - 实时流与REST行情源一致时优先使用WebSocket最新值缓存，否则使用行情Key池"""
+        cached = None
+        if self._stream_matches_rest_feed(account_id, is_option=True):
+            cached = self._cached_quote(option_symbol, is_option=True)
+        if cached is not None:
+            return cached
+        return await self._run_data_call(
+            account_id, routing_key or option_symbol,
+            lambda client: client.get_option_quote(option_symbol)
+        )
 
     async def get_multiple_option_quotes(self, option_symbols: List[str], account_id: Optional[str] = None,
                                          routing_key: Optional[str] = None) -> Dict[str, Any]:
-        """获取多个期权报价 - 使用HTTP客户端（无锁）"""
-        client = self._get_http_client(account_id, routing_key or option_symbols[0] if option_symbols else None)
-        return await client.get_multiple_option_quotes(option_symbols)
+        """获取多个期权报价 - 缓存命中的符号不再请求REST（仅在实时流与REST行情源一致时）"""
+        cached = {}
+        if self._stream_matches_rest_feed(account_id, is_option=True):
+            cached = {
+                symbol: quote for symbol in option_symbols or []
+                if (quote := self._cached_quote(symbol, is_option=True)) is not None
+            }
+        missing = [symbol for symbol in option_symbols or [] if symbol not in cached]
+        if cached and not missing:
+            return {
+                "quotes": [cached[symbol] for symbol in option_symbols],
+                "count": len(option_symbols),
+                "successful_count": len(option_symbols),
+                "failed_count": 0,
+                "requested_symbols": option_symbols,
+                "failed_symbols": None
+            }
+
+        quotes_data = await self._run_data_call(
+            account_id, routing_key or (missing[0] if missing else None),
+            lambda client: client.get_multiple_option_quotes(missing)
+        )
+        if not cached or "error" in quotes_data:
+            return quotes_data
+
+        # REST结果与请求的符号顺序一致（失败项也占位）
+        fetched = dict(zip(missing, quotes_data.get("quotes", [])))
+        results = [cached.get(symbol) or fetched.get(symbol) for symbol in option_symbols]
+        failed_symbols = quotes_data.get("failed_symbols") or []
+        return {
+            "quotes": results,
+            "count": len(results),
+            "successful_count": len(results) - len(failed_symbols),
+            "failed_count": len(failed_symbols),
+            "requested_symbols": option_symbols,
+            "failed_symbols": failed_symbols or None
+        }
 
     async def place_stock_order(self, symbol: str, qty: float, side: str, order_type: str = "market",
                                 limit_price: Optional[float] = None, stop_price: Optional[float] = None,
                                 time_in_force: str = "day", account_id: Optional[str] = None,
                                 routing_key: Optional[str] = None, user_id: Optional[str] = None) -> Dict[str, Any]:
         """下股票订单 - 使用HTTP客户端（无锁）"""
-        client = self._get_http_client(account_id, routing_key or symbol)
-        return await client.place_stock_order(
-            symbol, qty, side, order_type, limit_price, stop_price, time_in_force, user_id
+        return await self._run_account_call(
+            account_id, routing_key or symbol, EndpointClass.TRADING,
+            lambda client: client.place_stock_order(
+                symbol, qty, side, order_type, limit_price, stop_price, time_in_force, user_id
+            )
         )
 
     async def place_option_order(self, option_symbol: str, qty: int, side: str, order_type: str = "market",
@@ -1137,34 +1375,59 @@ class PooledAlpacaClient:
                                  account_id: Optional[str] = None, routing_key: Optional[str] = None,
                                  user_id: Optional[str] = None) -> Dict[str, Any]:
         """下期权订单 - 使用HTTP客户端（无锁）"""
-        client = self._get_http_client(account_id, routing_key or option_symbol)
-        return await client.place_option_order(
-            option_symbol, qty, side, order_type, limit_price, time_in_force, user_id, account_id
+        return await self._run_account_call(
+            account_id, routing_key or option_symbol, EndpointClass.TRADING,
+            lambda client: client.place_option_order(
+                option_symbol, qty, side, order_type, limit_price, time_in_force, user_id, account_id
+            )
         )
 
     async def get_account(self, account_id: Optional[str] = None, routing_key: Optional[str] = None) -> Dict[str, Any]:
         """获取账户信息 - 使用HTTP客户端（无锁）"""
-        client = self._get_http_client(account_id, routing_key)
-        return await client.get_account()
+        return await self._run_account_call(
+            account_id, routing_key, EndpointClass.ACCOUNT,
+            lambda client: client.get_account()
+        )
 
     async def get_positions(self, account_id: Optional[str] = None, routing_key: Optional[str] = None) -> List[
         Dict[str, Any]]:
         """获取持仓信息 - 使用HTTP客户端（无锁）"""
-        client = self._get_http_client(account_id, routing_key)
-        return await client.get_positions()
+        return await self._run_account_call(
+            account_id, routing_key, EndpointClass.ACCOUNT,
+            lambda client: client.get_positions(),
+            error_as_list=True
+        )
 
     async def get_orders(self, status: Optional[str] = None, limit: int = 100,
                          after: Optional[str] = None, before: Optional[str] = None,
                          account_id: Optional[str] = None, routing_key: Optional[str] = None) -> List[Dict[str, Any]]:
-        """获取订单信息 - 使用HTTP客户端（无锁）"""
-        client = self._get_http_client(account_id, routing_key)
-        return await client.get_orders(status, limit, after, before)
+        """获取订单信息 - 未完成订单优先从交易流维护的内存订单簿读取，其余使用HTTP客户端（无锁）"""
+        from app.order_book import order_book_manager
+        cached = order_book_manager.get_orders(self.pool.resolve_account_id(account_id), status, limit, after, before)
+        if cached is not None:
+            return cached
+
+        return await self._run_account_call(
+            account_id, routing_key, EndpointClass.ACCOUNT,
+            lambda client: client.get_orders(status, limit, after, before),
+            error_as_list=True
+        )
 
     async def cancel_order(self, order_id: str, account_id: Optional[str] = None,
                            routing_key: Optional[str] = None) -> Dict[str, Any]:
         """取消订单 - 使用HTTP客户端（无锁）"""
-        client = self._get_http_client(account_id, routing_key)
-        return await client.cancel_order(order_id)
+        return await self._run_account_call(
+            account_id, routing_key, EndpointClass.TRADING,
+            lambda client: client.cancel_order(order_id)
+        )
+
+    async def cancel_all_orders(self, account_id: Optional[str] = None,
+                                routing_key: Optional[str] = None) -> Dict[str, Any]:
+        """批量取消账户所有未完成订单 - 使用HTTP客户端（无锁）"""
+        return await self._run_account_call(
+            account_id, routing_key, EndpointClass.TRADING,
+            lambda client: client.cancel_all_orders()
+        )
 
     async def bulk_place_stock_order(self, symbol: str, qty: float, side: str, order_type: str = "market",
                                      limit_price: Optional[float] = None, stop_price: Optional[float] = None,
@@ -1413,20 +1676,26 @@ class PooledAlpacaClient:
     async def get_trading_history(self, days: int = 30, account_id: Optional[str] = None, 
                                  routing_key: Optional[str] = None) -> Dict[str, Any]:
         """获取交易历史 - 使用HTTP客户端（无锁）"""
-        client = self._get_http_client(account_id, routing_key)
-        return await client.get_trading_history(days)
+        return await self._run_account_call(
+            account_id, routing_key, EndpointClass.ACCOUNT,
+            lambda client: client.get_trading_history(days)
+        )
 
     async def get_profit_report(self, days: int = 30, account_id: Optional[str] = None, 
                                routing_key: Optional[str] = None) -> Dict[str, Any]:
         """获取收益报告 - 使用HTTP客户端（无锁）"""
-        client = self._get_http_client(account_id, routing_key)
-        return await client.get_profit_report(days)
+        return await self._run_account_call(
+            account_id, routing_key, EndpointClass.ACCOUNT,
+            lambda client: client.get_profit_report(days)
+        )
 
     async def test_connection(self, account_id: Optional[str] = None, routing_key: Optional[str] = None) -> Dict[
         str, Any]:
         """测试连接 - 使用HTTP客户端（无锁）"""
-        client = self._get_http_client(account_id, routing_key)
-        return await client.test_connection()
+        return await self._run_account_call(
+            account_id, routing_key, EndpointClass.ACCOUNT,
+            lambda client: client.test_connection()
+        )
 
 
 # 全局连接池客户端实例
@@ -67,6 +67,18 @@ async def get_account_pool_stats(
     return pool.get_pool_stats()
 
 
+@admin_router.get("/upstream/metrics")
+async def get_upstream_metrics(
+    _auth_data: dict = Depends(role_required(["admin"]))
+):
+    """获取上游Alpaca调用指标 - 按账户/端点类别/主机的延迟分布、错误率、重试次数及合成探测结果"""
+    from app.upstream_metrics import upstream_metrics, upstream_probe
+    return {
+        "accounts": upstream_metrics.get_stats(),
+        "probe": upstream_probe.get_stats()
+    }
+
+
 @admin_router.get("/system/health")
 async def get_system_health(
     _auth_data: dict = Depends(role_required(["admin"]))
@@ -0,0 +1,260 @@
+"""
+Per-account circuit breakers for upstream Alpaca calls
+Fast-fail requests to an account/endpoint class that is erroring or too slow
+"""
+
+import time
+from collections import deque
+from dataclasses import dataclass
+from enum import Enum
+from typing import Any, Deque, Dict, List, Optional, Tuple
+
+import requests
+from alpaca.common.exceptions import APIError, RetryException
+from loguru import logger
+
+
+class CircuitState(Enum):
+    """Circuit breaker state"""
+    CLOSED = "closed"        # Calls flow normally
+    OPEN = "open"            # Calls fail immediately
+    HALF_OPEN = "half_open"  # Limited probe calls decide whether to close again
+
+
+class EndpointClass(Enum):
+    """Upstream endpoint classes tracked by separate breakers"""
+    ACCOUNT = "account"          # Account, positions, orders queries
+    TRADING = "trading"          # Order submission and cancellation
+    MARKET_DATA = "market_data"  # Quotes, bars, option chains
+
+
+@dataclass
+class CircuitBreakerConfig:
+    """Circuit breaker thresholds"""
+    window_size: int = 20                    # Outcomes kept in the rolling window
+    minimum_calls: int = 5                   # Calls required before the failure rate is evaluated
+    failure_rate_threshold: float = 0.5      # Open when failures / calls reaches this rate
+    consecutive_failure_threshold: int = 3   # Open immediately after this many failures in a row
+    slow_call_seconds: float = 5.0           # Calls slower than this count as failures
+    open_seconds: float = 30.0               # Time spent open before probing
+    half_open_max_calls: int = 1             # Concurrent probe calls allowed while half-open
+    half_open_probe_timeout_seconds: float = 60.0  # Probe slots never released are reclaimed after this
+
+
+# HTTP statuses that point at the key or Alpaca itself (auth, rate limit, server side),
+# as opposed to request errors such as invalid symbols or insufficient buying power (403/422)
+UPSTREAM_FAILURE_STATUS_CODES = {401, 408, 429}
+
+
+def is_upstream_failure(error: Optional[BaseException]) -> bool:
+    """Check whether an exception raised by an Alpaca call points at an unhealthy upstream"""
+    if error is None:
+        return False
+    if isinstance(error, (requests.ConnectionError, requests.Timeout, ConnectionError, TimeoutError)):
+        return True
+    if isinstance(error, RetryException):
+        return True
+    if isinstance(error, APIError):
+        status_code = error.status_code
+        return status_code is not None and (status_code in UPSTREAM_FAILURE_STATUS_CODES or status_code >= 500)
+    return False
+
+
+class CircuitBreaker:
+    """Rolling-window circuit breaker for one (account, endpoint class) pair"""
+
+    def __init__(self, name: str, config: Optional[CircuitBreakerConfig] = None):
+        self.name = name
+        self.config = config or CircuitBreakerConfig()
+
+        self.state = CircuitState.CLOSED
+        self._outcomes: Deque[bool] = deque(maxlen=self.config.window_size)  # True = failure
+        self._consecutive_failures = 0
+        self._opened_at: Optional[float] = None
+        self._half_open_in_flight = 0
+        self._half_open_probe_at: Optional[float] = None  # when the latest probe slot was reserved
+
+        # Counters for stats
+        self.total_calls = 0
+        self.total_failures = 0
+        self.slow_calls = 0
+        self.rejected_calls = 0
+        self.trip_count = 0
+        self.last_failure: Optional[str] = None
+        self.last_latency_ms: Optional[float] = None
+
+    def _transition(self, new_state: CircuitState):
+        if new_state == self.state:
+            return
+        logger.warning(f"Circuit breaker {self.name}: {self.state.value} -> {new_state.value}")
+        self.state = new_state
+        if new_state == CircuitState.OPEN:
+            self._opened_at = time.monotonic()
+            self.trip_count += 1
+        elif new_state == CircuitState.CLOSED:
+            self._outcomes.clear()
+            self._consecutive_failures = 0
+            self._opened_at = None
+        self._half_open_in_flight = 0
+
+    def retry_after_seconds(self) -> float:
+        """Seconds until an open breaker starts probing again"""
+        if self.state != CircuitState.OPEN or self._opened_at is None:
+            return 0.0
+        return max(0.0, self.config.open_seconds - (time.monotonic() - self._opened_at))
+
+    def allow_request(self) -> bool:
+        """Check whether a call may go upstream; reserves a probe slot when half-open"""
+        if self.state == CircuitState.OPEN:
+            if self.retry_after_seconds() > 0:
+                self.rejected_calls += 1
+                return False
+            self._transition(CircuitState.HALF_OPEN)
+
+        if self.state == CircuitState.HALF_OPEN:
+            if self._half_open_in_flight >= self.config.half_open_max_calls:
+                if not self._probes_timed_out():
+                    self.rejected_calls += 1
+                    return False
+                logger.warning(f"Circuit breaker {self.name}: reclaiming {self._half_open_in_flight} "
+                               f"half-open probe slot(s) that never reported back")
+                self._half_open_in_flight = 0
+            self._half_open_in_flight += 1
+            self._half_open_probe_at = time.monotonic()
+
+        return True
+
+    def would_allow_request(self) -> bool:
+        """Check whether allow_request would currently let a call through, without reserving a probe slot"""
+        if self.state == CircuitState.OPEN:
+            return self.retry_after_seconds() <= 0
+        if self.state == CircuitState.HALF_OPEN:
+            return self._half_open_in_flight < self.config.half_open_max_calls or self._probes_timed_out()
+        return True
+
+    def _probes_timed_out(self) -> bool:
+        return (self._half_open_probe_at is not None
+                and time.monotonic() - self._half_open_probe_at >= self.config.half_open_probe_timeout_seconds)
+
+    def release_probe(self):
+        """Give back a probe slot of a call that ended without an outcome (e.g. cancelled)"""
+        if self.state == CircuitState.HALF_OPEN:
+            self._half_open_in_flight = max(0, self._half_open_in_flight - 1)
+
+    def record(self, latency_seconds: float, failed: bool, error: Optional[str] = None):
+        """Record the outcome of an upstream call"""
+        slow = latency_seconds >= self.config.slow_call_seconds
+        failure = failed or slow
+
+        self.total_calls += 1
+        self.last_latency_ms = round(latency_seconds * 1000, 2)
+        if slow:
+            self.slow_calls += 1
+        if failure:
+            self.total_failures += 1
+            self.last_failure = error or f"slow call ({latency_seconds:.2f}s)"
+
+        if self.state == CircuitState.HALF_OPEN:
+            self._half_open_in_flight = max(0, self._half_open_in_flight - 1)
+            self._transition(CircuitState.OPEN if failure else CircuitState.CLOSED)
+            return
+
+        if self.state == CircuitState.OPEN:
+            # Late result of a call admitted before the trip
+            return
+
+        self._outcomes.append(failure)
+        self._consecutive_failures = self._consecutive_failures + 1 if failure else 0
+
+        if self._consecutive_failures >= self.config.consecutive_failure_threshold:
+            self._transition(CircuitState.OPEN)
+        elif len(self._outcomes) >= self.config.minimum_calls:
+            failure_rate = sum(self._outcomes) / len(self._outcomes)
+            if failure_rate >= self.config.failure_rate_threshold:
+                self._transition(CircuitState.OPEN)
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Get breaker statistics"""
+        window_calls = len(self._outcomes)
+        return {
+            "state": self.state.value,
+            "failure_rate": round(sum(self._outcomes) / window_calls, 3) if window_calls else 0.0,
+            "window_calls": window_calls,
+            "total_calls": self.total_calls,
+            "total_failures": self.total_failures,
+            "slow_calls": self.slow_calls,
+            "rejected_calls": self.rejected_calls,
+            "trip_count": self.trip_count,
+            "retry_after_seconds": round(self.retry_after_seconds(), 1),
+            "last_latency_ms": self.last_latency_ms,
+            "last_failure": self.last_failure
+        }
+
+
+class CircuitBreakerRegistry:
+    """Circuit breakers keyed by (account_id, endpoint class)"""
+
+    def __init__(self, config: Optional[CircuitBreakerConfig] = None):
+        self.config = config or CircuitBreakerConfig()
+        self._breakers: Dict[Tuple[str, EndpointClass], CircuitBreaker] = {}
+
+    def get(self, account_id: str, endpoint_class: EndpointClass) -> CircuitBreaker:
+        """Get (or create) the breaker for an account and endpoint class"""
+        key = (account_id, endpoint_class)
+        breaker = self._breakers.get(key)
+        if breaker is None:
+            breaker = CircuitBreaker(f"{account_id}/{endpoint_class.value}", self.config)
+            self._breakers[key] = breaker
+        return breaker
+
+    def is_open(self, account_id: str, endpoint_class: EndpointClass) -> bool:
+        """Check whether the breaker currently rejects calls (without reserving a probe)"""
+        breaker = self._breakers.get((account_id, endpoint_class))
+        return breaker is not None and breaker.state == CircuitState.OPEN and breaker.retry_after_seconds() > 0
+
+    def rejects(self, account_id: str, endpoint_class: EndpointClass) -> bool:
+        """Check whether the breaker would reject a call right now: open, or half-open with no probe slot free"""
+        breaker = self._breakers.get((account_id, endpoint_class))
+        return breaker is not None and not breaker.would_allow_request()
+
+    def open_accounts(self, endpoint_class: EndpointClass) -> List[str]:
+        """Account IDs whose breaker for the endpoint class is open"""
+        return [
+            account_id for (account_id, breaker_class) in self._breakers
+            if breaker_class == endpoint_class and self.is_open(account_id, breaker_class)
+        ]
+
+    def get_account_stats(self, account_id: str) -> Dict[str, Dict[str, Any]]:
+        """Breaker stats for one account, keyed by endpoint class"""
+        return {
+            breaker_class.value: breaker.get_stats()
+            for (breaker_account_id, breaker_class), breaker in self._breakers.items()
+            if breaker_account_id == account_id
+        }
+
+    def clear(self):
+        """Drop all breakers"""
+        self._breakers.clear()
+
+
+class CircuitOpenError(Exception):
+    """Raised when a call is rejected by an open circuit breaker"""
+
+    def __init__(self, account_id: str, endpoint_class: EndpointClass, retry_after_seconds: float):
+        self.account_id = account_id
+        self.endpoint_class = endpoint_class
+        self.retry_after_seconds = retry_after_seconds
+        super().__init__(
+            f"Circuit breaker open for account {account_id} ({endpoint_class.value}), "
+            f"retry after {retry_after_seconds:.1f}s"
+        )
+
+    def to_error_dict(self) -> Dict[str, Any]:
+        """Structured error payload in the AlpacaClient error format"""
+        return {
+            "error": str(self),
+            "error_code": "CIRCUIT_OPEN",
+            "account_id": self.account_id,
+            "endpoint_class": self.endpoint_class.value,
+            "retry_after_seconds": round(self.retry_after_seconds, 1)
+        }
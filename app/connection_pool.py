@@ -1,6 +1,7 @@
 """
 Modern Alpaca Connection Manager
 Clean, simple architecture for individual account connections
+Pooling, health checks and idle cleanup are owned by app.account_pool.AccountPool
 """
 
 import asyncio
@@ -29,6 +30,14 @@ class ConnectionType(Enum):
     OPTION_STREAM = "option_stream"     # Option real-time data stream
 
 
+# WebSocket connections that hold a socket open and must be closed when idle
+STREAM_CONNECTION_TYPES = (
+    ConnectionType.TRADING_STREAM,
+    ConnectionType.STOCK_STREAM,
+    ConnectionType.OPTION_STREAM,
+)
+
+
 @dataclass
 class ConnectionStats:
     """Connection statistics"""
@@ -157,6 +166,28 @@ class ConnectionManager:
         
         return self.connections[connection_type]
 
+    def get_client(self, connection_type: ConnectionType):
+        """Get a shared REST client without taking its lock
+        
+        REST clients are stateless apart from their HTTP session, so the pool hands out
+        the same instance to every caller instead of building one per request.
+        """
+        if connection_type in STREAM_CONNECTION_TYPES:
+            raise ValueError(f"{connection_type.value} is a stream connection, use get_connection()")
+        
+        if connection_type not in self.connections:
+            self._create_data_connection(connection_type)
+        
+        self.mark_used(connection_type)
+        return self.connections[connection_type]
+
+    def mark_used(self, connection_type: ConnectionType):
+        """Record usage of a connection (for stats and idle cleanup)"""
+        stats = self.connection_stats.get(connection_type)
+        if stats is not None:
+            stats.last_used = datetime.utcnow()
+            stats.usage_count += 1
+
     def release_connection(self, connection_type: ConnectionType):
         """Release connection of specified type"""
         if connection_type in self._locks and self._locks[connection_type].locked():
@@ -212,6 +243,33 @@ class ConnectionManager:
         """Current total connection count"""
         return len(self.connections)
 
+    async def cleanup_idle_connections(self, max_idle_minutes: float) -> List[ConnectionType]:
+        """Close stream connections idle longer than max_idle_minutes
+        
+        REST clients are kept: they hold no socket while idle and are shared by the
+        account's AlpacaClient for the lifetime of the pool.
+        """
+        now = datetime.utcnow()
+        idle_connections = [
+            conn_type for conn_type, stats in self.connection_stats.items()
+            if conn_type in STREAM_CONNECTION_TYPES
+            and not self._in_use.get(conn_type, False)
+            and (now - stats.last_used).total_seconds() / 60 > max_idle_minutes
+        ]
+        
+        for conn_type in idle_connections:
+            connection = self.connections.pop(conn_type, None)
+            self.connection_stats.pop(conn_type, None)
+            self._locks.pop(conn_type, None)
+            self._in_use.pop(conn_type, None)
+            try:
+                if hasattr(connection, 'close'):
+                    await connection.close()
+            except Exception as e:
+                logger.error(f"Failed to close idle {conn_type.value} connection (user: {self.user_id}): {e}")
+        
+        return idle_connections
+
     def get_connection_stats(self) -> Dict:
         """Get connection statistics"""
         stats = {
@@ -243,7 +301,7 @@ class ConnectionManager:
         # Clean up connections (WebSocket connections need special handling)
         for conn_type, connection in list(self.connections.items()):
             try:
-                if conn_type in [ConnectionType.TRADING_STREAM, ConnectionType.STOCK_STREAM, ConnectionType.OPTION_STREAM]:
+                if conn_type in STREAM_CONNECTION_TYPES:
                     # WebSocket connections need close() method
                     if hasattr(connection, 'close'):
                         await connection.close()
@@ -309,209 +367,5 @@ class ConnectionManager:
             # Don't throw exception, allow program to continue running
 
 
-class PoolManager:
-    """Modern connection pool manager"""
-    
-    def __init__(self, max_idle_time_minutes: int = 30, health_check_interval_seconds: int = 300):
-        self.max_idle_time_minutes = max_idle_time_minutes
-        self.health_check_interval_seconds = health_check_interval_seconds
-        
-        # User connection managers {user_id: ConnectionManager}
-        self.user_managers: Dict[str, ConnectionManager] = {}
-        
-        # Global lock (delayed initialization)
-        self._global_lock = None
-        
-        # Background tasks
-        self._background_tasks = []
-        self._start_background_tasks()
-        
-    def _start_background_tasks(self):
-        """Start background maintenance tasks"""
-        try:
-            # Only create tasks when event loop is running
-            loop = asyncio.get_running_loop()
-            
-            # Health check task
-            health_check_task = asyncio.create_task(self._health_check_loop())
-            self._background_tasks.append(health_check_task)
-            
-            # Connection cleanup task
-            cleanup_task = asyncio.create_task(self._cleanup_loop())
-            self._background_tasks.append(cleanup_task)
-            
-        except RuntimeError:
-            # No running event loop, delay task startup
-            pass
-    
-    async def _ensure_async_components(self):
-        """Ensure async components are initialized"""
-        if self._global_lock is None:
-            self._global_lock = asyncio.Lock()
-        
-        # If background tasks haven't started, try to start them
-        if not self._background_tasks:
-            self._start_background_tasks()
-        
-    async def _health_check_loop(self):
-        """Health check loop"""
-        while True:
-            try:
-                await asyncio.sleep(self.health_check_interval_seconds)
-                await self._perform_health_checks()
-            except Exception as e:
-                logger.error(f"Health check loop error: {e}")
-                
-    async def _cleanup_loop(self):
-        """Connection cleanup loop"""
-        while True:
-            try:
-                await asyncio.sleep(60)  # Every minute
-                await self._cleanup_idle_connections()
-            except Exception as e:
-                logger.error(f"Connection cleanup loop error: {e}")
-    
-    async def _perform_health_checks(self):
-        """Perform health checks"""
-        await self._ensure_async_components()
-        async with self._global_lock:
-            for user_id, manager in self.user_managers.items():
-                # Check health of each connection in connection manager
-                for conn_type in list(manager.connections.keys()):
-                    try:
-                        await manager.test_connection(conn_type)
-                    except Exception as e:
-                        logger.error(f"Health check failed (user: {user_id}, connection: {conn_type.value}): {e}")
-    
-    async def _cleanup_idle_connections(self):
-        """Clean up idle connections"""
-        await self._ensure_async_components()
-        async with self._global_lock:
-            for user_id, manager in list(self.user_managers.items()):
-                # Check if connections in manager have been idle too long
-                idle_connections = []
-                
-                for conn_type, stats in manager.connection_stats.items():
-                    idle_time = (datetime.utcnow() - stats.last_used).total_seconds() / 60
-                    
-                    if idle_time > self.max_idle_time_minutes and not manager._in_use.get(conn_type, False):
-                        # Don't clean up core connections (TRADING_CLIENT)
-                        if conn_type != ConnectionType.TRADING_CLIENT:
-                            idle_connections.append(conn_type)
-                
-                # Clean up idle connections
-                for conn_type in idle_connections:
-                    try:
-                        if conn_type in manager.connections:
-                            connection = manager.connections[conn_type]
-                            # WebSocket connections need to be closed
-                            if conn_type in [ConnectionType.TRADING_STREAM, ConnectionType.STOCK_STREAM, ConnectionType.OPTION_STREAM]:
-                                if hasattr(connection, 'close'):
-                                    await connection.close()
-                            
-                            # Remove connection from manager
-                            del manager.connections[conn_type]
-                            del manager.connection_stats[conn_type]
-                            if conn_type in manager._locks:
-                                del manager._locks[conn_type]
-                            if conn_type in manager._in_use:
-                                del manager._in_use[conn_type]
-                    except Exception as e:
-                        logger.error(f"Failed to cleanup connection (user: {user_id}, connection: {conn_type.value}): {e}")
-                
-                # If user only has core connection and hasn't been used for a long time, consider cleaning up entire manager
-                if len(manager.connections) == 1 and ConnectionType.TRADING_CLIENT in manager.connections:
-                    trading_stats = manager.connection_stats[ConnectionType.TRADING_CLIENT]
-                    idle_time = (datetime.utcnow() - trading_stats.last_used).total_seconds() / 60
-                    
-                    if idle_time > self.max_idle_time_minutes * 2:  # Core connections kept longer
-                        try:
-                            await manager.shutdown()
-                            del self.user_managers[user_id]
-                        except Exception as e:
-                            logger.error(f"Failed to cleanup user manager (user: {user_id}): {e}")
-    
-    async def get_user_manager(self, user) -> ConnectionManager:
-        """Get user connection manager"""
-        user_id = user.id
-        
-        # Ensure async components are initialized
-        await self._ensure_async_components()
-        
-        async with self._global_lock:
-            # If user manager doesn't exist, create it
-            if user_id not in self.user_managers:
-                try:
-                    api_key, secret_key = user.decrypt_alpaca_credentials()
-                    manager = ConnectionManager(
-                        user_id=user_id,
-                        api_key=api_key,
-                        secret_key=secret_key,
-                        paper_trading=user.alpaca_paper_trading
-                    )
-                    self.user_managers[user_id] = manager
-                    
-                except Exception as e:
-                    logger.error(f"Failed to create user connection manager (user: {user_id}): {e}")
-                    raise
-            
-            return self.user_managers[user_id]
-
-    def get_pool_stats(self) -> Dict:
-        """Get connection pool statistics"""
-        stats = {
-            "total_users": len(self.user_managers),
-            "total_connections": sum(manager.connection_count for manager in self.user_managers.values()),
-            "user_stats": {}
-        }
-        
-        for user_id, manager in self.user_managers.items():
-            stats["user_stats"][user_id] = manager.get_connection_stats()
-        
-        return stats
-    
-    async def shutdown(self):
-        """Shutdown connection pool"""
-        # Cancel background tasks
-        for task in self._background_tasks:
-            task.cancel()
-            
-        # Wait for tasks to complete
-        await asyncio.gather(*self._background_tasks, return_exceptions=True)
-        
-        # Shutdown all user managers
-        if self._global_lock is not None:
-            async with self._global_lock:
-                for user_id, manager in list(self.user_managers.items()):
-                    try:
-                        await manager.shutdown()
-                    except Exception as e:
-                        logger.error(f"Failed to shutdown user manager (user: {user_id}): {e}")
-                
-                self.user_managers.clear()
-        else:
-            # If no lock, clean up directly
-            for user_id, manager in list(self.user_managers.items()):
-                try:
-                    await manager.shutdown()
-                except Exception as e:
-                    logger.error(f"Failed to shutdown user manager (user: {user_id}): {e}")
-            
-            self.user_managers.clear()
-
-
-# Global connection pool instance
-pool_manager = PoolManager(
-    max_idle_time_minutes=30,
-    health_check_interval_seconds=300
-)
-
-
-# Dependency injection function
-def get_pool_manager() -> PoolManager:
-    """Get connection pool instance"""
-    return pool_manager
-
-
 # Export connection types for use by other modules
-__all__ = ['PoolManager', 'ConnectionType', 'ConnectionManager', 'get_pool_manager']
\ No newline at end of file
+__all__ = ['ConnectionType', 'ConnectionStats', 'ConnectionManager', 'STREAM_CONNECTION_TYPES']
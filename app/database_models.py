@@ -3,17 +3,42 @@
 Database Models for User Account Management
 """
 
-from sqlalchemy import create_engine, Column, Integer, String, Boolean, DateTime, text
+from sqlalchemy import create_engine, event, Column, Integer, String, Boolean, DateTime, text
 from sqlalchemy.orm import declarative_base, sessionmaker
 from sqlalchemy.exc import SQLAlchemyError
 from typing import List, Dict, Optional
 from datetime import datetime
 import asyncio
+import time
 from loguru import logger
 
+from app.metrics import db_query_duration_seconds
+
 Base = declarative_base()
 
 
+def instrument_engine(engine):
+    """Time every SQL statement into db_query_duration_seconds (labelled by SELECT/INSERT/UPDATE/...)"""
+    
+    @event.listens_for(engine, "before_cursor_execute")
+    def _start_timer(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("query_started", []).append(time.perf_counter())
+    
+    @event.listens_for(engine, "after_cursor_execute")
+    def _stop_timer(conn, cursor, statement, parameters, context, executemany):
+        started = conn.info["query_started"].pop()
+        operation = statement.lstrip().split(None, 1)[0].upper() if statement.strip() else "OTHER"
+        db_query_duration_seconds.labels(operation).observe(time.perf_counter() - started)
+    
+    @event.listens_for(engine, "handle_error")
+    def _discard_timer(exception_context):
+        connection = exception_context.connection
+        if connection is not None and connection.info.get("query_started"):
+            connection.info["query_started"].pop()
+    
+    return engine
+
+
 class AlpacaUser(Base):
     """Alpaca User Account Model - mirrors app_alpaca_users table"""
     __tablename__ = 'app_alpaca_users'
@@ -75,6 +100,7 @@ class DatabaseManager:
                 echo=False  # Set to True for SQL debugging
             )
             
+            instrument_engine(self.engine)
             self.SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=self.engine)
             
             # Test connection
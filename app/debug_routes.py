@@ -0,0 +1,58 @@
+"""
+调试诊断路由
+事件循环阻塞报告、按需采样性能分析等运行时诊断端点 - 内网直接放行，外网需要admin角色
+"""
+
+import asyncio
+from typing import Optional
+
+from fastapi import APIRouter, Depends, HTTPException, Query
+
+from app.middleware import role_required
+
+
+debug_router = APIRouter(prefix="/debug", tags=["debug"])
+
+
+@debug_router.get("/loop")
+async def get_loop_report(
+    window_seconds: Optional[float] = Query(None, gt=0, description="统计窗口（秒），默认使用配置的report_window_seconds"),
+    top: int = Query(20, ge=1, le=200, description="返回的调用点数量"),
+    _auth_data: dict = Depends(role_required(["admin"]))
+):
+    """获取事件循环阻塞报告 - 循环延迟分布、最近的慢回调及按阻塞时间排序的调用点（含调用栈）"""
+    from app.loop_monitor import loop_monitor
+    return loop_monitor.get_report(window_seconds=window_seconds, top=top)
+
+
+@debug_router.get("/profile")
+async def run_profile(
+    seconds: float = Query(10, gt=0, le=120, description="采样时长（秒）"),
+    format: str = Query("speedscope", pattern="^(collapsed|speedscope)$",
+                        description="collapsed（火焰图折叠栈文本）或 speedscope（https://www.speedscope.app 可直接打开）"),
+    interval_ms: float = Query(10, ge=1, le=1000, description="采样间隔（毫秒）"),
+    include_idle: bool = Query(False, description="是否包含空闲等待中的线程栈"),
+    _auth_data: dict = Depends(role_required(["admin"]))
+):
+    """
+    按需统计采样性能分析 - 在工作线程中对所有线程采样，不阻塞事件循环，生产环境可直接使用
+    
+    返回采样结果（collapsed或speedscope格式）以及结束时的asyncio任务转储；同一时间只允许一个分析任务
+    """
+    from app.profiler import profiler, dump_tasks, ProfilerBusyError
+    
+    if profiler.is_running:
+        raise HTTPException(status_code=409, detail="Profile already running")
+    try:
+        profile = await asyncio.to_thread(profiler.run, seconds, interval_ms / 1000, include_idle)
+    except ProfilerBusyError:
+        raise HTTPException(status_code=409, detail="Profile already running")
+    
+    return {
+        "format": format,
+        "duration_seconds": round(profile.duration, 3),
+        "interval_ms": interval_ms,
+        "samples": profile.samples,
+        "profile": profile.collapsed() if format == "collapsed" else profile.speedscope(name=f"opitios-alpaca {seconds:g}s"),
+        "tasks": dump_tasks()
+    }
@@ -1,10 +1,14 @@
 """
 健康检查路由 - Web端点版本
+账户健康由后台探测器按计划并发刷新，端点返回缓存快照（附带age/stale信息），
+不再在每个请求里对每个账户执行全部检查
 """
 
 from fastapi import APIRouter, HTTPException, BackgroundTasks
 from typing import Dict, List, Optional
+from dataclasses import dataclass
 import asyncio
+import time
 from datetime import datetime
 from alpaca.trading.client import TradingClient
 from alpaca.trading.requests import LimitOrderRequest
@@ -14,6 +18,8 @@ from alpaca.data.requests import StockLatestQuoteRequest
 from loguru import logger
 
 from config import settings
+from app.account_pool import account_pool
+from app.connection_pool import ConnectionType
 
 # 健康检查路由
 health_router = APIRouter(prefix="/health", tags=["health"])
@@ -22,45 +28,105 @@ health_router = APIRouter(prefix="/health", tags=["health"])
 health_cache = {}
 health_check_running = False
 
+
+@dataclass
+class HealthCheckConfig:
+    """健康检查配置（secrets.yml中的health_check）"""
+    enabled: bool = True                    # 是否启动后台探测
+    refresh_interval_seconds: float = 60.0  # 后台刷新间隔
+    stale_after_seconds: float = 180.0      # 快照超过此时长标记为stale（并在请求时后台刷新）
+    concurrency: int = 4                    # 同时检查的账户数
+    check_timeout_seconds: float = 15.0     # 单项检查超时
+    order_probes: bool = False              # 是否提交测试订单检查买入/卖出/撤单权限
+
+
+def load_health_check_config() -> HealthCheckConfig:
+    """从settings构建健康检查配置（忽略未知字段）"""
+    health_settings = getattr(settings, 'health_check', None)
+    if not isinstance(health_settings, dict):
+        return HealthCheckConfig()
+    known_fields = HealthCheckConfig.__dataclass_fields__.keys()
+    return HealthCheckConfig(**{k: v for k, v in health_settings.items() if k in known_fields})
+
+
 class WebHealthChecker:
     """Web版本的健康检查器"""
     
-    def __init__(self):
+    def __init__(self, config: Optional[HealthCheckConfig] = None):
         self.accounts = settings.accounts
+        self.config = config or load_health_check_config()
+        # 不在连接池中的账户按账户缓存客户端，避免每次检查都新建
+        self._clients: Dict[str, tuple] = {}
     
     async def run_comprehensive_check(self, account_id: Optional[str] = None) -> Dict:
-        """执行全面健康检查"""
+        """执行全面健康检查（账户间按concurrency并发）"""
         results = {
             "timestamp": datetime.now().isoformat(),
             "accounts": {}
         }
         
         accounts_to_check = [account_id] if account_id else list(self.accounts.keys())
+        accounts_to_check = [acc_id for acc_id in accounts_to_check if acc_id in self.accounts]
+        semaphore = asyncio.Semaphore(max(1, int(self.config.concurrency)))
         
-        for acc_id in accounts_to_check:
-            if acc_id not in self.accounts:
-                continue
-                
-            account_config = self.accounts[acc_id]
-            if not account_config.get('enabled', True):
-                results["accounts"][acc_id] = {
-                    "status": "disabled",
-                    "message": "账户已禁用"
-                }
-                continue
-            
-            try:
-                account_result = await self.check_single_account(acc_id, account_config)
-                results["accounts"][acc_id] = account_result
-            except Exception as e:
-                results["accounts"][acc_id] = {
-                    "status": "error",
-                    "error": str(e),
-                    "message": "账户检查失败"
-                }
+        async def check(acc_id: str) -> Dict:
+            async with semaphore:
+                return await self._check_account_entry(acc_id, self.accounts[acc_id])
+        
+        account_results = await asyncio.gather(*(check(acc_id) for acc_id in accounts_to_check))
+        for acc_id, account_result in zip(accounts_to_check, account_results):
+            results["accounts"][acc_id] = account_result
         
         return results
     
+    async def _check_account_entry(self, account_id: str, account_config: Dict) -> Dict:
+        """单个账户的结果条目（禁用/失败也返回条目）"""
+        if not account_config.get('enabled', True):
+            return {
+                "status": "disabled",
+                "message": "账户已禁用"
+            }
+        
+        try:
+            return await self.check_single_account(account_id, account_config)
+        except Exception as e:
+            return {
+                "status": "error",
+                "error": str(e),
+                "message": "账户检查失败"
+            }
+    
+    def _get_clients(self, account_id: str, config: Dict) -> tuple:
+        """获取账户的交易/行情客户端 - 优先复用连接池中的共享客户端"""
+        connection = account_pool.account_connections.get(account_id)
+        if connection is not None:
+            manager = connection.connection_manager
+            return (manager.get_client(ConnectionType.TRADING_CLIENT),
+                    manager.get_client(ConnectionType.STOCK_DATA))
+        
+        clients = self._clients.get(account_id)
+        if clients is None:
+            clients = self._clients[account_id] = (
+                TradingClient(
+                    api_key=config['api_key'],
+                    secret_key=config['secret_key'],
+                    paper=config.get('paper_trading', True)
+                ),
+                StockHistoricalDataClient(
+                    api_key=config['api_key'],
+                    secret_key=config['secret_key']
+                )
+            )
+        return clients
+    
+    async def _run_check(self, name: str, check) -> Dict:
+        """执行单项检查，超时记为错误"""
+        timeout = self.config.check_timeout_seconds
+        try:
+            return await asyncio.wait_for(check, timeout=timeout)
+        except asyncio.TimeoutError:
+            return {"status": "error", "error": f"{name} 检查超时 ({timeout}s)"}
+    
     async def check_single_account(self, account_id: str, config: Dict) -> Dict:
         """检查单个账户"""
         result = {
@@ -71,26 +137,23 @@ class WebHealthChecker:
         }
         
         try:
-            # 初始化客户端
-            trading_client = TradingClient(
-                api_key=config['api_key'],
-                secret_key=config['secret_key'],
-                paper=config.get('paper_trading', True)
-            )
+            # 复用共享客户端
+            trading_client, data_client = self._get_clients(account_id, config)
             
-            data_client = StockHistoricalDataClient(
-                api_key=config['api_key'],
-                secret_key=config['secret_key']
-            )
+            # 各项检查并发执行（测试订单检查仅在order_probes开启时执行）
+            checks = {
+                "account_info": self.check_account_info(trading_client),
+                "positions": self.check_positions(trading_client),
+                "order_history": self.check_order_history(trading_client)
+            }
+            if self.config.order_probes:
+                checks["buy_permission"] = self.check_trading_permission(trading_client, "buy")
+                checks["sell_permission"] = self.check_trading_permission(trading_client, "sell")
+                checks["cancel_permission"] = self.check_cancel_permission(trading_client)
+            checks["market_data"] = self.check_market_data(data_client)
             
-            # 执行各项检查
-            result["checks"]["account_info"] = await self.check_account_info(trading_client)
-            result["checks"]["positions"] = await self.check_positions(trading_client)
-            result["checks"]["order_history"] = await self.check_order_history(trading_client)
-            result["checks"]["buy_permission"] = await self.check_trading_permission(trading_client, "buy")
-            result["checks"]["sell_permission"] = await self.check_trading_permission(trading_client, "sell")
-            result["checks"]["cancel_permission"] = await self.check_cancel_permission(trading_client)
-            result["checks"]["market_data"] = await self.check_market_data(data_client)
+            outcomes = await asyncio.gather(*(self._run_check(name, check) for name, check in checks.items()))
+            result["checks"].update(zip(checks.keys(), outcomes))
             result["checks"]["websocket_config"] = self.check_websocket_config(config)
             
             # 计算总体状态
@@ -109,7 +172,7 @@ class WebHealthChecker:
     async def check_account_info(self, trading_client: TradingClient) -> Dict:
         """检查账户基本信息"""
         try:
-            account = trading_client.get_account()
+            account = await asyncio.to_thread(trading_client.get_account)
             
             warnings = []
             if account.status.value != "ACTIVE":
@@ -138,7 +201,7 @@ class WebHealthChecker:
     async def check_positions(self, trading_client: TradingClient) -> Dict:
         """检查持仓"""
         try:
-            positions = trading_client.get_all_positions()
+            positions = await asyncio.to_thread(trading_client.get_all_positions)
             
             return {
                 "status": "success",
@@ -166,7 +229,7 @@ class WebHealthChecker:
             from alpaca.trading.requests import GetOrdersRequest
             
             request = GetOrdersRequest(status="all", limit=5)
-            orders = trading_client.get_orders(filter=request)
+            orders = await asyncio.to_thread(trading_client.get_orders, filter=request)
             
             return {
                 "status": "success",
@@ -205,7 +268,7 @@ class WebHealthChecker:
                 )
             else:  # sell
                 # 检查是否有持仓
-                positions = trading_client.get_all_positions()
+                positions = await asyncio.to_thread(trading_client.get_all_positions)
                 if not positions:
                     return {
                         "status": "skip",
@@ -223,12 +286,12 @@ class WebHealthChecker:
                 )
             
             # 提交测试订单
-            order = trading_client.submit_order(order_data=order_data)
+            order = await asyncio.to_thread(trading_client.submit_order, order_data=order_data)
             
             # 立即取消
             cancel_success = False
             try:
-                trading_client.cancel_order_by_id(order.id)
+                await asyncio.to_thread(trading_client.cancel_order_by_id, order.id)
                 cancel_success = True
             except Exception:
                 pass
@@ -262,13 +325,13 @@ class WebHealthChecker:
                 limit_price=1.0
             )
             
-            order = trading_client.submit_order(order_data=order_data)
+            order = await asyncio.to_thread(trading_client.submit_order, order_data=order_data)
             
             # 等待一下
             await asyncio.sleep(1)
             
             # 取消订单
-            trading_client.cancel_order_by_id(order.id)
+            await asyncio.to_thread(trading_client.cancel_order_by_id, order.id)
             
             return {
                 "status": "success",
@@ -283,7 +346,7 @@ class WebHealthChecker:
         """检查市场数据访问"""
         try:
             request = StockLatestQuoteRequest(symbol_or_symbols=["AAPL"])
-            quotes = data_client.get_stock_latest_quote(request)
+            quotes = await asyncio.to_thread(data_client.get_stock_latest_quote, request)
             
             if "AAPL" in quotes:
                 quote = quotes["AAPL"]
@@ -344,8 +407,169 @@ class WebHealthChecker:
         else:
             return "error"
 
-# 初始化检查器
+
+class HealthSnapshotProber:
+    """
+    后台健康探测器 - 按计划并发刷新各账户健康状态并缓存快照
+    
+    刷新为单飞(single-flight)：同一范围（全部账户或单个账户）同时只有一次检查在执行，
+    并发的刷新请求等待并共享该次结果；全量刷新进行中时单账户刷新也直接等待它。
+    """
+    
+    def __init__(self, checker: WebHealthChecker, config: Optional[HealthCheckConfig] = None):
+        self.checker = checker
+        self.config = config or checker.config
+        self._snapshots: Dict[str, Dict] = {}     # account_id -> 最近一次检查结果
+        self._checked_at: Dict[str, float] = {}   # account_id -> 检查完成时间(monotonic)
+        self._refreshes: Dict[Optional[str], asyncio.Task] = {}  # None = 全量刷新
+        self._task: Optional[asyncio.Task] = None
+        
+        self.refresh_count = 0
+        self.refresh_failures = 0
+        self.coalesced_requests = 0
+        self.last_refresh_seconds: Optional[float] = None
+        self.last_refreshed_at: Optional[datetime] = None
+    
+    @property
+    def is_running(self) -> bool:
+        return self._task is not None and not self._task.done()
+    
+    @property
+    def refreshing(self) -> bool:
+        return any(not task.done() for task in self._refreshes.values())
+    
+    def has_snapshot(self, account_id: Optional[str] = None) -> bool:
+        return account_id in self._snapshots if account_id else bool(self._snapshots)
+    
+    def start(self):
+        """启动后台刷新（立即执行第一次）"""
+        if self.is_running or not self.config.enabled:
+            return
+        self._task = asyncio.get_running_loop().create_task(self._refresh_loop())
+        logger.info(f"健康探测已启动 (每{self.config.refresh_interval_seconds:.0f}s刷新, "
+                    f"并发{self.config.concurrency})")
+    
+    async def stop(self):
+        tasks = [task for task in [self._task, *self._refreshes.values()] if task is not None]
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        self._task = None
+        self._refreshes.clear()
+    
+    async def _refresh_loop(self):
+        while True:
+            try:
+                await self.refresh()
+            except Exception as e:
+                logger.error(f"❌ 后台健康检查失败: {e}")
+            await asyncio.sleep(self.config.refresh_interval_seconds)
+    
+    async def refresh(self, account_id: Optional[str] = None) -> Dict:
+        """刷新并返回快照；已有覆盖该范围的刷新在执行时等待它"""
+        for key in dict.fromkeys((None, account_id)):
+            task = self._refreshes.get(key)
+            if task is not None and not task.done():
+                self.coalesced_requests += 1
+                await asyncio.shield(task)
+                return self.snapshot(account_id)
+        
+        task = asyncio.get_running_loop().create_task(self._refresh(account_id))
+        self._refreshes[account_id] = task
+        task.add_done_callback(lambda done: self._forget_refresh(account_id, done))
+        # shield: 调用方（如断开的HTTP请求）被取消时不中断共享的刷新
+        await asyncio.shield(task)
+        return self.snapshot(account_id)
+    
+    def trigger(self, account_id: Optional[str] = None):
+        """在后台刷新（已有刷新在执行时忽略）"""
+        if any(key in self._refreshes for key in (None, account_id)):
+            return
+        task = asyncio.get_running_loop().create_task(self.refresh(account_id))
+        task.add_done_callback(self._log_background_failure)
+    
+    def _forget_refresh(self, account_id: Optional[str], task: asyncio.Task):
+        if self._refreshes.get(account_id) is task:
+            del self._refreshes[account_id]
+    
+    @staticmethod
+    def _log_background_failure(task: asyncio.Task):
+        if not task.cancelled() and task.exception() is not None:
+            logger.error(f"❌ 后台健康检查失败: {task.exception()}")
+    
+    async def _refresh(self, account_id: Optional[str]):
+        global health_check_running
+        started = time.monotonic()
+        if account_id is None:
+            health_check_running = True
+        try:
+            results = await self.checker.run_comprehensive_check(account_id)
+        except Exception:
+            self.refresh_failures += 1
+            raise
+        finally:
+            if account_id is None:
+                health_check_running = False
+        
+        finished = time.monotonic()
+        for acc_id, result in results["accounts"].items():
+            self._snapshots[acc_id] = result
+            self._checked_at[acc_id] = finished
+        if account_id is None:
+            # 移除已不在配置中的账户；保留最近一次全量结果
+            for acc_id in set(self._snapshots) - set(results["accounts"]):
+                self._snapshots.pop(acc_id)
+                self._checked_at.pop(acc_id)
+            health_cache.clear()
+            health_cache.update(results)
+        
+        self.refresh_count += 1
+        self.last_refresh_seconds = finished - started
+        self.last_refreshed_at = datetime.now()
+    
+    def snapshot(self, account_id: Optional[str] = None) -> Dict:
+        """缓存快照（每个账户带age_seconds/stale）"""
+        now = time.monotonic()
+        account_ids = [account_id] if account_id else list(self._snapshots)
+        accounts = {}
+        for acc_id in account_ids:
+            if acc_id not in self._snapshots:
+                continue
+            age = now - self._checked_at[acc_id]
+            accounts[acc_id] = {
+                **self._snapshots[acc_id],
+                "age_seconds": round(age, 1),
+                "stale": age > self.config.stale_after_seconds
+            }
+        
+        ages = [result["age_seconds"] for result in accounts.values()]
+        return {
+            "timestamp": datetime.now().isoformat(),
+            "accounts": accounts,
+            "age_seconds": max(ages) if ages else None,
+            "stale": not accounts or any(result["stale"] for result in accounts.values()),
+            "refreshing": self.refreshing
+        }
+    
+    def get_stats(self) -> Dict:
+        """获取探测器统计"""
+        return {
+            "running": self.is_running,
+            "refreshing": self.refreshing,
+            "accounts_cached": len(self._snapshots),
+            "refresh_count": self.refresh_count,
+            "refresh_failures": self.refresh_failures,
+            "coalesced_requests": self.coalesced_requests,
+            "last_refresh_seconds": round(self.last_refresh_seconds, 2) if self.last_refresh_seconds is not None else None,
+            "last_refreshed_at": self.last_refreshed_at.isoformat() if self.last_refreshed_at else None,
+            "refresh_interval_seconds": self.config.refresh_interval_seconds,
+            "stale_after_seconds": self.config.stale_after_seconds,
+            "order_probes": self.config.order_probes
+        }
+
+# 初始化检查器和后台探测器
 web_checker = WebHealthChecker()
+health_prober = HealthSnapshotProber(web_checker)
 
 @health_router.get("/")
 async def health_overview():
@@ -367,24 +591,21 @@ async def health_overview():
         }
     }
 
-@health_router.get("/comprehensive")
-async def comprehensive_health_check():
-    """全面健康检查"""
-    global health_check_running
-    global health_cache
-    
-    if health_check_running:
-        return {
-            "status": "running",
-            "message": "健康检查正在进行中，请稍后再试"
-        }
+async def _cached_snapshot(account_id: Optional[str], refresh: bool) -> Dict:
+    """返回缓存快照；没有快照或refresh=true时等待刷新，快照过期时在后台刷新"""
+    if refresh or not health_prober.has_snapshot(account_id):
+        return await health_prober.refresh(account_id)
     
+    results = health_prober.snapshot(account_id)
+    if results["stale"]:
+        health_prober.trigger(account_id)
+    return results
+
+@health_router.get("/comprehensive")
+async def comprehensive_health_check(refresh: bool = False):
+    """全面健康检查 - 返回后台探测的缓存快照（refresh=true时等待一次新检查）"""
     try:
-        health_check_running = True
-        results = await web_checker.run_comprehensive_check()
-        
-        # 缓存结果
-        health_cache = results
+        results = await _cached_snapshot(None, refresh)
         
         return {
             "status": "completed",
@@ -398,18 +619,16 @@ async def comprehensive_health_check():
             "error": str(e),
             "message": "健康检查执行失败"
         }
-    finally:
-        health_check_running = False
 
 @health_router.get("/account/{account_id}")
-async def single_account_check(account_id: str):
-    """单个账户健康检查"""
+async def single_account_check(account_id: str, refresh: bool = False):
+    """单个账户健康检查 - 返回缓存快照（refresh=true时等待一次新检查）"""
     try:
-        results = await web_checker.run_comprehensive_check(account_id)
-        
-        if account_id not in results["accounts"]:
+        if account_id not in web_checker.accounts:
             raise HTTPException(status_code=404, detail="账户不存在或未配置")
         
+        results = await _cached_snapshot(account_id, refresh)
+        
         return {
             "status": "completed",
             "account_id": account_id,
@@ -436,14 +655,10 @@ async def trading_permissions_check():
             continue
         
         try:
-            trading_client = TradingClient(
-                api_key=config['api_key'],
-                secret_key=config['secret_key'],
-                paper=config.get('paper_trading', True)
-            )
+            trading_client, _ = web_checker._get_clients(account_id, config)
             
             # 检查账户状态
-            account = trading_client.get_account()
+            account = await asyncio.to_thread(trading_client.get_account)
             
             permissions = {
                 "account_active": account.status.value == "ACTIVE",
@@ -509,15 +724,17 @@ async def websocket_status_check():
 @health_router.get("/last-check")
 async def get_last_health_check():
     """获取最后一次健康检查结果"""
-    if not health_cache:
+    if not health_prober.has_snapshot():
         return {
             "status": "no_data",
+            "prober": health_prober.get_stats(),
             "message": "尚未执行健康检查，请先调用 /health/comprehensive"
         }
     
     return {
         "status": "success",
-        "cached_results": health_cache,
+        "cached_results": health_prober.snapshot(),
+        "prober": health_prober.get_stats(),
         "message": "返回最后一次健康检查结果"
     }
 
@@ -526,17 +743,11 @@ async def start_background_health_check(background_tasks: BackgroundTasks):
     """启动后台健康检查"""
     
     async def background_check():
-        global health_cache
-        global health_check_running
         try:
-            health_check_running = True
-            results = await web_checker.run_comprehensive_check()
-            health_cache = results
+            await health_prober.refresh()
             logger.info("✅ 后台健康检查完成")
         except Exception as e:
             logger.error(f"❌ 后台健康检查失败: {e}")
-        finally:
-            health_check_running = False
     
     background_tasks.add_task(background_check)
     
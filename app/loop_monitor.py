@@ -0,0 +1,261 @@
+"""
+Event loop lag sampling and slow-callback detection
+A timer scheduled every interval measures how late the loop runs it; the delay is time other
+callbacks held the loop (blocking SDK calls, sync DB or Redis access, heavy encoding).
+
+To find out who holds it, a fast heartbeat callback runs on the loop and a watchdog thread checks
+it: once the heartbeat is overdue by more than slow_callback_seconds the loop thread's current stack
+is sampled (sys._current_frames) and the blocked time is charged to the innermost frame in this
+service's code. The rolling report ranks call sites by blocked time over the report window.
+"""
+
+import asyncio
+import os
+import sys
+import threading
+import time
+from collections import deque
+from dataclasses import dataclass
+from typing import Any, Deque, Dict, List, Optional, Tuple
+
+from loguru import logger
+
+from config import settings
+from app.histogram import LatencyHistogram
+from app.metrics import (
+    LOOP_LAG_BUCKETS,
+    REGISTRY,
+    MetricFamily,
+    event_loop_lag_seconds,
+    event_loop_stall_seconds
+)
+
+
+# Repository root: frames below it (outside virtualenvs) count as our call sites
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+_LIBRARY_MARKERS = ("site-packages", "dist-packages", f"{os.sep}.venv{os.sep}", f"{os.sep}venv{os.sep}")
+
+
+@dataclass
+class LoopMonitorConfig:
+    """Loop monitor settings (loop_monitor in secrets.yml)"""
+    enabled: bool = True
+    interval_seconds: float = 0.5            # lag histogram sampling
+    slow_callback_seconds: float = 0.1       # a callback holding the loop longer than this is sampled
+    heartbeat_seconds: float = 0.05          # loop-side heartbeat checked by the watchdog thread
+    watchdog_interval_seconds: float = 0.02  # stack sampling period while the loop is blocked
+    report_window_seconds: float = 300.0     # rolling report / metrics window
+    max_stack_depth: int = 25
+    metrics_top_sites: int = 10              # call sites exported to /metrics
+
+
+def load_loop_monitor_config() -> LoopMonitorConfig:
+    """Build the loop monitor config from settings (unknown fields ignored)"""
+    monitor_settings = getattr(settings, 'loop_monitor', None)
+    if not isinstance(monitor_settings, dict):
+        return LoopMonitorConfig()
+    known_fields = LoopMonitorConfig.__dataclass_fields__.keys()
+    return LoopMonitorConfig(**{k: v for k, v in monitor_settings.items() if k in known_fields})
+
+
+def _is_project_file(filename: str) -> bool:
+    return filename.startswith(PROJECT_ROOT) and not any(marker in filename for marker in _LIBRARY_MARKERS)
+
+
+def describe_frame(filename: str, lineno: int, function: str) -> str:
+    """'path:line function' with project paths relative to the repository root"""
+    if filename.startswith(PROJECT_ROOT):
+        filename = os.path.relpath(filename, PROJECT_ROOT)
+    return f"{filename}:{lineno} {function}"
+
+
+def attribute_stack(frame, max_depth: int = 25) -> Tuple[str, List[str]]:
+    """
+    Call site and stack (outermost first) of a frame; the call site is the innermost frame in this
+    service's code, so time blocked inside a library is charged to the line that called it
+    """
+    frames = []
+    while frame is not None:
+        frames.append((frame.f_code.co_filename, frame.f_lineno, frame.f_code.co_name))
+        frame = frame.f_back
+    site = next((entry for entry in frames if _is_project_file(entry[0])), frames[0] if frames else None)
+    stack = [describe_frame(*entry) for entry in reversed(frames[:max_depth])]
+    return (describe_frame(*site) if site else "unknown"), stack
+
+
+class LoopMonitor:
+    """Samples event loop lag and attributes loop stalls to call sites"""
+
+    def __init__(self, config: Optional[LoopMonitorConfig] = None):
+        self.config = config or load_loop_monitor_config()
+        self._task: Optional[asyncio.Task] = None
+        self.lag = LatencyHistogram(LOOP_LAG_BUCKETS)
+        self.last_lag_seconds = 0.0
+
+        # Slow-callback detection
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._loop_thread_id: Optional[int] = None
+        self._heartbeat: Optional[asyncio.TimerHandle] = None
+        self._watchdog: Optional[threading.Thread] = None
+        self._stop_watchdog = threading.Event()
+        self._due = 0.0                   # perf_counter() by which the next heartbeat should run
+        self._sampled_due: Optional[float] = None
+        self._last_sample_at = 0.0
+        self._stall_site: Optional[str] = None
+
+        self._samples: Deque[Tuple[float, str, float]] = deque(maxlen=20000)  # (time, site, blocked seconds)
+        self._stalls: Deque[Tuple[float, float, str]] = deque(maxlen=1000)    # (time, duration, site)
+        self._stacks: Dict[str, List[str]] = {}                               # latest stack per site
+        self.stall_count = 0
+
+    @property
+    def is_running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    def start(self):
+        if self.is_running or not self.config.enabled:
+            return
+        self._loop = asyncio.get_running_loop()
+        self._task = self._loop.create_task(self._sample_lag())
+        if self.config.slow_callback_seconds > 0:
+            self._loop_thread_id = threading.get_ident()
+            self._due = time.perf_counter() + self.config.heartbeat_seconds
+            self._heartbeat = self._loop.call_later(self.config.heartbeat_seconds, self._beat)
+            self._stop_watchdog.clear()
+            self._watchdog = threading.Thread(target=self._watch, name="loop-watchdog", daemon=True)
+            self._watchdog.start()
+        logger.info(f"Event loop monitor started (lag sampled every {self.config.interval_seconds}s, "
+                    f"slow callbacks over {self.config.slow_callback_seconds * 1000:.0f}ms)")
+
+    async def stop(self):
+        self._stop_watchdog.set()
+        if self._heartbeat is not None:
+            self._heartbeat.cancel()
+            self._heartbeat = None
+        if self._watchdog is not None:
+            await asyncio.to_thread(self._watchdog.join, 1.0)
+            self._watchdog = None
+        if self.is_running:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+        self._task = None
+
+    async def _sample_lag(self):
+        interval = self.config.interval_seconds
+        while True:
+            expected = time.perf_counter() + interval
+            await asyncio.sleep(interval)
+            self.record_lag(max(0.0, time.perf_counter() - expected))
+
+    def record_lag(self, seconds: float):
+        self.last_lag_seconds = seconds
+        self.lag.observe(seconds)
+        event_loop_lag_seconds.observe(seconds)
+
+    # ------------------------------------------------------------ slow-callback detection
+
+    def _beat(self):
+        """Loop-side heartbeat; a late run closes the stall the watchdog has been sampling"""
+        now = time.perf_counter()
+        late = now - self._due
+        if late >= self.config.slow_callback_seconds:
+            site = self._stall_site if self._sampled_due == self._due else None
+            self._record_stall(late, site)
+        self._due = now + self.config.heartbeat_seconds
+        self._heartbeat = self._loop.call_later(self.config.heartbeat_seconds, self._beat)
+
+    def _record_stall(self, seconds: float, site: Optional[str]):
+        self.stall_count += 1
+        self._stalls.append((time.time(), seconds, site or "unknown"))
+        event_loop_stall_seconds.observe(seconds)
+        logger.warning(f"Event loop blocked for {seconds * 1000:.0f}ms at {site or 'unknown call site'}")
+
+    def _watch(self):
+        while not self._stop_watchdog.wait(self.config.watchdog_interval_seconds):
+            try:
+                self.check()
+            except Exception as e:
+                logger.debug(f"Loop watchdog check failed: {e}")
+
+    def check(self, now: Optional[float] = None):
+        """Watchdog step: sample the loop thread's stack if the heartbeat is overdue"""
+        now = time.perf_counter() if now is None else now
+        due = self._due
+        overdue = now - due
+        if overdue < self.config.slow_callback_seconds:
+            return
+        frame = sys._current_frames().get(self._loop_thread_id)
+        if frame is None:
+            return
+        site, stack = attribute_stack(frame, self.config.max_stack_depth)
+        # First sample of a stall is charged everything since the heartbeat was due
+        blocked = now - (self._last_sample_at if self._sampled_due == due else due)
+        self._sampled_due = due
+        self._last_sample_at = now
+        self._stall_site = site
+        self._stacks[site] = stack
+        self._samples.append((time.time(), site, blocked))
+
+    def call_sites(self, window_seconds: Optional[float] = None) -> List[Dict[str, Any]]:
+        """Call sites ranked by time they blocked the loop within the window"""
+        since = time.time() - (window_seconds or self.config.report_window_seconds)
+        blocked: Dict[str, float] = {}
+        samples: Dict[str, int] = {}
+        for at, site, seconds in list(self._samples):
+            if at >= since:
+                blocked[site] = blocked.get(site, 0.0) + seconds
+                samples[site] = samples.get(site, 0) + 1
+        return [
+            {"site": site, "blocked_seconds": round(seconds, 3), "samples": samples[site],
+             "stack": self._stacks.get(site, [])}
+            for site, seconds in sorted(blocked.items(), key=lambda item: item[1], reverse=True)
+        ]
+
+    def get_report(self, window_seconds: Optional[float] = None, top: int = 20) -> Dict[str, Any]:
+        """Rolling report: lag, recent stalls and the call sites that blocked the loop"""
+        window = window_seconds or self.config.report_window_seconds
+        since = time.time() - window
+        stalls = [stall for stall in list(self._stalls) if stall[0] >= since]
+        return {
+            **self.get_stats(),
+            "window_seconds": window,
+            "stalls": {
+                "count": len(stalls),
+                "blocked_seconds": round(sum((duration for _, duration, _ in stalls), 0.0), 3),
+                "max_ms": round(max((duration for _, duration, _ in stalls), default=0.0) * 1000, 1),
+                "recent": [
+                    {"at": at, "duration_ms": round(duration * 1000, 1), "site": site}
+                    for at, duration, site in stalls[-20:]
+                ]
+            },
+            "call_sites": self.call_sites(window)[:top]
+        }
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            "running": self.is_running,
+            "interval_seconds": self.config.interval_seconds,
+            "slow_callback_seconds": self.config.slow_callback_seconds,
+            "last_lag_ms": round(self.last_lag_seconds * 1000, 3),
+            "lag": self.lag.get_stats(),
+            "stalls_total": self.stall_count
+        }
+
+
+# Global loop monitor (started in the application lifespan)
+loop_monitor = LoopMonitor()
+
+
+def collect_loop_metrics():
+    """Prometheus families for /metrics: blocked time of the top call sites over the report window"""
+    blocked = MetricFamily("event_loop_blocked_seconds", "gauge",
+                           "Time call sites blocked the event loop within the report window")
+    for entry in loop_monitor.call_sites()[:loop_monitor.config.metrics_top_sites]:
+        blocked.add({"site": entry["site"]}, entry["blocked_seconds"])
+    return [blocked]
+
+
+REGISTRY.register_collector("loop_monitor", collect_loop_metrics)
@@ -0,0 +1,268 @@
+"""
+Prometheus metrics
+Dependency-free counters, gauges and histograms rendered in the Prometheus text exposition format
+at /metrics. Hot paths only bump a number on a pre-resolved child; components that already keep
+their own statistics (account pool, WebSocket manager, upstream metrics) are read by collectors
+at scrape time, so leaving metrics on costs next to nothing between scrapes.
+"""
+
+import math
+import time
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple, Union
+
+from loguru import logger
+
+from app.histogram import LatencyHistogram
+
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+# Bucket upper bounds in seconds
+REQUEST_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+MIDDLEWARE_BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1)
+DB_QUERY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+PHASE_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+LOOP_LAG_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+
+Labels = Dict[str, str]
+
+
+@dataclass
+class MetricFamily:
+    """One metric name with its samples (a number, or a LatencyHistogram for histograms)"""
+    name: str
+    kind: str                    # "counter", "gauge" or "histogram"
+    documentation: str
+    samples: List[Tuple[Labels, Union[float, LatencyHistogram]]] = field(default_factory=list)
+
+    def add(self, labels: Optional[Labels], value: Union[float, LatencyHistogram]) -> "MetricFamily":
+        self.samples.append((labels or {}, value))
+        return self
+
+
+class CounterValue:
+    """Monotonic counter child"""
+    __slots__ = ("value",)
+
+    def __init__(self):
+        self.value = 0.0
+
+    def inc(self, amount: float = 1):
+        self.value += amount
+
+
+class GaugeValue:
+    """Gauge child"""
+    __slots__ = ("value",)
+
+    def __init__(self):
+        self.value = 0.0
+
+    def inc(self, amount: float = 1):
+        self.value += amount
+
+    def dec(self, amount: float = 1):
+        self.value -= amount
+
+    def set(self, value: float):
+        self.value = value
+
+
+class _Metric:
+    """Labelled metric; labels(...) children are created on first use and kept (resolve them once on hot paths)"""
+    kind = ""
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                 registry: Optional["MetricsRegistry"] = None):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._children: Dict[Tuple[str, ...], Any] = {}
+        (registry if registry is not None else REGISTRY).register(self)
+
+    def _new_child(self) -> Any:
+        raise NotImplementedError
+
+    def labels(self, *values: Any) -> Any:
+        key = tuple(str(value) for value in values)
+        child = self._children.get(key)
+        if child is None:
+            if len(key) != len(self.labelnames):
+                raise ValueError(f"{self.name} expects labels {self.labelnames}, got {key}")
+            child = self._children[key] = self._new_child()
+        return child
+
+    def collect(self) -> MetricFamily:
+        family = MetricFamily(self.name, self.kind, self.documentation)
+        for key, child in list(self._children.items()):
+            family.add(dict(zip(self.labelnames, key)),
+                       child if isinstance(child, LatencyHistogram) else child.value)
+        return family
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def _new_child(self) -> CounterValue:
+        return CounterValue()
+
+    def inc(self, amount: float = 1):
+        self.labels().inc(amount)
+
+
+class Gauge(_Metric):
+    kind = "gauge"
+
+    def _new_child(self) -> GaugeValue:
+        return GaugeValue()
+
+    def inc(self, amount: float = 1):
+        self.labels().inc(amount)
+
+    def dec(self, amount: float = 1):
+        self.labels().dec(amount)
+
+    def set(self, value: float):
+        self.labels().set(value)
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                 buckets: Sequence[float] = REQUEST_BUCKETS, registry: Optional["MetricsRegistry"] = None):
+        self.buckets = tuple(buckets)
+        super().__init__(name, documentation, labelnames, registry)
+
+    def _new_child(self) -> LatencyHistogram:
+        return LatencyHistogram(self.buckets)
+
+    def observe(self, seconds: float):
+        self.labels().observe(seconds)
+
+
+@contextmanager
+def observe_duration(histogram: LatencyHistogram) -> Iterator[None]:
+    """Observe the wall time of the block (also when it raises)"""
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        histogram.observe(time.perf_counter() - started)
+
+
+class MetricsRegistry:
+    """Registered metrics plus scrape-time collectors"""
+
+    def __init__(self):
+        self._metrics: Dict[str, _Metric] = {}
+        self._collectors: Dict[str, Callable[[], Iterable[MetricFamily]]] = {}
+
+    def register(self, metric: _Metric):
+        if metric.name in self._metrics:
+            raise ValueError(f"Metric {metric.name} is already registered")
+        self._metrics[metric.name] = metric
+
+    def register_collector(self, name: str, collector: Callable[[], Iterable[MetricFamily]]):
+        """Add (or replace) a named callable returning MetricFamily objects, called on every scrape"""
+        self._collectors[name] = collector
+
+    def collect(self) -> Iterator[MetricFamily]:
+        for metric in list(self._metrics.values()):
+            yield metric.collect()
+        for name, collector in list(self._collectors.items()):
+            try:
+                families = list(collector())
+            except Exception as e:
+                # One broken component must not take the whole scrape down
+                logger.warning(f"Metrics collector {name} failed: {e}")
+                continue
+            yield from families
+
+    def render(self) -> str:
+        """Prometheus text exposition of every metric"""
+        lines: List[str] = []
+        for family in self.collect():
+            lines.append(f"# HELP {family.name} {_escape_help(family.documentation)}")
+            lines.append(f"# TYPE {family.name} {family.kind}")
+            for labels, value in family.samples:
+                if isinstance(value, LatencyHistogram):
+                    for bound, count in value.cumulative():
+                        lines.append(_sample(f"{family.name}_bucket", {**labels, "le": _format_value(bound)}, count))
+                    lines.append(_sample(f"{family.name}_sum", labels, value.sum))
+                    lines.append(_sample(f"{family.name}_count", labels, value.count))
+                else:
+                    lines.append(_sample(family.name, labels, value))
+        return "\n".join(lines) + "\n"
+
+
+def _escape_help(text: str) -> str:
+    return text.replace("\\", "\\\\").replace("\n", "\\n")
+
+
+def _escape_label(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_value(value: float) -> str:
+    if math.isinf(value):
+        return "+Inf" if value > 0 else "-Inf"
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+def _sample(name: str, labels: Labels, value: float) -> str:
+    if not labels:
+        return f"{name} {_format_value(value)}"
+    rendered = ",".join(f'{key}="{_escape_label(str(label))}"' for key, label in labels.items())
+    return f"{name}{{{rendered}}} {_format_value(value)}"
+
+
+# Global registry served at /metrics
+REGISTRY = MetricsRegistry()
+
+
+# HTTP
+http_requests_total = Counter(
+    "http_requests_total", "HTTP requests by route template and status", ("method", "route", "status"))
+http_request_duration_seconds = Histogram(
+    "http_request_duration_seconds", "HTTP request latency including middleware", ("method", "route"),
+    buckets=REQUEST_BUCKETS)
+http_middleware_duration_seconds = Histogram(
+    "http_middleware_duration_seconds", "Time spent in the middleware stack outside the route handler",
+    buckets=MIDDLEWARE_BUCKETS)
+http_requests_in_flight = Gauge("http_requests_in_flight", "HTTP requests being served")
+
+# Account pool
+pool_calls_in_flight = Gauge(
+    "alpaca_pool_calls_in_flight", "Upstream Alpaca calls in progress", ("account", "endpoint_class"))
+pool_wait_seconds = Histogram(
+    "alpaca_pool_wait_seconds", "Time waiting for an account connection or market data key budget", ("pool",),
+    buckets=REQUEST_BUCKETS)
+
+# WebSocket clients (per-message paths, so the children are resolved once here)
+ws_client_messages_sent_total = Counter(
+    "ws_client_messages_sent_total", "Messages written to WebSocket clients")
+ws_client_dropped_messages_total = Counter(
+    "ws_client_dropped_messages_total", "Messages dropped from full client send queues", ("kind",))
+ws_client_messages_sent = ws_client_messages_sent_total.labels()
+ws_client_dropped_quotes = ws_client_dropped_messages_total.labels("quote")
+ws_client_dropped_trades = ws_client_dropped_messages_total.labels("trade")
+
+# Sell watcher
+sell_cycle_phase_seconds = Histogram(
+    "sell_cycle_phase_seconds", "Sell watcher monitor cycle duration by phase", ("phase",), buckets=PHASE_BUCKETS)
+
+# Database
+db_query_duration_seconds = Histogram(
+    "db_query_duration_seconds", "SQL statement execution time", ("operation",), buckets=DB_QUERY_BUCKETS)
+
+# Event loop
+event_loop_lag_seconds = Histogram(
+    "event_loop_lag_seconds", "Delay of a periodic timer on the event loop", buckets=LOOP_LAG_BUCKETS)
+event_loop_stall_seconds = Histogram(
+    "event_loop_stall_seconds", "Callbacks that held the event loop longer than the slow-callback threshold",
+    buckets=LOOP_LAG_BUCKETS)
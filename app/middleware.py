@@ -19,6 +19,12 @@ import jwt
 import redis
 
 from config import settings
+from app.metrics import (
+    http_requests_total,
+    http_request_duration_seconds,
+    http_middleware_duration_seconds,
+    http_requests_in_flight
+)
 
 
 # JWT配置 —— 统一从 config.settings 读取（config.py 在 secret 缺失时启动即报错）。
@@ -583,4 +589,57 @@ class LoggingMiddleware(BaseHTTPMiddleware):
         return response
 
 
+
+class HandlerTimingMiddleware:
+    """最内层ASGI中间件 - 记录路由处理耗时，供MetricsMiddleware计算中间件开销"""
+    
+    def __init__(self, app):
+        self.app = app
+    
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            scope["handler_seconds"] = time.perf_counter() - started
+
+
+class MetricsMiddleware:
+    """最外层ASGI中间件 - 按路由模板统计请求数、状态码、延迟及中间件耗时（纯ASGI，无额外任务开销）"""
+    
+    def __init__(self, app):
+        self.app = app
+    
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+        
+        status_code = 500
+        
+        async def send_with_status(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+        
+        http_requests_in_flight.inc()
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            elapsed = time.perf_counter() - started
+            http_requests_in_flight.dec()
+            # 使用路由模板（如 /api/v1/stocks/{symbol}/quote）避免按路径参数产生高基数标签
+            route = scope.get("route")
+            route_path = getattr(route, "path", None) or "unmatched"
+            method = scope.get("method", "")
+            http_requests_total.labels(method, route_path, status_code).inc()
+            http_request_duration_seconds.labels(method, route_path).observe(elapsed)
+            handler_seconds = scope.get("handler_seconds")
+            if handler_seconds is not None:
+                http_middleware_duration_seconds.observe(max(0.0, elapsed - handler_seconds))
+
+
 # Middleware completed - no background cleanup needed for stateless authentication
\ No newline at end of file
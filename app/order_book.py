@@ -0,0 +1,352 @@
+"""
+In-memory order book driven by Alpaca trade-updates streams
+One TradingStream per account keeps every live order current; REST is only used to reconcile
+"""
+
+import asyncio
+import functools
+import time
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+from loguru import logger
+
+from config import settings
+from app.connection_pool import ConnectionType
+
+
+# Alpaca order statuses after which an order can no longer change
+TERMINAL_ORDER_STATUSES = {'filled', 'canceled', 'expired', 'replaced', 'rejected', 'done_for_day'}
+
+# Largest page Alpaca returns for an orders query
+RECONCILE_SNAPSHOT_LIMIT = 500
+
+
+class AccountOrderBook:
+    """Live (non-terminal) orders of a single account"""
+
+    def __init__(self, account_id: str):
+        self.account_id = account_id
+        self.orders: Dict[str, Dict[str, Any]] = {}
+
+        # Monotonic time of the last stream event per order id (including removals),
+        # so a reconciliation snapshot never overwrites newer stream state
+        self._touched_at: Dict[str, float] = {}
+
+        self.synced = False
+        self.stream_connected = False
+        # Monotonic time of the latest stream (re)connect; only a snapshot requested after it syncs the book
+        self.connected_at: Optional[float] = None
+        self.connection_count = 0
+        # False when the last snapshot hit the page limit, so the book may be missing open orders
+        self.complete = True
+        self.event_count = 0
+        self.reconcile_count = 0
+        self.drift_count = 0
+        self.last_event_at: Optional[datetime] = None
+        self.last_reconciled_at: Optional[datetime] = None
+        self._last_reconcile_monotonic: Optional[float] = None
+
+    @property
+    def is_live(self) -> bool:
+        """Whether queries can be answered from memory"""
+        return self.synced and self.stream_connected and self.complete
+
+    def mark_connected(self):
+        """The stream (re)connected: events may have been missed, so wait for a fresh snapshot"""
+        self.stream_connected = True
+        self.synced = False
+        self.connected_at = time.monotonic()
+        self.connection_count += 1
+
+    def mark_disconnected(self):
+        """The stream dropped or is connecting: events are no longer received"""
+        self.stream_connected = False
+        self.synced = False
+
+    def apply_update(self, event: str, order: Dict[str, Any], replaces: Optional[str] = None):
+        """Apply one trade-updates event"""
+        now = time.monotonic()
+        order_id = order["id"]
+
+        if order.get("status") in TERMINAL_ORDER_STATUSES:
+            self.orders.pop(order_id, None)
+        else:
+            self.orders[order_id] = order
+        self._touched_at[order_id] = now
+
+        # A replacement order closes the order it replaces
+        if replaces:
+            self.orders.pop(replaces, None)
+            self._touched_at[replaces] = now
+
+        self.event_count += 1
+        self.last_event_at = datetime.utcnow()
+        logger.debug(f"Order book [{self.account_id}] {event}: {order_id} {order.get('symbol')} -> {order.get('status')}")
+
+    def reconcile(self, snapshot: List[Dict[str, Any]], snapshot_started: float, complete: bool = True) -> int:
+        """
+        Replace book contents with a REST snapshot of open orders
+
+        Orders touched by stream events after the snapshot was requested keep their stream state.
+        The book is only marked synced when the snapshot was requested after the latest stream connect.
+        A truncated snapshot (``complete=False``) only adds and updates orders, since orders missing
+        from it may still be open; the book then stops answering queries until a complete snapshot.
+        Returns the number of orders that had drifted from the snapshot.
+        """
+        fresh = {order["id"]: order for order in snapshot}
+        drift = 0
+
+        for order_id in list(self.orders):
+            if (complete and order_id not in fresh
+                    and self._touched_at.get(order_id, 0) < snapshot_started):
+                del self.orders[order_id]
+                drift += 1
+
+        for order_id, order in fresh.items():
+            if self._touched_at.get(order_id, 0) >= snapshot_started:
+                continue
+            if self.orders.get(order_id) != order:
+                drift += 1
+            self.orders[order_id] = order
+
+        # Event timestamps older than this snapshot are no longer needed
+        self._touched_at = {
+            order_id: touched for order_id, touched in self._touched_at.items() if touched >= snapshot_started
+        }
+
+        self.synced = self.connected_at is None or snapshot_started >= self.connected_at
+        self.complete = complete
+        self.reconcile_count += 1
+        self.drift_count += drift
+        self.last_reconciled_at = datetime.utcnow()
+        self._last_reconcile_monotonic = time.monotonic()
+        return drift
+
+    def seconds_since_reconcile(self) -> Optional[float]:
+        if self._last_reconcile_monotonic is None:
+            return None
+        return time.monotonic() - self._last_reconcile_monotonic
+
+    def query(self, statuses: set, limit: int) -> List[Dict[str, Any]]:
+        """Orders with a status in ``statuses``, newest first (same order as the REST API)"""
+        matching = [order for order in self.orders.values() if order.get("status") in statuses]
+        matching.sort(key=lambda order: order.get("submitted_at") or order.get("created_at") or "", reverse=True)
+        return matching[:limit]
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Get order book statistics"""
+        return {
+            "live": self.is_live,
+            "synced": self.synced,
+            "complete": self.complete,
+            "stream_connected": self.stream_connected,
+            "connections": self.connection_count,
+            "open_orders": len(self.orders),
+            "event_count": self.event_count,
+            "reconcile_count": self.reconcile_count,
+            "drift_count": self.drift_count,
+            "last_event_at": self.last_event_at.isoformat() if self.last_event_at else None,
+            "last_reconciled_at": self.last_reconciled_at.isoformat() if self.last_reconciled_at else None
+        }
+
+
+class OrderBookManager:
+    """Runs one trade-updates stream per account and answers open-order queries from memory"""
+
+    def __init__(self, reconcile_interval_seconds: float = 60, reconcile_check_seconds: float = 5):
+        self.reconcile_interval_seconds = reconcile_interval_seconds
+        self.reconcile_check_seconds = reconcile_check_seconds
+
+        self.books: Dict[str, AccountOrderBook] = {}
+        self._streams: Dict[str, Any] = {}
+        self._account_pool = None
+        self._background_tasks: List[asyncio.Task] = []
+        self.memory_hits = 0
+        self.memory_misses = 0
+
+    @staticmethod
+    def _load_config() -> Dict[str, Any]:
+        stream_config = getattr(settings, 'order_stream', None)
+        return stream_config if isinstance(stream_config, dict) else {}
+
+    @property
+    def is_running(self) -> bool:
+        return bool(self._background_tasks)
+
+    async def start(self, account_pool):
+        """Start trade-updates streams for every connected account"""
+        if self.is_running:
+            return
+
+        stream_config = self._load_config()
+        if not stream_config.get('enabled', True):
+            logger.info("Order stream disabled - open orders are served from REST")
+            return
+        self.reconcile_interval_seconds = float(stream_config.get('reconcile_interval_seconds', self.reconcile_interval_seconds))
+
+        self._account_pool = account_pool
+        for account_id, connection in account_pool.account_connections.items():
+            self.books[account_id] = AccountOrderBook(account_id)
+            self._background_tasks.append(asyncio.create_task(self._run_account_stream(account_id, connection)))
+
+        self._background_tasks.append(asyncio.create_task(self._reconcile_loop()))
+        logger.info(f"Order stream started for {len(self.books)} accounts "
+                    f"(reconcile every {self.reconcile_interval_seconds:.0f}s)")
+
+    async def _run_account_stream(self, account_id: str, connection):
+        """Consume the account's trade-updates stream into its order book"""
+        from app.alpaca_client import order_to_dict
+
+        book = self.books[account_id]
+        manager = connection.connection_manager
+
+        async def on_trade_update(update):
+            order = update.order
+            event = update.event.value if hasattr(update.event, 'value') else str(update.event)
+            book.apply_update(event, order_to_dict(order), str(order.replaces) if order.replaces else None)
+
+        # Holding the stream connection keeps it in use, so idle cleanup never closes it
+        stream = await manager.get_connection(ConnectionType.TRADING_STREAM)
+        self._streams[account_id] = stream
+        self._track_connections(stream, book)
+        try:
+            stream.subscribe_trade_updates(on_trade_update)
+            await stream._run_forever()
+        except Exception as e:
+            logger.error(f"Trade-updates stream failed for account {account_id}: {e}")
+        finally:
+            book.mark_disconnected()
+            self._streams.pop(account_id, None)
+            manager.release_connection(ConnectionType.TRADING_STREAM)
+
+    @staticmethod
+    def _track_connections(stream, book: AccountOrderBook):
+        """
+        Hook the stream's connect and close steps so every (re)connect marks the book unsynced
+
+        TradingStream reconnects internally without a callback; wrapping the class methods (not
+        earlier wrappers) keeps this idempotent when a pooled stream is reused.
+        """
+        start_ws = functools.partial(type(stream)._start_ws, stream)
+        close = functools.partial(type(stream).close, stream)
+
+        async def start_ws_tracked():
+            book.mark_disconnected()
+            await start_ws()
+            book.mark_connected()
+            logger.info(f"Trade-updates stream connected for account {book.account_id} "
+                        f"(connection #{book.connection_count}), reconciling")
+
+        async def close_tracked():
+            book.mark_disconnected()
+            await close()
+
+        stream._start_ws = start_ws_tracked
+        stream.close = close_tracked
+
+    async def _reconcile_loop(self):
+        """Reconcile books on an interval, and immediately after a stream (re)connects"""
+        while True:
+            try:
+                due = [
+                    account_id for account_id, book in self.books.items()
+                    if book.stream_connected and (
+                        not book.synced
+                        or book.seconds_since_reconcile() >= self.reconcile_interval_seconds
+                    )
+                ]
+                if due:
+                    await asyncio.gather(*(self.reconcile_account(account_id) for account_id in due),
+                                         return_exceptions=True)
+
+                await asyncio.sleep(self.reconcile_check_seconds)
+            except Exception as e:
+                logger.error(f"Order book reconcile loop error: {e}")
+                await asyncio.sleep(self.reconcile_check_seconds)
+
+    async def reconcile_account(self, account_id: str) -> Optional[int]:
+        """Fetch open orders over REST and reconcile the account's book"""
+        from alpaca.trading.requests import GetOrdersRequest
+        from alpaca.trading.enums import QueryOrderStatus
+        from app.alpaca_client import order_to_dict
+
+        book = self.books.get(account_id)
+        client = self._account_pool.get_alpaca_client(account_id) if self._account_pool else None
+        if book is None or client is None:
+            return None
+
+        snapshot_started = time.monotonic()
+        try:
+            orders = await asyncio.to_thread(
+                client.trading_client.get_orders,
+                filter=GetOrdersRequest(status=QueryOrderStatus.OPEN, limit=RECONCILE_SNAPSHOT_LIMIT)
+            )
+        except Exception as e:
+            logger.error(f"Order book reconciliation failed for account {account_id}: {e}")
+            return None
+
+        complete = len(orders) < RECONCILE_SNAPSHOT_LIMIT
+        if not complete:
+            logger.warning(f"Order book [{account_id}] has at least {RECONCILE_SNAPSHOT_LIMIT} open orders - "
+                           f"snapshot may be truncated, open orders are served from REST")
+        drift = book.reconcile([order_to_dict(order) for order in orders], snapshot_started, complete)
+        if drift:
+            logger.warning(f"Order book [{account_id}] corrected {drift} drifted orders during reconciliation")
+        return drift
+
+    def get_orders(self, account_id: Optional[str], status: Optional[str], limit: int = 100,
+                   after: Optional[str] = None, before: Optional[str] = None) -> Optional[List[Dict[str, Any]]]:
+        """
+        Answer an orders query from memory
+
+        Returns None when the query needs REST: unknown or unsynced account, date filters,
+        or statuses that include closed orders.
+        """
+        from app.alpaca_client import expand_order_status_filter
+
+        book = self.books.get(account_id) if account_id else None
+        requested_statuses = expand_order_status_filter(status)
+        if (book is None or not book.is_live or after or before
+                or requested_statuses is None or requested_statuses & TERMINAL_ORDER_STATUSES):
+            self.memory_misses += 1
+            return None
+
+        self.memory_hits += 1
+        return [dict(order) for order in book.query(requested_statuses, limit)]
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Get order book statistics"""
+        return {
+            "running": self.is_running,
+            "reconcile_interval_seconds": self.reconcile_interval_seconds,
+            "memory_hits": self.memory_hits,
+            "memory_misses": self.memory_misses,
+            "accounts": {account_id: book.get_stats() for account_id, book in self.books.items()}
+        }
+
+    async def shutdown(self):
+        """Stop all streams"""
+        for stream in list(self._streams.values()):
+            try:
+                await stream.stop_ws()
+            except Exception as e:
+                logger.error(f"Error stopping trade-updates stream: {e}")
+
+        for task in self._background_tasks:
+            task.cancel()
+        await asyncio.gather(*self._background_tasks, return_exceptions=True)
+
+        self._background_tasks.clear()
+        self._streams.clear()
+        self.books.clear()
+        logger.info("Order book streams stopped")
+
+
+# Global order book manager
+order_book_manager = OrderBookManager()
+
+
+def get_order_book_manager() -> OrderBookManager:
+    """Get order book manager instance"""
+    return order_book_manager
@@ -0,0 +1,177 @@
+"""
+On-demand statistical profiler
+A background thread samples the stacks of every thread (sys._current_frames) at a fixed interval
+for a bounded duration, so a running production process can be profiled without a restart or an
+external tool. Results are aggregated per unique stack and exported as collapsed stacks (flame
+graph input) or a speedscope document; an asyncio task dump shows what every task is awaiting.
+"""
+
+import asyncio
+import os
+import sys
+import threading
+import time
+from collections import Counter
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional, Tuple
+
+from app.loop_monitor import PROJECT_ROOT, describe_frame
+
+
+SPEEDSCOPE_SCHEMA = "https://www.speedscope.app/file-format-schema.json"
+
+# (filename, function, first line) - frames are aggregated per function, not per line
+FrameKey = Tuple[str, str, int]
+
+# Innermost stdlib frames of a thread that is waiting rather than running
+_IDLE_FRAMES = {
+    ("threading.py", "wait"), ("threading.py", "_wait_for_tstate_lock"), ("selectors.py", "select"),
+    ("socket.py", "accept")
+}
+
+
+class ProfilerBusyError(Exception):
+    """Another profile is already running"""
+
+
+@dataclass
+class Profile:
+    """Aggregated samples of one profiling run"""
+    started_at: float
+    duration: float
+    interval: float
+    samples: int
+    stacks: Counter                     # (thread name, tuple of FrameKey outermost first) -> count
+
+    def frame_name(self, frame: FrameKey) -> str:
+        filename, function, first_line = frame
+        if filename.startswith(PROJECT_ROOT):
+            filename = os.path.relpath(filename, PROJECT_ROOT)
+        return f"{function} ({filename}:{first_line})"
+
+    def collapsed(self) -> str:
+        """Brendan Gregg collapsed stacks: 'thread;outer;...;inner count' per line"""
+        lines = []
+        for (thread_name, stack), count in self.stacks.most_common():
+            frames = ";".join(self.frame_name(frame).replace(";", ":") for frame in stack)
+            lines.append(f"{thread_name};{frames} {count}" if frames else f"{thread_name} {count}")
+        return "\n".join(lines)
+
+    def speedscope(self, name: str = "profile") -> Dict[str, Any]:
+        """speedscope file format: one weighted sampled profile per thread"""
+        frame_index: Dict[FrameKey, int] = {}
+        frames: List[Dict[str, Any]] = []
+        profiles: Dict[str, Dict[str, Any]] = {}
+        for (thread_name, stack), count in self.stacks.most_common():
+            indices = []
+            for frame in stack:
+                if frame not in frame_index:
+                    frame_index[frame] = len(frames)
+                    filename, function, first_line = frame
+                    frames.append({"name": function, "file": filename, "line": first_line})
+                indices.append(frame_index[frame])
+            profile = profiles.setdefault(thread_name, {
+                "type": "sampled", "name": thread_name, "unit": "seconds",
+                "startValue": 0, "endValue": round(self.duration, 6), "samples": [], "weights": []
+            })
+            profile["samples"].append(indices)
+            profile["weights"].append(round(count * self.interval, 6))
+        return {
+            "$schema": SPEEDSCOPE_SCHEMA,
+            "name": name,
+            "exporter": "opitios-alpaca",
+            "activeProfileIndex": 0,
+            "shared": {"frames": frames},
+            "profiles": list(profiles.values())
+        }
+
+
+class SamplingProfiler:
+    """Samples all threads for a bounded time; one run at a time per process"""
+
+    def __init__(self, max_depth: int = 128):
+        self.max_depth = max_depth
+        self._lock = threading.Lock()
+
+    @property
+    def is_running(self) -> bool:
+        return self._lock.locked()
+
+    def run(self, seconds: float, interval: float = 0.01, include_idle: bool = False) -> Profile:
+        """Blocking: sample every interval for the given seconds (call it from a worker thread)"""
+        if not self._lock.acquire(blocking=False):
+            raise ProfilerBusyError("a profile is already running")
+        try:
+            return self._sample(seconds, interval, include_idle)
+        finally:
+            self._lock.release()
+
+    def _sample(self, seconds: float, interval: float, include_idle: bool) -> Profile:
+        own_thread = threading.get_ident()
+        stacks: Counter = Counter()
+        samples = 0
+        started_at = time.time()
+        started = time.perf_counter()
+        deadline = started + seconds
+        next_at = started
+        while True:
+            now = time.perf_counter()
+            if now >= deadline:
+                break
+            thread_names = {thread.ident: thread.name for thread in threading.enumerate()}
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id == own_thread:
+                    continue
+                stack = self._stack(frame)
+                if not include_idle and stack and (os.path.basename(stack[-1][0]), stack[-1][1]) in _IDLE_FRAMES:
+                    continue
+                stacks[(thread_names.get(thread_id, f"thread-{thread_id}"), stack)] += 1
+            samples += 1
+            # Fixed-rate schedule; a slow sample skips ahead instead of bunching up
+            next_at += interval
+            if next_at < now:
+                next_at = now + interval
+            time.sleep(max(0.0, min(next_at, deadline) - time.perf_counter()))
+        return Profile(started_at=started_at, duration=time.perf_counter() - started, interval=interval,
+                       samples=samples, stacks=stacks)
+
+    def _stack(self, frame) -> Tuple[FrameKey, ...]:
+        frames = []
+        while frame is not None and len(frames) < self.max_depth:
+            code = frame.f_code
+            frames.append((code.co_filename, code.co_name, code.co_firstlineno))
+            frame = frame.f_back
+        frames.reverse()
+        return tuple(frames)
+
+
+def _await_chain(coro: Any, limit: int) -> List[str]:
+    """Frames of a suspended coroutine and the coroutines it awaits, outermost first"""
+    chain = []
+    while coro is not None and len(chain) < limit:
+        frame = getattr(coro, "cr_frame", None) or getattr(coro, "gi_frame", None) or getattr(coro, "ag_frame", None)
+        if frame is None:
+            break
+        chain.append(describe_frame(frame.f_code.co_filename, frame.f_lineno, frame.f_code.co_name))
+        coro = getattr(coro, "cr_await", None) or getattr(coro, "gi_yieldfrom", None) or getattr(coro, "ag_await", None)
+    return chain
+
+
+def dump_tasks(loop: Optional[asyncio.AbstractEventLoop] = None, stack_limit: int = 20) -> List[Dict[str, Any]]:
+    """Every asyncio task with its coroutine and the await chain it is suspended in (call on the loop thread)"""
+    tasks = []
+    for task in asyncio.all_tasks(loop):
+        coro = task.get_coro()
+        stack = _await_chain(coro, stack_limit)
+        tasks.append({
+            "name": task.get_name(),
+            "coroutine": getattr(coro, "__qualname__", repr(coro)),
+            "state": "cancelling" if task.cancelling() else ("done" if task.done() else "pending"),
+            "stack": stack
+        })
+    tasks.sort(key=lambda entry: entry["name"])
+    return tasks
+
+
+# Global profiler (one profile at a time)
+profiler = SamplingProfiler()
@@ -0,0 +1,37 @@
+"""
+Token bucket request budgets
+Shared by anything that must stay under an upstream per-minute budget (market data keys,
+per-account order cancels); not used for inbound API rate limiting (see middleware.RateLimiter)
+"""
+
+import time
+
+
+class TokenBucket:
+    """Token bucket refilled continuously up to a per-minute capacity"""
+
+    def __init__(self, requests_per_minute: int):
+        self.capacity = max(1, int(requests_per_minute))
+        self.refill_per_second = self.capacity / 60.0
+        self.tokens = float(self.capacity)
+        self._updated_at = time.monotonic()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self._updated_at) * self.refill_per_second)
+        self._updated_at = now
+
+    def try_acquire(self) -> bool:
+        """Take one token if available (no awaits, safe within a single event loop)"""
+        self._refill()
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return True
+        return False
+
+    def seconds_until_available(self) -> float:
+        """Seconds until the next token becomes available"""
+        self._refill()
+        if self.tokens >= 1:
+            return 0.0
+        return (1 - self.tokens) / self.refill_per_second
@@ -182,7 +182,7 @@ async def get_multiple_stock_quotes(
         
         quotes_data = await pooled_client.get_multiple_stock_quotes(
             symbols=request.symbols,
-            account_id=routing_info["account_id"] or "stock_ws",
+            account_id=routing_info["account_id"],
             routing_key=routing_info["routing_key"] or request.symbols[0]
         )
         if "error" in quotes_data:
@@ -221,7 +221,7 @@ async def get_stock_quote(symbol: str, routing_info: dict = Depends(get_routing_
     try:
         quote_data = await pooled_client.get_stock_quote(
             symbol=symbol.upper(),
-            account_id=routing_info["account_id"] or "stock_ws",
+            account_id=routing_info["account_id"],
             routing_key=routing_info["routing_key"] or symbol
         )
         if "error" in quote_data:
@@ -249,7 +249,7 @@ async def get_stock_bars(
             limit=limit,
             start_date=start_date,
             end_date=end_date,
-            account_id=routing_info["account_id"] or "stock_ws",
+            account_id=routing_info["account_id"],
             routing_key=routing_info["routing_key"] or symbol
         )
         if "error" in bars_data:
@@ -339,12 +339,12 @@ async def get_stock_bars(
     ```
     """)
 async def get_options_chain(request: OptionsChainRequest, routing_info: dict = Depends(get_routing_info)):
-    """Get options chain for an underlying symbol using only real market data - uses option_ws account"""
+    """Get options chain for an underlying symbol using only real market data - uses market data key pool"""
     try:
         chain_data = await pooled_client.get_options_chain(
             underlying_symbol=request.underlying_symbol,
             expiration_date=request.expiration_date,
-            account_id=routing_info["account_id"] or "option_ws",
+            account_id=routing_info["account_id"],
             routing_key=request.underlying_symbol
         )
         if "error" in chain_data:
@@ -440,11 +440,11 @@ async def get_options_chain(request: OptionsChainRequest, routing_info: dict = D
     ```
     """)
 async def get_option_quote(request: OptionQuoteRequest, routing_info: dict = Depends(get_routing_info)):
-    """Get quote for a specific option contract using only real market data - uses option_ws account"""
+    """Get quote for a specific option contract using only real market data - uses market data key pool"""
     try:
         quote_data = await pooled_client.get_option_quote(
             option_symbol=request.option_symbol,
-            account_id=routing_info["account_id"] or "option_ws",
+            account_id=routing_info["account_id"],
             routing_key=request.option_symbol
         )
         if "error" in quote_data:
@@ -516,7 +516,7 @@ async def get_option_quote(request: OptionQuoteRequest, routing_info: dict = Dep
     ```
     """)
 async def get_multiple_option_quotes(request: MultiOptionQuoteRequest, routing_info: dict = Depends(get_routing_info)):
-    """Get quotes for multiple option contracts using only real market data - uses option_ws account"""
+    """Get quotes for multiple option contracts using only real market data - uses market data key pool"""
     try:
         if len(request.option_symbols) > settings.max_option_symbols_per_request:
             logger.warning(f"Batch request exceeded limit: {len(request.option_symbols)} symbols (max {settings.max_option_symbols_per_request})")
@@ -532,7 +532,7 @@ async def get_multiple_option_quotes(request: MultiOptionQuoteRequest, routing_i
             
         quotes_data = await pooled_client.get_multiple_option_quotes(
             option_symbols=request.option_symbols,
-            account_id=routing_info["account_id"] or "option_ws",
+            account_id=routing_info["account_id"],
             routing_key=request.option_symbols[0] if request.option_symbols else "batch_options"
         )
         if "error" in quotes_data:
@@ -566,12 +566,12 @@ async def get_options_chain_by_symbol(
     expiration_date: Optional[str] = None,
     routing_info: dict = Depends(get_routing_info)
 ):
-    """Get options chain for an underlying symbol - uses option_ws account"""
+    """Get options chain for an underlying symbol - uses market data key pool"""
     try:
         chain_data = await pooled_client.get_options_chain(
             underlying_symbol=underlying_symbol.upper(),
             expiration_date=expiration_date,
-            account_id=routing_info["account_id"] or "option_ws",
+            account_id=routing_info["account_id"],
             routing_key=underlying_symbol
         )
         if "error" in chain_data:
@@ -1031,6 +1031,31 @@ async def get_orders(
         logger.error(f"Error in get_orders: {e}")
         raise HTTPException(status_code=500, detail=str(e)) from e
 
+@router.delete("/orders",
+    summary="Cancel All Orders",
+    description="🔐 **AUTHENTICATION REQUIRED** - Cancel all open orders of an account in one request (Internal network or JWT)")
+async def cancel_all_orders(
+    routing_info: dict = Depends(get_routing_info),
+    auth_data: dict = Depends(internal_or_jwt_auth)
+):
+    """Cancel all open orders - uses connection pool"""
+    try:
+        if routing_info["account_id"] is None:
+            logger.error("Account ID is required to cancel all orders.")
+            raise HTTPException(status_code=400, detail="Account ID is required for order cancellation")
+        result = await pooled_client.cancel_all_orders(
+            account_id=routing_info["account_id"],
+            routing_key=routing_info["routing_key"]
+        )
+        if "error" in result:
+            raise HTTPException(status_code=400, detail=result["error"])
+        return result
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error in cancel_all_orders: {e}")
+        raise HTTPException(status_code=500, detail=str(e)) from e
+
 @router.delete("/orders/{order_id}",
     summary="Cancel Order", 
     description="🔐 **AUTHENTICATION REQUIRED** - Cancel an order (Internal network or JWT)")
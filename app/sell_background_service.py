@@ -135,7 +135,8 @@ class SellBackgroundService:
             "running": self.is_running,
             "task_status": "running" if self.background_task and not self.background_task.done() else "stopped",
             "sell_watcher_initialized": self.sell_watcher is not None,
-            "account_pool_initialized": self.account_pool is not None and self.account_pool._initialized
+            "account_pool_initialized": self.account_pool is not None and self.account_pool._initialized,
+            "order_cancellation": self.sell_watcher.order_manager.get_cancel_metrics() if self.sell_watcher else None
         }
     
     async def restart(self) -> bool:
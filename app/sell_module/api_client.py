@@ -301,6 +301,28 @@ class AlpacaAPIClient:
             
         return result
     
+    async def cancel_all_orders(self, account_id: str) -> Dict[str, Any]:
+        """
+        批量取消账户所有未完成订单（一次请求）
+        
+        Args:
+            account_id: 账户ID
+            
+        Returns:
+            取消结果，包含 cancelled_order_ids 和 failed
+        """
+        logger.debug(f"通过 API 批量取消订单 (account: {account_id})")
+        result = await self._make_request(
+            'DELETE',
+            '/orders',
+            params={'account_id': account_id}
+        )
+        
+        if "error" in result:
+            logger.error(f"批量取消订单失败: {result['error']}")
+            
+        return result
+    
     
     async def place_option_order(self, account_id: str, option_symbol: str, qty: int, 
                                side: str, order_type: str = "market", 
@@ -76,6 +76,15 @@ class ConfigManager:
         """获取订单取消时间（分钟）"""
         return self.settings.sell_module['order_cancel_minutes']
     
+    def get_order_cancel_config(self) -> Dict:
+        """获取订单取消并发配置（可选，缺省使用默认值）"""
+        cancel_config = self.settings.sell_module.get('order_cancel', {}) or {}
+        return {
+            'max_concurrent_per_account': int(cancel_config.get('max_concurrent_per_account', 5)),
+            'rate_limit_per_minute': int(cancel_config.get('rate_limit_per_minute', 120)),
+            'bulk_cancel': bool(cancel_config.get('bulk_cancel', True))
+        }
+    
     def get_position_time_limit_config(self) -> Dict:
         """获取持仓时间限制配置"""
         return {
@@ -5,12 +5,18 @@
 
 import asyncio
 import time
-from typing import List, Optional, Dict, Any
+from typing import List, Optional, Dict, Any, Union
 from datetime import datetime
 from loguru import logger
 from app.account_pool import AccountPool
+from app.rate_limit import TokenBucket
 from app.database_models import save_order_details
 from .api_client import AlpacaAPIClient
+from .config_manager import ConfigManager
+
+# Status filter for cancel eligibility: the service's "open" keyword leaves out partially filled
+# orders, but Alpaca's bulk cancel also cancels them, so they must be part of the open set
+CANCELLABLE_ORDER_STATUS = 'open,partially_filled'
 
 
 class Order:
@@ -73,11 +79,27 @@ class Order:
 
 
 class OrderManager:
-    def __init__(self, account_pool: AccountPool, api_client: AlpacaAPIClient):
+    def __init__(self, account_pool: AccountPool, api_client: AlpacaAPIClient,
+                 config_manager: Optional[ConfigManager] = None):
         self.account_pool = account_pool
         # API客户端用于所有订单操作
         self.api_client = api_client
 
+        # 取消订单：单账户并发上限 + 请求预算（令牌桶）
+        self.cancel_config = (config_manager or ConfigManager()).get_order_cancel_config()
+        self._cancel_rate_limiters: Dict[str, TokenBucket] = {}
+
+        # 取消周期指标
+        self.cancel_metrics: Dict[str, Any] = {
+            'cycles': 0,
+            'total_cancelled': 0,
+            'total_failed': 0,
+            'total_bulk_cancels': 0,
+            'total_bulk_skipped': 0,
+            'total_unexpected_cancels': 0,
+            'last_cycle': None
+        }
+
     async def get_all_orders(self, status: str = 'open,accepted,replaced') -> List[Order]:
         """
         获取所有账户的订单信息 - 使用HTTP API客户端
@@ -170,17 +192,34 @@ class OrderManager:
         """
         High-performance async cancellation of old orders with optimized operations
         
+        Accounts are processed in parallel; within an account cancels run concurrently,
+        bounded by max_concurrent_per_account and the account's cancel rate budget.
+        
         Args:
             minutes: Order age threshold in minutes
             side: Order side filter ('sell', 'buy', 'all')
         """
         start_time = time.time()
+        cycle = {
+            'started_at': datetime.utcnow().isoformat(),
+            'side': side,
+            'minutes': minutes,
+            'orders_to_cancel': 0,
+            'accounts': 0,
+            'cancelled': 0,
+            'failed': 0,
+            'bulk_cancels': 0,
+            'bulk_skipped': 0,
+            'unexpected_cancels': 0,
+            'throttled_waits': 0,
+            'latencies_ms': []
+        }
 
         logger.info(f"Starting batch order cancellation: {side} orders older than {minutes}min")
 
         try:
             # Optimized concurrent order fetching and filtering
-            all_orders = await self.get_all_orders(status='open,accepted,replaced')
+            all_orders = await self.get_all_orders(status=CANCELLABLE_ORDER_STATUS)
 
             # High-performance filtering using list comprehension
             # When side == 'all', include both buy and sell orders
@@ -197,19 +236,23 @@ class OrderManager:
                 return
 
             # Group orders by account to avoid connection conflicts
-            orders_by_account = {}
+            orders_by_account: Dict[str, List[Order]] = {}
             for order in orders_to_cancel:
-                account_id = order.account_id
-                if account_id not in orders_by_account:
-                    orders_by_account[account_id] = []
-                orders_by_account[account_id].append(order)
+                orders_by_account.setdefault(order.account_id, []).append(order)
+
+            # Open orders per account (same fetch), used to decide whether bulk cancel is safe
+            open_orders_by_account: Dict[str, List[Order]] = {}
+            for order in all_orders:
+                if order.is_pending:
+                    open_orders_by_account.setdefault(order.account_id, []).append(order)
 
+            cycle['orders_to_cancel'] = len(orders_to_cancel)
+            cycle['accounts'] = len(orders_by_account)
             logger.info(
-                f"🔄 Cancelling {len(orders_to_cancel)} orders from {len(orders_by_account)} accounts (batched by account)")
+                f"🔄 Cancelling {len(orders_to_cancel)} orders from {len(orders_by_account)} accounts (concurrent per account)")
 
-            # Cancel orders sequentially per account, accounts processed in parallel
             tasks = [
-                self._cancel_account_orders_sequential(account_id, orders)
+                self._cancel_account_orders(account_id, orders, open_orders_by_account.get(account_id, []), cycle)
                 for account_id, orders in orders_by_account.items()
             ]
 
@@ -224,12 +267,15 @@ class OrderManager:
                     results.append(account_result)
 
             # Optimized result processing
-            success_count = sum(1 for r in results if not isinstance(r, Exception))
-            failed_count = len(results) - success_count
+            success_count = sum(1 for r in results if r is True)
+            failed_count = len(orders_to_cancel) - success_count
+            cycle['cancelled'] = success_count
+            cycle['failed'] = failed_count
 
             elapsed = (time.time() - start_time) * 1000
             logger.info(
-                f"✅ Batch cancellation complete: {success_count}/{len(orders_to_cancel)} successful in {elapsed:.1f}ms")
+                f"✅ Batch cancellation complete: {success_count}/{len(orders_to_cancel)} successful in {elapsed:.1f}ms "
+                f"({cycle['bulk_cancels']} bulk cancels)")
 
             if failed_count > 0:
                 logger.warning(f"{failed_count} orders failed to cancel")
@@ -237,51 +283,166 @@ class OrderManager:
         except Exception as e:
             elapsed = (time.time() - start_time) * 1000
             logger.error(f"Batch order cancellation failed in {elapsed:.1f}ms: {e}")
-
-    async def _cancel_account_orders_sequential(self, account_id: str, orders: List[Order]) -> List[bool]:
+        finally:
+            if cycle['orders_to_cancel']:
+                self._record_cancel_cycle(cycle, time.time() - start_time)
+
+    def _get_cancel_rate_limiter(self, account_id: str) -> TokenBucket:
+        """Per-account token bucket for cancel requests"""
+        limiter = self._cancel_rate_limiters.get(account_id)
+        if limiter is None:
+            limiter = TokenBucket(self.cancel_config['rate_limit_per_minute'])
+            self._cancel_rate_limiters[account_id] = limiter
+        return limiter
+
+    async def _acquire_cancel_budget(self, account_id: str, cycle: Dict[str, Any]):
+        """Wait until the account's cancel budget allows another request"""
+        limiter = self._get_cancel_rate_limiter(account_id)
+        while not limiter.try_acquire():
+            cycle['throttled_waits'] += 1
+            await asyncio.sleep(limiter.seconds_until_available())
+
+    async def _cancel_account_orders(self, account_id: str, orders: List[Order], open_orders: List[Order],
+                                     cycle: Dict[str, Any]) -> List[Union[bool, Exception]]:
         """
-        Cancel orders sequentially for a single account using HTTP API client
+        Cancel stale orders for a single account using HTTP API client
+        
+        Uses Alpaca's bulk cancel when every open order of the account qualifies (bulk cancel
+        cannot be scoped to a side or symbol), otherwise cancels individual orders concurrently.
         
         Args:
             account_id: Account ID to cancel orders for
             orders: List of orders to cancel for this account
+            open_orders: All open orders of this account from the same fetch
+            cycle: Metrics of the current cancellation cycle
             
         Returns:
             List of cancellation results (True for success, Exception for failure)
         """
-        results = []
         order_count = len(orders)
 
-        logger.info(f"🔄 Cancelling {order_count} orders sequentially for account [{account_id}]")
-
         if not self.api_client:
             logger.error(f"❌ API client not initialized for account [{account_id}]")
             return [Exception("API client not initialized")] * order_count
 
-        # Cancel each order sequentially using HTTP API client
-        for i, order in enumerate(orders, 1):
-            try:
-                logger.info(f"🔄 Cancelling order {i}/{order_count}: {order.id} [{account_id}] {order.symbol}")
-                
-                # Use HTTP API client instead of direct Alpaca client
-                result = await self.api_client.cancel_order(account_id, order.id)
+        cancel_ids = {order.id for order in orders}
+        if (self.cancel_config['bulk_cancel'] and order_count > 1
+                and cancel_ids == {order.id for order in open_orders}):
+            results = await self._bulk_cancel_account_orders(account_id, orders, cycle)
+            if results is not None:
+                return results
+
+        logger.info(f"🔄 Cancelling {order_count} orders concurrently for account [{account_id}]")
+
+        semaphore = asyncio.Semaphore(self.cancel_config['max_concurrent_per_account'])
+
+        async def cancel_one(order: Order) -> Union[bool, Exception]:
+            async with semaphore:
+                await self._acquire_cancel_budget(account_id, cycle)
+                request_start = time.monotonic()
+                try:
+                    result = await self.api_client.cancel_order(account_id, order.id)
+                except Exception as e:
+                    logger.error(f"❌ Error cancelling order {order.id} [{account_id}] {order.symbol}: {e}")
+                    return e
+                finally:
+                    cycle['latencies_ms'].append((time.monotonic() - request_start) * 1000)
 
                 if "error" not in result:
-                    logger.info(f"✅ Order {order.id} cancelled successfully [{account_id}] {order.symbol} ({i}/{order_count})")
-                    results.append(True)
-                else:
-                    logger.error(f"❌ Failed to cancel order {order.id} [{account_id}] {order.symbol}: {result.get('error')}")
-                    results.append(Exception(f"Cancellation failed: {result.get('error')}"))
+                    logger.info(f"✅ Order {order.id} cancelled successfully [{account_id}] {order.symbol}")
+                    return True
+                logger.error(f"❌ Failed to cancel order {order.id} [{account_id}] {order.symbol}: {result.get('error')}")
+                return Exception(f"Cancellation failed: {result.get('error')}")
 
-            except Exception as e:
-                logger.error(f"❌ Error cancelling order {order.id} [{account_id}] {order.symbol}: {e}")
-                results.append(e)
+        results = list(await asyncio.gather(*(cancel_one(order) for order in orders)))
 
         logger.debug(
             f"✅ Account [{account_id}] batch complete: {sum(1 for r in results if r is True)}/{order_count} successful")
 
         return results
 
+    async def _bulk_cancel_account_orders(self, account_id: str, orders: List[Order],
+                                          cycle: Dict[str, Any]) -> Optional[List[Union[bool, Exception]]]:
+        """
+        Cancel all open orders of an account in one request
+        
+        Bulk cancel also cancels orders placed after the cycle's fetch, so the open set is
+        fetched again right before the request and bulk cancel is skipped if it changed.
+        Returns None when bulk cancel is skipped or the bulk request itself fails, so the
+        caller falls back to per-order cancellation.
+        """
+        await self._acquire_cancel_budget(account_id, cycle)
+
+        open_now = await self._get_account_orders_via_api(account_id, CANCELLABLE_ORDER_STATUS)
+        if {order.id for order in open_now if order.is_pending} != {order.id for order in orders}:
+            cycle['bulk_skipped'] += 1
+            logger.info(f"Open orders of account [{account_id}] changed since the fetch, skipping bulk cancel")
+            return None
+
+        logger.info(f"🔄 Bulk cancelling all {len(orders)} open orders for account [{account_id}]")
+        request_start = time.monotonic()
+        try:
+            result = await self.api_client.cancel_all_orders(account_id)
+        except Exception as e:
+            result = {"error": str(e)}
+        finally:
+            cycle['latencies_ms'].append((time.monotonic() - request_start) * 1000)
+
+        if "error" in result:
+            logger.warning(f"Bulk cancel failed for account [{account_id}], falling back to per-order cancel: {result['error']}")
+            return None
+
+        cycle['bulk_cancels'] += 1
+        failed = {str(item.get('order_id')): item for item in result.get('failed', [])}
+        unexpected = set(result.get('cancelled_order_ids', [])) - {str(order.id) for order in orders}
+        if unexpected:
+            cycle['unexpected_cancels'] += len(unexpected)
+            logger.error(f"❌ Bulk cancel for account [{account_id}] also cancelled orders opened after the check: {sorted(unexpected)}")
+
+        # Orders missing from the response were already closed - nothing left to cancel
+        results: List[Union[bool, Exception]] = []
+        for order in orders:
+            failure = failed.get(str(order.id))
+            if failure:
+                logger.error(f"❌ Failed to cancel order {order.id} [{account_id}] {order.symbol}: HTTP {failure.get('status')}")
+                results.append(Exception(f"Cancellation failed: HTTP {failure.get('status')}"))
+            else:
+                results.append(True)
+        return results
+
+    def _record_cancel_cycle(self, cycle: Dict[str, Any], elapsed_seconds: float):
+        """Fold a finished cancellation cycle into the metrics"""
+        latencies = sorted(cycle.pop('latencies_ms'))
+
+        def percentile(p: float) -> Optional[float]:
+            if not latencies:
+                return None
+            return round(latencies[min(len(latencies) - 1, int(p * len(latencies)))], 2)
+
+        cycle.update({
+            'requests': len(latencies),
+            'elapsed_ms': round(elapsed_seconds * 1000, 2),
+            'cancels_per_second': round(cycle['cancelled'] / elapsed_seconds, 2) if elapsed_seconds > 0 else None,
+            'latency_ms': {
+                'avg': round(sum(latencies) / len(latencies), 2) if latencies else None,
+                'p50': percentile(0.5),
+                'p95': percentile(0.95),
+                'max': round(latencies[-1], 2) if latencies else None
+            }
+        })
+
+        self.cancel_metrics['cycles'] += 1
+        self.cancel_metrics['total_cancelled'] += cycle['cancelled']
+        self.cancel_metrics['total_failed'] += cycle['failed']
+        self.cancel_metrics['total_bulk_cancels'] += cycle['bulk_cancels']
+        self.cancel_metrics['total_bulk_skipped'] += cycle['bulk_skipped']
+        self.cancel_metrics['total_unexpected_cancels'] += cycle['unexpected_cancels']
+        self.cancel_metrics['last_cycle'] = cycle
+
+    def get_cancel_metrics(self) -> Dict[str, Any]:
+        """Get order cancellation metrics (cumulative + last cycle)"""
+        return {**self.cancel_metrics, 'config': dict(self.cancel_config)}
+
     async def _cancel_order(self, order: Order) -> bool:
         """
         High-performance single order cancellation using HTTP API client
@@ -518,7 +679,7 @@ class OrderManager:
             List of pending sell orders
         """
         try:
-            all_orders = await self.get_all_orders(status='open,accepted,replaced')
+            all_orders = await self.get_all_orders(status='open')
 
             # Optimized filtering with combined conditions
             return [
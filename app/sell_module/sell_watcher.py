@@ -13,6 +13,7 @@ from app.account_pool import AccountPool
 from .api_client import AlpacaAPIClient
 from app.utils.discord_notifier import send_sell_module_notification
 from app.database_models import get_auto_sell_enabled, close_order_tracking
+from app.metrics import sell_cycle_phase_seconds, observe_duration
 from .config_manager import ConfigManager
 from .position_manager import PositionManager, Position
 from .order_manager import OrderManager
@@ -39,14 +40,14 @@ class SellWatcher:
             # API 客户端架构 - 避免直接连接池访问
             logger.info("使用 API 客户端架构初始化卖出监控器组件（OptimizedStrategy优先）")
             self.position_manager = PositionManager(account_pool, api_client)
-            self.order_manager = OrderManager(account_pool, api_client)
+            self.order_manager = OrderManager(account_pool, api_client, self.config_manager)
             # 只有在优化策略失败时才需要price_tracker作为回退
             self.price_tracker = PriceTracker(account_pool)
         else:
             # 原始架构 - 直接连接池访问（需要price_tracker）
             logger.debug("使用原始架构初始化卖出监控器组件")
             self.position_manager = PositionManager(account_pool)
-            self.order_manager = OrderManager(account_pool)
+            self.order_manager = OrderManager(account_pool, None, self.config_manager)
             self.price_tracker = PriceTracker(account_pool)
 
         # 初始化策略
@@ -113,7 +114,8 @@ class SellWatcher:
                     break
 
                 # 执行监控周期
-                await self._monitor_cycle()
+                with observe_duration(sell_cycle_phase_seconds.labels("cycle")):
+                    await self._monitor_cycle()
 
         except Exception as e:
             logger.error(f"监控循环异常: {e}")
@@ -159,14 +161,16 @@ class SellWatcher:
             start_time = datetime.now()
 
             # 1. 获取所有持仓
-            all_positions = await self.position_manager.get_all_positions()
+            with observe_duration(sell_cycle_phase_seconds.labels("positions")):
+                all_positions = await self.position_manager.get_all_positions()
 
             if not all_positions:
                 logger.info("账户净持仓为0，没有持有期权")                
                 return
 
             # 2. 处理空头持仓（自动平仓）
-            await self.position_manager.handle_short_positions(all_positions)
+            with observe_duration(sell_cycle_phase_seconds.labels("short_positions")):
+                await self.position_manager.handle_short_positions(all_positions)
 
             # 3. 过滤出多头期权持仓
             long_positions = self.position_manager.filter_long_positions(all_positions)
@@ -180,7 +184,8 @@ class SellWatcher:
             # 4. 取消旧订单（无论市场是否开放都执行）
             cancel_minutes = self.config_manager.get_order_cancel_minutes()
             logger.info(f"开始取消超过 {cancel_minutes} 分钟的卖出订单")
-            await self.order_manager.cancel_old_orders(minutes=cancel_minutes, side='all')
+            with observe_duration(sell_cycle_phase_seconds.labels("cancel_orders")):
+                await self.order_manager.cancel_old_orders(minutes=cancel_minutes, side='all')
             # logger.info("取消旧订单检查完成")
 
             # 5. 检查是否在交易时间内
@@ -189,10 +194,12 @@ class SellWatcher:
             #     return
 
             # 6. 执行卖出策略
-            await self._execute_sell_strategies(long_positions)
+            with observe_duration(sell_cycle_phase_seconds.labels("strategies")):
+                await self._execute_sell_strategies(long_positions)
 
             # 7. 处理零日期权
-            await self._handle_zero_day_options(long_positions)
+            with observe_duration(sell_cycle_phase_seconds.labels("zero_day")):
+                await self._handle_zero_day_options(long_positions)
 
             # 计算执行时间
             execution_time = (datetime.now() - start_time).total_seconds()            
@@ -574,6 +581,7 @@ class SellWatcher:
             'strategy_one_enabled': self.config_manager.is_strategy_enabled(),
             'check_interval': self.config_manager.get_check_interval(),
             'tracked_options': len(self.track_list),
+            'order_cancellation': self.order_manager.get_cancel_metrics(),
             'architecture': 'parallel_optimized' if self.use_api_client else 'legacy',
             'components': {
                 'config_manager': 'ready',
@@ -130,7 +130,8 @@ async def get_sell_comprehensive_status() -> Dict[str, Any]:
             "statistics": {
                 "orders_processed": status.get("orders_processed", 0),
                 "success_rate": status.get("success_rate", 0.0),
-                "last_activity": status.get("last_activity", None)
+                "last_activity": status.get("last_activity", None),
+                "order_cancellation": status.get("order_cancellation")
             },
             "timestamp": datetime.now().isoformat()
         }
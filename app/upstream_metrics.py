@@ -0,0 +1,300 @@
+"""
+Latency, error and retry tracking for outbound Alpaca REST calls
+Every call made through PooledAlpacaClient is timed per (account, endpoint class, host). The SDK
+clients are instrumented so the host actually contacted and the retries alpaca-py performs
+internally (429 / 504) are attributed to the call in progress. A synthetic probe keeps the numbers
+fresh for idle accounts and data keys during market hours.
+"""
+
+import asyncio
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Any, Dict, Iterator, Optional, Tuple
+from urllib.parse import urlsplit
+
+from alpaca.common.rest import RESTClient
+from alpaca.data.requests import StockLatestQuoteRequest
+from loguru import logger
+
+from config import settings
+from app.circuit_breaker import EndpointClass
+from app.histogram import LatencyHistogram
+from app.metrics import REGISTRY, MetricFamily
+
+
+# REST call latency bucket upper bounds in seconds (10ms .. 30s)
+REST_LATENCY_BUCKETS = (0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+
+@dataclass
+class UpstreamCall:
+    """Outbound call in progress, filled in by the instrumented SDK client"""
+    host: Optional[str] = None
+    requests: int = 0
+    retries: int = 0
+    error: Optional[BaseException] = None  # exception raised by the last attempt, None if it succeeded
+
+
+_current_call: ContextVar[Optional[UpstreamCall]] = ContextVar("upstream_call", default=None)
+
+
+def instrument_rest_client(client: Any) -> Any:
+    """
+    Wrap an alpaca-py REST client's per-attempt request so the call in progress sees the host
+    and retry count (alpaca-py retries inside _request; the first attempt has retry == _retry)
+    """
+    if not isinstance(client, RESTClient) or getattr(client, "_upstream_instrumented", False):
+        return client
+    one_request = client._one_request
+
+    def instrumented_one_request(method, url, opts, retry):
+        call = _current_call.get()
+        if call is not None:
+            call.requests += 1
+            call.host = urlsplit(url).hostname
+            if retry < client._retry:
+                call.retries += 1
+        try:
+            result = one_request(method, url, opts, retry)
+        except Exception as e:
+            if call is not None:
+                call.error = e
+            raise
+        if call is not None:
+            call.error = None
+        return result
+
+    client._one_request = instrumented_one_request
+    client._upstream_instrumented = True
+    return client
+
+
+class UpstreamStats:
+    """Latency histogram and outcome counters for one (account, endpoint class, host)"""
+
+    def __init__(self):
+        self.latency = LatencyHistogram(REST_LATENCY_BUCKETS)
+        self.calls = 0
+        self.errors = 0              # any error result or exception
+        self.upstream_failures = 0   # errors pointing at the key, network or Alpaca
+        self.retries = 0
+        self.last_error: Optional[str] = None
+        self.last_call_at: Optional[datetime] = None
+
+    def record(self, seconds: float, error: Optional[str], retries: int, upstream_failure: bool = False):
+        self.latency.observe(seconds)
+        self.calls += 1
+        self.retries += retries
+        self.last_call_at = datetime.utcnow()
+        if error:
+            self.errors += 1
+            self.last_error = error
+            if upstream_failure:
+                self.upstream_failures += 1
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            "calls": self.calls,
+            "errors": self.errors,
+            "upstream_failures": self.upstream_failures,
+            "error_rate": round(self.errors / self.calls, 4) if self.calls else 0.0,
+            "retries": self.retries,
+            "latency": self.latency.get_stats(),
+            "last_error": self.last_error,
+            "last_call_at": self.last_call_at.isoformat() if self.last_call_at else None
+        }
+
+
+class UpstreamMetrics:
+    """Registry of per (account, endpoint class, host) upstream call statistics"""
+
+    def __init__(self):
+        self._stats: Dict[Tuple[str, str, str], UpstreamStats] = {}
+
+    @contextmanager
+    def track(self) -> Iterator[UpstreamCall]:
+        """Collect host and retries of the SDK requests made inside the block"""
+        call = UpstreamCall()
+        token = _current_call.set(call)
+        try:
+            yield call
+        finally:
+            _current_call.reset(token)
+
+    def record(self, account_id: str, endpoint_class: EndpointClass, call: UpstreamCall, seconds: float,
+               error: Optional[str] = None, upstream_failure: bool = False):
+        """Record a finished call (calls that never reached Alpaca are ignored)"""
+        if not call.requests:
+            return
+        key = (account_id, endpoint_class.value, call.host or "unknown")
+        stats = self._stats.get(key)
+        if stats is None:
+            stats = self._stats[key] = UpstreamStats()
+        stats.record(seconds, error, call.retries, upstream_failure)
+
+    def items(self):
+        """((account_id, endpoint_class, host), UpstreamStats) pairs"""
+        return self._stats.items()
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Stats grouped by account, then "endpoint_class@host" """
+        accounts: Dict[str, Dict[str, Any]] = {}
+        for (account_id, endpoint_class, host), stats in sorted(self._stats.items()):
+            accounts.setdefault(account_id, {})[f"{endpoint_class}@{host}"] = stats.get_stats()
+        return accounts
+
+    def clear(self):
+        self._stats.clear()
+
+
+upstream_metrics = UpstreamMetrics()
+
+
+def collect_upstream_metrics():
+    """Prometheus families for /metrics (read at scrape time)"""
+    latency = MetricFamily("alpaca_upstream_request_duration_seconds", "histogram",
+                           "Alpaca REST call latency including SDK retries")
+    calls = MetricFamily("alpaca_upstream_calls_total", "counter", "Alpaca REST calls")
+    errors = MetricFamily("alpaca_upstream_errors_total", "counter", "Alpaca REST calls that returned an error")
+    failures = MetricFamily("alpaca_upstream_failures_total", "counter",
+                            "Errors pointing at the key, network or Alpaca (circuit breaker failures)")
+    retries = MetricFamily("alpaca_upstream_retries_total", "counter", "Retries made inside the Alpaca SDK")
+    for (account_id, endpoint_class, host), stats in list(upstream_metrics.items()):
+        labels = {"account": account_id, "endpoint_class": endpoint_class, "host": host}
+        latency.add(labels, stats.latency)
+        calls.add(labels, stats.calls)
+        errors.add(labels, stats.errors)
+        failures.add(labels, stats.upstream_failures)
+        retries.add(labels, stats.retries)
+    return [latency, calls, errors, failures, retries]
+
+
+REGISTRY.register_collector("upstream", collect_upstream_metrics)
+
+
+@dataclass
+class UpstreamProbeConfig:
+    """Synthetic probe settings (upstream_probe in secrets.yml)"""
+    enabled: bool = True
+    interval_seconds: float = 60.0
+    market_hours_only: bool = True
+    symbol: str = "SPY"              # latest quote requested through every market data key
+
+
+def load_upstream_probe_config() -> UpstreamProbeConfig:
+    """Build the probe config from settings (unknown fields ignored)"""
+    probe_settings = getattr(settings, 'upstream_probe', None)
+    if not isinstance(probe_settings, dict):
+        return UpstreamProbeConfig()
+    known_fields = UpstreamProbeConfig.__dataclass_fields__.keys()
+    return UpstreamProbeConfig(**{k: v for k, v in probe_settings.items() if k in known_fields})
+
+
+class UpstreamProbe:
+    """
+    Lightweight synthetic calls per account (market clock) and per market data key (one latest quote)
+
+    Probes go through the same guarded path as real traffic, so they land in the upstream metrics
+    and feed the circuit breakers: a degraded key or region shows up before an order hits it.
+    """
+
+    def __init__(self, config: Optional[UpstreamProbeConfig] = None):
+        self.client = None
+        self.config = config or load_upstream_probe_config()
+        self._task: Optional[asyncio.Task] = None
+        self.rounds = 0
+        self.last_round_at: Optional[datetime] = None
+        self.last_results: Dict[str, Dict[str, Any]] = {}
+
+    @property
+    def is_running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    def start(self, client):
+        """Start probing through the pooled client (passed in to avoid an import cycle)"""
+        if self.is_running or not self.config.enabled:
+            return
+        self.client = client
+        self._task = asyncio.get_running_loop().create_task(self._run())
+        logger.info(f"Upstream probe started (every {self.config.interval_seconds:.0f}s)")
+
+    async def stop(self):
+        if self.is_running:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+        self._task = None
+
+    def _should_probe(self) -> bool:
+        if not self.config.market_hours_only:
+            return True
+        try:
+            from app.market_utils import is_market_hours
+            return is_market_hours()
+        except RuntimeError:
+            return True
+
+    async def _run(self):
+        while True:
+            if self._should_probe():
+                try:
+                    await self.probe_once()
+                except Exception as e:
+                    logger.error(f"Upstream probe round failed: {e}")
+            await asyncio.sleep(self.config.interval_seconds)
+
+    async def probe_once(self) -> Dict[str, Dict[str, Any]]:
+        """Probe every enabled account and market data key concurrently"""
+        pool = self.client.pool
+        account_ids = [account_id for account_id, config in pool.account_configs.items() if config.enabled]
+        key_ids = list(pool.data_key_connections)
+        results = await asyncio.gather(
+            *(self._probe_account(account_id) for account_id in account_ids),
+            *(self._probe_data_key(key_id) for key_id in key_ids)
+        )
+        self.last_results = dict(zip([f"account:{a}" for a in account_ids] + [f"data_key:{k}" for k in key_ids],
+                                     results))
+        self.rounds += 1
+        self.last_round_at = datetime.utcnow()
+        return self.last_results
+
+    async def _probe_account(self, account_id: str) -> Dict[str, Any]:
+        async def get_clock(alpaca_client):
+            await asyncio.to_thread(alpaca_client.trading_client.get_clock)
+            return {}
+        return await self._timed(self.client._run_account_call(account_id, None, EndpointClass.ACCOUNT, get_clock))
+
+    async def _probe_data_key(self, key_id: str) -> Dict[str, Any]:
+        request = StockLatestQuoteRequest(symbol_or_symbols=[self.config.symbol])
+
+        async def latest_quote(alpaca_client):
+            await asyncio.to_thread(alpaca_client.stock_data_client.get_stock_latest_quote, request)
+            return {}
+        return await self._timed(self.client._run_data_call(key_id, None, latest_quote))
+
+    @staticmethod
+    async def _timed(call) -> Dict[str, Any]:
+        started = time.monotonic()
+        try:
+            result = await call
+            error = result.get("error") if isinstance(result, dict) else None
+        except Exception as e:
+            error = str(e)
+        return {"ok": error is None, "latency_ms": round((time.monotonic() - started) * 1000, 1), "error": error}
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            "running": self.is_running,
+            "interval_seconds": self.config.interval_seconds,
+            "rounds": self.rounds,
+            "last_round_at": self.last_round_at.isoformat() if self.last_round_at else None,
+            "last_results": self.last_results
+        }
+
+
+upstream_probe = UpstreamProbe()
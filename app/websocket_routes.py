@@ -11,48 +11,63 @@ import ssl
 import threading
 import weakref
 from typing import Dict, List, Set, Optional
+from dataclasses import asdict
 from datetime import datetime
 from loguru import logger
-import pandas as pd
 
 from config import settings
+from app.ws_subscriptions import SubscriptionRegistry
+from app.ws_encoding import encode_message, encode_compact, QuoteMessage, TradeMessage
+from app.ws_cache import last_value_cache, stream_url, STOCK_STREAM_URL, OPTION_STREAM_URL
+from app.ws_replay import tick_buffer
+from app.ws_bars import bar_aggregator
+from app.ws_clients import ClientSession, ClientQueueConfig, SubscriptionOptions, QUOTE, TRADE, MESSAGE_FORMATS
+from app.ws_fanout import RedisFanout, load_fanout_config
+from app.ws_shards import ConsistentHashRing, OptionShard, option_shard_accounts, load_ring_replicas
+from app.ws_pipeline import FeedPipeline, load_pipeline_config, create_decode_executor
+from app.ws_reconnect import FeedReconnector, load_reconnect_config
+from app.metrics import REGISTRY, MetricFamily
 
 # WebSocket路由
 ws_router = APIRouter(prefix="/ws", tags=["websocket"])
 
-def convert_timestamps_to_strings(obj):
-    """递归将对象中的Timestamp转换为字符串，确保JSON序列化兼容性"""
-    if isinstance(obj, pd.Timestamp):
-        return str(obj)
-    elif isinstance(obj, dict):
-        return {key: convert_timestamps_to_strings(value) for key, value in obj.items()}
-    elif isinstance(obj, list):
-        return [convert_timestamps_to_strings(item) for item in obj]
-    elif hasattr(obj, '__dict__'):
-        # 处理其他对象的属性
-        return convert_timestamps_to_strings(obj.__dict__)
-    else:
-        return obj
+# 全局订阅注册表 - 符号->订阅者倒排索引，写操作发布新快照，广播读取无需加锁
+subscription_registry = SubscriptionRegistry()
+# 只读视图（兼容旧接口）
+active_connections = subscription_registry.connections
+client_subscriptions = subscription_registry.client_subscriptions  # 每个客户端订阅的符号
 
-# 全局订阅符号和客户端连接 - 使用线程安全锁保护
-_global_lock = asyncio.Lock()
-subscribed_symbols: Set[str] = set()
-active_connections: Dict[str, WebSocket] = {}
-client_subscriptions: Dict[str, Set[str]] = {}  # 每个客户端订阅的符号
+
+def _websocket_settings() -> Dict:
+    """secrets.yml中的websocket配置段"""
+    websocket_settings = getattr(settings, 'websocket', None)
+    return websocket_settings if isinstance(websocket_settings, dict) else {}
+
+
+def _load_client_queue_config() -> ClientQueueConfig:
+    """从settings构建客户端发送队列配置（忽略未知字段）"""
+    queue_settings = _websocket_settings().get('client_queue')
+    if not isinstance(queue_settings, dict):
+        return ClientQueueConfig()
+    known_fields = ClientQueueConfig.__dataclass_fields__.keys()
+    return ClientQueueConfig(**{k: v for k, v in queue_settings.items() if k in known_fields})
+
+
+client_queue_config = _load_client_queue_config()
 
 class SingletonWebSocketManager:
     """
     单例WebSocket管理器 - 线程安全和异步安全
-    确保整个应用只有1个股票WS + 1个期权WS连接
+    确保整个应用只有1个股票WS连接；期权按一致性哈希分片到每个option_ws*专用账户各1个WS连接
     """
     
     _instance: Optional['SingletonWebSocketManager'] = None
     _instance_lock = threading.Lock()  # 线程级别的锁
     _instance_init_lock = asyncio.Lock()  # 异步级别的锁
     
-    # Alpaca官方端点
-    STOCK_WS_URL = "wss://stream.data.alpaca.markets/v2/iex"
-    OPTION_WS_URL = "wss://stream.data.alpaca.markets/v1beta1/indicative"
+    # Alpaca官方端点（可由websocket.stock_url / option_url覆盖，如指向本地行情模拟器）
+    STOCK_WS_URL = STOCK_STREAM_URL
+    OPTION_WS_URL = OPTION_STREAM_URL
     
     def __new__(cls):
         # 双重检查锁定模式 - 线程安全的单例
@@ -69,30 +84,40 @@ class SingletonWebSocketManager:
             
         # WebSocket连接
         self.stock_ws: Optional[websockets.WebSocketServerProtocol] = None
-        self.option_ws: Optional[websockets.WebSocketServerProtocol] = None
         self.stock_connected = False
-        self.option_connected = False
         
         # 专用账户
         self._stock_account: Optional[Dict] = None
-        self._option_account: Optional[Dict] = None
+        
+        # 期权分片 - 每个option_ws*专用账户一个上游连接（含各自的监听任务和锁），符号按一致性哈希放置
+        self._option_shards: Dict[str, OptionShard] = {}
+        self._option_ring = ConsistentHashRing(replicas=load_ring_replicas())
+        
+        # 上游数据流水线 recv → 解析 → 扇出（期权分片各有一条，可在线程/进程池中解析msgpack）
+        self.pipeline_config = load_pipeline_config()
+        self._stock_pipeline = FeedPipeline("stock", "stock", self._broadcast_message, self.pipeline_config)
+        self._option_decode_executor = None
         
         # 监听任务 - 原子化管理
         self._stock_listener: Optional[asyncio.Task] = None
-        self._option_listener: Optional[asyncio.Task] = None
         self._stock_listener_lock = asyncio.Lock()
-        self._option_listener_lock = asyncio.Lock()
         
-        # 重连任务
+        # 重连 - 断线立即按抖动指数退避重连；_reconnection_task为兜底巡检
         self._reconnection_task: Optional[asyncio.Task] = None
+        self.reconnect_config = load_reconnect_config()
+        self._stock_desired: Set[str] = set()  # 最近一次同步放置到股票连接的符号
+        self._stock_reconnector = FeedReconnector("股票WebSocket", lambda: self._ensure_stock_connection(),
+                                                  self._stock_should_reconnect, self.reconnect_config)
         
         # WebSocket recv 锁 - 防止并发recv调用
         self._stock_recv_lock = asyncio.Lock()
-        self._option_recv_lock = asyncio.Lock()
         
         # 连接状态锁
         self._stock_connection_lock = asyncio.Lock()
-        self._option_connection_lock = asyncio.Lock()
+        
+        # 上游端点
+        self.STOCK_WS_URL = stream_url()
+        self.OPTION_WS_URL = stream_url(is_option=True)
         
         # 初始化锁
         self._init_lock = asyncio.Lock()
@@ -100,7 +125,36 @@ class SingletonWebSocketManager:
         # 关闭标志
         self._shutdown_event = asyncio.Event()
         
+        # 慢客户端断开统计及关闭任务
+        self.slow_consumer_disconnects = 0
+        self._close_tasks: Set[asyncio.Task] = set()
+        
+        # 上游当前已订阅的符号 - 只发送差异的subscribe/unsubscribe帧
+        self._upstream_symbols: Dict[str, Set[str]] = {"stock": set(), "option": set()}
+        self._subscription_sync_lock = asyncio.Lock()
+        self._subscription_sync_task: Optional[asyncio.Task] = None
+        self.subscription_debounce_seconds = float(_websocket_settings().get('subscription_debounce_seconds', 0.1))
+        self.subscription_stats = {
+            "sync_requests": 0,
+            "syncs": 0,
+            "frames_sent": 0,
+            "symbols_subscribed": 0,
+            "symbols_unsubscribed": 0
+        }
+        
+        # 多worker扇出（websocket.fanout.mode=redis）- 仅leader连接上游，行情经Redis分发给所有worker
+        self.fanout: Optional[RedisFanout] = None
+        self._cluster_symbols: Set[str] = set()
+        
+        # K线定时收盘任务（无成交的符号也按时收盘）
+        self._bar_task: Optional[asyncio.Task] = None
+        
         self._initialized = True
+    
+    @property
+    def option_connected(self) -> bool:
+        """任一期权分片已连接"""
+        return any(shard.connected for shard in self._option_shards.values())
         
     async def ensure_initialized(self):
         """确保WebSocket管理器已初始化 - 线程安全"""
@@ -110,7 +164,7 @@ class SingletonWebSocketManager:
             
         async with self._init_lock:
             try:
-                if not self._stock_account or not self._option_account:
+                if not self._stock_account or not self._option_shards:
                     await self._load_dedicated_accounts()
                     
                 # 原子化启动重连任务 - 修复事件循环问题
@@ -126,14 +180,12 @@ class SingletonWebSocketManager:
                     self._reconnection_task = loop.create_task(self._reconnection_manager())
                     
                 # 如果有订阅且连接断开，重新连接
-                async with _global_lock:
-                    has_symbols = bool(subscribed_symbols)
+                has_symbols = subscription_registry.has_symbols()
                     
-                if has_symbols:
+                if has_symbols and self._owns_upstream():
                     if not self.stock_connected:
                         await self._ensure_stock_connection()
-                    if not self.option_connected:
-                        await self._ensure_option_connection()
+                    # 期权分片按放置的符号在订阅同步时按需连接
                         
             except Exception as e:
                 logger.error(f"❌ WebSocket管理器初始化失败: {e}")
@@ -151,7 +203,6 @@ class SingletonWebSocketManager:
             
             # 获取专用股票WebSocket账户
             stock_account = None
-            option_account = None
             
             # 从account_pool获取AccountConfig对象
             if 'stock_ws' in account_pool.account_configs:
@@ -163,24 +214,19 @@ class SingletonWebSocketManager:
                         'secret_key': stock_config.secret_key
                     }
             
-            if 'option_ws' in account_pool.account_configs:
-                option_config = account_pool.account_configs['option_ws']
-                if option_config.enabled:
-                    option_account = {
-                        'name': option_config.account_name or 'option_ws',
-                        'api_key': option_config.api_key,
-                        'secret_key': option_config.secret_key
-                    }
+            # 期权专用账户: option_ws及option_ws_*，每个账户一个上游分片
+            option_accounts = option_shard_accounts(account_pool.account_configs)
             
             if not stock_account:
                 raise Exception("未找到stock_ws专用账户配置")
-            if not option_account:
+            if not option_accounts:
                 raise Exception("未找到option_ws专用账户配置")
                 
             self._stock_account = stock_account
-            self._option_account = option_account
+            self._set_option_shards(option_accounts)
             
-            logger.info(f"✅ 加载专用WebSocket账户: stock_ws={stock_account['name']}, option_ws={option_account['name']}")
+            logger.info(f"✅ 加载专用WebSocket账户: stock_ws={stock_account['name']}, "
+                        f"option_ws={[account['name'] for _, account in option_accounts]}")
             
         except Exception as e:
             logger.error(f"❌ 加载专用WebSocket账户失败: {e}")
@@ -202,15 +248,7 @@ class SingletonWebSocketManager:
                 # 清理旧连接
                 await self._cleanup_stock_connection()
                 
-                ssl_context = ssl.create_default_context()
-                self.stock_ws = await websockets.connect(
-                    self.STOCK_WS_URL,
-                    ssl=ssl_context,
-                    ping_interval=20,
-                    ping_timeout=10,
-                    close_timeout=10,
-                    max_size=2**20  # 1MB max message size
-                )
+                self.stock_ws = await self._connect_upstream(self.STOCK_WS_URL)
                 
                 # 认证
                 auth_message = {
@@ -239,6 +277,10 @@ class SingletonWebSocketManager:
                 # 原子化启动监听任务
                 await self._start_stock_listener()
                 
+                # 新连接没有订阅 - 立即以一个subscribe帧恢复当前需要的全部符号（不等待防抖同步）
+                await self._send_subscription_diff(self.stock_ws, self._upstream_symbols["stock"],
+                                                   self._stock_desired, json.dumps, "📊 股票")
+                
             except Exception as e:
                 logger.error(f"❌ 股票WebSocket连接失败: {e}")
                 self.stock_connected = False
@@ -266,6 +308,9 @@ class SingletonWebSocketManager:
                     pass
             self.stock_ws = None
             self.stock_connected = False
+            # 新连接上没有任何订阅，缓存值也不再实时
+            self._invalidate_cache(self._upstream_symbols["stock"])
+            self._upstream_symbols["stock"] = set()
             
         except Exception as e:
             logger.error(f"❌ 清理股票WebSocket连接异常: {e}")
@@ -290,10 +335,54 @@ class SingletonWebSocketManager:
             self._stock_listener = loop.create_task(self._listen_stock_data())
             logger.info("✅ 股票监听任务已启动")
     
-    async def _ensure_option_connection(self):
-        """确保期权WebSocket连接存在 - 原子化连接管理"""
-        async with self._option_connection_lock:
-            if self.option_connected and self.option_ws:
+    async def _connect_upstream(self, url: str):
+        """建立上游WebSocket连接（wss使用TLS，ws://仅用于本地模拟器）"""
+        return await websockets.connect(
+            url,
+            ssl=ssl.create_default_context() if url.startswith("wss://") else None,
+            ping_interval=20,
+            ping_timeout=10,
+            close_timeout=10,
+            max_size=2**20  # 1MB max message size
+        )
+    
+    def _set_option_shards(self, accounts):
+        """为每个期权专用账户建立分片并加入哈希环（已有分片保留其连接）"""
+        for shard_id, account in accounts:
+            shard = self._option_shards.get(shard_id)
+            if shard is None:
+                shard = self._option_shards[shard_id] = OptionShard(shard_id, account)
+                shard.pipeline = FeedPipeline(f"option[{shard_id}]", "option", self._broadcast_message,
+                                              self.pipeline_config, self._get_option_decode_executor())
+                shard.reconnector = self._create_option_reconnector(shard)
+                self._option_ring.add(shard_id)
+            else:
+                shard.account = account
+    
+    def _create_option_reconnector(self, shard: OptionShard) -> FeedReconnector:
+        return FeedReconnector(f"期权WebSocket[{shard.shard_id}]", lambda: self._ensure_option_connection(shard),
+                               lambda: self._option_should_reconnect(shard), self.reconnect_config)
+    
+    def _stock_should_reconnect(self) -> bool:
+        """股票连接断开且仍有需要的符号（未关闭、本进程拥有上游）"""
+        return (not self._shutdown_event.is_set() and self._owns_upstream()
+                and bool(self._stock_desired) and not self.stock_connected)
+    
+    def _option_should_reconnect(self, shard: OptionShard) -> bool:
+        return (not self._shutdown_event.is_set() and self._owns_upstream()
+                and bool(shard.desired) and not shard.connected)
+    
+    def _get_option_decode_executor(self):
+        """所有期权分片共用的解析池（option_decode=inline时为None）"""
+        if self._option_decode_executor is None and self.pipeline_config.option_decode != "inline":
+            self._option_decode_executor = create_decode_executor(self.pipeline_config.option_decode,
+                                                                  self.pipeline_config.decode_workers)
+        return self._option_decode_executor
+    
+    async def _ensure_option_connection(self, shard: OptionShard):
+        """确保期权分片的WebSocket连接存在 - 原子化连接管理"""
+        async with shard.connection_lock:
+            if shard.connected and shard.ws:
                 return
                 
             if self._shutdown_event.is_set():
@@ -301,33 +390,25 @@ class SingletonWebSocketManager:
                 return
                 
             try:
-                logger.info(f"🔌 建立期权WebSocket连接: {self.OPTION_WS_URL}")
+                logger.info(f"🔌 建立期权WebSocket连接[{shard.shard_id}]: {self.OPTION_WS_URL}")
                 
                 # 清理旧连接
-                await self._cleanup_option_connection()
+                await self._cleanup_option_connection(shard)
                 
-                ssl_context = ssl.create_default_context()
-                self.option_ws = await websockets.connect(
-                    self.OPTION_WS_URL,
-                    ssl=ssl_context,
-                    ping_interval=20,
-                    ping_timeout=10,
-                    close_timeout=10,
-                    max_size=2**20  # 1MB max message size
-                )
+                shard.ws = await self._connect_upstream(self.OPTION_WS_URL)
                 
                 # 认证 (期权使用MessagePack)
                 auth_message = {
                     "action": "auth",
-                    "key": self._option_account['api_key'],
-                    "secret": self._option_account['secret_key']
+                    "key": shard.account['api_key'],
+                    "secret": shard.account['secret_key']
                 }
                 packed_auth = msgpack.packb(auth_message)
-                await self.option_ws.send(packed_auth)
+                await shard.ws.send(packed_auth)
                 
                 # 使用recv锁等待认证响应
-                async with self._option_recv_lock:
-                    response = await self.option_ws.recv()
+                async with shard.recv_lock:
+                    response = await shard.ws.recv()
                     try:
                         auth_data = json.loads(response)
                     except:
@@ -341,62 +422,80 @@ class SingletonWebSocketManager:
                 if auth_response.get("T") != "success":
                     raise Exception(f"期权WebSocket认证失败: {auth_response}")
                 
-                self.option_connected = True
-                logger.info("✅ 期权WebSocket连接和认证成功")
+                shard.connected = True
+                shard.connects += 1
+                logger.info(f"✅ 期权WebSocket连接和认证成功[{shard.shard_id}]")
                 
                 # 原子化启动监听任务
-                await self._start_option_listener()
+                await self._start_option_listener(shard)
+                
+                # 新连接没有订阅 - 立即以一个subscribe帧恢复放置到该分片的全部符号
+                await self._send_subscription_diff(shard.ws, shard.symbols, shard.desired,
+                                                   msgpack.packb, f"📈 期权[{shard.shard_id}]")
+                self._refresh_option_upstream()
                 
             except Exception as e:
-                logger.error(f"❌ 期权WebSocket连接失败: {e}")
-                self.option_connected = False
-                await self._cleanup_option_connection()
+                logger.error(f"❌ 期权WebSocket连接失败[{shard.shard_id}]: {e}")
+                shard.connected = False
+                await self._cleanup_option_connection(shard)
                 raise
                 
-    async def _cleanup_option_connection(self):
-        """清理期权WebSocket连接资源"""
+    async def _cleanup_option_connection(self, shard: Optional[OptionShard] = None):
+        """清理期权WebSocket连接资源（不指定分片时清理所有分片）"""
+        if shard is None:
+            for option_shard in list(self._option_shards.values()):
+                await self._cleanup_option_connection(option_shard)
+            return
         try:
             # 取消监听任务
-            async with self._option_listener_lock:
-                if self._option_listener and not self._option_listener.done():
-                    self._option_listener.cancel()
+            async with shard.listener_lock:
+                if shard.listener and not shard.listener.done():
+                    shard.listener.cancel()
                     try:
-                        await self._option_listener
+                        await shard.listener
                     except asyncio.CancelledError:
                         pass
-                    self._option_listener = None
+                    shard.listener = None
             
             # 关闭WebSocket连接
-            if self.option_ws:
+            if shard.ws:
                 try:
-                    await self.option_ws.close()
+                    await shard.ws.close()
                 except Exception:
                     pass
-            self.option_ws = None
-            self.option_connected = False
+            shard.ws = None
+            shard.connected = False
+            # 新连接上没有任何订阅，缓存值也不再实时
+            self._invalidate_cache(shard.symbols)
+            shard.symbols = set()
+            self._refresh_option_upstream()
             
         except Exception as e:
-            logger.error(f"❌ 清理期权WebSocket连接异常: {e}")
+            logger.error(f"❌ 清理期权WebSocket连接异常[{shard.shard_id}]: {e}")
             
-    async def _start_option_listener(self):
-        """原子化启动期权监听任务"""
-        async with self._option_listener_lock:
+    async def _start_option_listener(self, shard: OptionShard):
+        """原子化启动期权分片的监听任务"""
+        async with shard.listener_lock:
             # 确保没有重复的监听任务
-            if self._option_listener and not self._option_listener.done():
-                logger.warning("期权监听任务已在运行，跳过启动")
+            if shard.listener and not shard.listener.done():
+                logger.warning(f"期权监听任务已在运行[{shard.shard_id}]，跳过启动")
                 return
                 
-            if self._option_listener:
-                self._option_listener.cancel()
+            if shard.listener:
+                shard.listener.cancel()
                 try:
-                    await self._option_listener
+                    await shard.listener
                 except asyncio.CancelledError:
                     pass
                     
             # 获取当前运行的事件循环来创建任务
             loop = asyncio.get_running_loop()
-            self._option_listener = loop.create_task(self._listen_option_data())
-            logger.info("✅ 期权监听任务已启动")
+            shard.listener = loop.create_task(self._listen_option_data(shard))
+            logger.info(f"✅ 期权监听任务已启动[{shard.shard_id}]")
+    
+    def _refresh_option_upstream(self):
+        """汇总各期权分片已订阅的符号"""
+        self._upstream_symbols["option"] = set().union(*(shard.symbols for shard in self._option_shards.values()))
     
     async def add_client_subscription(self, client_id: str, symbols: List[str]):
         """添加客户端订阅 - 线程安全"""
@@ -406,165 +505,202 @@ class SingletonWebSocketManager:
             
         await self.ensure_initialized()
         
-        async with _global_lock:
-            # 记录客户端订阅
-            if client_id not in client_subscriptions:
-                client_subscriptions[client_id] = set()
-            
-            new_symbols = set(symbols) - client_subscriptions[client_id]
-            client_subscriptions[client_id].update(symbols)
-            
-            # 更新全局订阅
-            global_new_symbols = new_symbols - subscribed_symbols
-            subscribed_symbols.update(new_symbols)
-            
-            if global_new_symbols:
-                logger.info(f"🆕 新增订阅符号: {list(global_new_symbols)} (客户端: {client_id})")
-                
-        # 在锁外更新订阅以避免死锁
+        # 记录客户端订阅，返回引用计数从0变为1的符号
+        global_new_symbols = subscription_registry.subscribe(client_id, symbols)
+        
         if global_new_symbols:
-            await self._update_subscriptions()
+            logger.info(f"🆕 新增订阅符号: {list(global_new_symbols)} (客户端: {client_id})")
+            self._schedule_subscription_sync()
+    
+    async def remove_client_symbols(self, client_id: str, symbols: List[str]) -> Set[str]:
+        """取消客户端对部分符号的订阅，返回实际取消的符号"""
+        requested = set(symbols) & subscription_registry.client_symbols(client_id)
+        orphaned_symbols = subscription_registry.unsubscribe(client_id, requested)
+        
+        if orphaned_symbols:
+            logger.info(f"🗑️ 移除不再需要的符号: {list(orphaned_symbols)} (客户端 {client_id} 取消订阅)")
+            self._schedule_subscription_sync()
+        return requested
     
     async def remove_client_subscription(self, client_id: str):
-        """移除客户端订阅（客户端断开时调用）- 线程安全"""
-        global subscribed_symbols
-        symbols_to_remove = set()
+        """移除客户端连接和订阅（客户端断开时调用）- 线程安全"""
+        # 注册表直接返回引用计数降为0的符号，无需扫描其他客户端
+        symbols_to_remove = subscription_registry.remove_client(client_id)
         
-        async with _global_lock:
-            if client_id not in client_subscriptions:
-                return
-            
-            client_symbols = client_subscriptions.pop(client_id)
-            
-            # 检查是否有其他客户端还需要这些符号
-            still_needed_symbols = set()
-            for other_client_symbols in client_subscriptions.values():
-                still_needed_symbols.update(other_client_symbols)
-            
-            # 移除不再需要的符号
-            symbols_to_remove = client_symbols - still_needed_symbols
-            if symbols_to_remove:
-                subscribed_symbols -= symbols_to_remove
-                logger.info(f"🗑️ 移除不再需要的符号: {list(symbols_to_remove)} (客户端 {client_id} 断开)")
-                
-        # 在锁外更新订阅以避免死锁
         if symbols_to_remove:
-            await self._update_subscriptions()
+            logger.info(f"🗑️ 移除不再需要的符号: {list(symbols_to_remove)} (客户端 {client_id} 断开)")
+            self._schedule_subscription_sync()
+    
+    def send_snapshot(self, client_id: str, symbols: List[str], resume_from: Optional[int] = None):
+        """
+        向客户端发送所订阅符号的最新报价/成交快照（非流动性符号无需等待下一笔行情）
+        
+        重连客户端提供resume_from时，一次性补发其后缺失的行情；缺口早于缓冲区时退回快照。
+        调用前刚完成订阅且中间没有await，补发内容与之后的实时行情按seq衔接。
+        """
+        session = subscription_registry.get_connection(client_id)
+        if session is None:
+            return
+        if resume_from is not None:
+            missed = tick_buffer.replay(resume_from, symbols)
+            session.send_message({
+                "type": "replay",
+                "resume_from": resume_from,
+                "complete": missed is not None,
+                "last_seq": tick_buffer.last_seq,
+                "messages": missed or []
+            })
+            if missed is not None:
+                return
+        snapshot = last_value_cache.snapshot(symbols)
+        if snapshot:
+            session.send_message(snapshot)
+    
+    def _schedule_subscription_sync(self):
+        """防抖调度上游订阅同步 - 短时间内的多次变更只产生一次同步"""
+        self.subscription_stats["sync_requests"] += 1
+        if self._shutdown_event.is_set():
+            return
+        if self._subscription_sync_task and not self._subscription_sync_task.done():
+            # 已有待执行的同步，它会读取最新的订阅状态
+            return
+        loop = asyncio.get_running_loop()
+        self._subscription_sync_task = loop.create_task(self._debounced_subscription_sync())
+    
+    async def _debounced_subscription_sync(self):
+        await asyncio.sleep(self.subscription_debounce_seconds)
+        await self._update_subscriptions()
     
     async def _update_subscriptions(self):
-        """更新Alpaca WebSocket订阅 - 线程安全"""
+        """同步Alpaca WebSocket订阅 - 只发送与上游当前订阅的差异"""
         if self._shutdown_event.is_set():
             return
+        
+        async with self._subscription_sync_lock:
+            current_symbols = await self._desired_symbols()
+            if current_symbols is None:
+                return
+            self.subscription_stats["syncs"] += 1
             
-        async with _global_lock:
-            current_symbols = subscribed_symbols.copy()
+            # 分离股票和期权符号
+            stock_symbols = {s for s in current_symbols if not self._is_option_symbol(s)}
+            option_symbols = current_symbols - stock_symbols
             
-        if not current_symbols:
+            await self._sync_stream_subscriptions("stock", stock_symbols)
+            await self._sync_stream_subscriptions("option", option_symbols)
+    
+    async def _desired_symbols(self) -> Optional[Set[str]]:
+        """上游应订阅的符号 - 本地模式为本进程客户端的符号，redis模式由leader汇总所有worker；非leader返回None"""
+        local_symbols = subscription_registry.symbols()
+        if self.fanout is None:
+            return local_symbols
+        try:
+            await self.fanout.update_demand(local_symbols)
+            if not self.fanout.is_leader:
+                return None
+            self._cluster_symbols = await self.fanout.cluster_demand()
+            return self._cluster_symbols
+        except Exception as e:
+            logger.error(f"❌ 同步集群订阅需求失败: {e}")
+            return None
+    
+    async def _sync_stream_subscriptions(self, stream: str, desired_symbols: Set[str]):
+        """发送上游连接的subscribe/unsubscribe差异帧（期权按分片放置后各分片并发同步）"""
+        if stream == "option":
+            placement = self._option_ring.partition(desired_symbols)
+            for shard_id, shard in self._option_shards.items():
+                shard.desired = placement.get(shard_id, set())
+            if desired_symbols and not self._option_shards:
+                logger.warning("⚠️ 没有期权专用账户，无法订阅期权符号")
+            await asyncio.gather(*(self._sync_option_shard(shard) for shard in self._option_shards.values()))
             return
         
-        # 分离股票和期权符号
-        stock_symbols = [s for s in current_symbols if not self._is_option_symbol(s)]
-        option_symbols = [s for s in current_symbols if self._is_option_symbol(s)]
-        
-        # 更新股票订阅
-        if stock_symbols:
-            try:
+        self._stock_desired = desired_symbols
+        try:
+            # 重连进行中时由重连恢复订阅
+            if desired_symbols and not self._stock_reconnector.active:
                 await self._ensure_stock_connection()
-                if self.stock_connected and self.stock_ws:
-                    subscribe_msg = {
-                        "action": "subscribe",
-                        "quotes": stock_symbols,
-                        "trades": stock_symbols
-                    }
-                    await self.stock_ws.send(json.dumps(subscribe_msg))
-                    logger.info(f"📊 更新股票订阅: {len(stock_symbols)} 个符号")
-            except Exception as e:
-                logger.error(f"❌ 更新股票订阅失败: {e}")
+            
+            if not self.stock_connected or not self.stock_ws:
+                return
+            
+            await self._send_subscription_diff(self.stock_ws, self._upstream_symbols["stock"], desired_symbols,
+                                               json.dumps, "📊 股票")
+        except Exception as e:
+            logger.error(f"❌ 更新股票订阅失败: {e}")
+            if self._stock_should_reconnect():
+                self._stock_reconnector.trigger(dropped=False)
+    
+    async def _sync_option_shard(self, shard: OptionShard):
+        """同步单个期权分片的上游订阅"""
+        try:
+            if shard.desired and not shard.reconnector.active:
+                await self._ensure_option_connection(shard)
+            
+            if not shard.connected or not shard.ws:
+                return
+            
+            await self._send_subscription_diff(shard.ws, shard.symbols, shard.desired,
+                                               msgpack.packb, f"📈 期权[{shard.shard_id}]")
+        except Exception as e:
+            logger.error(f"❌ 更新期权订阅失败[{shard.shard_id}]: {e}")
+            if self._option_should_reconnect(shard):
+                shard.reconnector.trigger(dropped=False)
+        finally:
+            self._refresh_option_upstream()
+    
+    async def _send_subscription_diff(self, ws, upstream_symbols: Set[str], desired_symbols: Set[str],
+                                      encode, label: str):
+        """发送差异帧并更新该连接已订阅的符号集合"""
+        to_subscribe = sorted(desired_symbols - upstream_symbols)
+        to_unsubscribe = sorted(upstream_symbols - desired_symbols)
         
-        # 更新期权订阅
-        if option_symbols:
-            try:
-                await self._ensure_option_connection()
-                if self.option_connected and self.option_ws:
-                    subscribe_msg = {
-                        "action": "subscribe",
-                        "quotes": option_symbols,
-                        "trades": option_symbols
-                    }
-                    packed_msg = msgpack.packb(subscribe_msg)
-                    await self.option_ws.send(packed_msg)
-                    logger.info(f"📈 更新期权订阅: {len(option_symbols)} 个符号")
-            except Exception as e:
-                logger.error(f"❌ 更新期权订阅失败: {e}")
+        for action, symbols in (("subscribe", to_subscribe), ("unsubscribe", to_unsubscribe)):
+            if not symbols:
+                continue
+            frame = {"action": action, "quotes": symbols, "trades": symbols}
+            await ws.send(encode(frame))
+            self.subscription_stats["frames_sent"] += 1
+            
+            if action == "subscribe":
+                upstream_symbols.update(symbols)
+                self.subscription_stats["symbols_subscribed"] += len(symbols)
+            else:
+                upstream_symbols.difference_update(symbols)
+                self._invalidate_cache(symbols)
+                self.subscription_stats["symbols_unsubscribed"] += len(symbols)
+            logger.info(f"{label}{action}: {len(symbols)} 个符号 (上游共 {len(upstream_symbols)} 个)")
     
     def _is_option_symbol(self, symbol: str) -> bool:
         """判断是否为期权符号"""
         return len(symbol) > 6 and any(c in symbol for c in ['C', 'P']) and any(c.isdigit() for c in symbol)
     
     async def _reconnection_manager(self):
-        """后台重连管理器 - 改进的健壮性"""
+        """兜底重连巡检 - 断线由监听任务立即触发重连；这里补上未在重连中的断开连接（如首次连接失败）"""
         logger.info("🔄 启动WebSocket重连管理器")
         
-        consecutive_failures = 0
-        max_failures = 5
-        
         try:
             while not self._shutdown_event.is_set():
                 try:
-                    # 动态调整检查间隔
-                    check_interval = min(10 + consecutive_failures * 5, 60)  # 10-60秒
-                    await asyncio.sleep(check_interval)
+                    await asyncio.sleep(self.reconnect_config.check_interval)
                     
                     if self._shutdown_event.is_set():
                         break
                     
-                    # 获取当前订阅状态
-                    async with _global_lock:
-                        has_symbols = bool(subscribed_symbols)
-                        current_stock_connected = self.stock_connected
-                        current_option_connected = self.option_connected
-                    
-                    reconnection_needed = False
-                    
-                    # 检查股票连接
-                    if has_symbols and not current_stock_connected:
-                        if not self._stock_listener or self._stock_listener.done():
-                            logger.info("🔄 检测到股票WebSocket断开，正在重新连接...")
-                            try:
-                                await self._ensure_stock_connection()
-                                reconnection_needed = True
-                            except Exception as e:
-                                logger.error(f"❌ 股票WebSocket重连失败: {e}")
-                                consecutive_failures += 1
+                    if self._stock_should_reconnect() and not self._stock_reconnector.active:
+                        logger.info("🔄 检测到股票WebSocket断开，开始重连...")
+                        self._stock_reconnector.trigger(dropped=False)
                     
-                    # 检查期权连接
-                    if has_symbols and not current_option_connected:
-                        if not self._option_listener or self._option_listener.done():
-                            logger.info("🔄 检测到期权WebSocket断开，正在重新连接...")
-                            try:
-                                await self._ensure_option_connection()
-                                reconnection_needed = True
-                            except Exception as e:
-                                logger.error(f"❌ 期权WebSocket重连失败: {e}")
-                                consecutive_failures += 1
-                    
-                    # 如果重连成功，重置失败计数
-                    if reconnection_needed and (self.stock_connected or self.option_connected):
-                        consecutive_failures = 0
-                    
-                    # 如果连续失败太多次，增加等待时间
-                    if consecutive_failures >= max_failures:
-                        logger.warning(f"⚠️ 连续重连失败 {consecutive_failures} 次，等待更长时间")
-                        await asyncio.sleep(60)  # 等待1分钟后再试
-                        consecutive_failures = 0  # 重置计数
+                    for shard in list(self._option_shards.values()):
+                        if self._option_should_reconnect(shard) and not shard.reconnector.active:
+                            logger.info(f"🔄 检测到期权WebSocket断开[{shard.shard_id}]，开始重连...")
+                            shard.reconnector.trigger(dropped=False)
                             
                 except asyncio.CancelledError:
                     logger.info("🔄 重连管理器被取消")
                     break
                 except Exception as e:
                     logger.error(f"❌ 重连管理器异常: {e}")
-                    consecutive_failures += 1
-                    await asyncio.sleep(30)  # 发生异常时等待30秒
                     
         except asyncio.CancelledError:
             logger.info("🔄 重连管理器已停止")
@@ -572,204 +708,226 @@ class SingletonWebSocketManager:
             logger.info("🔄 重连管理器任务结束")
     
     async def _listen_stock_data(self):
-        """监听股票数据并广播给客户端 - 使用recv锁防止并发问题"""
+        """监听股票数据并广播给客户端 - 分阶段流水线：recv → 解析 → 扇出，阶段之间经有界队列衔接"""
         logger.info("🎧 开始监听股票数据")
+        dropped = False
         
         try:
-            while (self.stock_connected and self.stock_ws and not self._shutdown_event.is_set()):
-                try:
-                    # 使用recv锁确保同一时间只有一个协程在recv
-                    async with self._stock_recv_lock:
-                        if not self.stock_connected or not self.stock_ws:
-                            break
-                        message = await self.stock_ws.recv()
-                    
-                    # 解析数据
-                    try:
-                        data = json.loads(message)
-                    except json.JSONDecodeError as e:
-                        logger.warning(f"⚠️ 股票数据JSON解析失败: {e}")
-                        continue
-                    
-                    # 处理Timestamp对象并广播数据
-                    if isinstance(data, list):
-                        for item in data:
-                            if item:  # 确保数据不为空
-                                # 确保数据中的Timestamp对象被转换
-                                processed_item = convert_timestamps_to_strings(item)
-                                await self._broadcast_data(processed_item, "stock")
-                    else:
-                        if data:  # 确保数据不为空
-                            # 确保数据中的Timestamp对象被转换
-                            processed_data = convert_timestamps_to_strings(data)
-                            await self._broadcast_data(processed_data, "stock")
-                        
-                except websockets.exceptions.ConnectionClosed:
-                    logger.warning("📡 股票WebSocket连接断开")
-                    self.stock_connected = False
-                    break
-                except asyncio.CancelledError:
-                    logger.info("📡 股票数据监听任务被取消")
-                    break
-                except Exception as e:
-                    logger.error(f"❌ 股票数据处理异常: {e}")
-                    # 继续循环，不要因为单个消息错误而退出
-                    await asyncio.sleep(0.1)
-                    
+            await self._stock_pipeline.run(self._recv_stock)
+        except websockets.exceptions.ConnectionClosed:
+            logger.warning("📡 股票WebSocket连接断开")
+            dropped = True
         except asyncio.CancelledError:
             logger.info("📡 股票数据监听任务被取消")
         except Exception as e:
             logger.error(f"❌ 股票数据监听严重异常: {e}")
+            dropped = True
         finally:
             self.stock_connected = False
+            self._invalidate_cache(self._upstream_symbols["stock"])
             logger.info("📡 股票数据监听任务结束")
+        
+        # 断线立即重连（退避从数百毫秒开始）
+        if dropped and self._stock_should_reconnect():
+            self._stock_reconnector.trigger(self._stock_pipeline.last_frame_at)
     
-    async def _listen_option_data(self):
-        """监听期权数据并广播给客户端 - 使用recv锁防止并发问题"""
-        logger.info("🎧 开始监听期权数据")
+    async def _recv_stock(self):
+        """流水线recv阶段 - 使用recv锁确保同一时间只有一个协程在recv；连接已关闭时返回None"""
+        async with self._stock_recv_lock:
+            if not self.stock_connected or not self.stock_ws or self._shutdown_event.is_set():
+                return None
+            return await self.stock_ws.recv()
+    
+    async def _listen_option_data(self, shard: OptionShard):
+        """监听期权分片数据并广播给客户端 - 每个分片独立的流水线，共用扇出"""
+        logger.info(f"🎧 开始监听期权数据[{shard.shard_id}]")
+        dropped = False
         
         try:
-            while (self.option_connected and self.option_ws and not self._shutdown_event.is_set()):
-                try:
-                    # 使用recv锁确保同一时间只有一个协程在recv
-                    async with self._option_recv_lock:
-                        if not self.option_connected or not self.option_ws:
-                            break
-                        message = await self.option_ws.recv()
-                    
-                    # 尝试解析JSON或MessagePack
-                    try:
-                        data = json.loads(message)
-                    except (json.JSONDecodeError, UnicodeDecodeError):
-                        try:
-                            data = msgpack.unpackb(message)
-                        except Exception as e:
-                            logger.warning(f"⚠️ 期权数据解析失败: {e}")
-                            continue
-                    
-                    # 处理Timestamp对象并广播数据
-                    if isinstance(data, list):
-                        for item in data:
-                            if item:  # 确保数据不为空
-                                # 确保数据中的Timestamp对象被转换
-                                processed_item = convert_timestamps_to_strings(item)
-                                await self._broadcast_data(processed_item, "option")
-                    else:
-                        if data:  # 确保数据不为空
-                            # 确保数据中的Timestamp对象被转换
-                            processed_data = convert_timestamps_to_strings(data)
-                            await self._broadcast_data(processed_data, "option")
-                        
-                except websockets.exceptions.ConnectionClosed:
-                    logger.warning("📡 期权WebSocket连接断开")
-                    self.option_connected = False
-                    break
-                except asyncio.CancelledError:
-                    logger.info("📡 期权数据监听任务被取消")
-                    break
-                except Exception as e:
-                    logger.error(f"❌ 期权数据处理异常: {e}")
-                    # 继续循环，不要因为单个消息错误而退出
-                    await asyncio.sleep(0.1)
-                    
+            await shard.pipeline.run(lambda: self._recv_option(shard))
+        except websockets.exceptions.ConnectionClosed:
+            logger.warning(f"📡 期权WebSocket连接断开[{shard.shard_id}]")
+            shard.disconnects += 1
+            dropped = True
         except asyncio.CancelledError:
-            logger.info("📡 期权数据监听任务被取消")
+            logger.info(f"📡 期权数据监听任务被取消[{shard.shard_id}]")
         except Exception as e:
-            logger.error(f"❌ 期权数据监听严重异常: {e}")
+            logger.error(f"❌ 期权数据监听严重异常[{shard.shard_id}]: {e}")
+            dropped = True
         finally:
-            self.option_connected = False
-            logger.info("📡 期权数据监听任务结束")
-    
-    async def _broadcast_data(self, data: dict, data_type: str):
-        """广播数据给所有相关的客户端 - 线程安全"""
-        if not data or data.get("T") not in ["q", "t"]:  # 只处理报价(q)和交易(t)数据
-            return
+            shard.connected = False
+            self._invalidate_cache(shard.symbols)
+            logger.info(f"📡 期权数据监听任务结束[{shard.shard_id}]")
         
-        symbol = data.get("S")
-        if not symbol:
+        if dropped and self._option_should_reconnect(shard):
+            shard.reconnector.trigger(shard.pipeline.last_frame_at)
+    
+    async def _recv_option(self, shard: OptionShard):
+        """期权分片的流水线recv阶段"""
+        async with shard.recv_lock:
+            if not shard.connected or not shard.ws or self._shutdown_event.is_set():
+                return None
+            return await shard.ws.recv()
+    
+    async def _broadcast_message(self, message):
+        """流水线扇出阶段 - 为解析后的行情编号后发布（多worker）或直接扇出"""
+        tick_buffer.stamp(message)
+        if self.fanout is not None:
+            # 多worker模式：发布到Redis，由每个worker（包括本进程）各自扇出
+            self.fanout.publish(message)
             return
+        await self._fan_out(message)
+    
+    async def _fan_out(self, message):
+        """把一条出站消息入队给本进程中订阅该符号的客户端"""
+        # 更新最新值缓存（供订阅快照和REST报价使用）及补发缓冲区
+        last_value_cache.update(message)
+        tick_buffer.append(message)
         
-        # 构造广播消息
-        timestamp_value = data.get("t", datetime.now().isoformat())
-        # 确保timestamp是字符串格式
-        if hasattr(timestamp_value, '__str__') and not isinstance(timestamp_value, str):
-            timestamp_value = str(timestamp_value)
-        
-        broadcast_msg = {
-            "type": "quote" if data.get("T") == "q" else "trade",
-            "data_type": data_type,
-            "symbol": symbol,
-            "timestamp": timestamp_value
-        }
-        
-        def safe_get_value(data, key, default=None):
-            """安全获取值，确保Timestamp对象被转换为字符串"""
-            value = data.get(key, default)
-            if hasattr(value, '__str__') and not isinstance(value, (str, int, float, type(None))):
-                return str(value)
-            return value
-        
-        if data.get("T") == "q":  # 报价数据
-            broadcast_msg.update({
-                "bid_price": safe_get_value(data, "bp"),
-                "ask_price": safe_get_value(data, "ap"),
-                "bid_size": safe_get_value(data, "bs"),
-                "ask_size": safe_get_value(data, "as")
-            })
-        else:  # 交易数据
-            broadcast_msg.update({
-                "price": safe_get_value(data, "p"),
-                "size": safe_get_value(data, "s")
-            })
-        
-        # 获取需要广播的客户端列表（在锁内快速获取快照）
-        clients_to_notify = []
-        async with _global_lock:
-            for client_id, websocket in active_connections.items():
-                if symbol in client_subscriptions.get(client_id, set()):
-                    clients_to_notify.append((client_id, websocket))
+        # 成交聚合为K线，收盘的K线推送给该符号的订阅者
+        if isinstance(message, TradeMessage):
+            for bar in bar_aggregator.add_trade(message):
+                await self._send_bar(bar)
+            self._ensure_bar_timer()
         
-        # 在锁外进行实际的广播操作
+        # 无锁读取该符号的订阅者快照 - O(订阅者数)，无订阅者时直接返回
+        symbol = message.symbol
+        clients_to_notify = subscription_registry.subscribers(symbol)
         if not clients_to_notify:
             return
         
-        # 确保所有Timestamp对象转换为字符串，防止JSON序列化错误
-        serializable_msg = convert_timestamps_to_strings(broadcast_msg)
-        message_json = json.dumps(serializable_msg)
-        disconnected_clients = []
+        kind = QUOTE if isinstance(message, QuoteMessage) else TRADE
+        await self._deliver(clients_to_notify, kind, symbol, message)
+    
+    async def _send_bar(self, bar):
+        """把收盘的K线入队给订阅该符号的客户端"""
+        clients_to_notify = subscription_registry.subscribers(bar.symbol)
+        if clients_to_notify:
+            await self._deliver(clients_to_notify, TRADE, bar.symbol, bar)
+    
+    async def _deliver(self, clients_to_notify, kind: str, symbol: str, message):
+        """入队一条出站消息 - 每种下行格式（JSON/msgpack）只编码一次，所有订阅者共享"""
+        message_json = None
+        message_packed = None
+        dropped_clients = []
+        for client_id, session in clients_to_notify:
+            if session.binary:
+                if message_packed is None:
+                    message_packed = encode_compact(message)
+                payload = message_packed
+            else:
+                if message_json is None:
+                    message_json = encode_message(message).decode()
+                payload = message_json
+            
+            # 只入队不等待发送 - 每个客户端由自己的写任务发送，慢客户端不会阻塞上游接收
+            # 设置了订阅选项（限频/变动阈值/类型）的客户端先过滤
+            accepted = (session.offer(kind, symbol, payload, message) if session.options
+                        else session.enqueue(kind, symbol, payload))
+            if not accepted:
+                dropped_clients.append((client_id, session))
         
-        # 并发发送消息给所有客户端
-        async def send_to_client(client_id: str, websocket: WebSocket):
-            try:
-                await websocket.send_text(message_json)
-            except Exception as e:
-                logger.debug(f"❌ 发送数据给客户端 {client_id} 失败: {e}")
-                return client_id
-            return None
+        # 清理已断开或落后过多的客户端
+        for client_id, session in dropped_clients:
+            await self._drop_client(client_id, session)
+    
+    def _ensure_bar_timer(self):
+        if self._bar_task is None or self._bar_task.done():
+            if not self._shutdown_event.is_set():
+                self._bar_task = asyncio.get_running_loop().create_task(self._bar_close_loop())
+    
+    async def _bar_close_loop(self):
+        """定时关闭到期的K线 - 成交稀少的符号不必等待下一笔成交"""
+        try:
+            while not self._shutdown_event.is_set():
+                await asyncio.sleep(0.5)
+                for bar in bar_aggregator.close_due():
+                    await self._send_bar(bar)
+        except asyncio.CancelledError:
+            pass
+        except Exception as e:
+            logger.error(f"❌ K线定时收盘异常: {e}")
+    
+    def _invalidate_cache(self, symbols: Set[str]):
+        """上游不再推送的符号从最新值缓存中移除（redis模式下通知所有worker）"""
+        if not symbols:
+            return
+        if self.fanout is not None:
+            self.fanout.publish_invalidate(symbols)
+        else:
+            self._drop_symbol_state(symbols)
+    
+    def _drop_symbol_state(self, symbols):
+        """移除符号的最新值缓存和K线（数据出现断档）"""
+        last_value_cache.invalidate(symbols)
+        bar_aggregator.invalidate(symbols)
+    
+    def _owns_upstream(self) -> bool:
+        """本进程是否负责上游Alpaca连接（本地模式总是，redis模式仅leader）"""
+        return self.fanout is None or self.fanout.is_leader
+    
+    async def start_fanout(self):
+        """按配置启动多worker扇出；Redis不可用时退回本地模式（每个worker各自连接上游）"""
+        config = load_fanout_config()
+        if config.mode != "redis":
+            return
         
-        # 使用gather进行并发发送，但限制并发数避免过载
-        batch_size = 50  # 限制并发发送的客户端数量
-        for i in range(0, len(clients_to_notify), batch_size):
-            batch = clients_to_notify[i:i + batch_size]
-            tasks = [send_to_client(client_id, websocket) for client_id, websocket in batch]
-            
-            try:
-                results = await asyncio.gather(*tasks, return_exceptions=True)
-                for result in results:
-                    if isinstance(result, str):  # 返回了client_id，表示发送失败
-                        disconnected_clients.append(result)
-            except Exception as e:
-                logger.error(f"❌ 批量发送数据异常: {e}")
+        fanout = RedisFanout(config)
+        fanout.on_message = self._fan_out
+        fanout.on_invalidate = self._drop_symbol_state
+        fanout.on_demand_changed = self._schedule_subscription_sync
+        fanout.on_leadership_changed = self._on_leadership_changed
+        self.fanout = fanout
+        try:
+            await fanout.start()
+        except Exception as e:
+            logger.warning(f"⚠️ WebSocket多worker扇出启动失败，使用本地模式: {e}")
+            self.fanout = None
+            return
+        # 上报本worker已有的订阅需求
+        self._schedule_subscription_sync()
+    
+    async def stop_fanout(self):
+        """释放leader租约并撤回本worker的订阅需求（应用关闭时调用）"""
+        if self.fanout is None:
+            return
+        fanout, self.fanout = self.fanout, None
+        was_leader = fanout.is_leader
+        await fanout.stop()
+        if was_leader:
+            await self._cleanup_stock_connection()
+            await self._cleanup_option_connection()
+    
+    async def _on_leadership_changed(self, is_leader: bool):
+        """成为leader时按集群需求建立上游订阅；失去leader时断开上游，由新leader接管"""
+        if is_leader:
+            if not self._stock_account or not self._option_shards:
+                try:
+                    await self._load_dedicated_accounts()
+                except Exception as e:
+                    logger.error(f"❌ leader加载专用WebSocket账户失败: {e}")
+                    return
+            self._schedule_subscription_sync()
+        else:
+            self._cluster_symbols = set()
+            self._stock_desired = set()
+            for shard in self._option_shards.values():
+                shard.desired = set()
+            await self._cleanup_stock_connection()
+            await self._cleanup_option_connection()
+    
+    async def _drop_client(self, client_id: str, session: ClientSession):
+        """移除客户端订阅并在后台关闭其连接"""
+        if session.close_reason and session.close_reason.startswith("slow consumer"):
+            self.slow_consumer_disconnects += 1
+            logger.warning(f"🐢 断开慢客户端 {client_id}: {session.close_reason}")
         
-        # 清理断开的客户端
-        if disconnected_clients:
-            async with _global_lock:
-                for client_id in disconnected_clients:
-                    active_connections.pop(client_id, None)
-            
-            # 在锁外移除订阅
-            for client_id in disconnected_clients:
-                await self.remove_client_subscription(client_id)
+        await self.remove_client_subscription(client_id)
+        
+        # 关闭可能耗时（对端无响应），不阻塞广播
+        task = asyncio.get_running_loop().create_task(session.close(reason=session.close_reason))
+        self._close_tasks.add(task)
+        task.add_done_callback(self._close_tasks.discard)
     
     async def shutdown(self):
         """关闭所有连接 - 优雅关闭"""
@@ -785,11 +943,25 @@ class SingletonWebSocketManager:
             if self._reconnection_task and not self._reconnection_task.done():
                 tasks_to_cancel.append(self._reconnection_task)
             
+            if self._subscription_sync_task and not self._subscription_sync_task.done():
+                tasks_to_cancel.append(self._subscription_sync_task)
+            
+            # 先释放leader租约，其他worker可立即接管上游
+            await self.stop_fanout()
+            
+            if self._bar_task and not self._bar_task.done():
+                tasks_to_cancel.append(self._bar_task)
+            
+            await self._stock_reconnector.stop()
+            for shard in self._option_shards.values():
+                await shard.reconnector.stop()
+            
             if self._stock_listener and not self._stock_listener.done():
                 tasks_to_cancel.append(self._stock_listener)
                 
-            if self._option_listener and not self._option_listener.done():
-                tasks_to_cancel.append(self._option_listener)
+            for shard in self._option_shards.values():
+                if shard.listener and not shard.listener.done():
+                    tasks_to_cancel.append(shard.listener)
             
             # 取消所有任务
             for task in tasks_to_cancel:
@@ -799,10 +971,20 @@ class SingletonWebSocketManager:
             if tasks_to_cancel:
                 await asyncio.gather(*tasks_to_cancel, return_exceptions=True)
             
+            # 关闭所有客户端会话
+            sessions = list(subscription_registry.connections.values())
+            if sessions:
+                await asyncio.gather(*(session.close(code=1001, reason="server shutdown") for session in sessions),
+                                     return_exceptions=True)
+            
             # 清理连接
             await self._cleanup_stock_connection()
             await self._cleanup_option_connection()
             
+            if self._option_decode_executor is not None:
+                self._option_decode_executor.shutdown(wait=False, cancel_futures=True)
+                self._option_decode_executor = None
+            
         except Exception as e:
             logger.error(f"❌ 关闭WebSocket管理器异常: {e}")
         
@@ -811,6 +993,51 @@ class SingletonWebSocketManager:
 # 全局单例实例
 ws_manager = SingletonWebSocketManager()
 
+
+def collect_ws_metrics():
+    """/metrics 抓取时读取WebSocket各组件已有的统计（热路径上不增加开销）"""
+    clients = MetricFamily("ws_clients", "gauge", "Connected WebSocket clients")
+    clients.add(None, subscription_registry.client_count)
+    pending = MetricFamily("ws_client_pending_messages", "gauge", "Messages queued for WebSocket clients")
+    pending.add(None, sum(len(session._pending) for session in list(subscription_registry.connections.values())))
+    slow_consumers = MetricFamily("ws_slow_consumer_disconnects_total", "counter",
+                                  "Clients disconnected for falling behind")
+    slow_consumers.add(None, ws_manager.slow_consumer_disconnects)
+    cache = MetricFamily("ws_quote_cache_lookups_total", "counter",
+                         "REST quote lookups answered from the streamed last-value cache")
+    cache.add({"result": "hit"}, last_value_cache.hits)
+    cache.add({"result": "miss"}, last_value_cache.misses)
+
+    connected = MetricFamily("ws_upstream_connected", "gauge", "Upstream Alpaca stream connected")
+    frames = MetricFamily("ws_upstream_frames_total", "counter", "Frames received from Alpaca streams")
+    ticks = MetricFamily("ws_upstream_ticks_total", "counter", "Ticks decoded and fanned out from Alpaca streams")
+    decode_errors = MetricFamily("ws_upstream_decode_errors_total", "counter", "Upstream frames that failed to decode")
+    recv_stalls = MetricFamily("ws_upstream_recv_stalls_total", "counter",
+                               "Times the recv stage waited on a full raw frame queue")
+    stages = MetricFamily("ws_pipeline_stage_seconds", "histogram", "Upstream feed pipeline latency by stage")
+    reconnects = MetricFamily("ws_upstream_reconnects_total", "counter", "Upstream stream reconnects")
+    feeds = [("stock", ws_manager.stock_connected, ws_manager._stock_pipeline, ws_manager._stock_reconnector)]
+    feeds += [(shard_id, shard.connected, shard.pipeline, shard.reconnector)
+              for shard_id, shard in list(ws_manager._option_shards.items())]
+    for feed, is_connected, pipeline, reconnector in feeds:
+        labels = {"feed": feed}
+        connected.add(labels, 1 if is_connected else 0)
+        if reconnector is not None:
+            reconnects.add(labels, reconnector.reconnects)
+        if pipeline is None:
+            continue
+        frames.add(labels, pipeline.frames)
+        ticks.add(labels, pipeline.ticks)
+        decode_errors.add(labels, pipeline.decode_errors)
+        recv_stalls.add(labels, pipeline.recv_stalls)
+        for stage, histogram in pipeline.latency.items():
+            stages.add({"feed": feed, "stage": stage}, histogram)
+    return [clients, pending, slow_consumers, cache, connected, frames, ticks, decode_errors, recv_stalls,
+            stages, reconnects]
+
+
+REGISTRY.register_collector("websocket", collect_ws_metrics)
+
 # 默认测试符号
 DEFAULT_STOCKS = [
     "AAPL", "TSLA", "GOOGL", "MSFT", "AMZN", "NVDA", "META", "SPY",
@@ -825,6 +1052,16 @@ DEFAULT_OPTIONS = [
     "NVDA250808C00140000"    # NVDA Call $140 2025-08-08
 ]
 
+def _parse_resume_from(value) -> Optional[int]:
+    """解析客户端的resume_from序号，无效值视为未提供"""
+    if value is None or value == "":
+        return None
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        logger.warning(f"忽略无效的resume_from: {value!r}")
+        return None
+
 @ws_router.websocket("/market-data")
 async def websocket_market_data(websocket: WebSocket):
     """WebSocket端点 - 实时市场数据（单例架构）- 内网免认证，外网JWT认证 - 线程安全"""
@@ -837,6 +1074,15 @@ async def websocket_market_data(websocket: WebSocket):
     token = None
     user_info = None
     
+    # 重连客户端可携带最后收到的seq，补发断线期间的行情
+    resume_from = _parse_resume_from(websocket.query_params.get("resume_from"))
+    # 下行格式协商：默认JSON文本帧，?format=msgpack为紧凑字段的批量二进制帧
+    message_format = websocket.query_params.get("format", "json").lower()
+    if message_format not in MESSAGE_FORMATS:
+        await websocket.close(code=4003, reason=f"Unsupported format: {message_format}")
+        logger.warning(f"WebSocket连接被拒绝: 不支持的格式 {message_format}")
+        return
+    
     try:
         # 内网访问无需JWT认证
         if is_internal:
@@ -882,9 +1128,10 @@ async def websocket_market_data(websocket: WebSocket):
             await websocket.accept()
             client_id = f"{user_info.get('username', 'unknown')}_{datetime.now().timestamp()}"
         
-        # 线程安全地添加连接
-        async with _global_lock:
-            active_connections[client_id] = websocket
+        # 注册客户端连接 - 每个客户端有自己的发送队列和写任务
+        session = ClientSession(client_id, websocket, client_queue_config, message_format)
+        session.start()
+        subscription_registry.add_client(client_id, session)
         
         logger.info(f"🔗 WebSocket客户端连接成功: {client_id} (用户: {user_info.get('username')}, 账户: {user_info.get('alpaca_account')}, 访问类型: {'内网' if is_internal else '外网'})")
             
@@ -906,21 +1153,22 @@ async def websocket_market_data(websocket: WebSocket):
             },
             "default_stocks": DEFAULT_STOCKS,
             "default_options": DEFAULT_OPTIONS,
+            "last_seq": tick_buffer.last_seq,
+            "format": message_format,
             "architecture": "singleton",
             "features": {
                 "single_stock_connection": True,
-                "single_option_connection": True,
+                "sharded_option_connections": True,
                 "dynamic_subscription_management": True,
                 "broadcast_to_all_clients": True,
                 "jwt_authenticated": True,
                 "open_to_all_users": True
             }
         }
-        await websocket.send_text(json.dumps(welcome_message))
+        session.send_message(welcome_message)
         
         # 自动订阅默认符号 - 线程安全检查
-        async with _global_lock:
-            is_first_client = len(client_subscriptions) == 0
+        is_first_client = subscription_registry.subscribed_client_count == 0
             
         if is_first_client:  # 第一个客户端
             logger.info(f"🎯 首个客户端，自动订阅默认符号: {client_id}")
@@ -932,9 +1180,8 @@ async def websocket_market_data(websocket: WebSocket):
         await ws_manager.add_client_subscription(client_id, all_symbols)
         
         # 发送订阅成功消息 - 线程安全获取状态
-        async with _global_lock:
-            subscribed_symbols_list = list(client_subscriptions.get(client_id, []))
-            total_clients = len(active_connections)
+        subscribed_symbols_list = list(subscription_registry.client_symbols(client_id))
+        total_clients = subscription_registry.client_count
             
         subscription_message = {
             "type": "subscription_success",
@@ -944,7 +1191,8 @@ async def websocket_market_data(websocket: WebSocket):
             "message": "成功订阅实时数据流",
             "status": "active"
         }
-        await websocket.send_text(json.dumps(subscription_message))
+        session.send_message(subscription_message)
+        ws_manager.send_snapshot(client_id, all_symbols, resume_from)
         
         # 保持连接并处理客户端消息
         while True:
@@ -954,35 +1202,48 @@ async def websocket_market_data(websocket: WebSocket):
                 message = json.loads(data)
                 
                 if message.get("type") == "subscribe":
-                    # 添加新的订阅
+                    # 添加新的订阅（可带options：max_rate/min_change/quotes/trades/bars，作用于本次的符号）
                     new_symbols = message.get("symbols", [])
+                    try:
+                        options = SubscriptionOptions.from_message(message.get("options"))
+                    except ValueError as e:
+                        session.send_message({
+                            "type": "error",
+                            "client_id": client_id,
+                            "message": f"Invalid subscription options: {e}"
+                        })
+                        continue
                     if new_symbols:
                         await ws_manager.add_client_subscription(client_id, new_symbols)
+                        session.set_options(new_symbols, options)
                         
-                        # 线程安全获取订阅数量
-                        async with _global_lock:
-                            total_subscribed = len(client_subscriptions.get(client_id, []))
+                        total_subscribed = len(subscription_registry.client_symbols(client_id))
                             
                         response = {
                             "type": "subscription_update",
                             "client_id": client_id,
                             "added_symbols": new_symbols,
+                            "options": asdict(options) if options else None,
                             "total_subscribed": total_subscribed
                         }
-                        await websocket.send_text(json.dumps(response))
+                        session.send_message(response)
+                        ws_manager.send_snapshot(client_id, new_symbols, _parse_resume_from(message.get("resume_from")))
                         
                 elif message.get("type") == "unsubscribe":
-                    # 取消订阅（TODO: 实现具体的取消订阅逻辑）
+                    # 取消订阅 - 引用计数降为0的符号才会向上游发送unsubscribe
+                    removed_symbols = await ws_manager.remove_client_symbols(client_id, message.get("symbols", []))
+                    session.set_options(removed_symbols, None)
                     response = {
                         "type": "unsubscribe_ack",
-                        "message": "取消订阅功能正在开发中"
+                        "client_id": client_id,
+                        "removed_symbols": sorted(removed_symbols),
+                        "total_subscribed": len(subscription_registry.client_symbols(client_id))
                     }
-                    await websocket.send_text(json.dumps(response))
+                    session.send_message(response)
                         
                 elif message.get("type") == "ping":
-                    # 心跳检测 - 线程安全获取状态
-                    async with _global_lock:
-                        total_clients = len(active_connections)
+                    # 心跳检测
+                    total_clients = subscription_registry.client_count
                         
                     pong_message = {
                         "type": "pong",
@@ -994,7 +1255,7 @@ async def websocket_market_data(websocket: WebSocket):
                             "total_clients": total_clients
                         }
                     }
-                    await websocket.send_text(json.dumps(pong_message))
+                    session.send_message(pong_message)
                     
             except WebSocketDisconnect:
                 break
@@ -1007,13 +1268,10 @@ async def websocket_market_data(websocket: WebSocket):
     except Exception as e:
         logger.error(f"❌ WebSocket连接异常 {client_id}: {e}")
     finally:
-        # 线程安全地清理连接和订阅
+        # 清理连接和订阅
         try:
-            async with _global_lock:
-                active_connections.pop(client_id, None)
-            
-            # 在锁外移除订阅
             await ws_manager.remove_client_subscription(client_id)
+            await session.close(code=1000, reason="client disconnected")
             logger.info(f"🧹 清理客户端连接和订阅: {client_id}")
         except Exception as e:
             logger.error(f"❌ 清理客户端连接异常 {client_id}: {e}")
@@ -1021,11 +1279,14 @@ async def websocket_market_data(websocket: WebSocket):
 @ws_router.get("/status")
 async def websocket_status():
     """WebSocket状态端点 - 线程安全"""
-    async with _global_lock:
-        active_connections_count = len(active_connections)
-        client_subscriptions_count = len(client_subscriptions)
-        total_subscribed = len(subscribed_symbols)
-        subscribed_symbols_list = list(subscribed_symbols)
+    subscribed_symbols = subscription_registry.symbols()
+    client_queue_stats = {
+        client_id: session.get_stats() for client_id, session in subscription_registry.connections.items()
+    }
+    active_connections_count = subscription_registry.client_count
+    client_subscriptions_count = subscription_registry.subscribed_client_count
+    total_subscribed = len(subscribed_symbols)
+    subscribed_symbols_list = list(subscribed_symbols)
     
     return {
         "service": "WebSocket Manager",
@@ -1033,12 +1294,40 @@ async def websocket_status():
         "connections": {
             "stock_connected": ws_manager.stock_connected,
             "option_connected": ws_manager.option_connected,
-            "total_alpaca_connections": (1 if ws_manager.stock_connected else 0) + (1 if ws_manager.option_connected else 0)
+            "total_alpaca_connections": (1 if ws_manager.stock_connected else 0) + sum(
+                shard.connected for shard in ws_manager._option_shards.values()),
+            "option_shards": {shard_id: shard.get_stats() for shard_id, shard in ws_manager._option_shards.items()}
         },
+        "stock_pipeline": ws_manager._stock_pipeline.get_stats(),
+        "stock_reconnect": ws_manager._stock_reconnector.get_stats(),
         "clients": {
             "active_connections": active_connections_count,
             "client_subscriptions": client_subscriptions_count
         },
+        "subscription_index": subscription_registry.get_stats(),
+        "last_value_cache": last_value_cache.get_stats(),
+        "tick_buffer": tick_buffer.get_stats(),
+        "bars": bar_aggregator.get_stats(),
+        "fanout": ws_manager.fanout.get_stats() if ws_manager.fanout else {"mode": "local"},
+        "upstream_subscriptions": {
+            "stock_symbols": len(ws_manager._upstream_symbols["stock"]),
+            "option_symbols": len(ws_manager._upstream_symbols["option"]),
+            "debounce_seconds": ws_manager.subscription_debounce_seconds,
+            **ws_manager.subscription_stats
+        },
+        "client_queues": {
+            "config": {
+                "max_pending": client_queue_config.max_pending,
+                "trade_policy": client_queue_config.trade_policy,
+                "max_lag_seconds": client_queue_config.max_lag_seconds
+            },
+            "slow_consumer_disconnects": ws_manager.slow_consumer_disconnects,
+            "max_lag_seconds": round(max((stats["lag_seconds"] for stats in client_queue_stats.values()), default=0.0), 3),
+            "total_pending": sum(stats["pending"] for stats in client_queue_stats.values()),
+            "total_conflated_quotes": sum(stats["conflated_quotes"] for stats in client_queue_stats.values()),
+            "total_dropped": sum(stats["dropped_quotes"] + stats["dropped_trades"] for stats in client_queue_stats.values()),
+            "clients": client_queue_stats
+        },
         "symbols": {
             "total_subscribed": total_subscribed,
             "subscribed_symbols": subscribed_symbols_list
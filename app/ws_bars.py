@@ -0,0 +1,309 @@
+"""
+Streaming OHLCV bar aggregation from the WebSocket trade stream
+Builds 1s/5s/1m bars per streamed symbol with incremental VWAP, emits each bar when it closes and
+keeps a rolling window so REST can serve today's intraday bars without calling Alpaca
+"""
+
+import time
+from collections import deque
+from datetime import datetime, timezone
+from typing import Any, Deque, Dict, Iterable, List, Optional, Tuple
+
+import arrow
+
+from config import settings
+from app.ws_encoding import BarMessage, TradeMessage
+
+
+# Interval name -> seconds
+INTERVALS = {"1s": 1, "5s": 5, "1m": 60}
+
+_INTERVAL_NAMES = tuple(INTERVALS)
+_INTERVAL_SECONDS = tuple(INTERVALS.values())
+
+# REST timeframes that can be rolled up from 1m bars -> minutes
+REST_TIMEFRAMES = {"1Min": 1, "5Min": 5, "15Min": 15, "1Hour": 60}
+
+
+class _Bar:
+    """Bar under construction (or closed, in the history window)"""
+    __slots__ = ("start", "open", "high", "low", "close", "volume", "trade_count", "notional")
+
+    def __init__(self, start: int, price: float, size: float):
+        self.start = start
+        self.open = self.high = self.low = self.close = price
+        self.volume = size
+        self.trade_count = 1
+        self.notional = price * size
+
+    def add(self, price: float, size: float, is_last: bool = True):
+        if price > self.high:
+            self.high = price
+        if price < self.low:
+            self.low = price
+        if is_last:
+            self.close = price
+        self.volume += size
+        self.trade_count += 1
+        self.notional += price * size
+
+    @property
+    def vwap(self) -> float:
+        return self.notional / self.volume if self.volume else self.close
+
+
+def _trade_time(timestamp: Any) -> float:
+    """Exchange timestamp of a trade in epoch seconds (arrival time if it cannot be parsed)"""
+    if isinstance(timestamp, datetime):
+        return timestamp.timestamp()
+    if isinstance(timestamp, str):
+        try:
+            return datetime.fromisoformat(timestamp.replace("Z", "+00:00")).timestamp()
+        except ValueError:
+            pass
+    return time.time()
+
+
+def _utc_iso(epoch_seconds: int) -> str:
+    return datetime.fromtimestamp(epoch_seconds, tz=timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ")
+
+
+class BarAggregator:
+    """
+    Per-symbol bar builder for every configured interval
+
+    Bars are bucketed by trade time and close when a later trade arrives or, for quiet symbols,
+    once the wall clock passes the bar end plus close_delay_seconds. A trade for a bar that has
+    already closed still updates the stored bar (REST stays exact) but is not re-sent.
+    Intervals without trades produce no bar, as in Alpaca's bar data.
+    """
+
+    def __init__(self, enabled: bool = True, history: Optional[Dict[str, int]] = None,
+                 close_delay_seconds: float = 1.0):
+        self.enabled = enabled
+        self.history = {"1s": 300, "5s": 720, "1m": 960}
+        self.history.update({k: int(v) for k, v in (history or {}).items() if k in INTERVALS})
+        self.close_delay_seconds = close_delay_seconds
+
+        # symbol -> open bar per interval (in INTERVALS order)
+        self._open: Dict[str, List[Optional[_Bar]]] = {}
+        self._closed: Dict[Tuple[str, str], Deque[_Bar]] = {}
+        # Earliest time each symbol's 1m history is complete from (streamed since, or last eviction)
+        self._covered_since: Dict[str, float] = {}
+        self._data_types: Dict[str, str] = {}
+
+        self.trades = 0
+        self.late_trades = 0
+        self.bars_closed = 0
+        self.rest_hits = 0
+        self.rest_misses = 0
+
+    @classmethod
+    def from_settings(cls) -> "BarAggregator":
+        websocket_settings = getattr(settings, 'websocket', None)
+        bar_settings = websocket_settings.get('bars') if isinstance(websocket_settings, dict) else None
+        if not isinstance(bar_settings, dict):
+            return cls()
+        return cls(
+            enabled=bool(bar_settings.get('enabled', True)),
+            history=bar_settings.get('history') if isinstance(bar_settings.get('history'), dict) else None,
+            close_delay_seconds=float(bar_settings.get('close_delay_seconds', 1.0))
+        )
+
+    def add_trade(self, trade: TradeMessage) -> List[BarMessage]:
+        """Fold a trade into every interval; returns the bars this trade closed"""
+        if not self.enabled or trade.price is None:
+            return []
+        price = float(trade.price)
+        size = float(trade.size or 0)
+        trade_time = _trade_time(trade.timestamp)
+        symbol = trade.symbol
+        self.trades += 1
+        if symbol not in self._covered_since:
+            self._covered_since[symbol] = trade_time
+            self._data_types[symbol] = trade.data_type
+
+        bars = self._open.get(symbol)
+        if bars is None:
+            bars = self._open[symbol] = [None] * len(_INTERVAL_SECONDS)
+
+        closed = []
+        for index, seconds in enumerate(_INTERVAL_SECONDS):
+            start = int(trade_time // seconds) * seconds
+            bar = bars[index]
+            if bar is not None and start == bar.start:
+                bar.add(price, size)
+                continue
+            key = (symbol, _INTERVAL_NAMES[index])
+            if bar is None:
+                window = self._closed.get(key)
+                if window and window[-1].start >= start:
+                    # Bar already closed by the timer
+                    self._add_late(key, start, price, size)
+                else:
+                    bars[index] = _Bar(start, price, size)
+            elif start > bar.start:
+                closed.append(self._close(key, bar))
+                bars[index] = _Bar(start, price, size)
+            else:
+                self._add_late(key, start, price, size)
+        return closed
+
+    def _add_late(self, key: Tuple[str, str], start: int, price: float, size: float):
+        if key[1] == "1m":
+            self.late_trades += 1
+        for bar in reversed(self._closed.get(key, ())):
+            if bar.start == start:
+                bar.add(price, size, is_last=False)
+                return
+            if bar.start < start:
+                break
+
+    def _close(self, key: Tuple[str, str], bar: _Bar) -> BarMessage:
+        symbol, interval = key
+        window = self._closed.get(key)
+        if window is None:
+            window = self._closed[key] = deque(maxlen=self.history[interval] or None)
+        if interval == "1m" and window.maxlen and len(window) == window.maxlen:
+            # The oldest bar is evicted: history is complete only from the next one
+            self._covered_since[symbol] = window[0].start + INTERVALS[interval]
+        window.append(bar)
+        self.bars_closed += 1
+        return BarMessage(
+            type="bar",
+            data_type=self._data_types.get(symbol, "stock"),
+            symbol=symbol,
+            interval=interval,
+            timestamp=_utc_iso(bar.start),
+            open=bar.open,
+            high=bar.high,
+            low=bar.low,
+            close=bar.close,
+            volume=bar.volume,
+            trade_count=bar.trade_count,
+            vwap=round(bar.vwap, 6)
+        )
+
+    def close_due(self, now: Optional[float] = None) -> List[BarMessage]:
+        """Close open bars whose interval ended at least close_delay_seconds ago"""
+        now = time.time() if now is None else now
+        closed = []
+        for symbol, bars in self._open.items():
+            for index, bar in enumerate(bars):
+                if bar is not None and bar.start + _INTERVAL_SECONDS[index] + self.close_delay_seconds <= now:
+                    bars[index] = None
+                    closed.append(self._close((symbol, _INTERVAL_NAMES[index]), bar))
+        return closed
+
+    def invalidate(self, symbols: Iterable[str]):
+        """Drop bars of symbols no longer streamed - their history has a gap from now on"""
+        for symbol in symbols:
+            self._covered_since.pop(symbol, None)
+            self._data_types.pop(symbol, None)
+            self._open.pop(symbol, None)
+            for interval in INTERVALS:
+                self._closed.pop((symbol, interval), None)
+
+    def clear(self):
+        self._open.clear()
+        self._closed.clear()
+        self._covered_since.clear()
+        self._data_types.clear()
+
+    def intraday_bars(self, symbol: str, timeframe: str, limit: int,
+                      start_date: Optional[str] = None, end_date: Optional[str] = None) -> Optional[Dict[str, Any]]:
+        """
+        Today's closed bars in the REST get_stock_bars shape, or None when memory cannot answer
+
+        Answers only requests for today's date (US/Eastern) in a minute/hour timeframe, for a
+        symbol streamed without interruption since the configured market open. The caller must
+        check the stock stream's feed matches the REST feed the request would use (see
+        PooledAlpacaClient.get_stock_bars).
+        """
+        minutes = REST_TIMEFRAMES.get(timeframe)
+        today = arrow.now('US/Eastern')
+        today_str = today.format('YYYY-MM-DD')
+        if (not self.enabled or minutes is None or start_date != today_str
+                or (end_date and end_date != today_str)):
+            return None
+
+        market = getattr(settings, 'market_config', None) or {}
+        market_open = today.replace(hour=market.get('open_hour', 8), minute=market.get('open_minute', 50),
+                                    second=0, microsecond=0).timestamp()
+        covered_since = self._covered_since.get(symbol)
+        if covered_since is None or covered_since > market_open:
+            self.rest_misses += 1
+            return None
+
+        from app.alpaca_client import convert_utc_to_eastern
+
+        day_start = today.floor('day').timestamp()
+        bars = []
+        for bar in self._rollup(self._closed.get((symbol, "1m"), ()), minutes * 60):
+            if bar.start < day_start:
+                continue
+            bars.append({
+                "timestamp": convert_utc_to_eastern(_utc_iso(bar.start)),
+                "open": bar.open,
+                "high": bar.high,
+                "low": bar.low,
+                "close": bar.close,
+                "volume": bar.volume,
+                "trade_count": bar.trade_count,
+                "vwap": round(bar.vwap, 6)
+            })
+            if len(bars) >= limit:
+                break
+
+        self.rest_hits += 1
+        return {
+            "symbol": symbol,
+            "timeframe": timeframe,
+            "start_date": start_date,
+            "end_date": end_date or today_str,
+            "bars_count": len(bars),
+            "bars": bars,
+            "source": "stream"
+        }
+
+    @staticmethod
+    def _rollup(bars: Iterable[_Bar], seconds: int) -> List[_Bar]:
+        """Combine consecutive 1m bars into seconds-long bars"""
+        if seconds == 60:
+            return list(bars)
+        combined: List[_Bar] = []
+        for bar in bars:
+            start = bar.start // seconds * seconds
+            if combined and combined[-1].start == start:
+                target = combined[-1]
+                target.high = max(target.high, bar.high)
+                target.low = min(target.low, bar.low)
+                target.close = bar.close
+                target.volume += bar.volume
+                target.trade_count += bar.trade_count
+                target.notional += bar.notional
+            else:
+                target = _Bar(start, bar.open, 0)
+                target.high, target.low, target.close = bar.high, bar.low, bar.close
+                target.volume, target.trade_count, target.notional = bar.volume, bar.trade_count, bar.notional
+                combined.append(target)
+        return combined
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Get aggregator statistics"""
+        return {
+            "enabled": self.enabled,
+            "intervals": list(INTERVALS),
+            "history": self.history,
+            "symbols": len(self._covered_since),
+            "open_bars": sum(bar is not None for bars in self._open.values() for bar in bars),
+            "trades": self.trades,
+            "late_trades": self.late_trades,
+            "bars_closed": self.bars_closed,
+            "rest_hits": self.rest_hits,
+            "rest_misses": self.rest_misses
+        }
+
+
+# Global bar aggregator
+bar_aggregator = BarAggregator.from_settings()
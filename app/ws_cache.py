@@ -0,0 +1,133 @@
+"""
+Last-value cache of WebSocket market data
+Latest quote and trade per symbol, maintained by the upstream listeners; used for
+snapshot-on-subscribe and to answer REST quote requests without calling Alpaca
+"""
+
+import time
+from typing import Any, Dict, Iterable, Optional, Tuple
+
+from config import settings
+from app.ws_encoding import QuoteMessage, TradeMessage
+
+
+# Alpaca stream endpoints (overridable with websocket.stock_url / option_url); the last path segment is the feed
+STOCK_STREAM_URL = "wss://stream.data.alpaca.markets/v2/iex"
+OPTION_STREAM_URL = "wss://stream.data.alpaca.markets/v1beta1/indicative"
+
+
+def stream_url(is_option: bool = False) -> str:
+    """Configured upstream stream endpoint for stocks or options"""
+    websocket_settings = getattr(settings, 'websocket', None)
+    configured = None
+    if isinstance(websocket_settings, dict):
+        configured = websocket_settings.get('option_url' if is_option else 'stock_url')
+    return configured or (OPTION_STREAM_URL if is_option else STOCK_STREAM_URL)
+
+
+def stream_feed(is_option: bool = False) -> str:
+    """Feed the cached data comes from: iex / sip / delayed_sip for stocks, indicative / opra for options"""
+    return stream_url(is_option).rstrip('/').rsplit('/', 1)[-1]
+
+
+class LastValueCache:
+    """
+    Latest quote and trade per symbol
+
+    Entries exist only while the symbol is subscribed on a connected upstream stream: the
+    WebSocket manager invalidates symbols when it unsubscribes them or loses the connection,
+    so a cached quote is the current quote however old its timestamp is.
+    """
+
+    def __init__(self, enabled: bool = True, max_age_seconds: float = 0):
+        self.enabled = enabled
+        self.max_age_seconds = max_age_seconds  # 0 = no age limit for REST answers
+
+        self._quotes: Dict[str, Tuple[float, QuoteMessage]] = {}
+        self._trades: Dict[str, Tuple[float, TradeMessage]] = {}
+
+        self.updates = 0
+        self.hits = 0
+        self.misses = 0
+        self.snapshots_sent = 0
+
+    @classmethod
+    def from_settings(cls) -> "LastValueCache":
+        websocket_settings = getattr(settings, 'websocket', None)
+        cache_settings = websocket_settings.get('last_value_cache') if isinstance(websocket_settings, dict) else None
+        if not isinstance(cache_settings, dict):
+            return cls()
+        return cls(
+            enabled=bool(cache_settings.get('enabled', True)),
+            max_age_seconds=float(cache_settings.get('max_age_seconds', 0))
+        )
+
+    def update(self, message: Any):
+        """Record an outbound quote or trade message"""
+        if not self.enabled:
+            return
+        entry = (time.monotonic(), message)
+        if isinstance(message, QuoteMessage):
+            self._quotes[message.symbol] = entry
+        else:
+            self._trades[message.symbol] = entry
+        self.updates += 1
+
+    def invalidate(self, symbols: Iterable[str]):
+        """Drop symbols that are no longer streamed"""
+        for symbol in symbols:
+            self._quotes.pop(symbol, None)
+            self._trades.pop(symbol, None)
+
+    def clear(self):
+        self._quotes.clear()
+        self._trades.clear()
+
+    def get_quote(self, symbol: str) -> Optional[QuoteMessage]:
+        """Latest streamed quote for REST callers (None if not cached or too old)"""
+        entry = self._quotes.get(symbol) if self.enabled else None
+        if entry is None or (self.max_age_seconds and time.monotonic() - entry[0] > self.max_age_seconds):
+            self.misses += 1
+            return None
+        self.hits += 1
+        return entry[1]
+
+    def get_trade(self, symbol: str) -> Optional[TradeMessage]:
+        """Latest streamed trade"""
+        entry = self._trades.get(symbol)
+        return entry[1] if entry else None
+
+    def snapshot(self, symbols: Iterable[str]) -> Optional[Dict[str, Any]]:
+        """Snapshot message with the latest quote and trade of each symbol (None if nothing cached)"""
+        quotes = []
+        trades = []
+        for symbol in symbols:
+            quote = self._quotes.get(symbol)
+            if quote:
+                quotes.append(quote[1])
+            trade = self._trades.get(symbol)
+            if trade:
+                trades.append(trade[1])
+        if not quotes and not trades:
+            return None
+        self.snapshots_sent += 1
+        return {"type": "snapshot", "quotes": quotes, "trades": trades}
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Get cache statistics"""
+        lookups = self.hits + self.misses
+        return {
+            "enabled": self.enabled,
+            "max_age_seconds": self.max_age_seconds,
+            "quotes": len(self._quotes),
+            "trades": len(self._trades),
+            "updates": self.updates,
+            "rest_hits": self.hits,
+            "rest_misses": self.misses,
+            "rest_hit_rate": round(self.hits / lookups, 3) if lookups else 0.0,
+            "snapshots_sent": self.snapshots_sent
+        }
+
+
+# Global last-value cache
+last_value_cache = LastValueCache.from_settings()
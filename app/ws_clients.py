@@ -0,0 +1,359 @@
+"""
+WebSocket client sessions - per-client bounded send queue and writer task
+Broadcasts only enqueue; slow clients get quotes conflated to the latest per symbol
+and are disconnected once they fall too far behind. Per-symbol subscription options
+(rate limit, price-change threshold, message types) are applied before enqueueing.
+"""
+
+import asyncio
+import itertools
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Dict, Iterable, Optional, Tuple
+
+from loguru import logger
+
+from app.metrics import ws_client_messages_sent, ws_client_dropped_quotes, ws_client_dropped_trades
+from app.ws_encoding import encode_message, encode_compact, pack_batch
+
+
+# Message kinds
+QUOTE = "quote"
+TRADE = "trade"
+CONTROL = "control"
+
+# Downstream message formats (negotiated with ?format= at connect time)
+JSON_FORMAT = "json"
+MSGPACK_FORMAT = "msgpack"
+MESSAGE_FORMATS = (JSON_FORMAT, MSGPACK_FORMAT)
+
+# WebSocket close code used for slow consumers (RFC 6455 "try again later")
+SLOW_CONSUMER_CLOSE_CODE = 1013
+
+
+@dataclass
+class ClientQueueConfig:
+    """Per-client send queue settings"""
+    max_pending: int = 500            # Pending messages before the trade policy applies
+    trade_policy: str = "drop"        # "drop": drop trades when full, "keep": disconnect instead
+    max_lag_seconds: float = 10.0     # Disconnect when the oldest pending message is this old
+    close_timeout_seconds: float = 2.0
+    max_batch: int = 100              # Messages per binary frame (msgpack clients)
+
+
+@dataclass
+class SubscriptionOptions:
+    """Per-client, per-symbol delivery options sent with a subscribe message"""
+    max_rate: float = 0.0        # Max quotes per second per symbol (0 = unlimited); the latest quote is delivered late, never lost
+    min_change: float = 0.0      # Min bid or ask price move to send a quote (0 = off); size-only updates never pass
+    quotes: bool = True
+    trades: bool = True
+    bars: bool = True
+
+    @classmethod
+    def from_message(cls, options: Any) -> Optional["SubscriptionOptions"]:
+        """Parse the options object of a subscribe message; raises ValueError if invalid"""
+        if options is None:
+            return None
+        if not isinstance(options, dict):
+            raise ValueError("options must be an object")
+        unknown = set(options) - set(cls.__dataclass_fields__)
+        if unknown:
+            raise ValueError(f"unknown options: {sorted(unknown)}")
+        try:
+            parsed = cls(
+                max_rate=float(options.get("max_rate", 0)),
+                min_change=float(options.get("min_change", 0)),
+                quotes=bool(options.get("quotes", True)),
+                trades=bool(options.get("trades", True)),
+                bars=bool(options.get("bars", True))
+            )
+        except (TypeError, ValueError):
+            raise ValueError("max_rate and min_change must be numbers")
+        if parsed.max_rate < 0 or parsed.min_change < 0:
+            raise ValueError("max_rate and min_change must not be negative")
+        return None if parsed == cls() else parsed
+
+
+class ClientSession:
+    """
+    One connected WebSocket client
+
+    Pending messages live in an insertion-ordered dict. A quote replaces the pending quote of
+    the same symbol in place (conflation), so a client that keeps up sees every quote while a
+    lagging one only gets the latest; trades and control messages each take their own slot.
+    """
+
+    def __init__(self, client_id: str, websocket: Any, config: Optional[ClientQueueConfig] = None,
+                 message_format: str = JSON_FORMAT):
+        self.client_id = client_id
+        self.websocket = websocket
+        self.config = config or ClientQueueConfig()
+        self.message_format = message_format
+        # Binary clients get msgpack payloads, batched into one array frame per write
+        self.binary = message_format == MSGPACK_FORMAT
+
+        self._pending: "OrderedDict[Tuple[str, Any], Tuple[float, str]]" = OrderedDict()
+        self._sequence = itertools.count()
+        self._wakeup = asyncio.Event()
+        self._writer: Optional[asyncio.Task] = None
+
+        # Per-symbol subscription options and their throttle state
+        self.options: Dict[str, SubscriptionOptions] = {}
+        self._last_prices: Dict[str, Tuple[Any, Any]] = {}
+        self._next_quote_at: Dict[str, float] = {}
+        self._deferred: Dict[str, str] = {}
+        self._deferred_timer: Optional[asyncio.TimerHandle] = None
+
+        self.closed = False
+        self.close_reason: Optional[str] = None
+        self.connected_at = time.monotonic()
+
+        # Metrics
+        self.sent = 0
+        self.frames = 0
+        self.conflated_quotes = 0
+        self.dropped_quotes = 0
+        self.dropped_trades = 0
+        self.max_lag_seconds = 0.0
+        self.max_pending = 0
+        self.filtered = 0
+        self.throttled = 0
+
+    def start(self):
+        """Start the writer task"""
+        if self._writer is None:
+            self._writer = asyncio.get_running_loop().create_task(self._write_loop())
+
+    @property
+    def pending(self) -> int:
+        return len(self._pending)
+
+    def lag_seconds(self) -> float:
+        """Age of the oldest pending message"""
+        if not self._pending:
+            return 0.0
+        enqueued_at, _ = next(iter(self._pending.values()))
+        return time.monotonic() - enqueued_at
+
+    def _mark_closed(self, reason: str):
+        if not self.closed:
+            self.closed = True
+            self.close_reason = reason
+            self._wakeup.set()
+
+    def enqueue(self, kind: str, symbol: Optional[str], message: str) -> bool:
+        """
+        Queue a message without waiting for the socket
+
+        Returns False once the session is closed or has become a slow consumer; the caller
+        should then drop the client.
+        """
+        if self.closed:
+            return False
+
+        lag = self.lag_seconds()
+        if lag > self.max_lag_seconds:
+            self.max_lag_seconds = lag
+        if lag >= self.config.max_lag_seconds:
+            self._mark_closed(f"slow consumer: {lag:.1f}s behind")
+            return False
+
+        if kind == QUOTE:
+            key = (QUOTE, symbol)
+            pending = self._pending.get(key)
+            if pending is not None:
+                # Keep the slot (and its age) but send only the latest quote
+                self._pending[key] = (pending[0], message)
+                self.conflated_quotes += 1
+                return True
+            if len(self._pending) >= self.config.max_pending:
+                self.dropped_quotes += 1
+                ws_client_dropped_quotes.inc()
+                return True
+        elif kind == TRADE:
+            if len(self._pending) >= self.config.max_pending:
+                if self.config.trade_policy == "keep":
+                    self._mark_closed(f"slow consumer: {len(self._pending)} messages pending")
+                    return False
+                self.dropped_trades += 1
+                ws_client_dropped_trades.inc()
+                return True
+            key = (TRADE, next(self._sequence))
+        else:
+            # Control messages are never dropped
+            key = (CONTROL, next(self._sequence))
+
+        self._pending[key] = (time.monotonic(), message)
+        if len(self._pending) > self.max_pending:
+            self.max_pending = len(self._pending)
+        self._wakeup.set()
+        return True
+
+    def set_options(self, symbols: Iterable[str], options: Optional[SubscriptionOptions]):
+        """Set (or with None, clear) delivery options for symbols"""
+        for symbol in symbols:
+            self._last_prices.pop(symbol, None)
+            self._next_quote_at.pop(symbol, None)
+            self._deferred.pop(symbol, None)
+            if options is None:
+                self.options.pop(symbol, None)
+            else:
+                self.options[symbol] = options
+
+    def offer(self, kind: str, symbol: str, message_json: str, message: Any) -> bool:
+        """
+        Enqueue a market data message subject to the symbol's options
+
+        Broadcast calls this only for sessions with options; the return value means the same as
+        enqueue's (False = drop the client). Filtered messages count as accepted.
+        """
+        options = self.options.get(symbol)
+        if options is None:
+            return self.enqueue(kind, symbol, message_json)
+        if kind != QUOTE:
+            wanted = options.bars if message.type == "bar" else options.trades
+            if not wanted:
+                self.filtered += 1
+                return True
+            return self.enqueue(kind, symbol, message_json)
+        if not options.quotes:
+            self.filtered += 1
+            return True
+
+        bid, ask = message.bid_price, message.ask_price
+        if options.min_change:
+            last = self._last_prices.get(symbol)
+            if last is not None and _moved_less(bid, last[0], options.min_change) \
+                    and _moved_less(ask, last[1], options.min_change):
+                self.filtered += 1
+                return True
+        self._last_prices[symbol] = (bid, ask)
+
+        if options.max_rate:
+            now = time.monotonic()
+            due = self._next_quote_at.get(symbol, 0.0)
+            if now < due:
+                # Too early: keep only the latest quote and deliver it when the interval ends
+                self._deferred[symbol] = message_json
+                self.throttled += 1
+                self._schedule_deferred(due - now)
+                return True
+            self._next_quote_at[symbol] = now + 1.0 / options.max_rate
+        return self.enqueue(QUOTE, symbol, message_json)
+
+    def _schedule_deferred(self, delay: float):
+        if self._deferred_timer is None and not self.closed:
+            self._deferred_timer = asyncio.get_running_loop().call_later(delay, self._flush_deferred)
+
+    def _flush_deferred(self):
+        """Deliver throttled quotes whose interval has ended"""
+        self._deferred_timer = None
+        if self.closed:
+            return
+        now = time.monotonic()
+        next_due = None
+        for symbol, message_json in list(self._deferred.items()):
+            options = self.options.get(symbol)
+            due = self._next_quote_at.get(symbol, 0.0)
+            if options is None or not options.max_rate:
+                del self._deferred[symbol]
+            elif now >= due:
+                del self._deferred[symbol]
+                self._next_quote_at[symbol] = now + 1.0 / options.max_rate
+                if not self.enqueue(QUOTE, symbol, message_json):
+                    return
+            elif next_due is None or due < next_due:
+                next_due = due
+        if next_due is not None:
+            self._schedule_deferred(next_due - now)
+
+    def send_control(self, message: Any) -> bool:
+        """Queue an already encoded non-market message (welcome, acks, pong)"""
+        return self.enqueue(CONTROL, None, message)
+
+    def encode(self, message: Any) -> Any:
+        """Encode a message (dict, or outbound message dataclasses) in this client's format"""
+        if self.binary:
+            return encode_compact(message)
+        return encode_message(message).decode()
+
+    def send_message(self, message: Any) -> bool:
+        """Encode and queue a non-market message"""
+        return self.send_control(self.encode(message))
+
+    async def _write_loop(self):
+        """Drain pending messages to the socket in order"""
+        try:
+            while not self.closed:
+                if not self._pending:
+                    self._wakeup.clear()
+                    await self._wakeup.wait()
+                    continue
+                if self.binary:
+                    batch = []
+                    while self._pending and len(batch) < self.config.max_batch:
+                        _, (_, message) = self._pending.popitem(last=False)
+                        batch.append(message)
+                    await self.websocket.send_bytes(pack_batch(batch))
+                    self.sent += len(batch)
+                    ws_client_messages_sent.inc(len(batch))
+                else:
+                    _, (_, message) = self._pending.popitem(last=False)
+                    await self.websocket.send_text(message)
+                    self.sent += 1
+                    ws_client_messages_sent.inc()
+                self.frames += 1
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.debug(f"❌ 发送数据给客户端 {self.client_id} 失败: {e}")
+            self._mark_closed(f"send failed: {e}")
+
+    async def close(self, code: int = SLOW_CONSUMER_CLOSE_CODE, reason: Optional[str] = None):
+        """Stop the writer and close the socket"""
+        self._mark_closed(reason or "closed")
+        if self._deferred_timer is not None:
+            self._deferred_timer.cancel()
+            self._deferred_timer = None
+        if self._writer and not self._writer.done() and self._writer is not asyncio.current_task():
+            self._writer.cancel()
+            await asyncio.gather(self._writer, return_exceptions=True)
+        self._pending.clear()
+        try:
+            await asyncio.wait_for(
+                self.websocket.close(code=code, reason=(self.close_reason or "")[:120]),
+                timeout=self.config.close_timeout_seconds
+            )
+        except Exception:
+            # Already closed or the peer is unresponsive
+            pass
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Get client queue statistics"""
+        return {
+            "pending": len(self._pending),
+            "lag_seconds": round(self.lag_seconds(), 3),
+            "max_lag_seconds": round(self.max_lag_seconds, 3),
+            "max_pending": self.max_pending,
+            "format": self.message_format,
+            "sent": self.sent,
+            "frames": self.frames,
+            "conflated_quotes": self.conflated_quotes,
+            "dropped_quotes": self.dropped_quotes,
+            "dropped_trades": self.dropped_trades,
+            "filtered": self.filtered,
+            "throttled": self.throttled,
+            "symbols_with_options": len(self.options),
+            "closed": self.closed,
+            "close_reason": self.close_reason,
+            "connected_seconds": round(time.monotonic() - self.connected_at, 1)
+        }
+
+
+def _moved_less(price: Any, last_price: Any, min_change: float) -> bool:
+    """Whether a price moved by less than min_change (missing prices count as unchanged)"""
+    if price is None or last_price is None:
+        return price is last_price
+    return abs(float(price) - float(last_price)) < min_change
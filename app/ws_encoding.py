@@ -0,0 +1,184 @@
+"""
+WebSocket market data encoding - decode upstream frames and encode outbound messages in one pass
+Each tick is serialized once per downstream format (JSON by default, compact msgpack for clients
+connecting with ?format=msgpack); the encoded message is shared by every subscriber
+
+Compact msgpack schema (keys follow Alpaca's stream naming; sq = global sequence):
+    quote: {"T": "q", "d": "s"|"o", "S", "t", "bp", "ap", "bs", "as", "sq"}
+    trade: {"T": "t", "d": "s"|"o", "S", "t", "p", "s", "sq"}
+    bar:   {"T": "b", "d": "s"|"o", "S", "iv", "t", "o", "h", "l", "c", "v", "n", "vw"}
+Control messages (welcome, acks, snapshot/replay envelopes) keep their JSON field names.
+Every binary frame is a msgpack array of one or more messages.
+"""
+
+from dataclasses import dataclass, fields
+from datetime import datetime
+from typing import Any, List, Optional, Union
+
+import msgpack
+import orjson
+
+
+@dataclass(slots=True)
+class QuoteMessage:
+    """Outbound quote message"""
+    type: str
+    data_type: str
+    symbol: str
+    timestamp: Any
+    bid_price: Any
+    ask_price: Any
+    bid_size: Any
+    ask_size: Any
+    seq: Optional[int] = None  # global tick sequence, stamped by the feed owner
+
+
+@dataclass(slots=True)
+class TradeMessage:
+    """Outbound trade message"""
+    type: str
+    data_type: str
+    symbol: str
+    timestamp: Any
+    price: Any
+    size: Any
+    seq: Optional[int] = None  # global tick sequence, stamped by the feed owner
+
+
+@dataclass(slots=True)
+class BarMessage:
+    """Outbound OHLCV bar message, sent when the bar closes"""
+    type: str
+    data_type: str
+    symbol: str
+    interval: str
+    timestamp: str  # bar start, UTC
+    open: float
+    high: float
+    low: float
+    close: float
+    volume: float
+    trade_count: int
+    vwap: float
+
+
+def _default(value: Any) -> str:
+    """Fallback for values orjson cannot serialize natively (e.g. pandas Timestamp)"""
+    return str(value)
+
+
+def decode_frame(message: Union[str, bytes]) -> Any:
+    """
+    Decode one upstream frame
+
+    Stock streams send JSON text, option streams send msgpack. msgpack timestamps are decoded
+    as timezone-aware datetimes, which orjson serializes natively as RFC 3339.
+    """
+    if isinstance(message, str):
+        return orjson.loads(message)
+    try:
+        return msgpack.unpackb(message, timestamp=3)
+    except Exception:
+        return orjson.loads(message)
+
+
+def iter_items(data: Any) -> List[dict]:
+    """Upstream frames carry either one item or a list of items"""
+    if isinstance(data, list):
+        return [item for item in data if item]
+    return [data] if data else []
+
+
+def build_message(item: dict, data_type: str) -> Optional[Union[QuoteMessage, TradeMessage]]:
+    """Map a raw quote ('q') or trade ('t') item to its outbound message; other items yield None"""
+    kind = item.get("T")
+    if kind == "q":
+        return QuoteMessage(
+            type="quote",
+            data_type=data_type,
+            symbol=item.get("S"),
+            timestamp=item.get("t") or datetime.now().isoformat(),
+            bid_price=item.get("bp"),
+            ask_price=item.get("ap"),
+            bid_size=item.get("bs"),
+            ask_size=item.get("as")
+        )
+    if kind == "t":
+        return TradeMessage(
+            type="trade",
+            data_type=data_type,
+            symbol=item.get("S"),
+            timestamp=item.get("t") or datetime.now().isoformat(),
+            price=item.get("p"),
+            size=item.get("s")
+        )
+    return None
+
+
+def decode_ticks(frame: Union[str, bytes], data_type: str) -> List[Union[QuoteMessage, TradeMessage]]:
+    """
+    Decode one upstream frame into its outbound quote/trade messages
+
+    Module-level and free of shared state so a pipeline can run it in a thread or process pool.
+    """
+    messages = []
+    for item in iter_items(decode_frame(frame)):
+        if isinstance(item, dict) and item.get("S"):
+            message = build_message(item, data_type)
+            if message is not None:
+                messages.append(message)
+    return messages
+
+
+_QUOTE_FIELDS = tuple(field.name for field in fields(QuoteMessage))
+_TRADE_FIELDS = tuple(field.name for field in fields(TradeMessage))
+
+
+def message_from_dict(item: dict) -> Optional[Union[QuoteMessage, TradeMessage]]:
+    """Rebuild an outbound message from its decoded JSON form (e.g. relayed between workers)"""
+    kind = item.get("type")
+    if kind == "quote":
+        return QuoteMessage(*[item.get(name) for name in _QUOTE_FIELDS])
+    if kind == "trade":
+        return TradeMessage(*[item.get(name) for name in _TRADE_FIELDS])
+    return None
+
+
+def encode_message(message: Any) -> bytes:
+    """Serialize an outbound message (message dataclass, or a dict containing them) to JSON bytes"""
+    return orjson.dumps(message, default=_default)
+
+
+def _compact_default(value: Any) -> Any:
+    """msgpack hook: outbound messages to their compact maps, other values as in JSON"""
+    if isinstance(value, QuoteMessage):
+        return {"T": "q", "d": value.data_type[0], "S": value.symbol, "t": value.timestamp,
+                "bp": value.bid_price, "ap": value.ask_price, "bs": value.bid_size, "as": value.ask_size,
+                "sq": value.seq}
+    if isinstance(value, TradeMessage):
+        return {"T": "t", "d": value.data_type[0], "S": value.symbol, "t": value.timestamp,
+                "p": value.price, "s": value.size, "sq": value.seq}
+    if isinstance(value, BarMessage):
+        return {"T": "b", "d": value.data_type[0], "S": value.symbol, "iv": value.interval, "t": value.timestamp,
+                "o": value.open, "h": value.high, "l": value.low, "c": value.close, "v": value.volume,
+                "n": value.trade_count, "vw": value.vwap}
+    if isinstance(value, datetime):
+        return value.isoformat()
+    return str(value)
+
+
+def encode_compact(message: Any) -> bytes:
+    """Serialize an outbound message (or a dict containing them) to compact msgpack"""
+    return msgpack.packb(message, default=_compact_default)
+
+
+def pack_batch(packed_messages: List[bytes]) -> bytes:
+    """Join individually packed messages into one msgpack array frame without re-encoding"""
+    count = len(packed_messages)
+    if count < 16:
+        header = bytes((0x90 | count,))
+    elif count < 0x10000:
+        header = b"\xdc" + count.to_bytes(2, "big")
+    else:
+        header = b"\xdd" + count.to_bytes(4, "big")
+    return header + b"".join(packed_messages)
@@ -0,0 +1,287 @@
+"""
+Multi-worker WebSocket fan-out over Redis pub/sub
+One worker (the feed leader, elected with a Redis lease) owns the upstream Alpaca connections and
+publishes normalized ticks; every worker subscribes and fans them out to its own clients, so client
+fan-out scales with uvicorn workers while Alpaca still sees a single feed per stream
+"""
+
+import asyncio
+import os
+import socket
+import uuid
+from dataclasses import dataclass
+from typing import Any, Awaitable, Callable, Dict, Iterable, List, Optional, Set
+
+import orjson
+from loguru import logger
+
+from config import settings
+from app.ws_encoding import message_from_dict, encode_message
+
+
+@dataclass
+class FanoutConfig:
+    """Fan-out settings (websocket.fanout in secrets.yml)"""
+    mode: str = "local"                  # "local" = this process owns upstream, "redis" = leader + pub/sub
+    channel_prefix: str = "opitios:ws"
+    leader_ttl_seconds: float = 15.0     # a dead leader is replaced within this time
+    heartbeat_seconds: float = 5.0       # lease renewal / worker heartbeat interval
+
+
+# Renew or release the leader lease only while this worker still holds it
+_RENEW_SCRIPT = """
+if redis.call('get', KEYS[1]) == ARGV[1] then
+    return redis.call('pexpire', KEYS[1], ARGV[2])
+end
+return 0
+"""
+_RELEASE_SCRIPT = """
+if redis.call('get', KEYS[1]) == ARGV[1] then
+    return redis.call('del', KEYS[1])
+end
+return 0
+"""
+
+
+def load_fanout_config() -> FanoutConfig:
+    """Build the fan-out config from settings (unknown fields ignored)"""
+    websocket_settings = getattr(settings, 'websocket', None)
+    fanout_settings = websocket_settings.get('fanout') if isinstance(websocket_settings, dict) else None
+    if not isinstance(fanout_settings, dict):
+        return FanoutConfig()
+    known_fields = FanoutConfig.__dataclass_fields__.keys()
+    return FanoutConfig(**{k: v for k, v in fanout_settings.items() if k in known_fields})
+
+
+class RedisFanout:
+    """
+    Leader election, tick relay and cluster-wide subscription demand for one worker
+
+    Wire format on the ticks channel: a JSON list of outbound messages, one PUBLISH per event-loop
+    batch, with {"type": "invalidate", "symbols": [...]} entries ordered among the ticks. Each worker
+    stores the symbols its clients want in a hash; the leader subscribes upstream to the union over
+    workers whose heartbeat key is still alive.
+    """
+
+    def __init__(self, config: FanoutConfig, redis_client: Any = None, worker_id: Optional[str] = None):
+        self.config = config
+        self.worker_id = worker_id or f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:6]}"
+        self._redis = redis_client
+
+        prefix = config.channel_prefix
+        self.leader_key = f"{prefix}:leader"
+        self.ticks_channel = f"{prefix}:ticks"
+        self.demand_key = f"{prefix}:demand"
+        self.demand_channel = f"{prefix}:demand_changed"
+        self.worker_key_prefix = f"{prefix}:worker:"
+
+        self.is_leader = False
+        self.running = False
+        self._buffer: List[Any] = []
+        self._flush_task: Optional[asyncio.Task] = None
+        self._tasks: List[asyncio.Task] = []
+        self._pubsub = None
+        self._published_demand: Optional[Set[str]] = None
+
+        # Callbacks wired by the WebSocket manager
+        self.on_message: Optional[Callable[[Any], Awaitable[None]]] = None
+        self.on_invalidate: Optional[Callable[[List[str]], None]] = None
+        self.on_demand_changed: Optional[Callable[[], None]] = None
+        self.on_leadership_changed: Optional[Callable[[bool], Awaitable[None]]] = None
+
+        self.published_messages = 0
+        self.published_batches = 0
+        self.publish_errors = 0
+        self.received_messages = 0
+        self.leadership_changes = 0
+
+    def _ttl_ms(self) -> int:
+        return int(self.config.leader_ttl_seconds * 1000)
+
+    async def start(self):
+        """Connect to Redis, join the worker set, try to take the lease and start the relay tasks"""
+        if self._redis is None:
+            import redis.asyncio as aioredis
+            self._redis = aioredis.Redis(
+                host=getattr(settings, 'redis_host', 'localhost'),
+                port=getattr(settings, 'redis_port', 6379),
+                db=getattr(settings, 'redis_db', 0),
+                password=getattr(settings, 'redis_password', None),
+                decode_responses=True,
+                socket_connect_timeout=5,
+                health_check_interval=30
+            )
+        await self._redis.ping()
+
+        self._pubsub = self._redis.pubsub()
+        await self._pubsub.subscribe(self.ticks_channel, self.demand_channel)
+        self.running = True
+        await self._heartbeat()
+
+        loop = asyncio.get_running_loop()
+        self._tasks = [
+            loop.create_task(self._listen()),
+            loop.create_task(self._heartbeat_loop())
+        ]
+        logger.info(f"WebSocket fan-out started (worker={self.worker_id}, leader={self.is_leader})")
+
+    async def stop(self):
+        """Release the lease and withdraw this worker's demand so the next leader takes over at once"""
+        if not self.running:
+            return
+        self.running = False
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+        try:
+            if self._flush_task and not self._flush_task.done():
+                await self._flush_task
+            if self.is_leader:
+                await self._redis.eval(_RELEASE_SCRIPT, 1, self.leader_key, self.worker_id)
+                self.is_leader = False
+            await self._redis.delete(self.worker_key_prefix + self.worker_id)
+            await self._redis.hdel(self.demand_key, self.worker_id)
+            await self._redis.publish(self.demand_channel, self.worker_id)
+            await self._pubsub.unsubscribe()
+            await self._pubsub.aclose()
+            await self._redis.aclose()
+        except Exception as e:
+            logger.warning(f"WebSocket fan-out shutdown incomplete: {e}")
+        logger.info(f"WebSocket fan-out stopped (worker={self.worker_id})")
+
+    # ----- tick relay -----
+
+    def publish(self, message: Any):
+        """Queue an outbound message; everything queued in one event-loop pass goes out as one PUBLISH"""
+        self._buffer.append(message)
+        if self._flush_task is None or self._flush_task.done():
+            self._flush_task = asyncio.get_running_loop().create_task(self._flush())
+
+    def publish_invalidate(self, symbols: Iterable[str]):
+        """Tell every worker to drop cached values of symbols the feed no longer streams"""
+        symbols = sorted(symbols)
+        if symbols:
+            self.publish({"type": "invalidate", "symbols": symbols})
+
+    async def _flush(self):
+        while self._buffer:
+            batch, self._buffer = self._buffer, []
+            try:
+                await self._redis.publish(self.ticks_channel, encode_message(batch))
+                self.published_batches += 1
+                self.published_messages += len(batch)
+            except Exception as e:
+                self.publish_errors += 1
+                logger.error(f"WebSocket fan-out publish failed, {len(batch)} messages lost: {e}")
+
+    async def _listen(self):
+        try:
+            async for event in self._pubsub.listen():
+                if event.get("type") != "message":
+                    continue
+                try:
+                    if event["channel"] == self.ticks_channel:
+                        await self._deliver(orjson.loads(event["data"]))
+                    elif event["channel"] == self.demand_channel:
+                        if self.is_leader and event["data"] != self.worker_id and self.on_demand_changed:
+                            self.on_demand_changed()
+                except Exception as e:
+                    logger.error(f"WebSocket fan-out message handling failed: {e}")
+        except asyncio.CancelledError:
+            pass
+        except Exception as e:
+            logger.error(f"WebSocket fan-out listener stopped: {e}")
+
+    async def _deliver(self, items: List[dict]):
+        for item in items:
+            if item.get("type") == "invalidate":
+                if self.on_invalidate:
+                    self.on_invalidate(item.get("symbols") or [])
+                continue
+            message = message_from_dict(item)
+            if message is not None and self.on_message:
+                self.received_messages += 1
+                await self.on_message(message)
+
+    # ----- leadership -----
+
+    async def _heartbeat_loop(self):
+        try:
+            while self.running:
+                await asyncio.sleep(self.config.heartbeat_seconds)
+                try:
+                    await self._heartbeat()
+                except Exception as e:
+                    logger.error(f"WebSocket fan-out heartbeat failed: {e}")
+        except asyncio.CancelledError:
+            pass
+
+    async def _heartbeat(self):
+        """Refresh this worker's liveness key and renew or try to acquire the leader lease"""
+        await self._redis.set(self.worker_key_prefix + self.worker_id, 1, px=self._ttl_ms())
+        if self.is_leader:
+            held = await self._redis.eval(_RENEW_SCRIPT, 1, self.leader_key, self.worker_id, self._ttl_ms())
+            if not held:
+                logger.warning(f"WebSocket feed leadership lost (worker={self.worker_id})")
+                await self._set_leader(False)
+            elif self.on_demand_changed:
+                # Also prunes demand of workers that died without withdrawing it
+                self.on_demand_changed()
+        else:
+            acquired = await self._redis.set(self.leader_key, self.worker_id, nx=True, px=self._ttl_ms())
+            if acquired:
+                logger.info(f"WebSocket feed leadership acquired (worker={self.worker_id})")
+                await self._set_leader(True)
+
+    async def _set_leader(self, is_leader: bool):
+        self.is_leader = is_leader
+        self.leadership_changes += 1
+        if self.on_leadership_changed:
+            await self.on_leadership_changed(is_leader)
+
+    # ----- subscription demand -----
+
+    async def update_demand(self, symbols: Set[str]):
+        """Publish the symbols this worker's clients want (no-op when unchanged)"""
+        if symbols == self._published_demand:
+            return
+        await self._redis.hset(self.demand_key, self.worker_id, orjson.dumps(sorted(symbols)))
+        await self._redis.publish(self.demand_channel, self.worker_id)
+        self._published_demand = set(symbols)
+
+    async def cluster_demand(self) -> Set[str]:
+        """Union of the demand of all live workers; demand left by dead workers is deleted"""
+        demand: Dict[str, str] = await self._redis.hgetall(self.demand_key)
+        workers = list(demand)
+        if not workers:
+            return set()
+        heartbeats = await self._redis.mget([self.worker_key_prefix + worker for worker in workers])
+
+        symbols: Set[str] = set()
+        stale = []
+        for worker, heartbeat in zip(workers, heartbeats):
+            if heartbeat is None and worker != self.worker_id:
+                stale.append(worker)
+                continue
+            symbols.update(orjson.loads(demand[worker]))
+        if stale:
+            await self._redis.hdel(self.demand_key, *stale)
+            logger.info(f"Dropped subscription demand of stale workers: {stale}")
+        return symbols
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Get fan-out statistics"""
+        return {
+            "mode": self.config.mode,
+            "worker_id": self.worker_id,
+            "is_leader": self.is_leader,
+            "running": self.running,
+            "published_messages": self.published_messages,
+            "published_batches": self.published_batches,
+            "publish_errors": self.publish_errors,
+            "received_messages": self.received_messages,
+            "leadership_changes": self.leadership_changes,
+            "local_demand": len(self._published_demand or ())
+        }
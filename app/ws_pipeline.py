@@ -0,0 +1,214 @@
+"""
+Staged upstream feed pipeline: recv -> decode -> fan-out
+A tight recv stage moves raw frames off the upstream socket into a bounded queue, a decode stage
+turns them into typed ticks (inline, or in a thread/process pool for msgpack-heavy option feeds)
+and a fan-out stage delivers them, so a slow broadcast never stalls reading from Alpaca
+"""
+
+import asyncio
+import time
+from collections import deque
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import Any, Awaitable, Callable, Deque, Dict, List, Optional, Tuple
+
+from loguru import logger
+
+from config import settings
+from app.histogram import LatencyHistogram
+from app.ws_encoding import decode_ticks
+
+
+DECODE_MODES = ("inline", "thread", "process")
+
+# End of stream marker passed down the queues so later stages drain what was already received
+_STOP = object()
+
+
+@dataclass
+class PipelineConfig:
+    """Feed pipeline settings (websocket.pipeline in secrets.yml)"""
+    raw_queue_size: int = 1000           # frames received but not decoded
+    tick_queue_size: int = 1000          # decoded frames not yet fanned out
+    option_decode: str = "inline"        # "inline", "thread" or "process" decoding of option (msgpack) frames
+    decode_workers: int = 2              # pool size, and decoded frames in flight per feed
+
+
+def load_pipeline_config() -> PipelineConfig:
+    """Build the pipeline config from settings (unknown fields ignored)"""
+    websocket_settings = getattr(settings, 'websocket', None)
+    pipeline_settings = websocket_settings.get('pipeline') if isinstance(websocket_settings, dict) else None
+    if not isinstance(pipeline_settings, dict):
+        return PipelineConfig()
+    known_fields = PipelineConfig.__dataclass_fields__.keys()
+    return PipelineConfig(**{k: v for k, v in pipeline_settings.items() if k in known_fields})
+
+
+def create_decode_executor(mode: str, workers: int) -> Optional[Executor]:
+    """Pool for off-loop decoding, or None to decode on the event loop"""
+    if mode == "thread":
+        return ThreadPoolExecutor(max_workers=workers, thread_name_prefix="ws-decode")
+    if mode == "process":
+        return ProcessPoolExecutor(max_workers=workers)
+    if mode != "inline":
+        logger.warning(f"Unknown decode mode {mode!r}, decoding inline")
+    return None
+
+
+class FeedPipeline:
+    """
+    recv -> decode -> fan-out stages for one upstream connection
+
+    Each run() uses fresh bounded queues; when the raw queue is full the recv stage waits (frames
+    then back up in the socket, as before) and the stall is counted. Frames already received when the
+    connection closes are still decoded and delivered. Decoding keeps frame order even with a pool:
+    up to decode_workers frames are in flight and completed in submission order.
+    """
+
+    STAGES = ("recv_wait", "decode", "decode_wait", "fanout", "total")
+
+    def __init__(self, name: str, data_type: str, emit: Callable[[Any], Awaitable[None]],
+                 config: Optional[PipelineConfig] = None, executor: Optional[Executor] = None):
+        self.name = name
+        self.data_type = data_type
+        self.emit = emit
+        self.config = config or PipelineConfig()
+        self.executor = executor
+
+        self._raw: Optional[asyncio.Queue] = None
+        self._ticks: Optional[asyncio.Queue] = None
+        self.latency = {stage: LatencyHistogram() for stage in self.STAGES}
+
+        self.frames = 0
+        self.ticks = 0
+        self.decode_errors = 0
+        self.fanout_errors = 0
+        self.recv_stalls = 0
+        self.max_raw_depth = 0
+        self.max_tick_depth = 0
+        self.last_frame_at: Optional[float] = None  # perf_counter() of the last frame received
+
+    async def run(self, recv: Callable[[], Awaitable[Any]]):
+        """Pump frames from recv() until it returns None or raises; re-raises after draining"""
+        loop = asyncio.get_running_loop()
+        raw = self._raw = asyncio.Queue(maxsize=self.config.raw_queue_size)
+        ticks = self._ticks = asyncio.Queue(maxsize=self.config.tick_queue_size)
+        stages = [loop.create_task(self._decode_stage(raw, ticks)), loop.create_task(self._fanout_stage(ticks))]
+        error = None
+        try:
+            try:
+                await self._recv_stage(recv, raw)
+            except Exception as e:
+                error = e
+            await raw.put(_STOP)
+            await asyncio.gather(*stages)
+        finally:
+            for task in stages:
+                task.cancel()
+            await asyncio.gather(*stages, return_exceptions=True)
+        if error is not None:
+            raise error
+
+    async def _recv_stage(self, recv: Callable[[], Awaitable[Any]], raw: asyncio.Queue):
+        while True:
+            frame = await recv()
+            if frame is None:
+                return
+            self.frames += 1
+            self.last_frame_at = time.perf_counter()
+            if raw.full():
+                self.recv_stalls += 1
+            await raw.put((frame, self.last_frame_at))
+            depth = raw.qsize()
+            if depth > self.max_raw_depth:
+                self.max_raw_depth = depth
+
+    async def _decode_stage(self, raw: asyncio.Queue, ticks: asyncio.Queue):
+        loop = asyncio.get_running_loop()
+        in_flight: Deque[Tuple[asyncio.Future, float, float]] = deque()
+        max_in_flight = max(1, int(self.config.decode_workers))
+        while True:
+            if in_flight and (len(in_flight) >= max_in_flight or raw.empty()):
+                await self._complete_decode(*in_flight.popleft(), ticks)
+                continue
+            item = await raw.get()
+            if item is _STOP:
+                while in_flight:
+                    await self._complete_decode(*in_flight.popleft(), ticks)
+                await ticks.put(_STOP)
+                return
+            frame, received_at = item
+            started = time.perf_counter()
+            self.latency["recv_wait"].observe(started - received_at)
+            if self.executor is None:
+                try:
+                    messages = decode_ticks(frame, self.data_type)
+                except Exception as e:
+                    self._decode_failed(e)
+                    continue
+                await self._put_ticks(ticks, messages, started, received_at)
+            else:
+                in_flight.append((loop.run_in_executor(self.executor, decode_ticks, frame, self.data_type),
+                                  started, received_at))
+
+    async def _complete_decode(self, future: asyncio.Future, started: float, received_at: float,
+                               ticks: asyncio.Queue):
+        try:
+            messages = await future
+        except Exception as e:
+            self._decode_failed(e)
+            return
+        await self._put_ticks(ticks, messages, started, received_at)
+
+    def _decode_failed(self, error: Exception):
+        self.decode_errors += 1
+        logger.warning(f"⚠️ {self.name} frame decode failed: {error}")
+
+    async def _put_ticks(self, ticks: asyncio.Queue, messages: List[Any], started: float, received_at: float):
+        decoded_at = time.perf_counter()
+        self.latency["decode"].observe(decoded_at - started)
+        if not messages:
+            return
+        await ticks.put((messages, received_at, decoded_at))
+        depth = ticks.qsize()
+        if depth > self.max_tick_depth:
+            self.max_tick_depth = depth
+
+    async def _fanout_stage(self, ticks: asyncio.Queue):
+        while True:
+            item = await ticks.get()
+            if item is _STOP:
+                return
+            messages, received_at, decoded_at = item
+            started = time.perf_counter()
+            self.latency["decode_wait"].observe(started - decoded_at)
+            for message in messages:
+                try:
+                    await self.emit(message)
+                except Exception as e:
+                    self.fanout_errors += 1
+                    logger.error(f"❌ {self.name} fan-out failed: {e}")
+            finished = time.perf_counter()
+            self.ticks += len(messages)
+            self.latency["fanout"].observe(finished - started)
+            self.latency["total"].observe(finished - received_at)
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Get pipeline statistics"""
+        return {
+            "decode": "inline" if self.executor is None else type(self.executor).__name__,
+            "frames": self.frames,
+            "ticks": self.ticks,
+            "decode_errors": self.decode_errors,
+            "fanout_errors": self.fanout_errors,
+            "recv_stalls": self.recv_stalls,
+            "queues": {
+                "raw_depth": self._raw.qsize() if self._raw else 0,
+                "raw_max_depth": self.max_raw_depth,
+                "raw_capacity": self.config.raw_queue_size,
+                "tick_depth": self._ticks.qsize() if self._ticks else 0,
+                "tick_max_depth": self.max_tick_depth,
+                "tick_capacity": self.config.tick_queue_size
+            },
+            "latency": {stage: histogram.get_stats() for stage, histogram in self.latency.items()}
+        }
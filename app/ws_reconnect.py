@@ -0,0 +1,135 @@
+"""
+Upstream feed reconnection with jittered exponential backoff
+A dropped Alpaca connection is retried right away (first attempt after a few hundred milliseconds,
+doubling up to max_delay, each delay jittered so feeds and workers do not retry in lockstep) and
+records how long the feed was down
+"""
+
+import asyncio
+import random
+import time
+from dataclasses import dataclass
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+from loguru import logger
+
+from config import settings
+from app.histogram import LatencyHistogram
+
+
+# Outage / reconnect latency bucket upper bounds in seconds
+OUTAGE_BUCKETS = (0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0, 300.0)
+
+
+@dataclass
+class ReconnectConfig:
+    """Reconnect settings (websocket.reconnect in secrets.yml)"""
+    initial_delay: float = 0.2       # first retry after ~100-300ms with the default jitter
+    max_delay: float = 30.0
+    multiplier: float = 2.0
+    jitter: float = 0.5              # each delay is drawn from delay * (1 +/- jitter)
+    check_interval: float = 10.0     # safety-net scan for feeds that are down without a retry running
+
+
+def load_reconnect_config() -> ReconnectConfig:
+    """Build the reconnect config from settings (unknown fields ignored)"""
+    websocket_settings = getattr(settings, 'websocket', None)
+    reconnect_settings = websocket_settings.get('reconnect') if isinstance(websocket_settings, dict) else None
+    if not isinstance(reconnect_settings, dict):
+        return ReconnectConfig()
+    known_fields = ReconnectConfig.__dataclass_fields__.keys()
+    return ReconnectConfig(**{k: v for k, v in reconnect_settings.items() if k in known_fields})
+
+
+def backoff_delay(attempt: int, config: ReconnectConfig, rng: Any = random) -> float:
+    """Delay before retry number attempt (0-based)"""
+    delay = min(config.max_delay, config.initial_delay * config.multiplier ** attempt)
+    return max(0.0, delay * (1 + config.jitter * (2 * rng.random() - 1)))
+
+
+class FeedReconnector:
+    """
+    Retry loop and outage metrics for one upstream connection
+
+    connect() must connect, authenticate and restore the feed's subscriptions, raising on failure.
+    The loop stops as soon as should_reconnect() is false (shutdown, lost feed leadership, or no
+    symbols left on the feed). Outage runs from the last frame received before the drop to the
+    restored subscription; reconnect latency from detecting the drop to the same point.
+    """
+
+    def __init__(self, name: str, connect: Callable[[], Awaitable[None]], should_reconnect: Callable[[], bool],
+                 config: Optional[ReconnectConfig] = None):
+        self.name = name
+        self.connect = connect
+        self.should_reconnect = should_reconnect
+        self.config = config or ReconnectConfig()
+        self._task: Optional[asyncio.Task] = None
+
+        self.outage = LatencyHistogram(OUTAGE_BUCKETS)
+        self.reconnect_latency = LatencyHistogram(OUTAGE_BUCKETS)
+        self.drops = 0
+        self.attempts = 0
+        self.failures = 0
+        self.reconnects = 0
+        self.last_outage_seconds: Optional[float] = None
+
+    @property
+    def active(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    def trigger(self, last_frame_at: Optional[float] = None, dropped: bool = True):
+        """Start retrying now (no-op while a retry loop is already running)"""
+        if self.active:
+            return
+        if dropped:
+            self.drops += 1
+        detected_at = time.perf_counter()
+        self._task = asyncio.get_running_loop().create_task(
+            self._run(detected_at, last_frame_at if last_frame_at is not None else detected_at))
+
+    async def _run(self, detected_at: float, down_since: float):
+        attempt = 0
+        while self.should_reconnect():
+            await asyncio.sleep(backoff_delay(attempt, self.config))
+            if not self.should_reconnect():
+                return
+            self.attempts += 1
+            try:
+                await self.connect()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                self.failures += 1
+                attempt += 1
+                logger.warning(f"⚠️ {self.name} reconnect attempt {attempt} failed: {e}")
+                continue
+            restored_at = time.perf_counter()
+            self.reconnects += 1
+            self.reconnect_latency.observe(restored_at - detected_at)
+            self.last_outage_seconds = restored_at - down_since
+            self.outage.observe(self.last_outage_seconds)
+            logger.info(f"✅ {self.name} restored after {self.last_outage_seconds:.2f}s "
+                        f"({attempt + 1} attempt{'s' if attempt else ''})")
+            return
+
+    async def stop(self):
+        if self.active:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+        self._task = None
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Get reconnect statistics"""
+        return {
+            "retrying": self.active,
+            "drops": self.drops,
+            "attempts": self.attempts,
+            "failures": self.failures,
+            "reconnects": self.reconnects,
+            "last_outage_seconds": round(self.last_outage_seconds, 3) if self.last_outage_seconds is not None else None,
+            "outage": self.outage.get_stats(),
+            "reconnect_latency": self.reconnect_latency.get_stats()
+        }
@@ -0,0 +1,104 @@
+"""
+Sequenced tick ring buffer for WebSocket resume
+Every outbound quote and trade gets a global sequence number; recent ticks are kept in a bounded
+ring so a reconnecting client can send resume_from=<seq> and receive exactly the ticks it missed
+"""
+
+import time
+from collections import deque
+from typing import Any, Deque, Dict, Iterable, List, Optional
+
+from config import settings
+
+
+class TickRingBuffer:
+    """
+    Bounded buffer of the most recent outbound ticks, in sequence order
+
+    Sequence numbers start from the current time in microseconds, so they keep increasing across
+    restarts and feed-leader changes as long as the feed stays below a million ticks per second.
+    They are global, not per client: gaps in what one client sees are normal (other symbols,
+    conflated quotes).
+    """
+
+    def __init__(self, capacity: int = 10000):
+        self.capacity = capacity
+        self._ticks: Deque[Any] = deque(maxlen=capacity or None)
+        self._next_seq = time.time_ns() // 1000
+        self._last_seen = 0
+
+        self.replays = 0
+        self.replayed_messages = 0
+        self.gaps = 0
+
+    @classmethod
+    def from_settings(cls) -> "TickRingBuffer":
+        websocket_settings = getattr(settings, 'websocket', None)
+        replay_settings = websocket_settings.get('replay') if isinstance(websocket_settings, dict) else None
+        if not isinstance(replay_settings, dict):
+            return cls()
+        return cls(capacity=int(replay_settings.get('buffer_size', 10000)))
+
+    def stamp(self, message: Any):
+        """Assign the next sequence number (called by the process that owns the upstream feed)"""
+        self._next_seq = max(self._next_seq, self._last_seen) + 1
+        message.seq = self._next_seq
+
+    def append(self, message: Any):
+        """Keep a stamped outbound message for replay"""
+        if message.seq is None:
+            return
+        self._last_seen = message.seq
+        if self.capacity:
+            self._ticks.append(message)
+
+    @property
+    def last_seq(self) -> Optional[int]:
+        return self._ticks[-1].seq if self._ticks else None
+
+    @property
+    def oldest_seq(self) -> Optional[int]:
+        return self._ticks[0].seq if self._ticks else None
+
+    def replay(self, after_seq: int, symbols: Iterable[str]) -> Optional[List[Any]]:
+        """
+        Ticks of the given symbols with a sequence after after_seq, oldest first
+
+        Returns None when the buffer cannot prove the gap is complete (older than the buffer,
+        buffer empty after a restart, or a sequence this feed never issued).
+        """
+        if not self._ticks or after_seq < self._ticks[0].seq - 1 or after_seq > self._ticks[-1].seq:
+            self.gaps += 1
+            return None
+
+        symbols = set(symbols)
+        missed = []
+        for message in reversed(self._ticks):
+            if message.seq <= after_seq:
+                break
+            if message.symbol in symbols:
+                missed.append(message)
+        missed.reverse()
+
+        self.replays += 1
+        self.replayed_messages += len(missed)
+        return missed
+
+    def clear(self):
+        self._ticks.clear()
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Get buffer statistics"""
+        return {
+            "capacity": self.capacity,
+            "buffered": len(self._ticks),
+            "oldest_seq": self.oldest_seq,
+            "last_seq": self.last_seq,
+            "replays": self.replays,
+            "replayed_messages": self.replayed_messages,
+            "gaps": self.gaps
+        }
+
+
+# Global tick buffer
+tick_buffer = TickRingBuffer.from_settings()
@@ -0,0 +1,134 @@
+"""
+Sharded upstream option stream connections
+Option symbols are spread over one upstream connection per dedicated option_ws / option_ws_* account.
+A consistent hash ring places each symbol, so adding or removing an account moves only ~1/N symbols
+"""
+
+import asyncio
+import bisect
+import hashlib
+from typing import Any, Dict, Iterable, List, Optional, Set, Tuple
+
+from config import settings
+
+
+# Account ids that own an option stream connection: option_ws, option_ws_2, option_ws_spy ...
+OPTION_SHARD_PREFIX = "option_ws"
+
+
+def _ring_hash(key: str) -> int:
+    # Stable across processes and restarts (unlike hash()), so every worker places symbols alike
+    return int.from_bytes(hashlib.md5(key.encode("utf-8")).digest()[:8], "big")
+
+
+class ConsistentHashRing:
+    """Hash ring with virtual nodes - maps keys (symbols) to nodes (shard ids)"""
+
+    def __init__(self, nodes: Iterable[str] = (), replicas: int = 100):
+        self.replicas = max(1, int(replicas))
+        self._points: List[int] = []
+        self._owners: List[str] = []
+        self._nodes: Set[str] = set()
+        for node in nodes:
+            self.add(node)
+
+    @property
+    def nodes(self) -> List[str]:
+        return sorted(self._nodes)
+
+    def add(self, node: str):
+        if node in self._nodes:
+            return
+        self._nodes.add(node)
+        for replica in range(self.replicas):
+            point = _ring_hash(f"{node}#{replica}")
+            index = bisect.bisect(self._points, point)
+            self._points.insert(index, point)
+            self._owners.insert(index, node)
+
+    def remove(self, node: str):
+        if node not in self._nodes:
+            return
+        self._nodes.discard(node)
+        kept = [(point, owner) for point, owner in zip(self._points, self._owners) if owner != node]
+        self._points = [point for point, _ in kept]
+        self._owners = [owner for _, owner in kept]
+
+    def node_for(self, key: str) -> Optional[str]:
+        """Node owning key: the first virtual node clockwise from the key's hash"""
+        if not self._points:
+            return None
+        index = bisect.bisect(self._points, _ring_hash(key))
+        return self._owners[index % len(self._owners)]
+
+    def partition(self, keys: Iterable[str]) -> Dict[str, Set[str]]:
+        """Group keys by owning node (nodes without keys are omitted)"""
+        placement: Dict[str, Set[str]] = {}
+        for key in keys:
+            node = self.node_for(key)
+            if node is not None:
+                placement.setdefault(node, set()).add(key)
+        return placement
+
+
+class OptionShard:
+    """One upstream option stream connection: its account, socket, listener and subscribed symbols"""
+
+    def __init__(self, shard_id: str, account: Dict[str, Any]):
+        self.shard_id = shard_id
+        self.account = account
+        self.ws: Any = None
+        self.connected = False
+        self.listener: Optional[asyncio.Task] = None
+        self.pipeline: Any = None  # FeedPipeline feeding the shared fan-out, set by the manager
+        self.reconnector: Any = None  # FeedReconnector restoring the connection after a drop, set by the manager
+
+        self.connection_lock = asyncio.Lock()
+        self.listener_lock = asyncio.Lock()
+        self.recv_lock = asyncio.Lock()
+
+        # Symbols placed on this shard by the last sync, and those actually subscribed upstream
+        self.desired: Set[str] = set()
+        self.symbols: Set[str] = set()
+
+        self.connects = 0
+        self.disconnects = 0
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Get shard statistics"""
+        return {
+            "account": self.account.get("name"),
+            "connected": self.connected,
+            "desired_symbols": len(self.desired),
+            "subscribed_symbols": len(self.symbols),
+            "connects": self.connects,
+            "disconnects": self.disconnects,
+            "reconnect": self.reconnector.get_stats() if self.reconnector else None,
+            "pipeline": self.pipeline.get_stats() if self.pipeline else None
+        }
+
+
+def option_shard_accounts(account_configs: Dict[str, Any]) -> List[Tuple[str, Dict[str, Any]]]:
+    """Enabled option stream accounts as (account id, credentials), sorted by account id"""
+    accounts = []
+    for account_id in sorted(account_configs):
+        if account_id != OPTION_SHARD_PREFIX and not account_id.startswith(OPTION_SHARD_PREFIX + "_"):
+            continue
+        config = account_configs[account_id]
+        if not config.enabled:
+            continue
+        accounts.append((account_id, {
+            'name': config.account_name or account_id,
+            'api_key': config.api_key,
+            'secret_key': config.secret_key
+        }))
+    return accounts
+
+
+def load_ring_replicas() -> int:
+    """Virtual nodes per shard from websocket.option_shards.replicas"""
+    websocket_settings = getattr(settings, 'websocket', None)
+    shard_settings = websocket_settings.get('option_shards') if isinstance(websocket_settings, dict) else None
+    if not isinstance(shard_settings, dict):
+        return 100
+    return int(shard_settings.get('replicas', 100))
@@ -0,0 +1,181 @@
+"""
+WebSocket subscription registry - symbol -> subscribers inverted index
+Writers publish immutable snapshots (copy-on-write), so broadcast readers never take a lock
+"""
+
+import threading
+from types import MappingProxyType
+from typing import Any, Dict, FrozenSet, Iterable, Mapping, Set, Tuple
+
+# (client_id, connection) pairs subscribed to one symbol
+Subscribers = Tuple[Tuple[str, Any], ...]
+
+_NO_SUBSCRIBERS: Subscribers = ()
+
+
+class SubscriptionRegistry:
+    """
+    Client connections and their symbol subscriptions
+
+    Subscribe, unsubscribe and disconnect serialize on a writer lock and publish a new
+    symbol index; ``subscribers()`` is a plain dict lookup on the current snapshot, so
+    per-tick fan-out costs O(subscribers of that symbol) and never contends with writers.
+    The length of a symbol's subscriber tuple is its reference count: writers report the
+    symbols whose count went 0 -> 1 or 1 -> 0, which are the only upstream changes needed.
+    """
+
+    def __init__(self):
+        self._write_lock = threading.Lock()
+        self._connections: Dict[str, Any] = {}  # client_id -> connection (client session)
+        self._client_symbols: Dict[str, Set[str]] = {}
+
+        # Published snapshot - replaced wholesale, never mutated after publication
+        self._index: Mapping[str, Subscribers] = MappingProxyType({})
+        self.version = 0
+
+    # ---- Lock-free readers -------------------------------------------------
+
+    def subscribers(self, symbol: str) -> Subscribers:
+        """Clients subscribed to a symbol (immutable snapshot)"""
+        return self._index.get(symbol, _NO_SUBSCRIBERS)
+
+    def symbols(self) -> FrozenSet[str]:
+        """Symbols with at least one subscriber"""
+        return frozenset(self._index)
+
+    def has_symbols(self) -> bool:
+        return bool(self._index)
+
+    def subscriber_count(self, symbol: str) -> int:
+        return len(self._index.get(symbol, _NO_SUBSCRIBERS))
+
+    def client_symbols(self, client_id: str) -> FrozenSet[str]:
+        """Symbols one client is subscribed to"""
+        return frozenset(self._client_symbols.get(client_id, ()))
+
+    def get_connection(self, client_id: str) -> Any:
+        return self._connections.get(client_id)
+
+    @property
+    def connections(self) -> Mapping[str, Any]:
+        """Read-only view of client_id -> connection"""
+        return MappingProxyType(self._connections)
+
+    @property
+    def client_subscriptions(self) -> Mapping[str, Set[str]]:
+        """Read-only view of client_id -> subscribed symbols"""
+        return MappingProxyType(self._client_symbols)
+
+    @property
+    def client_count(self) -> int:
+        return len(self._connections)
+
+    @property
+    def subscribed_client_count(self) -> int:
+        return len(self._client_symbols)
+
+    # ---- Writers ------------------------------------------------------------
+
+    def _publish(self, changes: Dict[str, Subscribers]):
+        """Publish a new index with the given symbol entries replaced (empty tuple removes)"""
+        index = dict(self._index)
+        for symbol, subscribers in changes.items():
+            if subscribers:
+                index[symbol] = subscribers
+            else:
+                index.pop(symbol, None)
+        self._index = MappingProxyType(index)
+        self.version += 1
+
+    def add_client(self, client_id: str, connection: Any):
+        """Register a connected client"""
+        with self._write_lock:
+            self._connections[client_id] = connection
+
+    def subscribe(self, client_id: str, symbols: Iterable[str]) -> Set[str]:
+        """
+        Subscribe a registered client to symbols
+
+        Returns symbols that had no subscribers before (need an upstream subscribe).
+        """
+        with self._write_lock:
+            connection = self._connections.get(client_id)
+            if connection is None:
+                return set()
+
+            client_symbols = self._client_symbols.setdefault(client_id, set())
+            new_symbols = set(symbols) - client_symbols
+            if not new_symbols:
+                return set()
+            client_symbols.update(new_symbols)
+
+            first_subscribers = set()
+            changes = {}
+            for symbol in new_symbols:
+                current = self._index.get(symbol, _NO_SUBSCRIBERS)
+                if not current:
+                    first_subscribers.add(symbol)
+                changes[symbol] = current + ((client_id, connection),)
+            self._publish(changes)
+            return first_subscribers
+
+    def _drop_symbols(self, client_id: str, symbols: Set[str]) -> Set[str]:
+        """Remove client_id from the given symbols; returns symbols left without subscribers"""
+        orphaned = set()
+        changes = {}
+        for symbol in symbols:
+            remaining = tuple(entry for entry in self._index.get(symbol, _NO_SUBSCRIBERS) if entry[0] != client_id)
+            if not remaining:
+                orphaned.add(symbol)
+            changes[symbol] = remaining
+        if changes:
+            self._publish(changes)
+        return orphaned
+
+    def unsubscribe(self, client_id: str, symbols: Iterable[str]) -> Set[str]:
+        """
+        Unsubscribe a client from symbols
+
+        Returns symbols that no longer have any subscriber (need an upstream unsubscribe).
+        """
+        with self._write_lock:
+            client_symbols = self._client_symbols.get(client_id)
+            if not client_symbols:
+                return set()
+            removed = client_symbols & set(symbols)
+            if not removed:
+                return set()
+            client_symbols -= removed
+            return self._drop_symbols(client_id, removed)
+
+    def remove_client(self, client_id: str) -> Set[str]:
+        """
+        Drop a client and all its subscriptions
+
+        Returns symbols that no longer have any subscriber (need an upstream unsubscribe).
+        """
+        with self._write_lock:
+            self._connections.pop(client_id, None)
+            client_symbols = self._client_symbols.pop(client_id, None)
+            if not client_symbols:
+                return set()
+            return self._drop_symbols(client_id, client_symbols)
+
+    def clear(self):
+        """Drop all clients and subscriptions"""
+        with self._write_lock:
+            self._connections.clear()
+            self._client_symbols.clear()
+            self._index = MappingProxyType({})
+            self.version += 1
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Get registry statistics"""
+        index = self._index
+        return {
+            "clients": len(self._connections),
+            "subscribed_clients": len(self._client_symbols),
+            "symbols": len(index),
+            "max_subscribers_per_symbol": max((len(entries) for entries in index.values()), default=0),
+            "version": self.version
+        }
@@ -1,4 +1,5 @@
 import os
+import sys
 import yaml
 from pathlib import Path
 from typing import Optional, List, Dict
@@ -164,6 +165,25 @@ class Settings(BaseSettings):
         'trading_days': [0, 1, 2, 3, 4]
     })
     
+    # Market Data Key Pool (data-only keys, separate from trading accounts)
+    market_data: Dict = secrets.get('market_data', {})
+    
+    # Circuit Breaker Configuration (per account and endpoint class)
+    circuit_breaker: Dict = secrets.get('circuit_breaker', {})
+    order_stream: Dict = secrets.get('order_stream', {})
+    
+    # WebSocket market data fan-out (per-client send queues)
+    websocket: Dict = secrets.get('websocket', {})
+    
+    # Background health probing (cached per-account health snapshots)
+    health_check: Dict = secrets.get('health_check', {})
+    
+    # Synthetic upstream probe (per account / market data key latency)
+    upstream_probe: Dict = secrets.get('upstream_probe', {})
+    
+    # Event loop lag sampling and slow-callback detection
+    loop_monitor: Dict = secrets.get('loop_monitor', {})
+    
     # Discord Configuration
     discord_config: Dict = secrets.get('discord', {
         'transaction_channel': None
@@ -180,4 +200,4 @@ class Settings(BaseSettings):
 # 创建设置实例
 settings = Settings()
 
-print(f"Configuration loaded: {len(settings.accounts)} accounts from database")
\ No newline at end of file
+print(f"Configuration loaded: {len(settings.accounts)} accounts from database", file=sys.stderr)
\ No newline at end of file
@@ -4,15 +4,20 @@
 """
 Comprehensive Health Check for Alpaca Trading Service
 Tests all API endpoints with correct accounts to ensure everything works.
+Accounts are checked concurrently (bounded by --concurrency) and results can be
+emitted as JSON or streamed as NDJSON for cron and CI.
 """
 
+import argparse
 import asyncio
+import json
 import sys
 import os
+import threading
 import time
 import yaml
 from datetime import datetime, timedelta
-from typing import Dict, List, Any
+from typing import Dict, List, Any, AsyncIterator, Callable, Optional, Tuple
 
 # Add project path
 sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
@@ -27,19 +32,34 @@ from rich.text import Text
 from rich.progress import Progress, SpinnerColumn, TextColumn, TimeElapsedColumn
 from rich import box
 
+# Result shape of a check that raised or timed out, per check
+_CHECK_ERROR_RESULTS = {
+    "basics": {"account_number": "N/A", "equity": 0, "buying_power": 0, "cash": 0, "positions_count": 0,
+               "positions": []},
+    "stock": {"endpoints": {}},
+    "options": {"endpoints": {}, "working_endpoints": 0, "total_endpoints": 0},
+    "trading": {"endpoints": {}, "working_endpoints": 0, "total_endpoints": 0}
+}
+
 class HealthChecker:
     """Comprehensive health checker for all API endpoints and accounts"""
     
-    def __init__(self):
+    def __init__(self, concurrency: int = 10, check_timeout: float = 30.0):
         self.pool = None
         self.results = {}
         self.console = Console()
         self.secrets_config = None
+        self.concurrency = max(1, concurrency)
+        self.check_timeout = check_timeout
         
     async def initialize(self):
-        """Initialize account pool and load secrets configuration"""
+        """Load account configurations and secrets configuration
+        
+        Only the account configs are loaded: the checks exercise every account themselves,
+        so the pool's one-by-one connection tests would just add startup time.
+        """
         self.pool = get_account_pool()
-        await self.pool.initialize()
+        await self.pool.load_configs()
         
         # Load secrets configuration
         try:
@@ -52,6 +72,51 @@ class HealthChecker:
             
         logger.info(f"Health checker initialized with {len(self.pool.account_configs)} accounts")
     
+    @staticmethod
+    def _run_in_thread(check) -> asyncio.Future:
+        """Run a check coroutine on its own daemon thread with its own event loop
+        
+        AlpacaClient calls block, so checks cannot share the main loop. Daemon threads are not
+        joined at interpreter exit, so a check abandoned after a timeout cannot keep the CLI alive
+        (ThreadPoolExecutor workers would be joined, however long the hung request takes).
+        """
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        
+        def resolve(result=None, error: Optional[BaseException] = None):
+            if future.done():
+                return
+            if error is not None:
+                future.set_exception(error)
+            else:
+                future.set_result(result)
+        
+        def run():
+            try:
+                result, error = asyncio.run(check), None
+            except BaseException as e:
+                result, error = None, e
+            try:
+                loop.call_soon_threadsafe(resolve, result, error)
+            except RuntimeError:
+                pass  # main loop already closed: the check was abandoned
+        
+        threading.Thread(target=run, name="healthcheck", daemon=True).start()
+        return future
+    
+    async def _run_check(self, name: str, check) -> Dict[str, Any]:
+        """Run one check coroutine on a daemon thread, bounded by check_timeout
+        
+        Never raises: errors and timeouts become an ERROR result of the check's shape.
+        """
+        try:
+            return await asyncio.wait_for(self._run_in_thread(check), timeout=self.check_timeout)
+        except asyncio.TimeoutError:
+            error = f"{name} check timed out after {self.check_timeout:.0f}s"
+        except Exception as e:
+            error = str(e)
+        return {"status": "ERROR", "error": error, **_CHECK_ERROR_RESULTS[name]}
+    
     def check_secrets_configuration(self) -> Dict[str, Any]:
         """Check secrets.yml configuration completeness"""
         logger.debug("🔐 Checking secrets configuration")
@@ -640,48 +705,14 @@ class HealthChecker:
         """
         logger.info(f"🔍 Starting comprehensive health check for account: {account_id}")
         
-        # Run all checks in parallel for better performance
-        try:
-            # Prepare tasks based on options chain setting
-            tasks = [
-                self.check_account_basics(account_id),
-                self.check_stock_endpoints(account_id),
-                self.check_trading_endpoints(account_id)
-            ]
-            
-            if include_options_chain:
-                tasks.append(self.check_options_endpoints(account_id))
-            else:
-                # Add a placeholder for options endpoints when disabled
-                tasks.append(asyncio.create_task(self._get_disabled_options_result()))
-            
-            basics, stock_endpoints, trading_endpoints, options_endpoints = await asyncio.gather(
-                *tasks,
-                return_exceptions=True
-            )
-            
-            # Handle exceptions from parallel execution
-            if isinstance(basics, Exception):
-                basics = {"status": "ERROR", "error": str(basics), "account_number": "N/A", 
-                         "equity": 0, "buying_power": 0, "cash": 0, "positions_count": 0}
-            if isinstance(stock_endpoints, Exception):
-                stock_endpoints = {"status": "ERROR", "error": str(stock_endpoints), "endpoints": {}}
-            if isinstance(options_endpoints, Exception):
-                options_endpoints = {"status": "ERROR", "error": str(options_endpoints), 
-                                   "endpoints": {}, "working_endpoints": 0, "total_endpoints": 0}
-            if isinstance(trading_endpoints, Exception):
-                trading_endpoints = {"status": "ERROR", "error": str(trading_endpoints), 
-                                   "endpoints": {}, "working_endpoints": 0, "total_endpoints": 0}
-                
-        except Exception as e:
-            logger.error(f"Unexpected error in parallel check for {account_id}: {e}")
-            basics = {"status": "ERROR", "error": f"Parallel execution failed: {e}", "account_number": "N/A", 
-                     "equity": 0, "buying_power": 0, "cash": 0, "positions_count": 0}
-            stock_endpoints = {"status": "ERROR", "error": f"Parallel execution failed: {e}", "endpoints": {}}
-            options_endpoints = {"status": "ERROR", "error": f"Parallel execution failed: {e}", 
-                               "endpoints": {}, "working_endpoints": 0, "total_endpoints": 0}
-            trading_endpoints = {"status": "ERROR", "error": f"Parallel execution failed: {e}", 
-                               "endpoints": {}, "working_endpoints": 0, "total_endpoints": 0}
+        # Run all checks concurrently, each on its own daemon thread
+        basics, stock_endpoints, trading_endpoints, options_endpoints = await asyncio.gather(
+            self._run_check("basics", self.check_account_basics(account_id)),
+            self._run_check("stock", self.check_stock_endpoints(account_id)),
+            self._run_check("trading", self.check_trading_endpoints(account_id)),
+            self._run_check("options", self.check_options_endpoints(account_id)) if include_options_chain
+            else self._get_disabled_options_result()
+        )
         
         # Determine overall status
         if basics["status"] == "ERROR":
@@ -703,9 +734,6 @@ class HealthChecker:
             "trading_endpoints": trading_endpoints
         }
         
-        # Log one-line summary as requested
-        self._log_account_summary(account_id, result)
-        
         return result
     
     def _log_account_summary(self, account_id: str, result: Dict[str, Any]):
@@ -731,10 +759,10 @@ class HealthChecker:
         
         summary = (
             f"{emoji} {account_id}: {result['overall_status']} | "
-            f"Account#{basics['account_number']} | "
-            f"Equity=${basics['equity']:,.2f} | "
-            f"Cash=${basics['cash']:,.2f} | "
-            f"Positions={basics['positions_count']} | "
+            f"Account#{basics.get('account_number', 'N/A')} | "
+            f"Equity=${basics.get('equity', 0):,.2f} | "
+            f"Cash=${basics.get('cash', 0):,.2f} | "
+            f"Positions={basics.get('positions_count', 0)} | "
             f"Stock:{stock_status} | "
             f"Options:{options_status} | "
             f"Trading:{trading_status}"
@@ -748,7 +776,7 @@ class HealthChecker:
             logger.error(summary)
         
         # Display position time table
-        self._display_position_time_table(result["basics"]["positions"])
+        self._display_position_time_table(basics.get("positions", []))
     
     def _display_position_time_table(self, positions: List[Dict[str, Any]]):
         """Display a table showing position hold times"""
@@ -986,11 +1014,43 @@ class HealthChecker:
             padding=(1, 2)
         )
     
-    async def check_all_accounts(self, include_options_chain: bool = False) -> Dict[str, Any]:
-        """Check all configured accounts and endpoints in parallel
+    def _failed_account_result(self, account_id: str, error: Exception) -> Dict[str, Any]:
+        """Result of an account whose check raised"""
+        return {
+            "account_id": account_id,
+            "overall_status": "CRITICAL",
+            "timestamp": datetime.now().isoformat(),
+            "error": f"Account check failed: {error}",
+            "basics": {"status": "ERROR", "error": str(error), **_CHECK_ERROR_RESULTS["basics"]},
+            "stock_endpoints": {"status": "ERROR", "error": str(error), **_CHECK_ERROR_RESULTS["stock"]},
+            "options_endpoints": {"status": "ERROR", "error": str(error), **_CHECK_ERROR_RESULTS["options"]},
+            "trading_endpoints": {"status": "ERROR", "error": str(error), **_CHECK_ERROR_RESULTS["trading"]}
+        }
+    
+    async def iter_account_checks(self, account_ids: List[str],
+                                  include_options_chain: bool = False) -> AsyncIterator[Tuple[str, Dict[str, Any]]]:
+        """Check accounts with at most `concurrency` in flight, yielding (account_id, result) as each finishes"""
+        semaphore = asyncio.Semaphore(self.concurrency)
+        
+        async def check(account_id: str) -> Tuple[str, Dict[str, Any]]:
+            async with semaphore:
+                try:
+                    return account_id, await self.check_single_account(account_id, include_options_chain)
+                except Exception as e:
+                    logger.error(f"Failed to check account {account_id}: {e}")
+                    return account_id, self._failed_account_result(account_id, e)
+        
+        for finished in asyncio.as_completed([check(account_id) for account_id in account_ids]):
+            yield await finished
+    
+    async def check_all_accounts(self, include_options_chain: bool = False, show_progress: bool = True,
+                                 on_result: Optional[Callable[[str, Dict[str, Any]], None]] = None) -> Dict[str, Any]:
+        """Check all configured accounts and endpoints concurrently
         
         Args:
             include_options_chain: If True, includes options chain processing (slow operation)
+            show_progress: Show a Rich progress bar while accounts are checked
+            on_result: Called with (account_id, result) as soon as each account finishes
         """
         start_time = time.time()
         logger.info("🚀 Starting comprehensive health check for all accounts and endpoints")
@@ -1018,57 +1078,32 @@ class HealthChecker:
                 "accounts": {}
             }
         
-        logger.info(f"Checking {len(enabled_accounts)} accounts in parallel...")
+        logger.info(f"Checking {len(enabled_accounts)} accounts, {self.concurrency} at a time...")
         parallel_start = time.time()
         
-        # Create progress bar
+        results = {}
         with Progress(
             SpinnerColumn(),
             TextColumn("[progress.description]{task.description}"),
             TimeElapsedColumn(),
             console=self.console,
-            transient=True
+            transient=True,
+            disable=not show_progress
         ) as progress:
             task = progress.add_task("Running health checks...", total=len(enabled_accounts))
             
-            # Run all account checks in parallel
-            try:
-                results = await asyncio.gather(
-                    *[self.check_single_account(account_id, include_options_chain) for account_id in enabled_accounts],
-                    return_exceptions=True
-                )
-                progress.update(task, completed=len(enabled_accounts))
-                
-                parallel_time = time.time() - parallel_start
-                logger.info(f"⚡ Parallel execution completed in {parallel_time:.2f} seconds")
-                
-                # Process results
-                self.results = {}
-                healthy_count = 0
-                
-                for i, result in enumerate(results):
-                    account_id = enabled_accounts[i]
-                    
-                    if isinstance(result, Exception):
-                        logger.error(f"Failed to check account {account_id}: {result}")
-                        self.results[account_id] = {
-                            "account_id": account_id,
-                            "overall_status": "CRITICAL",
-                            "timestamp": datetime.now().isoformat(),
-                            "error": f"Account check failed: {result}",
-                            "basics": {"status": "ERROR", "error": str(result)},
-                            "market_data": {"status": "ERROR", "error": str(result)},
-                            "orders": {"status": "ERROR", "error": str(result)}
-                        }
-                    else:
-                        self.results[account_id] = result
-                        if result["overall_status"] == "HEALTHY":
-                            healthy_count += 1
-                            
-            except Exception as e:
-                logger.error(f"Critical error during parallel account checks: {e}")
-                # Fallback to sequential processing
-                return await self._fallback_sequential_check(enabled_accounts)
+            async for account_id, result in self.iter_account_checks(enabled_accounts, include_options_chain):
+                results[account_id] = result
+                progress.advance(task)
+                if on_result:
+                    on_result(account_id, result)
+        
+        parallel_time = time.time() - parallel_start
+        logger.info(f"⚡ Parallel execution completed in {parallel_time:.2f} seconds")
+        
+        # Keep configuration order for the report
+        self.results = {account_id: results[account_id] for account_id in enabled_accounts}
+        healthy_count = sum(1 for result in self.results.values() if result["overall_status"] == "HEALTHY")
         
         # Overall summary
         total_accounts = len(self.results)
@@ -1086,6 +1121,7 @@ class HealthChecker:
             "parallel_execution_time": parallel_time,
             "avg_time_per_account": total_time / total_accounts if total_accounts > 0 else 0,
             "performance_mode": "parallel",
+            "concurrency": self.concurrency,
             "secrets_configuration": secrets_check,
             "accounts": self.results
         }
@@ -1239,51 +1275,6 @@ class HealthChecker:
             "accounts": self.results
         }
     
-    async def _fallback_sequential_check(self, enabled_accounts: List[str]) -> Dict[str, Any]:
-        """Fallback to sequential checking if parallel fails"""
-        sequential_start = time.time()
-        logger.warning("Falling back to sequential account checking")
-        
-        self.results = {}
-        healthy_count = 0
-        
-        for account_id in enabled_accounts:
-            try:
-                result = await self.check_single_account(account_id)
-                self.results[account_id] = result
-                
-                if result["overall_status"] == "HEALTHY":
-                    healthy_count += 1
-                    
-            except Exception as e:
-                logger.error(f"Sequential check failed for account {account_id}: {e}")
-                self.results[account_id] = {
-                    "account_id": account_id,
-                    "overall_status": "CRITICAL",
-                    "timestamp": datetime.now().isoformat(),
-                    "error": f"Sequential check failed: {e}",
-                    "basics": {"status": "ERROR", "error": str(e)},
-                    "market_data": {"status": "ERROR", "error": str(e)},
-                    "orders": {"status": "ERROR", "error": str(e)}
-                }
-        
-        total_accounts = len(self.results)
-        sequential_time = time.time() - sequential_start
-        
-        logger.info(f"📊 Sequential Health Check Complete: {healthy_count}/{total_accounts} accounts healthy")
-        logger.info(f"⏱️  Sequential execution time: {sequential_time:.2f} seconds ({sequential_time/total_accounts:.2f}s per account)")
-        
-        return {
-            "timestamp": datetime.now().isoformat(),
-            "total_accounts": total_accounts,
-            "healthy_accounts": healthy_count,
-            "success_rate": f"{(healthy_count/total_accounts)*100:.1f}%" if total_accounts > 0 else "0%",
-            "execution_time": sequential_time,
-            "avg_time_per_account": sequential_time / total_accounts if total_accounts > 0 else 0,
-            "performance_mode": "sequential_fallback",
-            "accounts": self.results
-        }
-    
     async def check_specific_account(self, account_id: str, include_options_chain: bool = False) -> Dict[str, Any]:
         """Check a specific account"""
         if account_id not in self.pool.account_configs:
@@ -1296,98 +1287,145 @@ class HealthChecker:
         
         return await self.check_single_account(account_id, include_options_chain)
 
-async def main():
+def _exit_status(account_results: List[Dict[str, Any]]) -> int:
+    """0 when no account is CRITICAL/DEGRADED (or failed outright), else 2"""
+    failing = [result for result in account_results
+               if "overall_status" not in result or result["overall_status"] in ("CRITICAL", "DEGRADED")]
+    return 2 if failing else 0
+
+def _print_json(data: Dict[str, Any], indent: Optional[int] = None):
+    print(json.dumps(data, default=str, ensure_ascii=False, indent=indent), flush=True)
+
+def _parse_args(argv: List[str]) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Comprehensive health check for all Alpaca accounts")
+    parser.add_argument("account_id", nargs="?", help="check only this account")
+    parser.add_argument("--include-options-chain", action="store_true", help="include options endpoints (slow)")
+    parser.add_argument("--parallel-trading", action="store_true", help="run trading checks for all accounts first")
+    parser.add_argument("--output", choices=["rich", "json", "ndjson"], default="rich",
+                        help="rich tables, one JSON document, or one JSON line per account as it finishes")
+    parser.add_argument("--concurrency", type=int, default=10, help="accounts checked at the same time")
+    parser.add_argument("--timeout", type=float, default=30.0, help="seconds allowed per check")
+    return parser.parse_args(argv)
+
+async def main(argv: Optional[List[str]] = None):
     """Main health check function
     
     Usage:
         python healthcheck.py                                    # Check all accounts (options chain disabled)
         python healthcheck.py --include-options-chain            # Check all accounts with options chain
-        python healthcheck.py --parallel-trading                 # Check all accounts with parallel trading (FASTEST)
-        python healthcheck.py --parallel-trading --include-options-chain  # Full parallel check with options
+        python healthcheck.py --parallel-trading                 # Check all accounts with parallel trading
         python healthcheck.py account_id                         # Check specific account (options chain disabled)
         python healthcheck.py account_id --include-options-chain # Check specific account with options chain
+        python healthcheck.py --output ndjson --concurrency 20   # One JSON line per account as it finishes
+        python healthcheck.py --output json --timeout 15         # One JSON document (cron / CI)
         
-    Performance Modes:
-        Default: ~12 seconds per account (sequential trading operations)
-        --parallel-trading: ~3-5 seconds per account (parallel trading operations)
+    Performance:
+        Accounts are checked --concurrency at a time; each account's basics, stock, trading
+        and options checks run at the same time on daemon threads, each bounded by --timeout.
         --include-options-chain: Adds ~3-4 seconds per account (options chain processing)
+    
+    Exit status: 0 healthy, 1 health check could not run, 2 any account CRITICAL or DEGRADED
     """
-    checker = HealthChecker()
+    args = _parse_args(sys.argv[1:] if argv is None else argv)
+    machine_output = args.output != "rich"
+    checker = HealthChecker(concurrency=args.concurrency, check_timeout=args.timeout)
     
     try:
         await checker.initialize()
         
-        # Parse command line arguments
-        include_options_chain = "--include-options-chain" in sys.argv
-        use_parallel_trading = "--parallel-trading" in sys.argv
+        include_options_chain = args.include_options_chain
         
         # Check if specific account was requested
-        if len(sys.argv) > 1 and not sys.argv[1].startswith("--"):
-            account_id = sys.argv[1]
+        if args.account_id:
+            account_id = args.account_id
             logger.info(f"🎯 Running health check for specific account: {account_id}")
             result = await checker.check_specific_account(account_id, include_options_chain)
-            print(f"\nResult: {result}")
-        else:
-            # Check all accounts
-            if use_parallel_trading:
-                logger.info("🚀 Using parallel trading approach for maximum speed")
-                result = await checker.check_all_accounts_parallel(include_options_chain=include_options_chain)
+            if machine_output:
+                _print_json({"type": "account", **result} if args.output == "ndjson" else result,
+                            indent=None if args.output == "ndjson" else 2)
             else:
-                result = await checker.check_all_accounts(include_options_chain=include_options_chain)
-            
-            # Display secrets configuration panel
-            secrets_config = result.get("secrets_configuration", {})
-            if secrets_config:
-                secrets_panel = checker._create_secrets_panel(secrets_config)
-                checker.console.print(secrets_panel)
-                checker.console.print()
-            
-            # Display Rich summary panel
-            summary_panel = checker._create_summary_panel(result)
-            checker.console.print(summary_panel)
-            checker.console.print()
-            
-            # Display Rich health table
-            health_table = checker._create_health_table(result["accounts"])
-            checker.console.print(health_table)
+                if "overall_status" in result:
+                    checker._log_account_summary(account_id, result)
+                print(f"\nResult: {result}")
+            return _exit_status([result])
+        
+        # Check all accounts
+        if args.parallel_trading:
+            logger.info("🚀 Using parallel trading approach for maximum speed")
+            result = await checker.check_all_accounts_parallel(include_options_chain=include_options_chain)
+            if args.output == "ndjson":
+                for account_result in result["accounts"].values():
+                    _print_json({"type": "account", **account_result})
+        elif args.output == "ndjson":
+            # Stream each account as soon as it finishes
+            result = await checker.check_all_accounts(
+                include_options_chain, show_progress=False,
+                on_result=lambda account_id, account_result: _print_json({"type": "account", **account_result}))
+        else:
+            result = await checker.check_all_accounts(
+                include_options_chain, show_progress=not machine_output,
+                on_result=None if machine_output else checker._log_account_summary)
+        
+        if args.output == "json":
+            _print_json(result, indent=2)
+            return _exit_status(list(result["accounts"].values()))
+        if args.output == "ndjson":
+            _print_json({"type": "summary", **{k: v for k, v in result.items() if k != "accounts"}})
+            return _exit_status(list(result["accounts"].values()))
+        
+        # Display secrets configuration panel
+        secrets_config = result.get("secrets_configuration", {})
+        if secrets_config:
+            secrets_panel = checker._create_secrets_panel(secrets_config)
+            checker.console.print(secrets_panel)
             checker.console.print()
-            
-            # Display any issues in a separate panel
-            issues = []
-            for account_id, account_result in result["accounts"].items():
-                if account_result["overall_status"] != "HEALTHY":
-                    issue_text = f"[bold red]{account_id}:[/bold red] {account_result['overall_status']}"
-                    
-                    # Add specific endpoint errors
-                    if account_result["basics"].get("error"):
-                        issue_text += f"\n   Account Error: {account_result['basics']['error']}"
-                    if account_result["stock_endpoints"].get("error"):
-                        issue_text += f"\n   Stock APIs Error: {account_result['stock_endpoints']['error']}"
-                    if account_result["options_endpoints"].get("error"):
-                        issue_text += f"\n   Options APIs Error: {account_result['options_endpoints']['error']}"
-                    if account_result["trading_endpoints"].get("error"):
-                        issue_text += f"\n   Trading APIs Error: {account_result['trading_endpoints']['error']}"
-                    
-                    issues.append(issue_text)
-            
-            if issues:
-                issues_panel = Panel(
-                    "\n\n".join(issues),
-                    title="⚠️ Issues Found",
-                    border_style="red",
-                    padding=(1, 2)
-                )
-                checker.console.print(issues_panel)
-            else:
-                success_panel = Panel(
-                    "🎉 All accounts are healthy! No issues found.",
-                    title="✅ Perfect Health",
-                    border_style="green",
-                    padding=(1, 2)
-                )
-                checker.console.print(success_panel)
         
-        return 0
+        # Display Rich summary panel
+        summary_panel = checker._create_summary_panel(result)
+        checker.console.print(summary_panel)
+        checker.console.print()
+        
+        # Display Rich health table
+        health_table = checker._create_health_table(result["accounts"])
+        checker.console.print(health_table)
+        checker.console.print()
+        
+        # Display any issues in a separate panel
+        issues = []
+        for account_id, account_result in result["accounts"].items():
+            if account_result["overall_status"] != "HEALTHY":
+                issue_text = f"[bold red]{account_id}:[/bold red] {account_result['overall_status']}"
+                
+                # Add specific endpoint errors
+                if account_result["basics"].get("error"):
+                    issue_text += f"\n   Account Error: {account_result['basics']['error']}"
+                if account_result["stock_endpoints"].get("error"):
+                    issue_text += f"\n   Stock APIs Error: {account_result['stock_endpoints']['error']}"
+                if account_result["options_endpoints"].get("error"):
+                    issue_text += f"\n   Options APIs Error: {account_result['options_endpoints']['error']}"
+                if account_result["trading_endpoints"].get("error"):
+                    issue_text += f"\n   Trading APIs Error: {account_result['trading_endpoints']['error']}"
+                
+                issues.append(issue_text)
+        
+        if issues:
+            issues_panel = Panel(
+                "\n\n".join(issues),
+                title="⚠️ Issues Found",
+                border_style="red",
+                padding=(1, 2)
+            )
+            checker.console.print(issues_panel)
+        else:
+            success_panel = Panel(
+                "🎉 All accounts are healthy! No issues found.",
+                title="✅ Perfect Health",
+                border_style="green",
+                padding=(1, 2)
+            )
+            checker.console.print(success_panel)
+        
+        return _exit_status(list(result["accounts"].values()))
         
     except Exception as e:
         logger.error(f"Health check failed: {e}")
@@ -3,14 +3,16 @@ from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.security import HTTPBearer
 from fastapi.staticfiles import StaticFiles
-from fastapi.responses import HTMLResponse
+from fastapi.responses import HTMLResponse, Response
 from fastapi.openapi.docs import get_swagger_ui_html
 from app.routes import router
 from app.middleware import (
-    AuthenticationMiddleware, RateLimitMiddleware, LoggingMiddleware, is_internal_ip
+    AuthenticationMiddleware, RateLimitMiddleware, LoggingMiddleware, MetricsMiddleware, HandlerTimingMiddleware,
+    is_internal_ip
 )
 from app.logging_config import logging_config
 from app.account_pool import account_pool
+from app.order_book import order_book_manager
 from app.market_utils import init_market_checker
 from config import settings
 from loguru import logger
@@ -60,6 +62,43 @@ async def lifespan(app: FastAPI):
         logger.error(f"Failed to initialize account pool: {e}")
         raise
     
+    # Start trade-updates streams (in-memory order book)
+    try:
+        await order_book_manager.start(account_pool)
+    except Exception as e:
+        logger.error(f"Failed to start order book streams: {e}")
+        # Don't raise - open orders fall back to REST
+    
+    # Multi-worker WebSocket fan-out (websocket.fanout.mode: redis)
+    try:
+        from app.websocket_routes import ws_manager
+        await ws_manager.start_fanout()
+    except Exception as e:
+        logger.error(f"Failed to start WebSocket fan-out: {e}")
+        # Don't raise - each worker then owns its upstream feed
+    
+    # Background account health probing (health endpoints serve its cached snapshot)
+    try:
+        from app.health_routes import health_prober
+        health_prober.start()
+    except Exception as e:
+        logger.error(f"Failed to start health prober: {e}")
+    
+    # Event loop lag sampling and slow-callback detection (/metrics, /api/v1/debug/loop)
+    try:
+        from app.loop_monitor import loop_monitor
+        loop_monitor.start()
+    except Exception as e:
+        logger.error(f"Failed to start event loop monitor: {e}")
+    
+    # Synthetic upstream probe (per account / market data key latency during market hours)
+    try:
+        from app.upstream_metrics import upstream_probe
+        from app.alpaca_client import pooled_client
+        upstream_probe.start(pooled_client)
+    except Exception as e:
+        logger.error(f"Failed to start upstream probe: {e}")
+    
     if not settings.real_data_only or settings.enable_mock_data:
         logger.warning(
             "ALERT: Service is NOT configured for real-data-only mode!"
@@ -103,6 +142,32 @@ async def lifespan(app: FastAPI):
     except Exception as e:
         logger.error(f"Error stopping sell background service: {e}")
     
+    # Hand WebSocket feed leadership to another worker
+    try:
+        from app.websocket_routes import ws_manager
+        await ws_manager.stop_fanout()
+    except Exception as e:
+        logger.error(f"Error stopping WebSocket fan-out: {e}")
+    
+    try:
+        from app.health_routes import health_prober
+        await health_prober.stop()
+    except Exception as e:
+        logger.error(f"Error stopping health prober: {e}")
+    
+    try:
+        from app.upstream_metrics import upstream_probe
+        await upstream_probe.stop()
+    except Exception as e:
+        logger.error(f"Error stopping upstream probe: {e}")
+    
+    try:
+        from app.loop_monitor import loop_monitor
+        await loop_monitor.stop()
+    except Exception as e:
+        logger.error(f"Error stopping event loop monitor: {e}")
+    
+    await order_book_manager.shutdown()
     await account_pool.shutdown()
 
 # Create FastAPI application with JWT security scheme
@@ -219,6 +284,7 @@ async def custom_swagger_ui_html(request: Request):
     return HTMLResponse(html)
 
 # Add middleware in order (last added = first executed)
+app.add_middleware(HandlerTimingMiddleware)
 app.add_middleware(LoggingMiddleware)
 app.add_middleware(RateLimitMiddleware)
 app.add_middleware(AuthenticationMiddleware)
@@ -232,17 +298,22 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Request metrics - outermost so route latency includes the whole middleware stack
+app.add_middleware(MetricsMiddleware)
+
 # Include routers
 from app.auth_routes import auth_router, admin_router
 from app.websocket_routes import ws_router
 from app.health_routes import health_router
 from app.sell_routes import sell_router
+from app.debug_routes import debug_router
 app.include_router(auth_router, prefix="/api/v1")
 app.include_router(admin_router, prefix="/api/v1")
 app.include_router(health_router, prefix="/api/v1")
 app.include_router(router, prefix="/api/v1", tags=["trading"])
 app.include_router(ws_router, prefix="/api/v1", tags=["websocket"])
 app.include_router(sell_router, prefix="/api/v1", tags=["sell_module"])
+app.include_router(debug_router, prefix="/api/v1")
 
 # Mount static files
 app.mount("/static", StaticFiles(directory="static"), name="static")
@@ -258,6 +329,12 @@ async def root():
         "health": "/api/v1/health"
     }
 
+@app.get("/metrics", include_in_schema=False)
+async def metrics():
+    """Prometheus metrics (text exposition format)"""
+    from app.metrics import REGISTRY, CONTENT_TYPE
+    return Response(content=REGISTRY.render(), media_type=CONTENT_TYPE)
+
 @app.get("/health")
 async def basic_health_check():
     """Basic health check endpoint - fast response < 100ms"""
@@ -7,7 +7,7 @@ from unittest.mock import patch, MagicMock
 
 from tests.utils import RealAPITestClient, WebSocketTestManager, APITestHelper, WebSocketEndpoint
 from app.account_pool import AccountPool, AccountConfig
-from app.connection_pool import PoolManager, ConnectionType
+from app.connection_pool import ConnectionManager, ConnectionType
 from app.middleware import RateLimiter, create_jwt_token, verify_jwt_token
 
 
@@ -59,25 +59,17 @@ class TestConnectionPoolIntegration:
     """Test connection pool integration."""
     
     @pytest.mark.asyncio
-    async def test_connection_pool_with_real_users(self, primary_test_account):
-        """Test connection pool with real user credentials."""
-        pool = PoolManager(max_idle_time_minutes=30, health_check_interval_seconds=300)
-        
-        # Create mock user object
-        class MockUser:
-            def __init__(self, account):
-                self.id = account.credentials.account_id
-                self.api_key = account.credentials.api_key
-                self.secret_key = account.credentials.secret_key
-                self.alpaca_paper_trading = account.credentials.paper_trading
-            
-            def decrypt_alpaca_credentials(self):
-                return self.api_key, self.secret_key
-        
-        user = MockUser(primary_test_account)
+    async def test_connection_manager_with_real_account(self, primary_test_account):
+        """Test connection manager with real account credentials."""
+        credentials = primary_test_account.credentials
+        connection_manager = ConnectionManager(
+            user_id=credentials.account_id,
+            api_key=credentials.api_key,
+            secret_key=credentials.secret_key,
+            paper_trading=credentials.paper_trading
+        )
         
         # Test connection acquisition and usage
-        connection_manager = await pool.get_user_manager(user)
         trading_client = await connection_manager.get_connection(ConnectionType.TRADING_CLIENT)
         try:
             # Test connection functionality
@@ -86,7 +78,7 @@ class TestConnectionPoolIntegration:
             if is_healthy:
                 stats = connection_manager.connection_stats[ConnectionType.TRADING_CLIENT]
                 assert stats.is_healthy is True
-                assert connection_manager.user_id == user.id
+                assert connection_manager.user_id == credentials.account_id
                 assert connection_manager._in_use[ConnectionType.TRADING_CLIENT] is True
             else:
                 # Connection might fail in test environment
@@ -99,12 +91,15 @@ class TestConnectionPoolIntegration:
         # Connection should be released
         assert connection_manager._in_use[ConnectionType.TRADING_CLIENT] is False
         
-        # Test pool statistics
-        stats = pool.get_pool_stats()
-        assert stats["total_users"] == 1
+        # Shared REST clients are reused
+        assert connection_manager.get_client(ConnectionType.TRADING_CLIENT) is trading_client
+        
+        # Test connection statistics
+        stats = connection_manager.get_connection_stats()
+        assert stats["user_id"] == credentials.account_id
         assert stats["total_connections"] >= 1
         
-        await pool.shutdown()
+        await connection_manager.shutdown()
 
 
 class TestMiddlewareIntegration:
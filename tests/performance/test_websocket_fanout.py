@@ -0,0 +1,203 @@
+"""Performance benchmark for WebSocket broadcast fan-out (no upstream connection needed)."""
+
+import pytest
+import asyncio
+import random
+import time
+from unittest.mock import patch
+
+from app.ws_encoding import build_message
+from app.ws_subscriptions import SubscriptionRegistry
+from app.ws_clients import ClientSession
+
+
+class NullWebSocket:
+    """Client websocket stand-in that accepts frames without I/O."""
+
+    def __init__(self):
+        self.frames = 0
+        self.bytes = 0
+
+    async def send_text(self, message: str):
+        self.frames += 1
+        self.bytes += len(message)
+
+    async def send_bytes(self, message: bytes):
+        self.frames += 1
+        self.bytes += len(message)
+
+
+def build_registry(num_clients: int, num_symbols: int, symbols_per_client: int, seed: int = 7,
+                   message_format: str = "json"):
+    rng = random.Random(seed)
+    symbols = [f"SYM{i}" for i in range(num_symbols)]
+    registry = SubscriptionRegistry()
+    clients = []
+    for i in range(num_clients):
+        websocket = NullWebSocket()
+        session = ClientSession(f"client_{i}", websocket, message_format=message_format)
+        session.start()
+        registry.add_client(f"client_{i}", session)
+        registry.subscribe(f"client_{i}", rng.sample(symbols, symbols_per_client))
+        clients.append(websocket)
+    return registry, symbols, clients
+
+
+async def drain(registry: SubscriptionRegistry):
+    """Wait until every client writer has emptied its queue, then stop the writers"""
+    sessions = list(registry.connections.values())
+    while any(session.pending for session in sessions):
+        await asyncio.sleep(0)
+    for session in sessions:
+        await session.close()
+
+
+class TestWebSocketFanOutPerformance:
+    """Ticks per second through the decode and fan-out stages against client count."""
+
+    @pytest.mark.asyncio
+    @pytest.mark.parametrize("num_clients", [10, 100, 500, 1000])
+    async def test_broadcast_ticks_per_second(self, num_clients):
+        from app.websocket_routes import ws_manager
+
+        num_ticks = 5000
+        registry, symbols, clients = build_registry(num_clients, num_symbols=500, symbols_per_client=5)
+        rng = random.Random(11)
+        ticks = [{"T": "t", "S": rng.choice(symbols), "p": 100.25, "s": 10} for _ in range(num_ticks)]
+
+        with patch("app.websocket_routes.subscription_registry", registry):
+            start = time.perf_counter()
+            for tick in ticks:
+                await ws_manager._broadcast_message(build_message(tick, "stock"))
+            ingest_elapsed = time.perf_counter() - start
+            await drain(registry)
+            elapsed = time.perf_counter() - start
+
+        frames = sum(client.frames for client in clients)
+        print(f"WebSocket fan-out ({num_clients} clients, {num_ticks} ticks):")
+        print(f"  Ingest ticks/second: {num_ticks / ingest_elapsed:,.0f}")
+        print(f"  Ticks/second (delivered): {num_ticks / elapsed:,.0f}")
+        print(f"  Frames sent: {frames} ({frames / num_ticks:.2f} per tick)")
+
+        assert frames > 0
+
+    @pytest.mark.asyncio
+    async def test_slow_client_does_not_block_ingest(self):
+        """A client stuck in send must not slow down the upstream listener."""
+        from app.websocket_routes import ws_manager
+
+        class StuckWebSocket(NullWebSocket):
+            async def send_text(self, message: str):
+                await asyncio.sleep(3600)
+
+        registry, symbols, clients = build_registry(100, num_symbols=50, symbols_per_client=5)
+        stuck = ClientSession("stuck", StuckWebSocket())
+        stuck.start()
+        registry.add_client("stuck", stuck)
+        registry.subscribe("stuck", symbols)
+
+        ticks = [{"T": "q", "S": symbols[i % len(symbols)], "bp": 1.0, "ap": 1.1} for i in range(5000)]
+        with patch("app.websocket_routes.subscription_registry", registry):
+            start = time.perf_counter()
+            for tick in ticks:
+                await ws_manager._broadcast_message(build_message(tick, "stock"))
+            elapsed = time.perf_counter() - start
+            stuck_pending = stuck.pending
+            await stuck.close()
+            await drain(registry)
+
+        print(f"Ingest with one stuck client: {len(ticks) / elapsed:,.0f} ticks/second, "
+              f"stuck client pending={stuck_pending} conflated={stuck.conflated_quotes}")
+
+        assert stuck.conflated_quotes > 0
+        assert sum(client.frames for client in clients) > 0
+
+    @pytest.mark.asyncio
+    async def test_throttled_clients_send_fewer_frames(self):
+        """Clients with max_rate/min_change options only get what they consume."""
+        from app.websocket_routes import ws_manager
+        from app.ws_clients import SubscriptionOptions
+
+        registry, symbols, clients = build_registry(100, num_symbols=50, symbols_per_client=5)
+        options = SubscriptionOptions(max_rate=4, min_change=0.01)
+        for session in registry.connections.values():
+            session.set_options(registry.client_symbols(session.client_id), options)
+
+        rng = random.Random(3)
+        ticks = [{"T": "q", "S": rng.choice(symbols), "bp": 100 + rng.randint(0, 3) / 100, "ap": 100.05}
+                 for _ in range(5000)]
+        with patch("app.websocket_routes.subscription_registry", registry):
+            start = time.perf_counter()
+            for tick in ticks:
+                await ws_manager._broadcast_message(build_message(tick, "stock"))
+            elapsed = time.perf_counter() - start
+            await drain(registry)
+
+        frames = sum(client.frames for client in clients)
+        filtered = sum(session.filtered + session.throttled for session in registry.connections.values())
+        print(f"Throttled clients: {len(ticks) / elapsed:,.0f} ticks/second, frames sent={frames}, "
+              f"filtered or throttled={filtered}")
+
+        assert frames < filtered
+
+    @pytest.mark.asyncio
+    @pytest.mark.parametrize("message_format", ["json", "msgpack"])
+    async def test_downstream_format_frames_and_bytes(self, message_format):
+        """Frames and bytes on the wire per downstream format (msgpack batches pending ticks)."""
+        from app.websocket_routes import ws_manager
+
+        registry, symbols, clients = build_registry(200, num_symbols=50, symbols_per_client=10,
+                                                    message_format=message_format)
+        rng = random.Random(5)
+        ticks = [{"T": "t", "S": rng.choice(symbols), "p": 100.25, "s": 10, "t": "2025-01-02T15:04:05.123456Z"}
+                 for _ in range(5000)]
+        with patch("app.websocket_routes.subscription_registry", registry):
+            start = time.perf_counter()
+            for i, tick in enumerate(ticks):
+                await ws_manager._broadcast_message(build_message(tick, "stock"))
+                if i % 50 == 0:
+                    await asyncio.sleep(0)
+            await drain(registry)
+            elapsed = time.perf_counter() - start
+
+        frames = sum(client.frames for client in clients)
+        total_bytes = sum(client.bytes for client in clients)
+        print(f"Downstream {message_format}: {len(ticks) / elapsed:,.0f} ticks/second, "
+              f"frames={frames}, bytes={total_bytes:,}")
+
+        assert frames > 0
+
+    @pytest.mark.asyncio
+    @pytest.mark.parametrize("decode", ["inline", "thread"])
+    async def test_staged_pipeline_throughput(self, decode):
+        """Upstream msgpack frames through recv -> decode -> fan-out into 500 clients."""
+        import msgpack
+        from app.websocket_routes import ws_manager
+        from app.ws_pipeline import FeedPipeline, PipelineConfig, create_decode_executor
+
+        registry, symbols, clients = build_registry(500, num_symbols=500, symbols_per_client=5)
+        rng = random.Random(13)
+        frames = [msgpack.packb([{"T": "q", "S": rng.choice(symbols), "bp": 1.0, "ap": 1.1, "bs": 1, "as": 2}
+                                 for _ in range(20)]) for _ in range(1000)]
+        pending = iter(frames)
+
+        async def recv():
+            await asyncio.sleep(0)
+            return next(pending, None)
+
+        executor = create_decode_executor(decode, 2)
+        pipeline = FeedPipeline("option", "option", ws_manager._broadcast_message, PipelineConfig(), executor)
+        with patch("app.websocket_routes.subscription_registry", registry):
+            start = time.perf_counter()
+            await pipeline.run(recv)
+            elapsed = time.perf_counter() - start
+            await drain(registry)
+        if executor:
+            executor.shutdown()
+
+        stats = pipeline.get_stats()
+        print(f"Staged pipeline ({decode} decode, 500 clients): {stats['ticks'] / elapsed:,.0f} ticks/second, "
+              f"recv stalls={stats['recv_stalls']}, max raw depth={stats['queues']['raw_max_depth']}, "
+              f"decode p99={stats['latency']['decode']['p99_ms']}ms, fanout p99={stats['latency']['fanout']['p99_ms']}ms")
+
+        assert stats["ticks"] == 20000
@@ -0,0 +1,66 @@
+"""End-to-end WebSocket load tests against the local Alpaca stream simulator (no network access needed)."""
+
+import pytest
+import asyncio
+import time
+from unittest.mock import patch
+
+from app.ws_reconnect import ReconnectConfig
+from tests.utils.alpaca_stream_simulator import AlpacaStreamSimulator, SimulatorConfig
+from tests.performance.websocket_load_benchmark import BenchmarkConfig, run_benchmark
+
+
+async def wait_for(condition, timeout: float = 5.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        if time.monotonic() > deadline:
+            raise TimeoutError("condition not met")
+        await asyncio.sleep(0.01)
+
+
+class TestStreamSimulatorLoad:
+    """Manager against the simulator, and a small run of the load benchmark."""
+
+    @pytest.mark.asyncio
+    async def test_manager_streams_and_recovers_from_drop(self):
+        from app.websocket_routes import ws_manager
+
+        simulator = AlpacaStreamSimulator(SimulatorConfig(ticks_per_second=500, seed=1))
+        await simulator.start()
+        received = []
+
+        async def record(message):
+            received.append(message)
+
+        with patch.object(ws_manager, "STOCK_WS_URL", simulator.stock_url), \
+             patch.object(ws_manager, "_stock_account", {"name": "stock_ws", "api_key": "sim", "secret_key": "sim"}), \
+             patch.object(ws_manager._stock_pipeline, "emit", record), \
+             patch.object(ws_manager._stock_reconnector, "config", ReconnectConfig(initial_delay=0.05)):
+            try:
+                ws_manager._stock_desired = {"SIM1", "SIM2"}
+                await ws_manager._ensure_stock_connection()
+                await wait_for(lambda: len(received) >= 20)
+                assert {message.symbol for message in received} <= {"SIM1", "SIM2"}
+
+                await simulator.drop_connections()
+                await wait_for(lambda: ws_manager._stock_reconnector.reconnects == 1)
+                count = len(received)
+                await wait_for(lambda: len(received) >= count + 20)
+                assert simulator.connections_total == 2
+                assert ws_manager._stock_reconnector.get_stats()["last_outage_seconds"] < 2
+            finally:
+                ws_manager._stock_desired = set()
+                await ws_manager._stock_reconnector.stop()
+                await ws_manager._cleanup_stock_connection()
+                await simulator.stop()
+
+    @pytest.mark.asyncio
+    async def test_load_benchmark_small_run(self):
+        report = await run_benchmark(BenchmarkConfig(clients=20, symbols=50, rate=500, duration=2.0, warmup=1.0))
+
+        print(f"\n{report}")
+        assert report["active_clients"] == 20
+        assert report["upstream_ticks_per_second"] > 0
+        assert report["delivered_ticks_per_second"] > 0
+        assert report["latency_ms"]["samples"] > 0
+        assert report["latency_ms"]["p99"] < 1000
@@ -0,0 +1,300 @@
+"""
+Offline WebSocket fan-out load benchmark
+
+Runs the market data WebSocket endpoint against the local Alpaca stream simulator in a server
+subprocess, connects simulated clients over real sockets and reports delivered ticks per second,
+p50/p99 tick-to-client latency (simulator send time to client receive time) and server memory
+per client.
+
+    ALPACA_TESTING=true python -m tests.performance.websocket_load_benchmark --clients 2000 --rate 5000
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import socket
+import sys
+import time
+from dataclasses import dataclass, asdict
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+import httpx
+import msgpack
+import orjson
+import websockets
+
+
+@dataclass
+class BenchmarkConfig:
+    clients: int = 500
+    symbols: int = 500                   # symbol universe (option_share of it are option contracts)
+    symbols_per_client: int = 5
+    option_share: float = 0.2
+    option_shards: int = 1               # option_ws_* accounts / upstream option connections
+    rate: float = 2000.0                 # simulator ticks per second per upstream connection
+    duration: float = 10.0               # measurement window in seconds
+    warmup: float = 2.0
+    message_format: str = "json"
+    connect_concurrency: int = 200
+    seed: int = 7
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def _rss_bytes(pid: int) -> Optional[int]:
+    """Resident memory of a process (psutil when installed, else /proc)"""
+    try:
+        import psutil
+        return psutil.Process(pid).memory_info().rss
+    except ImportError:
+        pass
+    try:
+        with open(f"/proc/{pid}/status") as status:
+            for line in status:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        return None
+    return None
+
+
+def _percentile(values: List[float], q: float) -> float:
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(len(values) - 1, int(q * len(values)))]
+
+
+def _universe(config: BenchmarkConfig) -> List[str]:
+    option_count = int(config.symbols * config.option_share)
+    stocks = [f"SIM{i}" for i in range(config.symbols - option_count)]
+    options = [f"SIM{i % 100:02d}260116C{i:05d}000" for i in range(option_count)]
+    return stocks + options
+
+
+# ---------------------------------------------------------------- server side (subprocess)
+
+async def _serve(port: int, rate: float, option_shards: int):
+    import uvicorn
+    from fastapi import FastAPI
+    from loguru import logger
+
+    from app.websocket_routes import ws_router, ws_manager
+    from tests.utils.alpaca_stream_simulator import AlpacaStreamSimulator, SimulatorConfig
+
+    logger.remove()
+    logger.add(sys.stderr, level="WARNING")
+
+    simulator = AlpacaStreamSimulator(SimulatorConfig(ticks_per_second=rate))
+    await simulator.start()
+
+    # Simulator endpoints and accounts instead of Alpaca / the account pool
+    ws_manager.STOCK_WS_URL = simulator.stock_url
+    ws_manager.OPTION_WS_URL = simulator.option_url
+    ws_manager._stock_account = {"name": "stock_ws", "api_key": "sim", "secret_key": "sim"}
+    ws_manager._set_option_shards([
+        (f"option_ws_{i}" if i else "option_ws", {"name": f"option_ws_{i}", "api_key": "sim", "secret_key": "sim"})
+        for i in range(option_shards)
+    ])
+
+    app = FastAPI()
+    app.include_router(ws_router, prefix="/api/v1")
+
+    @app.get("/simulator")
+    async def simulator_stats():
+        return simulator.get_stats()
+
+    server = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=port, log_level="warning",
+                                           ws_max_size=2**20))
+    try:
+        await server.serve()
+    finally:
+        await ws_manager.shutdown()
+        await simulator.stop()
+
+
+# ---------------------------------------------------------------- client side
+
+class _Client:
+    """One simulated downstream client: counts ticks and samples tick-to-client latency"""
+
+    def __init__(self, binary: bool):
+        self.binary = binary
+        self.measuring = False
+        self.ticks = 0
+        self.latencies: List[float] = []
+
+    async def run(self, url: str, symbols: List[str], subscribed: asyncio.Event, stop: asyncio.Event):
+        async with websockets.connect(url, max_size=2**22, ping_interval=None) as websocket:
+            await websocket.send(json.dumps({"type": "unsubscribe", "symbols": await self._defaults(websocket)}))
+            await websocket.send(json.dumps({"type": "subscribe", "symbols": symbols}))
+            subscribed.set()
+            receiver = asyncio.get_running_loop().create_task(self._receive(websocket))
+            await stop.wait()
+            receiver.cancel()
+
+    async def _defaults(self, websocket) -> List[str]:
+        """Symbols auto-subscribed on connect (taken from the welcome message)"""
+        while True:
+            message = self._decode(await websocket.recv())
+            for item in message:
+                if item.get("type") == "welcome":
+                    return item.get("default_stocks", []) + item.get("default_options", [])
+
+    def _decode(self, frame) -> List[Dict[str, Any]]:
+        if isinstance(frame, bytes):
+            return msgpack.unpackb(frame)
+        message = orjson.loads(frame)
+        return message if isinstance(message, list) else [message]
+
+    async def _receive(self, websocket):
+        try:
+            async for frame in websocket:
+                received_at = time.time()
+                if not self.measuring:
+                    continue
+                for item in self._decode(frame):
+                    kind = item.get("T") if self.binary else item.get("type")
+                    if kind not in ("q", "t", "quote", "trade"):
+                        continue
+                    self.ticks += 1
+                    timestamp = item.get("t") if self.binary else item.get("timestamp")
+                    if isinstance(timestamp, str):
+                        sent_at = datetime.fromisoformat(timestamp.replace("Z", "+00:00")).timestamp()
+                        self.latencies.append(received_at - sent_at)
+        except (asyncio.CancelledError, websockets.exceptions.ConnectionClosed):
+            pass
+
+
+async def _wait_ready(http: httpx.AsyncClient, server: asyncio.subprocess.Process, timeout: float = 30.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if server.returncode is not None:
+            raise RuntimeError(f"benchmark server exited with {server.returncode}")
+        try:
+            if (await http.get("/simulator")).status_code == 200:
+                return
+        except httpx.HTTPError:
+            pass
+        await asyncio.sleep(0.2)
+    raise TimeoutError("benchmark server did not start")
+
+
+async def run_benchmark(config: BenchmarkConfig) -> Dict[str, Any]:
+    """Start the server subprocess, drive the clients and return the report"""
+    port = _free_port()
+    env = dict(os.environ, ALPACA_TESTING=os.environ.get("ALPACA_TESTING", "true"))
+    server = await asyncio.create_subprocess_exec(
+        sys.executable, "-m", "tests.performance.websocket_load_benchmark", "--serve", str(port),
+        "--rate", str(config.rate), "--option-shards", str(config.option_shards), env=env)
+    base_url = f"http://127.0.0.1:{port}"
+    url = f"ws://127.0.0.1:{port}/api/v1/ws/market-data?format={config.message_format}"
+    rng = random.Random(config.seed)
+    universe = _universe(config)
+    clients = [_Client(config.message_format == "msgpack") for _ in range(config.clients)]
+    stop = asyncio.Event()
+    tasks: List[asyncio.Task] = []
+
+    try:
+        async with httpx.AsyncClient(base_url=base_url, timeout=10) as http:
+            await _wait_ready(http, server)
+            # The first connection pays one-off initialization (~4s); keep it out of the connect timing
+            async with websockets.connect(url, ping_interval=None):
+                pass
+            rss_before = _rss_bytes(server.pid)
+
+            gate = asyncio.Semaphore(config.connect_concurrency)
+            connect_started = time.perf_counter()
+
+            async def connect(client: _Client):
+                subscribed = asyncio.Event()
+                async with gate:
+                    task = asyncio.get_running_loop().create_task(
+                        client.run(url, rng.sample(universe, config.symbols_per_client), subscribed, stop))
+                    tasks.append(task)
+                    waiter = asyncio.get_running_loop().create_task(subscribed.wait())
+                    await asyncio.wait({task, waiter}, return_when=asyncio.FIRST_COMPLETED)
+                    waiter.cancel()
+                    if task.done():
+                        task.result()
+
+            await asyncio.gather(*(connect(client) for client in clients))
+            connect_seconds = time.perf_counter() - connect_started
+
+            await asyncio.sleep(config.warmup)
+            rss_after = _rss_bytes(server.pid)
+            simulator_before = (await http.get("/simulator")).json()
+
+            for client in clients:
+                client.measuring = True
+            measure_started = time.perf_counter()
+            await asyncio.sleep(config.duration)
+            for client in clients:
+                client.measuring = False
+            elapsed = time.perf_counter() - measure_started
+
+            simulator_after = (await http.get("/simulator")).json()
+            status = (await http.get("/api/v1/ws/status")).json()
+    finally:
+        stop.set()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        if server.returncode is None:
+            server.terminate()
+            await server.wait()
+
+    latencies = [latency for client in clients for latency in client.latencies]
+    delivered = sum(client.ticks for client in clients)
+    upstream = simulator_after["ticks_sent"] - simulator_before["ticks_sent"]
+    memory_per_client = ((rss_after - rss_before) / config.clients
+                         if rss_before is not None and rss_after is not None and config.clients else None)
+    return {
+        "config": asdict(config),
+        "connect_seconds": round(connect_seconds, 2),
+        "upstream_ticks_per_second": round(upstream / elapsed),
+        "delivered_ticks_per_second": round(delivered / elapsed),
+        "latency_ms": {
+            "p50": round(_percentile(latencies, 0.5) * 1000, 2),
+            "p99": round(_percentile(latencies, 0.99) * 1000, 2),
+            "max": round(max(latencies, default=0.0) * 1000, 2),
+            "samples": len(latencies)
+        },
+        "server_rss_mb": round(rss_after / 2**20, 1) if rss_after else None,
+        "memory_per_client_kb": round(memory_per_client / 1024, 1) if memory_per_client is not None else None,
+        "slow_consumer_disconnects": status["client_queues"]["slow_consumer_disconnects"],
+        "dropped": status["client_queues"]["total_dropped"],
+        "active_clients": status["clients"]["active_connections"]
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="WebSocket fan-out load benchmark against the stream simulator")
+    parser.add_argument("--serve", type=int, metavar="PORT", help=argparse.SUPPRESS)
+    parser.add_argument("--clients", type=int, default=BenchmarkConfig.clients)
+    parser.add_argument("--symbols", type=int, default=BenchmarkConfig.symbols)
+    parser.add_argument("--symbols-per-client", type=int, default=BenchmarkConfig.symbols_per_client)
+    parser.add_argument("--option-share", type=float, default=BenchmarkConfig.option_share)
+    parser.add_argument("--option-shards", type=int, default=BenchmarkConfig.option_shards)
+    parser.add_argument("--rate", type=float, default=BenchmarkConfig.rate)
+    parser.add_argument("--duration", type=float, default=BenchmarkConfig.duration)
+    parser.add_argument("--format", dest="message_format", choices=["json", "msgpack"], default="json")
+    args = parser.parse_args()
+
+    if args.serve:
+        asyncio.run(_serve(args.serve, args.rate, args.option_shards))
+        return
+
+    config = BenchmarkConfig(clients=args.clients, symbols=args.symbols, symbols_per_client=args.symbols_per_client,
+                             option_share=args.option_share, option_shards=args.option_shards, rate=args.rate,
+                             duration=args.duration, message_format=args.message_format)
+    print(json.dumps(asyncio.run(run_benchmark(config)), indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -9,9 +9,11 @@ from app.account_pool import (
     AccountConfig, 
     AccountConnection,
     AccountPool,
+    DataKeyConfig,
+    DataKeyConnection,
     account_pool
 )
-from app.connection_pool import ConnectionStats
+from app.connection_pool import ConnectionStats, ConnectionManager, ConnectionType
 from tests.utils import APITestHelper
 
 
@@ -541,6 +543,21 @@ class TestAccountPool:
             assert "test_account_2" not in pool.account_configs
             assert len(pool.account_id_list) == 1
     
+    @pytest.mark.asyncio
+    async def test_load_configs_only(self):
+        """Test load_configs loads account configs without connections or initializing the pool."""
+        pool = AccountPool()
+        
+        with patch('app.account_pool.settings') as mock_settings:
+            mock_settings.accounts = {
+                "test_account_1": {"api_key": "test_key_1", "secret_key": "test_secret_1"}
+            }
+            await pool.load_configs()
+        
+        assert pool.account_id_list == ["test_account_1"]
+        assert pool.account_connections == {}
+        assert pool._initialized is False
+    
     @pytest.mark.asyncio
     async def test_pool_initialization_fallback_to_default(self):
         """Test pool initialization failure when no account configurations are found."""
@@ -815,6 +832,119 @@ class TestAccountPool:
         assert len(pool.usage_queues) == 0
 
 
+class TestDataKeyPool:
+    """Test the dedicated market data key pool."""
+    
+    def _make_pool(self, key_ids, rate_limit_per_minute=200):
+        pool = AccountPool()
+        for key_id in key_ids:
+            config = DataKeyConfig(
+                key_id=key_id,
+                api_key=f"{key_id}_key",
+                secret_key=f"{key_id}_secret",
+                rate_limit_per_minute=rate_limit_per_minute
+            )
+            pool.data_key_configs[key_id] = config
+            pool.data_key_connections[key_id] = DataKeyConnection(config)
+        pool.data_key_id_list = list(key_ids)
+        pool._initialized = True
+        return pool
+    
+    def test_data_key_paper_trading(self):
+        """Test paper flags cover the pinned key or every key the pool may route to."""
+        pool = self._make_pool(["data_1", "data_2"])
+        pool.data_key_configs["data_2"].paper_trading = False
+        
+        assert pool.data_key_paper_trading() == {True, False}
+        assert pool.data_key_paper_trading("data_2") == {False}
+        assert pool.data_key_paper_trading("trader_1") == {True, False}
+    
+    def test_load_data_keys_from_config(self):
+        """Test data keys are loaded from market_data.keys and kept apart from trading accounts."""
+        pool = AccountPool()
+        pool.account_configs["trader_1"] = AccountConfig(
+            account_id="trader_1", api_key="trade_key", secret_key="trade_secret"
+        )
+        
+        with patch('app.account_pool.settings') as mock_settings:
+            mock_settings.market_data = {
+                "rate_limit_per_minute": 150,
+                "keys": {
+                    "data_1": {"api_key": "data_key_1", "secret_key": "data_secret_1"},
+                    "data_2": {"api_key": "data_key_2", "secret_key": "data_secret_2", "enabled": False}
+                }
+            }
+            pool._load_data_key_configs()
+        
+        assert pool.data_key_id_list == ["data_1"]
+        assert pool.data_key_configs["data_1"].rate_limit_per_minute == 150
+        assert "trader_1" not in pool.data_key_configs
+    
+    def test_load_data_keys_fallback_accounts(self):
+        """Test dedicated stock_ws/option_ws accounts are used when no data keys are configured."""
+        pool = AccountPool()
+        for account_id in ["stock_ws", "option_ws", "trader_1"]:
+            pool.account_configs[account_id] = AccountConfig(
+                account_id=account_id, api_key=f"{account_id}_key", secret_key=f"{account_id}_secret"
+            )
+        
+        with patch('app.account_pool.settings') as mock_settings:
+            mock_settings.market_data = {}
+            pool._load_data_key_configs()
+        
+        assert pool.data_key_id_list == ["stock_ws", "option_ws"]
+        assert pool.data_key_configs["stock_ws"].api_key == "stock_ws_key"
+    
+    @pytest.mark.asyncio
+    async def test_hash_routing_is_stable(self):
+        """Test the same symbol is routed to the same data key."""
+        pool = self._make_pool(["data_1", "data_2", "data_3"])
+        
+        client_1 = await pool.acquire_data_client(routing_key="AAPL")
+        client_2 = await pool.acquire_data_client(routing_key="AAPL")
+        
+        assert client_1 is client_2
+        assert sum(conn.request_count for conn in pool.data_key_connections.values()) == 2
+    
+    @pytest.mark.asyncio
+    async def test_spill_over_when_budget_exhausted(self):
+        """Test requests move to another data key once the preferred key is out of budget."""
+        pool = self._make_pool(["data_1", "data_2"], rate_limit_per_minute=1)
+        
+        client_1 = await pool.acquire_data_client(routing_key="AAPL")
+        client_2 = await pool.acquire_data_client(routing_key="AAPL")
+        
+        assert client_1 is not client_2
+    
+    @pytest.mark.asyncio
+    async def test_budget_exhausted_raises(self):
+        """Test acquisition fails fast when all keys are exhausted beyond the max wait."""
+        pool = self._make_pool(["data_1"], rate_limit_per_minute=1)
+        pool.data_key_max_wait_seconds = 0.01
+        
+        await pool.acquire_data_client(routing_key="AAPL")
+        with pytest.raises(Exception, match="rate budget exhausted"):
+            await pool.acquire_data_client(routing_key="AAPL")
+    
+    @pytest.mark.asyncio
+    async def test_no_data_keys_configured(self):
+        """Test acquisition fails when the data key pool is empty."""
+        pool = self._make_pool([])
+        
+        with pytest.raises(Exception, match="No market data keys configured"):
+            await pool.acquire_data_client(routing_key="AAPL")
+    
+    def test_pool_stats_include_data_keys(self):
+        """Test data key stats are reported separately from trading accounts."""
+        pool = self._make_pool(["data_1"])
+        
+        stats = pool.get_pool_stats()
+        
+        assert "data_1" in stats["data_keys"]
+        assert "data_1" not in stats["account_stats"]
+        assert stats["data_keys"]["data_1"]["rate_limit_per_minute"] == 200
+
+
 class TestAccountPoolIntegration:
     """Integration tests for account pool with real connections."""
     
@@ -952,4 +1082,63 @@ async def test_account_pool_performance_under_load():
     # At least some calls should have been made
     assert total_acquire_calls > 0, "No acquire calls were made"
     assert total_release_calls > 0, "No release calls were made"
-    assert total_acquire_calls == total_release_calls, "Mismatched acquire/release calls"
\ No newline at end of file
+    assert total_acquire_calls == total_release_calls, "Mismatched acquire/release calls"
+
+class TestConsolidatedPool:
+    """Test shared clients and the single maintenance scheduler."""
+    
+    def _make_pool(self):
+        pool = AccountPool(maintenance_interval_seconds=0, health_check_interval_seconds=0)
+        for account_id in ["trader_1", "trader_2"]:
+            pool.account_configs[account_id] = AccountConfig(
+                account_id=account_id, api_key=f"{account_id}_key", secret_key=f"{account_id}_secret"
+            )
+        with patch.object(ConnectionManager, '_verify_account_access'):
+            pool.account_connections["trader_1"] = AccountConnection(pool.account_configs["trader_1"])
+        pool.account_id_list = list(pool.account_configs.keys())
+        pool._initialized = True
+        return pool
+    
+    def test_alpaca_client_shared_per_account(self):
+        """Test requests reuse the account's AlpacaClient and its pooled SDK clients."""
+        pool = self._make_pool()
+        connection = pool.account_connections["trader_1"]
+        
+        client = pool.get_alpaca_client("trader_1")
+        
+        assert pool.get_alpaca_client("trader_1") is client
+        assert client.trading_client is connection.connection_manager.connections[ConnectionType.TRADING_CLIENT]
+        assert client.stock_data_client is connection.connection_manager.connections[ConnectionType.STOCK_DATA]
+        
+        # Configured account without a live connection gets one cached client too
+        standalone = pool.get_alpaca_client("trader_2")
+        assert standalone is pool.get_alpaca_client("trader_2")
+        assert pool.get_pool_stats()["standalone_clients"] == 1
+        assert pool.get_alpaca_client("unknown") is None
+    
+    def test_fallback_data_key_reuses_account_client(self):
+        """Test fallback data keys share the account's client instead of building another."""
+        pool = self._make_pool()
+        pool.data_key_configs["trader_1"] = DataKeyConfig(
+            key_id="trader_1", api_key="trader_1_key", secret_key="trader_1_secret"
+        )
+        pool.data_key_id_list = ["trader_1"]
+        
+        pool._create_data_key_connections()
+        
+        assert pool.data_key_connections["trader_1"].client is pool.get_alpaca_client("trader_1")
+    
+    @pytest.mark.asyncio
+    async def test_maintenance_loop_runs_cleanup_and_health_checks(self):
+        """Test one scheduler drives both idle cleanup and health checks."""
+        pool = self._make_pool()
+        pool._cleanup_idle_connections = AsyncMock()
+        pool._perform_health_checks = AsyncMock()
+        
+        task = asyncio.create_task(pool._maintenance_loop())
+        await asyncio.sleep(0.01)
+        task.cancel()
+        await asyncio.gather(task, return_exceptions=True)
+        
+        assert pool._cleanup_idle_connections.await_count >= 1
+        assert pool._perform_health_checks.await_count >= 1
@@ -0,0 +1,324 @@
+"""Unit tests for per-account circuit breakers."""
+
+import pytest
+import asyncio
+import time
+from unittest.mock import AsyncMock, MagicMock
+
+import requests
+from alpaca.common.exceptions import APIError, RetryException
+from alpaca.trading.client import TradingClient
+
+from app.account_pool import AccountConfig, AccountPool, DataKeyConfig, DataKeyConnection
+from app.alpaca_client import PooledAlpacaClient
+from app.circuit_breaker import (
+    CircuitBreaker,
+    CircuitBreakerConfig,
+    CircuitBreakerRegistry,
+    CircuitOpenError,
+    CircuitState,
+    EndpointClass,
+    is_upstream_failure
+)
+from app.upstream_metrics import instrument_rest_client
+
+
+def _api_error(status_code: int, message: str) -> APIError:
+    response = requests.Response()
+    response.status_code = status_code
+    return APIError(message, requests.HTTPError(response=response))
+
+
+def _fast_config(**overrides) -> CircuitBreakerConfig:
+    values = dict(minimum_calls=4, consecutive_failure_threshold=3, open_seconds=60.0)
+    values.update(overrides)
+    return CircuitBreakerConfig(**values)
+
+
+class TestCircuitBreaker:
+    """Test circuit breaker state transitions."""
+    
+    def test_opens_after_consecutive_failures(self):
+        """Test the breaker opens after consecutive upstream failures."""
+        breaker = CircuitBreaker("acc/trading", _fast_config())
+        
+        for _ in range(3):
+            assert breaker.allow_request() is True
+            breaker.record(0.05, failed=True, error="connection reset")
+        
+        assert breaker.state == CircuitState.OPEN
+        assert breaker.allow_request() is False
+        assert breaker.rejected_calls == 1
+        assert breaker.retry_after_seconds() > 0
+    
+    def test_opens_on_failure_rate(self):
+        """Test the breaker opens when the windowed failure rate crosses the threshold."""
+        breaker = CircuitBreaker("acc/account", _fast_config(consecutive_failure_threshold=10))
+        
+        for failed in [True, False, True, False]:
+            breaker.record(0.05, failed=failed)
+        
+        assert breaker.state == CircuitState.OPEN
+    
+    def test_slow_calls_count_as_failures(self):
+        """Test calls above the latency threshold count as failures."""
+        breaker = CircuitBreaker("acc/market_data", _fast_config(slow_call_seconds=1.0))
+        
+        for _ in range(3):
+            breaker.record(2.0, failed=False)
+        
+        assert breaker.state == CircuitState.OPEN
+        assert breaker.slow_calls == 3
+    
+    def test_half_open_probe_closes_on_success(self):
+        """Test a successful half-open probe closes the breaker."""
+        breaker = CircuitBreaker("acc/trading", _fast_config(open_seconds=0.0))
+        for _ in range(3):
+            breaker.record(0.05, failed=True)
+        
+        assert breaker.allow_request() is True
+        assert breaker.state == CircuitState.HALF_OPEN
+        # Only one probe at a time
+        assert breaker.allow_request() is False
+        
+        breaker.record(0.05, failed=False)
+        assert breaker.state == CircuitState.CLOSED
+    
+    def test_half_open_probe_reopens_on_failure(self):
+        """Test a failed half-open probe opens the breaker again."""
+        breaker = CircuitBreaker("acc/trading", _fast_config(open_seconds=0.0))
+        for _ in range(3):
+            breaker.record(0.05, failed=True)
+        
+        assert breaker.allow_request() is True
+        breaker.record(0.05, failed=True)
+        
+        assert breaker.state == CircuitState.OPEN
+        assert breaker.trip_count == 2
+    
+    def test_release_probe_frees_half_open_slot(self):
+        """Test a released probe lets the next call probe without recording an outcome."""
+        breaker = CircuitBreaker("acc/trading", _fast_config(open_seconds=0.0))
+        for _ in range(3):
+            breaker.record(0.05, failed=True)
+        
+        assert breaker.allow_request() is True
+        breaker.release_probe()
+        
+        assert breaker.state == CircuitState.HALF_OPEN
+        assert breaker.total_calls == 3
+        assert breaker.allow_request() is True
+    
+    def test_stuck_probe_slot_is_reclaimed_after_timeout(self):
+        """Test a probe that never reports back stops blocking calls after the probe timeout."""
+        breaker = CircuitBreaker("acc/trading", _fast_config(open_seconds=0.0, half_open_probe_timeout_seconds=10.0))
+        for _ in range(3):
+            breaker.record(0.05, failed=True)
+        assert breaker.allow_request() is True
+        assert breaker.allow_request() is False
+        
+        breaker._half_open_probe_at = time.monotonic() - 11
+        
+        assert breaker.allow_request() is True
+        assert breaker._half_open_in_flight == 1
+    
+    def test_upstream_failure_classification(self):
+        """Test only upstream errors are treated as breaker failures."""
+        assert is_upstream_failure(requests.ReadTimeout("HTTPSConnectionPool: Read timed out"))
+        assert is_upstream_failure(requests.ConnectionError("Connection aborted"))
+        assert is_upstream_failure(RetryException())
+        assert is_upstream_failure(_api_error(401, '{"code":40110000,"message":"request is not authorized"}'))
+        assert is_upstream_failure(_api_error(429, '{"message":"too many requests"}'))
+        assert is_upstream_failure(_api_error(503, "Service Unavailable"))
+        assert not is_upstream_failure(_api_error(403, '{"code":40310000,"message":"insufficient buying power"}'))
+        # Business rejections mentioning numbers or "connection" are not upstream failures
+        assert not is_upstream_failure(_api_error(422, '{"code":42210000,"message":"qty must be <= 500"}'))
+        assert not is_upstream_failure(ValueError("connection id 502 is invalid"))
+        assert not is_upstream_failure(None)
+
+
+class TestCircuitBreakerRegistry:
+    """Test breaker registry keyed by account and endpoint class."""
+    
+    def test_breakers_are_per_endpoint_class(self):
+        """Test tripping one endpoint class leaves the others closed."""
+        registry = CircuitBreakerRegistry(_fast_config())
+        breaker = registry.get("acc_1", EndpointClass.TRADING)
+        for _ in range(3):
+            breaker.record(0.05, failed=True)
+        
+        assert registry.is_open("acc_1", EndpointClass.TRADING)
+        assert not registry.is_open("acc_1", EndpointClass.ACCOUNT)
+        assert registry.open_accounts(EndpointClass.TRADING) == ["acc_1"]
+        assert registry.get_account_stats("acc_1")["trading"]["state"] == "open"
+    
+    def test_circuit_open_error_payload(self):
+        """Test the structured error payload returned to callers."""
+        error = CircuitOpenError("acc_1", EndpointClass.TRADING, 12.34)
+        payload = error.to_error_dict()
+        
+        assert payload["error_code"] == "CIRCUIT_OPEN"
+        assert payload["account_id"] == "acc_1"
+        assert payload["endpoint_class"] == "trading"
+        assert payload["retry_after_seconds"] == 12.3
+
+
+class TestCircuitBreakerIntegration:
+    """Test breakers wired into the account pool and pooled client."""
+    
+    def _make_pool(self) -> AccountPool:
+        pool = AccountPool()
+        pool.circuit_breakers = CircuitBreakerRegistry(_fast_config())
+        pool.account_configs["acc_1"] = AccountConfig(
+            account_id="acc_1", api_key="key", secret_key="secret"
+        )
+        for key_id in ["data_1", "data_2"]:
+            config = DataKeyConfig(key_id=key_id, api_key=f"{key_id}_key", secret_key=f"{key_id}_secret")
+            pool.data_key_configs[key_id] = config
+            pool.data_key_connections[key_id] = DataKeyConnection(config)
+        pool.data_key_id_list = ["data_1", "data_2"]
+        pool._initialized = True
+        return pool
+    
+    @pytest.mark.asyncio
+    async def test_open_breaker_fast_fails_orders(self):
+        """Test an open trading breaker returns a structured error without calling upstream."""
+        pool = self._make_pool()
+        client = PooledAlpacaClient()
+        client._pool = pool
+        
+        trading_client = TradingClient("key", "secret", paper=True)
+        trading_client._session.request = MagicMock(side_effect=requests.ConnectionError("Connection aborted"))
+        instrument_rest_client(trading_client)
+
+        async def place_stock_order(*args, **kwargs):
+            # Like AlpacaClient: the SDK exception is turned into an error result
+            try:
+                trading_client._request("POST", "/orders")
+            except Exception as e:
+                return {"error": str(e)}
+
+        upstream = AsyncMock(side_effect=place_stock_order)
+        fake_client = MagicMock()
+        fake_client.place_stock_order = upstream
+        client._get_http_client = MagicMock(return_value=fake_client)
+        
+        for _ in range(3):
+            await client.place_stock_order("AAPL", 1, "buy", account_id="acc_1")
+        assert upstream.await_count == 3
+        
+        result = await client.place_stock_order("AAPL", 1, "buy", account_id="acc_1")
+        
+        assert upstream.await_count == 3
+        assert result["error_code"] == "CIRCUIT_OPEN"
+        assert result["endpoint_class"] == "trading"
+        assert pool.get_pool_stats()["open_circuits"] == ["acc_1/trading"]
+
+    @pytest.mark.asyncio
+    async def test_order_rejections_keep_breaker_closed(self):
+        """Test business rejections from Alpaca do not trip the breaker."""
+        pool = self._make_pool()
+        client = PooledAlpacaClient()
+        client._pool = pool
+
+        trading_client = TradingClient("key", "secret", paper=True)
+        trading_client._one_request = MagicMock(
+            side_effect=_api_error(422, '{"code":42210000,"message":"qty must be <= 500"}'))
+        instrument_rest_client(trading_client)
+
+        async def place_stock_order(*args, **kwargs):
+            try:
+                trading_client._request("POST", "/orders")
+            except Exception as e:
+                return {"error": str(e)}
+
+        fake_client = MagicMock()
+        fake_client.place_stock_order = AsyncMock(side_effect=place_stock_order)
+        client._get_http_client = MagicMock(return_value=fake_client)
+
+        for _ in range(5):
+            result = await client.place_stock_order("AAPL", 1000, "buy", account_id="acc_1")
+            assert "qty must be <= 500" in result["error"]
+
+        breaker = pool.circuit_breakers.get("acc_1", EndpointClass.TRADING)
+        assert breaker.state == CircuitState.CLOSED
+        assert breaker.total_failures == 0
+    
+    @pytest.mark.asyncio
+    async def test_cancelled_half_open_probe_releases_slot(self):
+        """Test a probe cancelled by a timeout does not leave the breaker stuck half-open."""
+        pool = self._make_pool()
+        pool.circuit_breakers = CircuitBreakerRegistry(_fast_config(open_seconds=0.0))
+        client = PooledAlpacaClient()
+        client._pool = pool
+        breaker = pool.circuit_breakers.get("acc_1", EndpointClass.TRADING)
+        for _ in range(3):
+            breaker.record(0.05, failed=True)
+        
+        async def hang(*args, **kwargs):
+            await asyncio.sleep(3600)
+        
+        fake_client = MagicMock()
+        fake_client.place_stock_order = AsyncMock(side_effect=hang)
+        client._get_http_client = MagicMock(return_value=fake_client)
+        
+        with pytest.raises(asyncio.TimeoutError):
+            await asyncio.wait_for(client.place_stock_order("AAPL", 1, "buy", account_id="acc_1"), 0.05)
+        
+        assert breaker.state == CircuitState.HALF_OPEN
+        assert breaker._half_open_in_flight == 0
+        
+        fake_client.place_stock_order = AsyncMock(return_value={"id": "order_1"})
+        result = await client.place_stock_order("AAPL", 1, "buy", account_id="acc_1")
+        
+        assert result == {"id": "order_1"}
+        assert breaker.state == CircuitState.CLOSED
+    
+    @pytest.mark.asyncio
+    async def test_open_breaker_drops_data_key_from_routing(self):
+        """Test a tripped data key is skipped by market data routing."""
+        pool = self._make_pool()
+        breaker = pool.circuit_breakers.get("data_1", EndpointClass.MARKET_DATA)
+        for _ in range(3):
+            breaker.record(0.05, failed=True)
+        
+        for symbol in ["AAPL", "TSLA", "SPY", "NVDA"]:
+            key_id, _ = await pool.acquire_data_key(routing_key=symbol)
+            assert key_id == "data_2"
+        
+        assert pool.get_pool_stats()["data_keys"]["data_1"]["routable"] is False
+    
+    @pytest.mark.asyncio
+    async def test_half_open_data_key_with_probe_in_flight_is_skipped(self):
+        """Test a half-open key whose probe slot is taken spills over to a healthy key."""
+        pool = self._make_pool()
+        pool.circuit_breakers = CircuitBreakerRegistry(_fast_config(open_seconds=0.0))
+        breaker = pool.circuit_breakers.get("data_1", EndpointClass.MARKET_DATA)
+        for _ in range(3):
+            breaker.record(0.05, failed=True)
+        assert breaker.allow_request() is True
+        assert breaker.state == CircuitState.HALF_OPEN
+
+        for symbol in ["AAPL", "TSLA", "SPY", "NVDA"]:
+            key_id, _ = await pool.acquire_data_key(routing_key=symbol)
+            assert key_id == "data_2"
+
+        assert breaker.rejected_calls == 0
+        breaker.release_probe()
+        assert pool.circuit_breakers.rejects("data_1", EndpointClass.MARKET_DATA) is False
+
+    @pytest.mark.asyncio
+    async def test_all_data_keys_open_fast_fails(self):
+        """Test market data fails fast when every data key is tripped."""
+        pool = self._make_pool()
+        for key_id in ["data_1", "data_2"]:
+            breaker = pool.circuit_breakers.get(key_id, EndpointClass.MARKET_DATA)
+            for _ in range(3):
+                breaker.record(0.05, failed=True)
+        
+        client = PooledAlpacaClient()
+        client._pool = pool
+        result = await client.get_stock_quote("AAPL")
+        
+        assert result["error_code"] == "CIRCUIT_OPEN"
+        assert result["endpoint_class"] == "market_data"
@@ -1,6 +1,7 @@
 """Unit tests for health check routes."""
 
 import pytest
+import asyncio
 from unittest.mock import patch, MagicMock, AsyncMock
 from fastapi.testclient import TestClient
 from fastapi import FastAPI
@@ -233,4 +234,106 @@ class TestAsyncHealthOperations:
         
         # Should be able to use asyncio in health check context
         await asyncio.sleep(0.001)  # Minimal async operation test
-        assert True  # If we get here, async works
\ No newline at end of file
+        assert True  # If we get here, async works
+
+def make_prober(results_by_call=None, **config):
+    """Prober over a checker whose run_comprehensive_check is mocked."""
+    from app.health_routes import HealthSnapshotProber, HealthCheckConfig
+
+    checker = WebHealthChecker(HealthCheckConfig(**config))
+    checker.run_comprehensive_check = AsyncMock(return_value=results_by_call or {
+        "timestamp": datetime.now().isoformat(),
+        "accounts": {"account1": {"account_id": "account1", "overall_status": "excellent", "checks": {}}}
+    })
+    return HealthSnapshotProber(checker), checker
+
+
+@pytest.mark.asyncio
+class TestHealthSnapshotProber:
+    """Test cached, single-flight health snapshots."""
+
+    async def test_concurrent_refreshes_share_one_check(self):
+        """Concurrent refreshes run the account checks once."""
+        prober, checker = make_prober()
+
+        async def slow_check(account_id=None):
+            await asyncio.sleep(0.05)
+            return {"timestamp": "t", "accounts": {"account1": {"overall_status": "good"}}}
+        checker.run_comprehensive_check = AsyncMock(side_effect=slow_check)
+
+        snapshots = await asyncio.gather(prober.refresh(), prober.refresh(), prober.refresh("account1"))
+
+        assert checker.run_comprehensive_check.await_count == 1
+        assert prober.coalesced_requests == 2
+        assert all(snapshot["accounts"]["account1"]["overall_status"] == "good" for snapshot in snapshots)
+
+    async def test_snapshot_staleness_metadata(self):
+        """Snapshots carry their age and are marked stale past stale_after_seconds."""
+        prober, _ = make_prober(stale_after_seconds=60)
+        assert not prober.has_snapshot()
+        assert prober.snapshot()["stale"] is True
+
+        await prober.refresh()
+        snapshot = prober.snapshot()
+        assert snapshot["stale"] is False
+        assert snapshot["accounts"]["account1"]["age_seconds"] < 1
+
+        prober.config.stale_after_seconds = 0
+        await asyncio.sleep(0.01)
+        assert prober.snapshot()["accounts"]["account1"]["stale"] is True
+
+    async def test_endpoint_serves_cached_snapshot(self):
+        """The comprehensive endpoint only checks again when asked to refresh."""
+        from app import health_routes
+
+        prober, checker = make_prober()
+        with patch.object(health_routes, "health_prober", prober):
+            first = await health_routes.comprehensive_health_check()
+            second = await health_routes.comprehensive_health_check()
+            assert checker.run_comprehensive_check.await_count == 1
+            assert first["results"]["accounts"].keys() == second["results"]["accounts"].keys()
+
+            await health_routes.comprehensive_health_check(refresh=True)
+            assert checker.run_comprehensive_check.await_count == 2
+
+    async def test_failed_refresh_is_counted(self):
+        """A failing refresh raises to the caller and keeps the previous snapshot."""
+        prober, checker = make_prober()
+        await prober.refresh()
+        checker.run_comprehensive_check.side_effect = RuntimeError("alpaca down")
+
+        with pytest.raises(RuntimeError):
+            await prober.refresh()
+        assert prober.refresh_failures == 1
+        assert prober.has_snapshot("account1")
+
+
+@pytest.mark.asyncio
+class TestConcurrentAccountChecks:
+    """Test pooled clients, order probe gating and per-check timeouts."""
+
+    @patch('app.health_routes.StockHistoricalDataClient')
+    @patch('app.health_routes.TradingClient')
+    async def test_clients_are_reused_and_order_probes_skipped(self, mock_trading_client, mock_data_client):
+        from app.health_routes import HealthCheckConfig
+
+        checker = WebHealthChecker(HealthCheckConfig(order_probes=False))
+        config = {"api_key": "key", "secret_key": "secret"}
+
+        with patch.object(checker, "check_trading_permission") as permission_check:
+            await checker.check_single_account("standalone_account", config)
+            result = await checker.check_single_account("standalone_account", config)
+
+        assert mock_trading_client.call_count == 1
+        assert mock_data_client.call_count == 1
+        permission_check.assert_not_called()
+        assert set(result["checks"]) == {"account_info", "positions", "order_history", "market_data", "websocket_config"}
+
+    async def test_check_timeout_is_reported(self):
+        from app.health_routes import HealthCheckConfig
+
+        checker = WebHealthChecker(HealthCheckConfig(check_timeout_seconds=0.01))
+        result = await checker._run_check("account_info", asyncio.sleep(1))
+
+        assert result["status"] == "error"
+        assert "超时" in result["error"]
@@ -0,0 +1,146 @@
+"""Unit tests for the concurrent multi-account healthcheck CLI."""
+
+import pytest
+import json
+import os
+import subprocess
+import sys
+import textwrap
+import threading
+import time
+from unittest.mock import MagicMock
+
+pytest.importorskip("rich")
+
+from healthcheck import HealthChecker, main
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def make_checker(account_ids, check_seconds: float = 0.0, concurrency: int = 10, check_timeout: float = 5.0):
+    """Checker whose checks block (like the SDK-backed AlpacaClient) for check_seconds."""
+    checker = HealthChecker(concurrency=concurrency, check_timeout=check_timeout)
+    checker.pool = MagicMock()
+    checker.pool.account_configs = {account_id: MagicMock(enabled=True) for account_id in account_ids}
+    checker.in_flight = 0
+    checker.max_in_flight = 0
+    lock = threading.Lock()
+
+    def blocking(result):
+        async def check(account_id):
+            with lock:
+                checker.in_flight += 1
+                checker.max_in_flight = max(checker.max_in_flight, checker.in_flight)
+            time.sleep(check_seconds)
+            with lock:
+                checker.in_flight -= 1
+            return {"status": "HEALTHY", "error": None, **result}
+        return check
+
+    checker.check_account_basics = blocking({"account_number": "PA1", "equity": 1.0, "buying_power": 1.0,
+                                             "cash": 1.0, "positions_count": 0, "positions": []})
+    checker.check_stock_endpoints = blocking({"endpoints": {}})
+    checker.check_trading_endpoints = blocking({"endpoints": {}, "working_endpoints": 5, "total_endpoints": 5})
+    return checker
+
+
+@pytest.mark.asyncio
+class TestConcurrentAccountChecks:
+    """Test bounded parallelism, per-check timeouts and streaming results."""
+
+    async def test_accounts_run_concurrently_within_cap(self):
+        """Blocking checks overlap across accounts, never beyond concurrency accounts at once."""
+        accounts = [f"account_{i}" for i in range(12)]
+        checker = make_checker(accounts, check_seconds=0.1, concurrency=4)
+        started = time.perf_counter()
+        result = await checker.check_all_accounts(show_progress=False)
+        elapsed = time.perf_counter() - started
+
+        assert result["healthy_accounts"] == 12
+        assert list(result["accounts"]) == accounts
+        # 3 checks per account, 4 accounts at a time
+        assert checker.max_in_flight == 12
+        assert elapsed < 1.0
+
+    async def test_check_timeout_marks_check_as_error(self):
+        """A hung check is reported as ERROR without failing the other checks."""
+        checker = make_checker(["account_1"], check_timeout=0.05)
+
+        async def hung(account_id):
+            time.sleep(0.3)
+        checker.check_stock_endpoints = hung
+        result = await checker.check_single_account("account_1")
+
+        assert result["stock_endpoints"]["status"] == "ERROR"
+        assert "timed out" in result["stock_endpoints"]["error"]
+        assert result["basics"]["status"] == "HEALTHY"
+        assert result["overall_status"] == "DEGRADED"
+
+    async def test_results_stream_as_accounts_finish(self):
+        """on_result sees the fast account before the slow one finishes."""
+        checker = make_checker(["slow", "fast"])
+        basics = checker.check_account_basics
+
+        async def slow_basics(account_id):
+            if account_id == "slow":
+                time.sleep(0.2)
+            return await basics(account_id)
+        checker.check_account_basics = slow_basics
+        finished = []
+        await checker.check_all_accounts(show_progress=False, on_result=lambda account_id, _: finished.append(account_id))
+
+        assert finished == ["fast", "slow"]
+
+
+def test_timed_out_check_does_not_delay_exit():
+    """A check still blocked after its timeout does not keep the process alive once results are out."""
+    script = textwrap.dedent("""
+        import asyncio, time
+        from healthcheck import HealthChecker
+
+        async def hung():
+            time.sleep(5)
+
+        async def run():
+            checker = HealthChecker(check_timeout=0.2)
+            result = await checker._run_check("stock", hung())
+            print(result["error"], flush=True)
+
+        asyncio.run(run())
+    """)
+    started = time.perf_counter()
+    completed = subprocess.run([sys.executable, "-c", script], cwd=PROJECT_ROOT, capture_output=True,
+                               text=True, timeout=30)
+    elapsed = time.perf_counter() - started
+
+    assert completed.returncode == 0, completed.stderr
+    assert "timed out" in completed.stdout
+    assert elapsed < 4.0
+
+
+@pytest.mark.asyncio
+async def test_ndjson_output_and_exit_status(capsys, monkeypatch):
+    """NDJSON mode prints one line per account plus a summary and exits 2 on a failing account."""
+    checker = make_checker(["account_1", "account_2"])
+    basics = checker.check_account_basics
+
+    async def failing_basics(account_id):
+        if account_id == "account_2":
+            raise RuntimeError("unauthorized")
+        return await basics(account_id)
+    checker.check_account_basics = failing_basics
+
+    async def initialize():
+        pass
+    checker.initialize = initialize
+    checker.check_secrets_configuration = lambda: {"status": "HEALTHY"}
+    monkeypatch.setattr("healthcheck.HealthChecker", lambda **kwargs: checker)
+
+    exit_status = await main(["--output", "ndjson"])
+
+    lines = [json.loads(line) for line in capsys.readouterr().out.splitlines()]
+    assert [line["type"] for line in lines] == ["account", "account", "summary"]
+    assert {line["account_id"]: line["overall_status"] for line in lines[:2]} == {
+        "account_1": "HEALTHY", "account_2": "CRITICAL"}
+    assert lines[2]["healthy_accounts"] == 1
+    assert exit_status == 2
@@ -0,0 +1,66 @@
+"""Unit tests for event loop lag sampling and slow-callback detection."""
+
+import asyncio
+import time
+
+import pytest
+
+from app.loop_monitor import LoopMonitor, LoopMonitorConfig, attribute_stack, collect_loop_metrics
+
+
+def _blocking_call(seconds: float):
+    time.sleep(seconds)
+
+
+class TestLoopMonitor:
+    """Test stall detection and call-site attribution."""
+
+    @pytest.mark.asyncio
+    async def test_blocking_callback_is_attributed_to_call_site(self):
+        """Test a blocking call on the loop is reported with the line that made it."""
+        monitor = LoopMonitor(LoopMonitorConfig(interval_seconds=0.05, slow_callback_seconds=0.05,
+                                                heartbeat_seconds=0.01, watchdog_interval_seconds=0.005))
+        monitor.start()
+        try:
+            await asyncio.sleep(0.05)
+            _blocking_call(0.3)
+            await asyncio.sleep(0.1)
+        finally:
+            await monitor.stop()
+
+        report = monitor.get_report()
+        assert report["stalls"]["count"] >= 1
+        assert report["stalls"]["max_ms"] >= 200
+        top = report["call_sites"][0]
+        assert top["site"].startswith("tests/unit/test_loop_monitor.py:")
+        assert top["site"].endswith("_blocking_call")
+        assert top["blocked_seconds"] >= 0.2
+        assert any("test_blocking_callback_is_attributed_to_call_site" in line for line in top["stack"])
+        assert report["lag"]["count"] >= 1
+        assert not monitor.is_running
+
+    def test_check_ignores_heartbeat_on_time(self):
+        """Test the watchdog samples nothing while the heartbeat is not overdue."""
+        monitor = LoopMonitor(LoopMonitorConfig(slow_callback_seconds=0.1))
+        monitor._due = time.perf_counter() + 1
+
+        monitor.check()
+
+        assert monitor.call_sites() == []
+
+    def test_attribute_stack_prefers_project_frames(self):
+        """Test the call site is the innermost frame in this repository."""
+        def inner():
+            import sys
+            return attribute_stack(sys._getframe())
+
+        site, stack = inner()
+
+        assert site.startswith("tests/unit/test_loop_monitor.py:") and site.endswith(" inner")
+        assert stack[-1] == site
+
+    def test_metrics_collector_exports_blocked_sites(self):
+        """Test the collector exports blocked seconds per call site."""
+        family = collect_loop_metrics()[0]
+        assert family.name == "event_loop_blocked_seconds"
+        assert family.kind == "gauge"
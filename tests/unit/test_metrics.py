@@ -0,0 +1,126 @@
+"""Unit tests for Prometheus metrics rendering and instrumentation."""
+
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine, text
+
+from app.database_models import instrument_engine
+from app.metrics import (
+    Counter,
+    Gauge,
+    Histogram,
+    MetricFamily,
+    MetricsRegistry,
+    REGISTRY,
+    db_query_duration_seconds,
+    http_requests_total,
+    observe_duration
+)
+from app.middleware import HandlerTimingMiddleware, MetricsMiddleware
+
+
+class TestMetricsRegistry:
+    """Test the text exposition format."""
+
+    def test_render_counters_gauges_and_histograms(self):
+        """Test samples, labels and cumulative histogram buckets are rendered."""
+        registry = MetricsRegistry()
+        requests = Counter("requests_total", "Requests", ("route",), registry=registry)
+        in_flight = Gauge("in_flight", "In flight", registry=registry)
+        latency = Histogram("latency_seconds", "Latency", buckets=(0.1, 1.0), registry=registry)
+
+        requests.labels("/a").inc()
+        requests.labels("/a").inc(2)
+        in_flight.inc()
+        latency.observe(0.05)
+        latency.observe(0.5)
+        latency.observe(3.0)
+
+        output = registry.render()
+
+        assert "# TYPE requests_total counter" in output
+        assert 'requests_total{route="/a"} 3' in output
+        assert "in_flight 1" in output
+        assert 'latency_seconds_bucket{le="0.1"} 1' in output
+        assert 'latency_seconds_bucket{le="1"} 2' in output
+        assert 'latency_seconds_bucket{le="+Inf"} 3' in output
+        assert "latency_seconds_count 3" in output
+        assert "latency_seconds_sum 3.55" in output
+
+    def test_label_escaping_and_label_count(self):
+        """Test label values are escaped and a wrong label count is rejected."""
+        registry = MetricsRegistry()
+        errors = Counter("errors_total", "Errors", ("message",), registry=registry)
+        errors.labels('bad "quote"\n').inc()
+
+        assert 'errors_total{message="bad \\"quote\\"\\n"} 1' in registry.render()
+        try:
+            errors.labels("a", "b")
+        except ValueError:
+            pass
+        else:
+            raise AssertionError("expected ValueError")
+
+    def test_failing_collector_does_not_break_scrape(self):
+        """Test a collector raising is skipped while the others are rendered."""
+        registry = MetricsRegistry()
+
+        def broken():
+            raise RuntimeError("boom")
+
+        registry.register_collector("broken", broken)
+        registry.register_collector("ok", lambda: [MetricFamily("up", "gauge", "Up").add(None, 1)])
+
+        assert "up 1" in registry.render()
+
+    def test_observe_duration_records_on_error(self):
+        """Test the timer observes blocks that raise."""
+        histogram = Histogram("timed_seconds", "Timed", registry=MetricsRegistry()).labels()
+        try:
+            with observe_duration(histogram):
+                raise ValueError("failed")
+        except ValueError:
+            pass
+        assert histogram.count == 1
+
+
+class TestInstrumentation:
+    """Test request and database instrumentation."""
+
+    def test_metrics_middleware_labels_route_template(self):
+        """Test requests are labelled by route template and status, with middleware time measured."""
+        app = FastAPI()
+        app.add_middleware(HandlerTimingMiddleware)
+        app.add_middleware(MetricsMiddleware)
+
+        @app.get("/items/{item_id}")
+        async def get_item(item_id: str):
+            return {"item_id": item_id}
+
+        before = http_requests_total.labels("GET", "/items/{item_id}", 200).value
+        client = TestClient(app)
+        assert client.get("/items/1").status_code == 200
+        assert client.get("/items/2").status_code == 200
+        assert client.get("/missing").status_code == 404
+
+        assert http_requests_total.labels("GET", "/items/{item_id}", 200).value == before + 2
+        assert http_requests_total.labels("GET", "unmatched", 404).value >= 1
+        output = REGISTRY.render()
+        assert 'http_request_duration_seconds_count{method="GET",route="/items/{item_id}"}' in output
+        assert "http_middleware_duration_seconds_count" in output
+
+    def test_database_queries_are_timed(self):
+        """Test SQL statements are timed by operation."""
+        engine = instrument_engine(create_engine("sqlite://"))
+        histogram = db_query_duration_seconds.labels("SELECT")
+        before = histogram.count
+
+        with engine.connect() as connection:
+            connection.execute(text("SELECT 1"))
+            try:
+                connection.execute(text("SELECT * FROM missing_table"))
+            except Exception:
+                pass
+            connection.execute(text("SELECT 2"))
+
+        assert histogram.count == before + 2
@@ -0,0 +1,175 @@
+"""Unit tests for the trade-updates driven order book."""
+
+import pytest
+import time
+from unittest.mock import patch, MagicMock, AsyncMock
+
+from alpaca.trading.stream import TradingStream
+
+from app.order_book import AccountOrderBook, OrderBookManager
+from app.alpaca_client import PooledAlpacaClient
+
+
+def make_order(order_id: str, status: str = "new", submitted_at: str = "2025-01-02 10:00:00 EST"):
+    return {"id": order_id, "symbol": "AAPL", "side": "sell", "status": status, "submitted_at": submitted_at}
+
+
+class TestAccountOrderBook:
+    """Test applying stream events and reconciling with REST snapshots."""
+
+    def test_apply_update_tracks_live_orders(self):
+        """Test terminal events remove orders and replacements close the original."""
+        book = AccountOrderBook("acc_1")
+
+        book.apply_update("new", make_order("o1"))
+        book.apply_update("partial_fill", make_order("o1", status="partially_filled"))
+        book.apply_update("new", make_order("o2"))
+        book.apply_update("fill", make_order("o2", status="filled"))
+        book.apply_update("new", make_order("o3"), replaces="o1")
+
+        assert set(book.orders) == {"o3"}
+        assert book.event_count == 5
+
+    def test_reconcile_keeps_newer_stream_state(self):
+        """Test a snapshot corrects drift but never overwrites events received after it was requested."""
+        book = AccountOrderBook("acc_1")
+        book.apply_update("new", make_order("stale"))
+
+        snapshot_started = time.monotonic()
+        # Filled while the snapshot request was in flight
+        book.apply_update("fill", make_order("filled_late", status="filled"))
+
+        drift = book.reconcile(
+            [make_order("missed"), make_order("filled_late")],
+            snapshot_started
+        )
+
+        assert set(book.orders) == {"missed"}
+        assert drift == 2  # "stale" removed, "missed" added
+        assert book.synced is True
+
+    def test_truncated_reconcile_keeps_missing_orders(self):
+        """Test a snapshot cut off at the page limit removes nothing and stops memory answers."""
+        book = AccountOrderBook("acc_1")
+        book.apply_update("new", make_order("beyond_limit"))
+        book.stream_connected = True
+
+        drift = book.reconcile([make_order("o1")], time.monotonic(), complete=False)
+
+        assert set(book.orders) == {"beyond_limit", "o1"}
+        assert drift == 1
+        assert book.is_live is False
+
+        book.reconcile([make_order("o1")], time.monotonic())
+
+        assert set(book.orders) == {"o1"}
+        assert book.is_live is True
+
+    def test_query_filters_and_sorts_newest_first(self):
+        """Test queries match statuses and return newest orders first."""
+        book = AccountOrderBook("acc_1")
+        book.apply_update("new", make_order("old", submitted_at="2025-01-02 09:00:00 EST"))
+        book.apply_update("new", make_order("new", submitted_at="2025-01-02 11:00:00 EST"))
+        book.apply_update("pending_cancel", make_order("cancelling", status="pending_cancel"))
+
+        result = book.query({"new"}, limit=10)
+
+        assert [order["id"] for order in result] == ["new", "old"]
+        assert len(book.query({"new", "pending_cancel"}, limit=1)) == 1
+
+
+class TestOrderBookManager:
+    """Test memory-vs-REST routing of order queries."""
+
+    def _make_manager(self):
+        manager = OrderBookManager()
+        book = AccountOrderBook("acc_1")
+        book.reconcile([make_order("o1"), make_order("o2", status="partially_filled")], time.monotonic())
+        book.stream_connected = True
+        manager.books["acc_1"] = book
+        return manager
+
+    def test_open_orders_served_from_memory(self):
+        """Test open-order queries of a live book do not need REST."""
+        manager = self._make_manager()
+
+        result = manager.get_orders("acc_1", "open")
+
+        assert [order["id"] for order in result] == ["o1"]
+        assert manager.memory_hits == 1
+
+    @pytest.mark.parametrize("status, kwargs", [
+        ("all", {}),
+        ("filled", {}),
+        ("open,accepted,replaced", {}),
+        ("open", {"after": "2025-01-01"}),
+    ])
+    def test_queries_needing_history_fall_back(self, status, kwargs):
+        """Test closed statuses and date filters fall back to REST."""
+        manager = self._make_manager()
+
+        assert manager.get_orders("acc_1", status, **kwargs) is None
+        assert manager.memory_misses == 1
+
+    @pytest.mark.asyncio
+    async def test_reconnect_requires_fresh_reconcile(self):
+        """Test every stream (re)connect unsyncs the book until a snapshot requested after it arrives."""
+        manager = OrderBookManager()
+        book = AccountOrderBook("acc_1")
+        manager.books["acc_1"] = book
+        stream = TradingStream("key", "secret", paper=True)
+
+        with patch.object(TradingStream, "_start_ws", AsyncMock()), \
+                patch.object(TradingStream, "close", AsyncMock()):
+            manager._track_connections(stream, book)
+            # Re-tracking a reused stream wraps the SDK methods, not the previous hooks
+            manager._track_connections(stream, book)
+
+            await stream._start_ws()
+            book.reconcile([make_order("o1")], time.monotonic())
+            assert manager.get_orders("acc_1", "open") is not None
+
+            # Dropped and reconnected between two reconcile loop checks
+            snapshot_started = time.monotonic()
+            await stream.close()
+            await stream._start_ws()
+            assert manager.get_orders("acc_1", "open") is None
+
+            # A snapshot requested before the reconnect does not resync the book
+            book.reconcile([make_order("o1")], snapshot_started)
+            assert manager.get_orders("acc_1", "open") is None
+
+            book.reconcile([make_order("o1")], time.monotonic())
+            assert manager.get_orders("acc_1", "open") is not None
+
+        assert book.connection_count == 2
+
+    def test_disconnected_book_falls_back(self):
+        """Test a book whose stream is down is not trusted."""
+        manager = self._make_manager()
+        manager.books["acc_1"].stream_connected = False
+
+        assert manager.get_orders("acc_1", "open") is None
+        assert manager.get_orders("unknown", "open") is None
+
+
+@pytest.mark.asyncio
+async def test_pooled_get_orders_uses_order_book():
+    """Test PooledAlpacaClient answers open orders from the order book without REST."""
+    manager = OrderBookManager()
+    book = AccountOrderBook("acc_1")
+    book.reconcile([make_order("o1")], time.monotonic())
+    book.stream_connected = True
+    manager.books["acc_1"] = book
+
+    pool = MagicMock()
+    pool.resolve_account_id.return_value = "acc_1"
+    client = PooledAlpacaClient()
+    client._pool = pool
+    client._get_http_client = MagicMock()
+
+    with patch("app.order_book.order_book_manager", manager):
+        result = await client.get_orders(status="open", account_id="acc_1")
+
+    assert [order["id"] for order in result] == ["o1"]
+    client._get_http_client.assert_not_called()
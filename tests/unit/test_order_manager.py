@@ -0,0 +1,200 @@
+"""Unit tests for sell module order cancellation."""
+
+import pytest
+import asyncio
+from datetime import datetime, timedelta
+from unittest.mock import patch, MagicMock, AsyncMock
+
+from app.alpaca_client import expand_order_status_filter
+from app.sell_module.order_manager import OrderManager, Order
+
+
+def make_order(order_id: str, account_id: str = "acc_1", side: str = "sell", age_minutes: int = 10,
+               status: str = "new") -> Order:
+    """Build an open order submitted age_minutes ago."""
+    submitted_at = (datetime.now() - timedelta(minutes=age_minutes)).isoformat()
+    return Order({
+        "id": order_id,
+        "account_id": account_id,
+        "symbol": "AAPL250620C00200000",
+        "side": side,
+        "status": status,
+        "asset_class": "us_option",
+        "submitted_at": submitted_at
+    })
+
+
+def make_manager(orders, max_concurrent=5, rate_limit=600, bulk_cancel=True):
+    config_manager = MagicMock()
+    config_manager.get_order_cancel_config.return_value = {
+        "max_concurrent_per_account": max_concurrent,
+        "rate_limit_per_minute": rate_limit,
+        "bulk_cancel": bulk_cancel
+    }
+    api_client = MagicMock()
+    manager = OrderManager(MagicMock(), api_client, config_manager)
+
+    def matching(status):
+        # Apply the same status filter as the orders endpoint
+        return [order for order in orders if order.status in expand_order_status_filter(status)]
+
+    manager.get_all_orders = AsyncMock(side_effect=lambda status: matching(status))
+    # Re-fetch before bulk cancel sees the same open orders unless a test overrides it
+    manager._get_account_orders_via_api = AsyncMock(
+        side_effect=lambda account_id, status: [order for order in matching(status) if order.account_id == account_id])
+    return manager, api_client
+
+
+class TestCancelOldOrders:
+    """Test concurrent, budgeted and bulk cancellation."""
+
+    @pytest.mark.asyncio
+    async def test_cancels_run_concurrently_within_bound(self):
+        """Test per-account cancels overlap but never exceed max_concurrent_per_account."""
+        orders = [make_order(f"o{i}") for i in range(6)] + [make_order("fresh", age_minutes=0)]
+        manager, api_client = make_manager(orders, max_concurrent=3)
+
+        in_flight = 0
+        peak = 0
+
+        async def cancel_order(account_id, order_id):
+            nonlocal in_flight, peak
+            in_flight += 1
+            peak = max(peak, in_flight)
+            await asyncio.sleep(0.01)
+            in_flight -= 1
+            return {"status": "cancelled", "order_id": order_id}
+
+        api_client.cancel_order = AsyncMock(side_effect=cancel_order)
+        api_client.cancel_all_orders = AsyncMock()
+
+        await manager.cancel_old_orders(minutes=3, side="sell")
+
+        assert api_client.cancel_order.await_count == 6
+        assert peak == 3
+        api_client.cancel_all_orders.assert_not_called()
+
+        metrics = manager.get_cancel_metrics()
+        assert metrics["cycles"] == 1
+        assert metrics["total_cancelled"] == 6
+        assert metrics["last_cycle"]["requests"] == 6
+        assert metrics["last_cycle"]["latency_ms"]["p95"] is not None
+
+    @pytest.mark.asyncio
+    async def test_bulk_cancel_when_all_open_orders_qualify(self):
+        """Test one bulk request replaces per-order cancels when every open order is stale."""
+        orders = [make_order("o1", side="sell"), make_order("o2", side="buy"), make_order("o3", account_id="acc_2")]
+        manager, api_client = make_manager(orders)
+        api_client.cancel_all_orders = AsyncMock(return_value={
+            "status": "cancelled",
+            "cancelled_order_ids": ["o1"],
+            "failed": [{"order_id": "o2", "status": 500}]
+        })
+        api_client.cancel_order = AsyncMock(return_value={"status": "cancelled"})
+
+        await manager.cancel_old_orders(minutes=3, side="all")
+
+        api_client.cancel_all_orders.assert_awaited_once_with("acc_1")
+        # Single-order account is cancelled directly
+        api_client.cancel_order.assert_awaited_once_with("acc_2", "o3")
+
+        last_cycle = manager.get_cancel_metrics()["last_cycle"]
+        assert last_cycle["bulk_cancels"] == 1
+        assert last_cycle["cancelled"] == 2
+        assert last_cycle["failed"] == 1
+
+    @pytest.mark.asyncio
+    async def test_no_bulk_cancel_when_other_side_is_open(self):
+        """Test bulk cancel is skipped when it would also cancel non-qualifying orders."""
+        orders = [make_order("s1"), make_order("s2"), make_order("b1", side="buy")]
+        manager, api_client = make_manager(orders)
+        api_client.cancel_all_orders = AsyncMock()
+        api_client.cancel_order = AsyncMock(return_value={"status": "cancelled"})
+
+        await manager.cancel_old_orders(minutes=3, side="sell")
+
+        api_client.cancel_all_orders.assert_not_called()
+        assert api_client.cancel_order.await_count == 2
+
+    @pytest.mark.asyncio
+    async def test_no_bulk_cancel_when_partially_filled_order_is_open(self):
+        """Test a partially filled order that does not qualify keeps bulk cancel off."""
+        orders = [make_order("o1"), make_order("o2"),
+                  make_order("p1", age_minutes=0, status="partially_filled")]
+        manager, api_client = make_manager(orders)
+        api_client.cancel_all_orders = AsyncMock()
+        api_client.cancel_order = AsyncMock(return_value={"status": "cancelled"})
+
+        await manager.cancel_old_orders(minutes=3, side="sell")
+
+        api_client.cancel_all_orders.assert_not_called()
+        assert {call.args[1] for call in api_client.cancel_order.await_args_list} == {"o1", "o2"}
+
+    @pytest.mark.asyncio
+    async def test_bulk_cancel_failure_falls_back(self):
+        """Test a failed bulk request falls back to per-order cancellation."""
+        orders = [make_order("o1"), make_order("o2")]
+        manager, api_client = make_manager(orders)
+        api_client.cancel_all_orders = AsyncMock(return_value={"error": "HTTP 500"})
+        api_client.cancel_order = AsyncMock(return_value={"status": "cancelled"})
+
+        await manager.cancel_old_orders(minutes=3, side="sell")
+
+        assert api_client.cancel_order.await_count == 2
+        assert manager.get_cancel_metrics()["total_cancelled"] == 2
+
+    @pytest.mark.asyncio
+    async def test_no_bulk_cancel_when_open_orders_changed(self):
+        """Test bulk cancel is skipped when an order was placed after the cycle's fetch."""
+        orders = [make_order("o1"), make_order("o2")]
+        manager, api_client = make_manager(orders)
+        manager._get_account_orders_via_api = AsyncMock(return_value=orders + [make_order("new", age_minutes=0)])
+        api_client.cancel_all_orders = AsyncMock()
+        api_client.cancel_order = AsyncMock(return_value={"status": "cancelled"})
+
+        await manager.cancel_old_orders(minutes=3, side="sell")
+
+        api_client.cancel_all_orders.assert_not_called()
+        assert api_client.cancel_order.await_count == 2
+        metrics = manager.get_cancel_metrics()
+        assert metrics["last_cycle"]["bulk_skipped"] == 1
+        assert metrics["total_cancelled"] == 2
+
+    @pytest.mark.asyncio
+    async def test_unexpected_bulk_cancels_are_recorded(self):
+        """Test orders cancelled by bulk cancel but never selected are counted in the cycle metrics."""
+        orders = [make_order("o1"), make_order("o2")]
+        manager, api_client = make_manager(orders)
+        api_client.cancel_all_orders = AsyncMock(return_value={
+            "status": "cancelled",
+            "cancelled_order_ids": ["o1", "o2", "late"],
+            "failed": []
+        })
+
+        await manager.cancel_old_orders(minutes=3, side="sell")
+
+        metrics = manager.get_cancel_metrics()
+        assert metrics["last_cycle"]["unexpected_cancels"] == 1
+        assert metrics["total_unexpected_cancels"] == 1
+        assert metrics["total_cancelled"] == 2
+
+    @pytest.mark.asyncio
+    async def test_rate_budget_throttles_cancels(self):
+        """Test cancels wait for the account's rate budget once it is spent."""
+        orders = [make_order(f"o{i}") for i in range(3)]
+        manager, api_client = make_manager(orders, rate_limit=1, bulk_cancel=False)
+        api_client.cancel_order = AsyncMock(return_value={"status": "cancelled"})
+
+        sleeps = []
+
+        async def fake_sleep(seconds):
+            sleeps.append(seconds)
+            limiter = manager._get_cancel_rate_limiter("acc_1")
+            limiter.tokens = 1
+
+        with patch("app.sell_module.order_manager.asyncio.sleep", side_effect=fake_sleep):
+            await manager.cancel_old_orders(minutes=3, side="sell")
+
+        assert api_client.cancel_order.await_count == 3
+        assert len(sleeps) == 2
+        assert manager.get_cancel_metrics()["last_cycle"]["throttled_waits"] == 2
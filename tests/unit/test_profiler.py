@@ -0,0 +1,104 @@
+"""Unit tests for the on-demand sampling profiler."""
+
+import asyncio
+import threading
+import time
+
+import pytest
+
+from app.profiler import ProfilerBusyError, SamplingProfiler, dump_tasks
+
+
+def _busy_loop(stop: threading.Event):
+    while not stop.is_set():
+        sum(range(1000))
+
+
+def _profile_busy_thread(profiler: SamplingProfiler, seconds: float = 0.3):
+    stop = threading.Event()
+    worker = threading.Thread(target=_busy_loop, args=(stop,), name="busy-worker")
+    worker.start()
+    try:
+        return profiler.run(seconds, interval=0.005)
+    finally:
+        stop.set()
+        worker.join()
+
+
+class TestSamplingProfiler:
+    """Test sampling and export formats."""
+
+    def test_collapsed_stacks_include_busy_thread(self):
+        """Test a busy thread shows up in collapsed stacks with its function."""
+        profile = _profile_busy_thread(SamplingProfiler())
+
+        assert profile.samples > 10
+        lines = [line for line in profile.collapsed().splitlines() if line.startswith("busy-worker;")]
+        assert lines
+        assert any("_busy_loop (tests/unit/test_profiler.py:" in line for line in lines)
+        assert sum(int(line.rsplit(" ", 1)[1]) for line in lines) > 10
+
+    def test_speedscope_document(self):
+        """Test the speedscope export has shared frames and weighted per-thread samples."""
+        profile = _profile_busy_thread(SamplingProfiler())
+
+        document = profile.speedscope(name="test")
+
+        assert document["$schema"] == "https://www.speedscope.app/file-format-schema.json"
+        busy = next(p for p in document["profiles"] if p["name"] == "busy-worker")
+        assert busy["type"] == "sampled"
+        assert len(busy["samples"]) == len(busy["weights"])
+        frames = document["shared"]["frames"]
+        assert all(0 <= index < len(frames) for sample in busy["samples"] for index in sample)
+        assert any(frames[sample[-1]]["name"] == "_busy_loop" for sample in busy["samples"])
+
+    def test_idle_threads_skipped_by_default(self):
+        """Test threads blocked in a wait are excluded unless requested."""
+        stop = threading.Event()
+        waiter = threading.Thread(target=stop.wait, name="idle-waiter")
+        waiter.start()
+        try:
+            profiler = SamplingProfiler()
+            without_idle = profiler.run(0.05, interval=0.01)
+            with_idle = profiler.run(0.05, interval=0.01, include_idle=True)
+        finally:
+            stop.set()
+            waiter.join()
+
+        assert not any(thread == "idle-waiter" for thread, _ in without_idle.stacks)
+        assert any(thread == "idle-waiter" for thread, _ in with_idle.stacks)
+
+    def test_only_one_profile_at_a_time(self):
+        """Test a second concurrent run is rejected."""
+        profiler = SamplingProfiler()
+        runner = threading.Thread(target=profiler.run, args=(0.3,))
+        runner.start()
+        time.sleep(0.05)
+        try:
+            with pytest.raises(ProfilerBusyError):
+                profiler.run(0.1)
+        finally:
+            runner.join()
+
+    @pytest.mark.asyncio
+    async def test_task_dump_shows_await_chain(self):
+        """Test the task dump lists tasks with the coroutine they are suspended in."""
+        async def inner_wait(event: asyncio.Event):
+            await event.wait()
+
+        async def outer_wait(event: asyncio.Event):
+            await inner_wait(event)
+
+        event = asyncio.Event()
+        task = asyncio.get_running_loop().create_task(outer_wait(event), name="waiting-task")
+        await asyncio.sleep(0)
+        try:
+            entry = next(item for item in dump_tasks() if item["name"] == "waiting-task")
+        finally:
+            event.set()
+            await task
+
+        assert entry["state"] == "pending"
+        assert entry["coroutine"].endswith("outer_wait")
+        assert entry["stack"][0].endswith(" outer_wait")
+        assert entry["stack"][1].endswith(" inner_wait")
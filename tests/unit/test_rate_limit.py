@@ -0,0 +1,31 @@
+"""Unit tests for token bucket request budgets."""
+
+from unittest.mock import patch
+
+from app.rate_limit import TokenBucket
+
+
+class TestTokenBucket:
+    """Test token bucket budget and refill."""
+
+    def test_budget_exhausts(self):
+        """Test the bucket exhausts after its per-minute budget."""
+        bucket = TokenBucket(requests_per_minute=2)
+
+        assert bucket.try_acquire() is True
+        assert bucket.try_acquire() is True
+        assert bucket.try_acquire() is False
+        assert bucket.seconds_until_available() > 0
+
+    def test_refills_over_time(self):
+        """Test tokens come back at capacity / 60 per second."""
+        with patch("app.rate_limit.time.monotonic", return_value=100.0):
+            bucket = TokenBucket(requests_per_minute=60)
+            bucket.tokens = 0.0
+
+        with patch("app.rate_limit.time.monotonic", return_value=100.5):
+            assert bucket.try_acquire() is False
+            assert abs(bucket.seconds_until_available() - 0.5) < 1e-9
+
+        with patch("app.rate_limit.time.monotonic", return_value=101.0):
+            assert bucket.try_acquire() is True
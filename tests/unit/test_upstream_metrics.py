@@ -0,0 +1,149 @@
+"""Unit tests for upstream call latency tracking and the synthetic probe."""
+
+import asyncio
+
+import pytest
+from unittest.mock import AsyncMock, MagicMock, patch
+
+from alpaca.common.exceptions import RetryException
+from alpaca.trading.client import TradingClient
+
+from app.account_pool import AccountConfig, AccountPool, DataKeyConfig, DataKeyConnection
+from app.alpaca_client import PooledAlpacaClient
+from app.circuit_breaker import CircuitBreakerRegistry, EndpointClass
+from app.upstream_metrics import (
+    UpstreamMetrics,
+    UpstreamProbe,
+    UpstreamProbeConfig,
+    instrument_rest_client,
+    upstream_metrics
+)
+
+
+def _trading_client(responses) -> TradingClient:
+    """Trading client whose per-attempt request replays responses (exceptions are raised)"""
+    client = TradingClient("key", "secret", paper=True)
+    client._retry, client._retry_wait = 2, 0
+
+    def one_request(method, url, opts, retry):
+        response = responses.pop(0)
+        if isinstance(response, Exception):
+            raise response
+        return response
+
+    client._one_request = one_request
+    return instrument_rest_client(client)
+
+
+class TestUpstreamMetrics:
+    """Test host and retry attribution and per-key aggregation."""
+
+    def test_instrumented_client_attributes_host_and_retries(self):
+        """Test SDK-internal retries and the contacted host are recorded on the tracked call."""
+        client = _trading_client([RetryException(), {"status": "ACTIVE"}])
+        metrics = UpstreamMetrics()
+
+        with metrics.track() as call:
+            assert client._request("GET", "/account") == {"status": "ACTIVE"}
+        metrics.record("acc_1", EndpointClass.ACCOUNT, call, 0.12)
+
+        assert call.requests == 2
+        assert call.retries == 1
+        assert call.host == "paper-api.alpaca.markets"
+        stats = metrics.get_stats()["acc_1"]["account@paper-api.alpaca.markets"]
+        assert stats["calls"] == 1
+        assert stats["retries"] == 1
+        assert stats["latency"]["count"] == 1
+
+    def test_instrumentation_is_idempotent_and_untracked_calls_pass_through(self):
+        """Test re-instrumenting does not double count and calls outside track() still work."""
+        client = _trading_client([{"ok": 1}, {"ok": 2}])
+        instrument_rest_client(client)
+
+        assert client._request("GET", "/clock") == {"ok": 1}
+        with UpstreamMetrics().track() as call:
+            client._request("GET", "/clock")
+        assert call.requests == 1
+        assert call.retries == 0
+
+    def test_error_rate_and_untouched_calls(self):
+        """Test errors are counted per key and calls that never reached Alpaca are skipped."""
+        metrics = UpstreamMetrics()
+        with metrics.track() as call:
+            pass
+        metrics.record("acc_1", EndpointClass.TRADING, call, 0.01, error="rejected")
+        assert metrics.get_stats() == {}
+
+        call.requests, call.host = 1, "api.alpaca.markets"
+        metrics.record("acc_1", EndpointClass.TRADING, call, 0.05)
+        metrics.record("acc_1", EndpointClass.TRADING, call, 2.0, error="HTTPSConnectionPool: Read timed out",
+                       upstream_failure=True)
+
+        stats = metrics.get_stats()["acc_1"]["trading@api.alpaca.markets"]
+        assert stats["calls"] == 2
+        assert stats["errors"] == 1
+        assert stats["upstream_failures"] == 1
+        assert stats["error_rate"] == 0.5
+
+    @pytest.mark.asyncio
+    async def test_guarded_call_records_upstream_metrics(self):
+        """Test calls through the pooled client are recorded per account and endpoint class."""
+        pool = AccountPool()
+        pool.circuit_breakers = CircuitBreakerRegistry()
+        pool.account_configs["acc_1"] = AccountConfig(account_id="acc_1", api_key="key", secret_key="secret")
+        pool._initialized = True
+        client = PooledAlpacaClient()
+        client._pool = pool
+        trading_client = _trading_client([{"id": "order-1"}])
+
+        async def place_order(alpaca_client):
+            return await asyncio.to_thread(trading_client._request, "POST", "/orders")
+
+        upstream_metrics.clear()
+        try:
+            client._get_http_client = MagicMock(return_value=MagicMock())
+            result = await client._run_account_call("acc_1", None, EndpointClass.TRADING, place_order)
+            stats = upstream_metrics.get_stats()
+        finally:
+            upstream_metrics.clear()
+
+        assert result == {"id": "order-1"}
+        assert stats["acc_1"]["trading@paper-api.alpaca.markets"]["calls"] == 1
+
+
+class TestUpstreamProbe:
+    """Test the synthetic probe rounds."""
+
+    def _probe(self, **config) -> UpstreamProbe:
+        pool = AccountPool()
+        pool.account_configs["acc_1"] = AccountConfig(account_id="acc_1", api_key="key", secret_key="secret")
+        pool.account_configs["acc_2"] = AccountConfig(account_id="acc_2", api_key="key", secret_key="secret",
+                                                      enabled=False)
+        data_config = DataKeyConfig(key_id="data_1", api_key="data_key", secret_key="data_secret")
+        pool.data_key_connections["data_1"] = DataKeyConnection(data_config)
+        client = MagicMock()
+        client.pool = pool
+        client._run_account_call = AsyncMock(return_value={})
+        client._run_data_call = AsyncMock(return_value={"error": "HTTPSConnectionPool: Read timed out"})
+        probe = UpstreamProbe(UpstreamProbeConfig(**config))
+        probe.client = client
+        return probe
+
+    @pytest.mark.asyncio
+    async def test_probe_round_covers_enabled_accounts_and_data_keys(self):
+        """Test one round probes every enabled account and market data key."""
+        probe = self._probe()
+
+        results = await probe.probe_once()
+
+        assert set(results) == {"account:acc_1", "data_key:data_1"}
+        assert results["account:acc_1"]["ok"] is True
+        assert results["data_key:data_1"]["ok"] is False
+        assert probe.client._run_account_call.call_args.args[2] == EndpointClass.ACCOUNT
+        assert probe.get_stats()["rounds"] == 1
+
+    def test_probe_skipped_outside_market_hours(self):
+        """Test the probe only runs during market hours unless configured otherwise."""
+        with patch("app.market_utils.is_market_hours", return_value=False):
+            assert self._probe()._should_probe() is False
+            assert self._probe(market_hours_only=False)._should_probe() is True
@@ -0,0 +1,170 @@
+"""Unit tests for streaming bar aggregation."""
+
+import pytest
+import json
+import arrow
+from unittest.mock import patch, MagicMock, AsyncMock
+
+from app.ws_bars import BarAggregator
+from app.ws_encoding import build_message
+from app.ws_subscriptions import SubscriptionRegistry
+from app.alpaca_client import PooledAlpacaClient
+
+
+def trade(symbol: str, timestamp: str, price: float, size: float = 100):
+    return build_message({"T": "t", "S": symbol, "p": price, "s": size, "t": timestamp}, "stock")
+
+
+class TestBarAggregator:
+    """Test OHLCV, VWAP and bar closing."""
+
+    def test_bar_closes_on_next_interval_with_vwap(self):
+        aggregator = BarAggregator()
+        assert aggregator.add_trade(trade("AAPL", "2025-01-02T15:04:05.100Z", 10.0, 100)) == []
+        aggregator.add_trade(trade("AAPL", "2025-01-02T15:04:05.500Z", 12.0, 300))
+        aggregator.add_trade(trade("AAPL", "2025-01-02T15:04:05.900Z", 11.0, 100))
+
+        closed = aggregator.add_trade(trade("AAPL", "2025-01-02T15:04:06.000Z", 11.5))
+
+        assert [bar.interval for bar in closed] == ["1s"]
+        bar = closed[0]
+        assert (bar.open, bar.high, bar.low, bar.close) == (10.0, 12.0, 10.0, 11.0)
+        assert bar.volume == 500
+        assert bar.trade_count == 3
+        assert bar.vwap == pytest.approx((10.0 * 100 + 12.0 * 300 + 11.0 * 100) / 500)
+        assert bar.timestamp == "2025-01-02T15:04:05Z"
+
+    def test_timer_closes_quiet_symbols_and_late_trades_amend_history(self):
+        aggregator = BarAggregator(close_delay_seconds=1.0)
+        aggregator.add_trade(trade("AAPL", "2025-01-02T15:04:05Z", 10.0))
+        bar_end = arrow.get("2025-01-02T15:04:06Z").timestamp()
+
+        assert aggregator.close_due(now=bar_end + 0.5) == []
+        closed = aggregator.close_due(now=bar_end + 1.0)
+        assert [bar.interval for bar in closed] == ["1s"]
+
+        # Same second arrives after the timer closed it: stored bar updated, nothing re-sent
+        assert aggregator.add_trade(trade("AAPL", "2025-01-02T15:04:05.800Z", 9.0)) == []
+        stored = aggregator._closed[("AAPL", "1s")][-1]
+        assert (stored.low, stored.close, stored.trade_count) == (9.0, 10.0, 2)
+
+    def test_invalidate_drops_history(self):
+        aggregator = BarAggregator()
+        aggregator.add_trade(trade("AAPL", "2025-01-02T15:04:05Z", 10.0))
+        aggregator.invalidate(["AAPL"])
+
+        assert aggregator.close_due(now=2e9) == []
+        assert aggregator.get_stats()["symbols"] == 0
+
+
+class TestIntradayRestBars:
+    """Test get_stock_bars answers today's bars from memory when the stream covers the day."""
+
+    def _stream_day(self, aggregator: BarAggregator, day: arrow.Arrow):
+        for minute in range(3):
+            start = day.replace(hour=9, minute=30 + minute, second=0, microsecond=0)
+            aggregator.add_trade(trade("AAPL", start.to("UTC").isoformat(), 100.0 + minute, 10))
+        aggregator.close_due(now=day.replace(hour=10).timestamp())
+
+    def test_rollup_and_coverage(self):
+        aggregator = BarAggregator()
+        today = arrow.now("US/Eastern")
+        date = today.format("YYYY-MM-DD")
+        market = {"open_hour": 9, "open_minute": 30}
+
+        with patch("app.ws_bars.settings", MagicMock(market_config=market)):
+            self._stream_day(aggregator, today)
+            minute_bars = aggregator.intraday_bars("AAPL", "1Min", 100, date)
+            five_minute_bars = aggregator.intraday_bars("AAPL", "5Min", 100, date, date)
+            assert aggregator.intraday_bars("AAPL", "1Day", 100, date) is None
+            assert aggregator.intraday_bars("AAPL", "1Min", 100, None) is None
+            assert aggregator.intraday_bars("MSFT", "1Min", 100, date) is None
+
+        assert minute_bars["bars_count"] == 3
+        assert [bar["close"] for bar in minute_bars["bars"]] == [100.0, 101.0, 102.0]
+        assert five_minute_bars["bars"][0]["volume"] == 30
+        assert five_minute_bars["bars"][0]["vwap"] == pytest.approx(101.0)
+        assert minute_bars["source"] == "stream"
+
+    def test_stream_started_after_open_is_not_served(self):
+        aggregator = BarAggregator()
+        today = arrow.now("US/Eastern")
+
+        with patch("app.ws_bars.settings", MagicMock(market_config={"open_hour": 9, "open_minute": 0})):
+            self._stream_day(aggregator, today)
+            assert aggregator.intraday_bars("AAPL", "1Min", 100, today.format("YYYY-MM-DD")) is None
+
+    @staticmethod
+    def _make_client(paper_trading: bool):
+        client = PooledAlpacaClient()
+        client._run_data_call = AsyncMock(return_value={"symbol": "AAPL", "bars": []})
+        client._pool = MagicMock()
+        client._pool.data_key_paper_trading.return_value = {paper_trading}
+        return client
+
+    @pytest.mark.asyncio
+    async def test_pooled_client_skips_rest_when_served(self):
+        """Test a paper data key (REST feed IEX) is answered from the IEX stream."""
+        client = self._make_client(paper_trading=True)
+        aggregator = MagicMock()
+        aggregator.intraday_bars.return_value = {"symbol": "AAPL", "bars": [], "source": "stream"}
+
+        with patch("app.ws_bars.bar_aggregator", aggregator):
+            result = await client.get_stock_bars("AAPL", "1Min", 10, "2025-01-02")
+
+        assert result["source"] == "stream"
+        client._run_data_call.assert_not_called()
+
+    @pytest.mark.asyncio
+    async def test_live_key_with_iex_stream_uses_rest(self):
+        """Test a live data key (REST feed SIP) never gets bars built from the IEX stream."""
+        client = self._make_client(paper_trading=False)
+        aggregator = MagicMock()
+        aggregator.intraday_bars.return_value = {"symbol": "AAPL", "bars": [], "source": "stream"}
+
+        with patch("app.ws_bars.bar_aggregator", aggregator):
+            result = await client.get_stock_bars("AAPL", "1Min", 10, "2025-01-02")
+
+        assert "source" not in result
+        aggregator.intraday_bars.assert_not_called()
+        client._run_data_call.assert_awaited_once()
+
+    @pytest.mark.asyncio
+    async def test_live_key_with_sip_stream_is_served(self):
+        """Test a SIP stream serves today's bars for live data keys."""
+        client = self._make_client(paper_trading=False)
+        aggregator = MagicMock()
+        aggregator.intraday_bars.return_value = {"symbol": "AAPL", "bars": [], "source": "stream"}
+
+        with patch("app.ws_bars.bar_aggregator", aggregator), \
+                patch("app.ws_cache.settings") as mock_settings:
+            mock_settings.websocket = {"stock_url": "wss://stream.data.alpaca.markets/v2/sip"}
+            result = await client.get_stock_bars("AAPL", "1Min", 10, "2025-01-02")
+
+        assert result["source"] == "stream"
+        client._run_data_call.assert_not_called()
+
+
+class TestBarBroadcast:
+    """Test closed bars reach the symbol's subscribers."""
+
+    @pytest.mark.asyncio
+    async def test_closed_bar_is_sent_as_bar_message(self):
+        from app.websocket_routes import ws_manager
+
+        registry = SubscriptionRegistry()
+        session = MagicMock(options={}, binary=False)
+        session.enqueue.return_value = True
+        registry.add_client("c1", session)
+        registry.subscribe("c1", ["AAPL"])
+
+        with patch("app.websocket_routes.subscription_registry", registry), \
+                patch("app.websocket_routes.bar_aggregator", BarAggregator()), \
+                patch.object(ws_manager, "_ensure_bar_timer"):
+            await ws_manager._fan_out(trade("AAPL", "2025-01-02T15:04:05Z", 10.0))
+            await ws_manager._fan_out(trade("AAPL", "2025-01-02T15:04:06Z", 10.5))
+
+        frames = [json.loads(call.args[2]) for call in session.enqueue.call_args_list]
+        assert [frame["type"] for frame in frames] == ["trade", "bar", "trade"]
+        assert frames[1]["interval"] == "1s"
+        assert frames[1]["close"] == 10.0
@@ -0,0 +1,203 @@
+"""Unit tests for the WebSocket last-value cache."""
+
+import pytest
+import json
+from unittest.mock import patch, MagicMock, AsyncMock
+
+from app.ws_cache import LastValueCache
+from app.ws_encoding import build_message
+from app.alpaca_client import PooledAlpacaClient
+from app.ws_clients import ClientSession
+
+
+OPTION_SYMBOL = "AAPL250620C00200000"
+
+
+def quote(symbol: str, bid: float = 1.0, ask: float = 1.1):
+    return build_message({"T": "q", "S": symbol, "bp": bid, "ap": ask, "bs": 3, "as": 4,
+                          "t": "2025-01-02T15:04:05Z"}, "stock")
+
+
+def trade(symbol: str, price: float = 1.05):
+    return build_message({"T": "t", "S": symbol, "p": price, "s": 10, "t": "2025-01-02T15:04:06Z"}, "stock")
+
+
+class TestLastValueCache:
+    """Test cache maintenance and snapshots."""
+
+    def test_keeps_latest_quote_and_trade(self):
+        cache = LastValueCache()
+        cache.update(quote("AAPL", bid=1.0))
+        cache.update(quote("AAPL", bid=2.0))
+        cache.update(trade("AAPL"))
+
+        assert cache.get_quote("AAPL").bid_price == 2.0
+        assert cache.get_trade("AAPL").price == 1.05
+        assert cache.get_quote("TSLA") is None
+        assert cache.get_stats()["rest_hits"] == 1
+
+    def test_invalidate_drops_symbols(self):
+        cache = LastValueCache()
+        cache.update(quote("AAPL"))
+        cache.update(trade("AAPL"))
+
+        cache.invalidate({"AAPL"})
+
+        assert cache.get_quote("AAPL") is None
+        assert cache.snapshot(["AAPL"]) is None
+
+    def test_max_age_limits_rest_answers(self):
+        cache = LastValueCache(max_age_seconds=5)
+        with patch("app.ws_cache.time.monotonic", return_value=100.0):
+            cache.update(quote("AAPL"))
+        with patch("app.ws_cache.time.monotonic", return_value=106.0):
+            assert cache.get_quote("AAPL") is None
+
+    def test_snapshot_contains_cached_symbols_only(self):
+        cache = LastValueCache()
+        cache.update(quote("AAPL"))
+        cache.update(trade("TSLA"))
+
+        snapshot = cache.snapshot(["AAPL", "TSLA", "MSFT"])
+
+        assert snapshot["type"] == "snapshot"
+        assert [message.symbol for message in snapshot["quotes"]] == ["AAPL"]
+        assert [message.symbol for message in snapshot["trades"]] == ["TSLA"]
+
+
+class TestSnapshotOnSubscribe:
+    """Test WebSocket manager integration."""
+
+    @pytest.mark.asyncio
+    async def test_broadcast_updates_cache_without_subscribers(self):
+        from app.websocket_routes import ws_manager
+        from app.ws_subscriptions import SubscriptionRegistry
+
+        cache = LastValueCache()
+        with patch("app.websocket_routes.last_value_cache", cache), \
+                patch("app.websocket_routes.subscription_registry", SubscriptionRegistry()):
+            await ws_manager._broadcast_message(build_message({"T": "q", "S": OPTION_SYMBOL, "bp": 1.0, "ap": 1.2}, "option"))
+
+        assert cache.get_quote(OPTION_SYMBOL).ask_price == 1.2
+
+    def test_send_snapshot_enqueues_one_frame(self):
+        from app.websocket_routes import ws_manager
+        from app.ws_subscriptions import SubscriptionRegistry
+
+        cache = LastValueCache()
+        cache.update(quote("AAPL"))
+        cache.update(trade("AAPL"))
+        registry = SubscriptionRegistry()
+        session = ClientSession("c1", AsyncMock())
+        registry.add_client("c1", session)
+
+        with patch("app.websocket_routes.last_value_cache", cache), \
+                patch("app.websocket_routes.subscription_registry", registry):
+            ws_manager.send_snapshot("c1", ["AAPL", "TSLA"])
+
+        assert session.pending == 1
+        frame = json.loads(next(iter(session._pending.values()))[1])
+        assert frame["type"] == "snapshot"
+        assert frame["quotes"][0]["symbol"] == "AAPL"
+        assert frame["trades"][0]["price"] == 1.05
+
+
+class TestRestQuotesFromCache:
+    """Test REST quote methods answer from the cache when possible."""
+
+    def _make_client(self, paper_trading: bool = True):
+        client = PooledAlpacaClient()
+        client._run_data_call = AsyncMock()
+        # Paper data keys get IEX / indicative data from REST, the same feeds as the default streams
+        client._pool = MagicMock()
+        client._pool.data_key_paper_trading.return_value = {paper_trading}
+        return client
+
+    @pytest.mark.asyncio
+    async def test_stock_quote_served_from_cache(self):
+        cache = LastValueCache()
+        cache.update(quote("AAPL", bid=190.1, ask=190.2))
+        client = self._make_client()
+
+        with patch("app.ws_cache.last_value_cache", cache):
+            result = await client.get_stock_quote("AAPL")
+
+        assert result["bid_price"] == 190.1
+        assert result["source"] == "stream"
+        assert result["timestamp"].startswith("2025-01-02 10:04:05")
+        client._run_data_call.assert_not_called()
+
+    @pytest.mark.asyncio
+    async def test_option_quote_served_from_cache(self):
+        cache = LastValueCache()
+        cache.update(build_message({"T": "q", "S": OPTION_SYMBOL, "bp": 2.5, "ap": 2.7, "bs": 1, "as": 2}, "option"))
+        cache.update(build_message({"T": "t", "S": OPTION_SYMBOL, "p": 2.6, "s": 1}, "option"))
+        client = self._make_client()
+
+        with patch("app.ws_cache.last_value_cache", cache):
+            result = await client.get_option_quote(OPTION_SYMBOL)
+
+        assert result["underlying_symbol"] == "AAPL"
+        assert result["strike_price"] == 200.0
+        assert result["last_price"] == 2.6
+        client._run_data_call.assert_not_called()
+
+    @pytest.mark.asyncio
+    async def test_multiple_quotes_only_fetch_missing_symbols(self):
+        cache = LastValueCache()
+        cache.update(quote("AAPL"))
+        client = self._make_client()
+        client._run_data_call.return_value = {
+            "quotes": [{"symbol": "TSLA", "bid_price": 250.0}],
+            "count": 1,
+            "requested_symbols": ["TSLA"]
+        }
+
+        with patch("app.ws_cache.last_value_cache", cache):
+            result = await client.get_multiple_stock_quotes(["AAPL", "TSLA"])
+
+        assert [item["symbol"] for item in result["quotes"]] == ["AAPL", "TSLA"]
+        assert result["quotes"][0]["source"] == "stream"
+        assert result["requested_symbols"] == ["AAPL", "TSLA"]
+        client._run_data_call.assert_awaited_once()
+
+    @pytest.mark.asyncio
+    async def test_cache_miss_uses_rest(self):
+        client = self._make_client()
+        client._run_data_call.return_value = {"symbol": "AAPL", "bid_price": 1.0}
+
+        with patch("app.ws_cache.last_value_cache", LastValueCache()):
+            result = await client.get_stock_quote("AAPL")
+
+        assert result == {"symbol": "AAPL", "bid_price": 1.0}
+
+    @pytest.mark.asyncio
+    async def test_live_key_with_iex_stream_uses_rest(self):
+        """Test an IEX stream quote never stands in for the SIP quote a live data key gets from REST."""
+        cache = LastValueCache()
+        cache.update(quote("AAPL"))
+        cache.update(build_message({"T": "q", "S": OPTION_SYMBOL, "bp": 2.5, "ap": 2.7, "bs": 1, "as": 2}, "option"))
+        client = self._make_client(paper_trading=False)
+        client._run_data_call.return_value = {"symbol": "AAPL", "bid_price": 1.0}
+
+        with patch("app.ws_cache.last_value_cache", cache):
+            result = await client.get_stock_quote("AAPL")
+            await client.get_multiple_option_quotes([OPTION_SYMBOL])
+
+        assert "source" not in result
+        assert client._run_data_call.await_count == 2
+
+    @pytest.mark.asyncio
+    async def test_sip_stream_serves_live_key(self):
+        """Test a SIP stream serves stock quotes for live data keys."""
+        cache = LastValueCache()
+        cache.update(quote("AAPL"))
+        client = self._make_client(paper_trading=False)
+
+        with patch("app.ws_cache.last_value_cache", cache), \
+                patch("app.ws_cache.settings") as mock_settings:
+            mock_settings.websocket = {"stock_url": "wss://stream.data.alpaca.markets/v2/sip"}
+            result = await client.get_stock_quote("AAPL")
+
+        assert result["source"] == "stream"
+        client._run_data_call.assert_not_called()
@@ -0,0 +1,170 @@
+"""Unit tests for per-client WebSocket send queues."""
+
+import pytest
+import asyncio
+import msgpack
+from unittest.mock import patch, MagicMock, AsyncMock
+
+from app.ws_clients import ClientSession, ClientQueueConfig, SubscriptionOptions, QUOTE, TRADE, MSGPACK_FORMAT
+from app.ws_encoding import build_message, encode_compact
+
+
+class TestClientSessionQueue:
+    """Test conflation, trade policy and slow-consumer detection (writer not started)."""
+
+    def test_quotes_conflate_to_latest_per_symbol(self):
+        session = ClientSession("c1", AsyncMock())
+
+        session.enqueue(QUOTE, "AAPL", "aapl-1")
+        session.enqueue(TRADE, "AAPL", "trade-1")
+        session.enqueue(QUOTE, "TSLA", "tsla-1")
+        session.enqueue(QUOTE, "AAPL", "aapl-2")
+
+        assert [message for _, message in session._pending.values()] == ["aapl-2", "trade-1", "tsla-1"]
+        assert session.conflated_quotes == 1
+
+    def test_full_queue_drops_trades_by_default(self):
+        session = ClientSession("c1", AsyncMock(), ClientQueueConfig(max_pending=2))
+        session.enqueue(TRADE, "AAPL", "t1")
+        session.enqueue(TRADE, "AAPL", "t2")
+
+        assert session.enqueue(TRADE, "AAPL", "t3") is True
+        assert session.enqueue(QUOTE, "MSFT", "q1") is True
+        assert session.send_control("pong") is True
+
+        assert session.dropped_trades == 1
+        assert session.dropped_quotes == 1
+        assert session.pending == 3
+
+    def test_full_queue_with_keep_policy_disconnects(self):
+        session = ClientSession("c1", AsyncMock(), ClientQueueConfig(max_pending=1, trade_policy="keep"))
+        session.enqueue(TRADE, "AAPL", "t1")
+
+        assert session.enqueue(TRADE, "AAPL", "t2") is False
+        assert session.closed is True
+        assert session.close_reason.startswith("slow consumer")
+
+    def test_lagging_client_is_disconnected(self):
+        session = ClientSession("c1", AsyncMock(), ClientQueueConfig(max_lag_seconds=5))
+
+        with patch("app.ws_clients.time.monotonic", return_value=100.0):
+            session.enqueue(QUOTE, "AAPL", "q1")
+        with patch("app.ws_clients.time.monotonic", return_value=106.0):
+            assert session.enqueue(QUOTE, "TSLA", "q2") is False
+
+        assert session.get_stats()["max_lag_seconds"] == 6.0
+        assert session.closed is True
+
+
+class TestClientSessionWriter:
+    """Test the writer task drains the queue without blocking producers."""
+
+    @pytest.mark.asyncio
+    async def test_writer_sends_in_order(self):
+        websocket = AsyncMock()
+        session = ClientSession("c1", websocket)
+        session.start()
+
+        session.send_control("welcome")
+        session.enqueue(QUOTE, "AAPL", "q1")
+        session.enqueue(TRADE, "AAPL", "t1")
+        await asyncio.sleep(0)
+        await asyncio.sleep(0)
+
+        assert [call.args[0] for call in websocket.send_text.await_args_list] == ["welcome", "q1", "t1"]
+        assert session.sent == 3
+        await session.close()
+
+    @pytest.mark.asyncio
+    async def test_send_failure_closes_session(self):
+        websocket = AsyncMock()
+        websocket.send_text.side_effect = RuntimeError("connection reset")
+        session = ClientSession("c1", websocket)
+        session.start()
+
+        session.enqueue(QUOTE, "AAPL", "q1")
+        await asyncio.sleep(0)
+
+        assert session.closed is True
+        assert session.enqueue(QUOTE, "AAPL", "q2") is False
+        await session.close()
+
+
+def quote(symbol: str, bid: float, ask: float):
+    return build_message({"T": "q", "S": symbol, "bp": bid, "ap": ask, "bs": 1, "as": 1}, "stock")
+
+
+class TestSubscriptionOptions:
+    """Test per-symbol throttle, change threshold and type filters."""
+
+    def test_parse_options(self):
+        assert SubscriptionOptions.from_message(None) is None
+        assert SubscriptionOptions.from_message({}) is None
+        assert SubscriptionOptions.from_message({"max_rate": "4", "trades": False}) == \
+            SubscriptionOptions(max_rate=4.0, trades=False)
+        for invalid in ({"max_rate": -1}, {"min_change": "abc"}, {"rate": 4}, ["quotes"]):
+            with pytest.raises(ValueError):
+                SubscriptionOptions.from_message(invalid)
+
+    def test_type_filters(self):
+        session = ClientSession("c1", AsyncMock())
+        session.set_options(["AAPL"], SubscriptionOptions(quotes=False, bars=False))
+        trade = build_message({"T": "t", "S": "AAPL", "p": 1.0, "s": 1}, "stock")
+        bar = MagicMock(type="bar")
+
+        assert session.offer(QUOTE, "AAPL", "q", quote("AAPL", 1.0, 1.1)) is True
+        assert session.offer(TRADE, "AAPL", "b", bar) is True
+        assert session.offer(TRADE, "AAPL", "t", trade) is True
+
+        assert [message for _, message in session._pending.values()] == ["t"]
+        assert session.filtered == 2
+
+    def test_min_change_drops_size_only_and_small_moves(self):
+        session = ClientSession("c1", AsyncMock())
+        session.set_options(["AAPL"], SubscriptionOptions(min_change=0.05))
+
+        session.offer(QUOTE, "AAPL", "q1", quote("AAPL", 10.00, 10.10))
+        session.offer(QUOTE, "AAPL", "q2", quote("AAPL", 10.00, 10.10))  # size-only
+        session.offer(QUOTE, "AAPL", "q3", quote("AAPL", 10.02, 10.12))
+        session.offer(QUOTE, "AAPL", "q4", quote("AAPL", 10.00, 10.20))
+
+        assert session.filtered == 2
+        assert session._pending[(QUOTE, "AAPL")][1] == "q4"
+
+    @pytest.mark.asyncio
+    async def test_max_rate_delivers_latest_quote_late(self):
+        websocket = AsyncMock()
+        session = ClientSession("c1", websocket)
+        session.start()
+        session.set_options(["AAPL"], SubscriptionOptions(max_rate=20))
+
+        for i in range(5):
+            session.offer(QUOTE, "AAPL", f"q{i}", quote("AAPL", 10.0 + i, 10.1 + i))
+        await asyncio.sleep(0)
+        assert [call.args[0] for call in websocket.send_text.await_args_list] == ["q0"]
+
+        await asyncio.sleep(0.08)
+        assert [call.args[0] for call in websocket.send_text.await_args_list] == ["q0", "q4"]
+        assert session.throttled == 4
+        await session.close()
+
+
+class TestBinaryFormat:
+    """Test msgpack clients get batched binary frames."""
+
+    @pytest.mark.asyncio
+    async def test_pending_messages_go_out_as_one_array_frame(self):
+        websocket = AsyncMock()
+        session = ClientSession("c1", websocket, message_format=MSGPACK_FORMAT)
+
+        session.send_message({"type": "welcome"})
+        session.enqueue(QUOTE, "AAPL", encode_compact(quote("AAPL", 1.0, 1.1)))
+        session.enqueue(QUOTE, "TSLA", encode_compact(quote("TSLA", 2.0, 2.1)))
+        session.start()
+        await asyncio.sleep(0)
+
+        websocket.send_bytes.assert_awaited_once()
+        frame = msgpack.unpackb(websocket.send_bytes.await_args.args[0])
+        assert [message.get("type") or message["S"] for message in frame] == ["welcome", "AAPL", "TSLA"]
+        assert (session.sent, session.frames) == (3, 1)
+        await session.close()
@@ -0,0 +1,103 @@
+"""Unit tests for WebSocket market data encoding."""
+
+import json
+import msgpack
+import pandas as pd
+from datetime import datetime, timezone
+
+from app.ws_encoding import decode_frame, iter_items, build_message, encode_message, encode_compact, pack_batch
+
+
+class TestEncodeMarketData:
+    """Test raw upstream items are built into messages and encoded to outbound JSON."""
+
+    def test_quote_message(self):
+        item = {"T": "q", "S": "AAPL", "bp": 190.1, "ap": 190.2, "bs": 3, "as": 4,
+                "bx": "V", "t": "2025-01-02T15:04:05.123456789Z"}
+
+        message = json.loads(encode_message(build_message(item, "stock")))
+
+        assert message == {
+            "type": "quote",
+            "data_type": "stock",
+            "symbol": "AAPL",
+            "timestamp": "2025-01-02T15:04:05.123456789Z",
+            "bid_price": 190.1,
+            "ask_price": 190.2,
+            "bid_size": 3,
+            "ask_size": 4,
+            "seq": None
+        }
+
+    def test_trade_message(self):
+        item = {"T": "t", "S": "AAPL", "p": 190.15, "s": 100, "t": "2025-01-02T15:04:05Z"}
+
+        message = json.loads(encode_message(build_message(item, "stock")))
+
+        assert message["type"] == "trade"
+        assert message["price"] == 190.15
+        assert message["size"] == 100
+        assert "bid_price" not in message
+
+    def test_other_message_types_are_skipped(self):
+        assert build_message({"T": "b", "S": "AAPL"}, "stock") is None
+        assert build_message({"T": "success", "msg": "authenticated"}, "stock") is None
+
+    def test_non_json_values_fall_back_to_str(self):
+        item = {"T": "t", "S": "AAPL", "p": 1.0, "s": 1, "t": pd.Timestamp("2025-01-02 15:04:05")}
+
+        message = json.loads(encode_message(build_message(item, "stock")))
+
+        assert message["timestamp"] == "2025-01-02 15:04:05"
+
+
+class TestDecodeFrame:
+    """Test decoding of JSON and msgpack upstream frames."""
+
+    def test_option_msgpack_timestamps_become_rfc3339(self):
+        frame = msgpack.packb([{"T": "q", "S": "AAPL250620C00200000", "bp": 1.1, "ap": 1.2,
+                                "bs": 3, "as": 4, "t": msgpack.Timestamp(1735830245, 123456000)}])
+
+        items = iter_items(decode_frame(frame))
+        message = json.loads(encode_message(build_message(items[0], "option")))
+
+        assert message["timestamp"] == "2025-01-02T15:04:05.123456+00:00"
+
+    def test_json_text_frame(self):
+        frame = '[{"T":"t","S":"AAPL","p":1.0,"s":1}, {}]'
+
+        items = iter_items(decode_frame(frame))
+
+        assert len(items) == 1
+        assert items[0]["S"] == "AAPL"
+
+
+class TestCompactMsgpack:
+    """Test the compact binary downstream schema."""
+
+    def test_quote_uses_short_keys(self):
+        message = build_message({"T": "q", "S": "AAPL", "bp": 190.1, "ap": 190.2, "bs": 3, "as": 4,
+                                 "t": "2025-01-02T15:04:05Z"}, "stock")
+        message.seq = 7
+
+        assert msgpack.unpackb(encode_compact(message)) == {
+            "T": "q", "d": "s", "S": "AAPL", "t": "2025-01-02T15:04:05Z",
+            "bp": 190.1, "ap": 190.2, "bs": 3, "as": 4, "sq": 7
+        }
+
+    def test_envelopes_keep_field_names(self):
+        trade = build_message({"T": "t", "S": "AAPL250620C00200000", "p": 2.5, "s": 1,
+                               "t": datetime(2025, 1, 2, 15, 4, 5, tzinfo=timezone.utc)}, "option")
+
+        decoded = msgpack.unpackb(encode_compact({"type": "snapshot", "quotes": [], "trades": [trade]}))
+
+        assert decoded["type"] == "snapshot"
+        assert decoded["trades"][0]["d"] == "o"
+        assert decoded["trades"][0]["t"] == "2025-01-02T15:04:05+00:00"
+
+    def test_pack_batch_builds_one_array(self):
+        for count in (1, 15, 16, 70000):
+            frame = pack_batch([msgpack.packb({"n": i}) for i in range(count)])
+            decoded = msgpack.unpackb(frame)
+            assert len(decoded) == count
+            assert decoded[-1] == {"n": count - 1}
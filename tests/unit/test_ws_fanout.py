@@ -0,0 +1,169 @@
+"""Unit tests for the multi-worker WebSocket fan-out (Redis mocked)."""
+
+import pytest
+import orjson
+from unittest.mock import patch, MagicMock, AsyncMock
+
+from app.ws_fanout import RedisFanout, FanoutConfig
+from app.ws_encoding import build_message, QuoteMessage
+from app.ws_subscriptions import SubscriptionRegistry
+from app.ws_clients import ClientSession
+
+
+def make_fanout(worker_id: str = "w1") -> RedisFanout:
+    return RedisFanout(FanoutConfig(mode="redis"), redis_client=AsyncMock(), worker_id=worker_id)
+
+
+class TestTickRelay:
+    """Test ticks are batched into one PUBLISH and rebuilt on the receiving side."""
+
+    @pytest.mark.asyncio
+    async def test_one_publish_per_loop_pass(self):
+        fanout = make_fanout()
+        quote = build_message({"T": "q", "S": "AAPL", "bp": 1.0, "ap": 1.1, "t": "2025-01-02T15:04:05Z"}, "stock")
+        trade = build_message({"T": "t", "S": "AAPL", "p": 1.05, "s": 10}, "stock")
+
+        fanout.publish(quote)
+        fanout.publish(trade)
+        fanout.publish_invalidate({"TSLA"})
+        await fanout._flush_task
+
+        fanout._redis.publish.assert_awaited_once()
+        channel, payload = fanout._redis.publish.await_args.args
+        assert channel == "opitios:ws:ticks"
+        assert [item["type"] for item in orjson.loads(payload)] == ["quote", "trade", "invalidate"]
+        assert fanout.published_messages == 3
+
+    @pytest.mark.asyncio
+    async def test_delivery_rebuilds_messages_in_order(self):
+        fanout = make_fanout()
+        received = []
+        fanout.on_message = AsyncMock(side_effect=lambda message: received.append(message))
+        fanout.on_invalidate = MagicMock(side_effect=lambda symbols: received.append(symbols))
+        quote = build_message({"T": "q", "S": "AAPL", "bp": 1.0, "ap": 1.1, "bs": 2, "as": 3,
+                               "t": "2025-01-02T15:04:05Z"}, "stock")
+
+        await fanout._deliver(orjson.loads(orjson.dumps([{"type": "invalidate", "symbols": ["AAPL"]}, quote])))
+
+        assert received == [["AAPL"], quote]
+
+
+class TestLeaderElection:
+    """Test lease acquisition, renewal and loss."""
+
+    @pytest.mark.asyncio
+    async def test_acquire_renew_and_lose_lease(self):
+        fanout = make_fanout()
+        fanout.on_leadership_changed = AsyncMock()
+        fanout.on_demand_changed = MagicMock()
+
+        fanout._redis.set.side_effect = [True, True]  # heartbeat key, leader lease
+        await fanout._heartbeat()
+        assert fanout.is_leader is True
+        fanout.on_leadership_changed.assert_awaited_once_with(True)
+
+        fanout._redis.set.side_effect = None
+        fanout._redis.eval.return_value = 1
+        await fanout._heartbeat()
+        assert fanout.is_leader is True
+        fanout.on_demand_changed.assert_called_once()
+
+        fanout._redis.eval.return_value = 0
+        await fanout._heartbeat()
+        assert fanout.is_leader is False
+        fanout.on_leadership_changed.assert_awaited_with(False)
+
+    @pytest.mark.asyncio
+    async def test_follower_does_not_take_held_lease(self):
+        fanout = make_fanout()
+        fanout.on_leadership_changed = AsyncMock()
+        fanout._redis.set.side_effect = [True, None]
+
+        await fanout._heartbeat()
+
+        assert fanout.is_leader is False
+        fanout.on_leadership_changed.assert_not_awaited()
+
+
+class TestClusterDemand:
+    """Test demand is published per worker and unioned over live workers."""
+
+    @pytest.mark.asyncio
+    async def test_unchanged_demand_is_not_republished(self):
+        fanout = make_fanout()
+
+        await fanout.update_demand({"AAPL", "TSLA"})
+        await fanout.update_demand({"AAPL", "TSLA"})
+
+        fanout._redis.hset.assert_awaited_once_with("opitios:ws:demand", "w1", orjson.dumps(["AAPL", "TSLA"]))
+        fanout._redis.publish.assert_awaited_once_with("opitios:ws:demand_changed", "w1")
+
+    @pytest.mark.asyncio
+    async def test_union_skips_and_prunes_dead_workers(self):
+        fanout = make_fanout()
+        fanout._redis.hgetall.return_value = {"w1": '["AAPL"]', "w2": '["AAPL","MSFT"]', "dead": '["SPY"]'}
+        fanout._redis.mget.return_value = [None, "1", None]  # own key may lag behind the demand
+
+        assert await fanout.cluster_demand() == {"AAPL", "MSFT"}
+        fanout._redis.hdel.assert_awaited_once_with("opitios:ws:demand", "dead")
+
+
+class TestManagerFanoutMode:
+    """Test the WebSocket manager relays through the fan-out in redis mode."""
+
+    @pytest.mark.asyncio
+    async def test_broadcast_publishes_and_fan_out_enqueues_locally(self):
+        from app.websocket_routes import ws_manager
+
+        fanout = MagicMock()
+        registry = SubscriptionRegistry()
+        session = ClientSession("c1", AsyncMock())
+        registry.add_client("c1", session)
+        registry.subscribe("c1", ["AAPL"])
+
+        with patch("app.websocket_routes.subscription_registry", registry), \
+                patch.object(ws_manager, "fanout", fanout):
+            await ws_manager._broadcast_message(build_message({"T": "q", "S": "AAPL", "bp": 1.0, "ap": 1.1}, "stock"))
+            assert session.pending == 0
+
+            message = fanout.publish.call_args.args[0]
+            assert isinstance(message, QuoteMessage)
+            await ws_manager._fan_out(message)
+
+        assert session.pending == 1
+
+    @pytest.mark.asyncio
+    async def test_follower_only_publishes_demand(self):
+        from app.websocket_routes import ws_manager
+
+        fanout = MagicMock(is_leader=False)
+        fanout.update_demand = AsyncMock()
+        registry = SubscriptionRegistry()
+        registry.add_client("c1", MagicMock())
+        registry.subscribe("c1", ["AAPL"])
+
+        with patch("app.websocket_routes.subscription_registry", registry), \
+                patch.object(ws_manager, "fanout", fanout), \
+                patch.object(ws_manager, "_sync_stream_subscriptions", AsyncMock()) as sync:
+            await ws_manager._update_subscriptions()
+            assert ws_manager._owns_upstream() is False
+
+        fanout.update_demand.assert_awaited_once_with({"AAPL"})
+        sync.assert_not_awaited()
+
+    @pytest.mark.asyncio
+    async def test_leader_subscribes_cluster_demand(self):
+        from app.websocket_routes import ws_manager
+
+        fanout = MagicMock(is_leader=True)
+        fanout.update_demand = AsyncMock()
+        fanout.cluster_demand = AsyncMock(return_value={"AAPL", "AAPL250620C00200000"})
+
+        with patch("app.websocket_routes.subscription_registry", SubscriptionRegistry()), \
+                patch.object(ws_manager, "fanout", fanout), \
+                patch.object(ws_manager, "_cluster_symbols", set()), \
+                patch.object(ws_manager, "_sync_stream_subscriptions", AsyncMock()) as sync:
+            await ws_manager._update_subscriptions()
+
+        assert [call.args for call in sync.await_args_list] == [("stock", {"AAPL"}),
+                                                                 ("option", {"AAPL250620C00200000"})]
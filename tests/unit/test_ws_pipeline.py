@@ -0,0 +1,97 @@
+"""Unit tests for the staged recv -> decode -> fan-out feed pipeline."""
+
+import pytest
+import asyncio
+import msgpack
+import orjson
+from concurrent.futures import ThreadPoolExecutor
+from unittest.mock import AsyncMock
+
+from app.ws_pipeline import FeedPipeline, PipelineConfig, LatencyHistogram
+from app.ws_encoding import QuoteMessage, TradeMessage
+
+
+def frames_recv(frames):
+    """recv() stand-in returning the given frames, then None (connection finished)"""
+    pending = list(frames)
+
+    async def recv():
+        await asyncio.sleep(0)
+        if not pending:
+            return None
+        frame = pending.pop(0)
+        if isinstance(frame, Exception):
+            raise frame
+        return frame
+    return recv
+
+
+class TestFeedPipeline:
+    """Test ordering, error isolation and draining."""
+
+    @pytest.mark.asyncio
+    async def test_ticks_reach_fan_out_in_order(self):
+        received = []
+        pipeline = FeedPipeline("stock", "stock", AsyncMock(side_effect=received.append),
+                                PipelineConfig(raw_queue_size=2, tick_queue_size=2))
+        frames = [orjson.dumps([{"T": "t", "S": "AAPL", "p": float(i), "s": 1},
+                                {"T": "success", "msg": "ignored"}]) for i in range(20)]
+
+        await pipeline.run(frames_recv(frames))
+
+        assert [message.price for message in received] == [float(i) for i in range(20)]
+        stats = pipeline.get_stats()
+        assert (stats["frames"], stats["ticks"]) == (20, 20)
+        assert stats["queues"]["raw_max_depth"] <= 2
+        assert stats["latency"]["total"]["count"] == 20
+
+    @pytest.mark.asyncio
+    async def test_bad_frame_and_failing_emit_do_not_stop_the_feed(self):
+        emit = AsyncMock(side_effect=[RuntimeError("client gone"), None])
+        pipeline = FeedPipeline("stock", "stock", emit)
+        frames = [b"\xc1not msgpack", orjson.dumps({"T": "q", "S": "AAPL", "bp": 1.0, "ap": 1.1}),
+                  orjson.dumps({"T": "q", "S": "MSFT", "bp": 1.0, "ap": 1.1})]
+
+        await pipeline.run(frames_recv(frames))
+
+        assert (pipeline.decode_errors, pipeline.fanout_errors, emit.await_count) == (1, 1, 2)
+
+    @pytest.mark.asyncio
+    async def test_received_frames_are_delivered_before_close_is_raised(self):
+        received = []
+        pipeline = FeedPipeline("option", "option", AsyncMock(side_effect=received.append))
+        frame = msgpack.packb([{"T": "q", "S": "SPY250620C00500000", "bp": 1.0, "ap": 1.2}])
+
+        with pytest.raises(ConnectionError):
+            await pipeline.run(frames_recv([frame, frame, ConnectionError("closed")]))
+
+        assert len(received) == 2
+        assert all(isinstance(message, QuoteMessage) and message.data_type == "option" for message in received)
+
+    @pytest.mark.asyncio
+    async def test_pool_decoding_keeps_frame_order(self):
+        received = []
+        frames = [msgpack.packb({"T": "t", "S": "SPY250620C00500000", "p": float(i), "s": 1}) for i in range(50)]
+        with ThreadPoolExecutor(max_workers=4) as executor:
+            pipeline = FeedPipeline("option", "option", AsyncMock(side_effect=received.append),
+                                    PipelineConfig(decode_workers=4), executor)
+            await pipeline.run(frames_recv(frames))
+
+        assert [message.price for message in received] == [float(i) for i in range(50)]
+        assert all(isinstance(message, TradeMessage) for message in received)
+        assert pipeline.get_stats()["decode"] == "ThreadPoolExecutor"
+
+
+class TestLatencyHistogram:
+    """Test bucket counts and quantiles."""
+
+    def test_quantiles_and_cumulative_buckets(self):
+        histogram = LatencyHistogram(buckets=(0.001, 0.01))
+        for seconds in [0.0005] * 98 + [0.005, 2.0]:
+            histogram.observe(seconds)
+
+        assert histogram.quantile(0.5) == 0.001
+        assert histogram.quantile(0.99) == 0.01
+        assert histogram.quantile(1.0) == 2.0
+        assert histogram.cumulative() == [(0.001, 98), (0.01, 99), (float("inf"), 100)]
+        assert histogram.get_stats()["max_ms"] == 2000.0
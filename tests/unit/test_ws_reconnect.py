@@ -0,0 +1,98 @@
+"""Unit tests for jittered-backoff upstream reconnection."""
+
+import pytest
+import asyncio
+import json
+import random
+import websockets
+from unittest.mock import patch, AsyncMock
+
+from app.ws_reconnect import FeedReconnector, ReconnectConfig, backoff_delay
+
+
+FAST = ReconnectConfig(initial_delay=0.001, max_delay=0.01)
+
+
+class TestBackoff:
+    """Test delay growth, cap and jitter range."""
+
+    def test_delays_start_low_double_and_cap(self):
+        config = ReconnectConfig()
+        rng = random.Random(1)
+        first = [backoff_delay(0, config, rng) for _ in range(200)]
+
+        assert 0.1 <= min(first) and max(first) <= 0.3
+        assert len({round(delay, 4) for delay in first}) > 100
+        assert backoff_delay(3, ReconnectConfig(jitter=0)) == pytest.approx(1.6)
+        assert backoff_delay(30, ReconnectConfig(jitter=0)) == 30.0
+
+
+class TestFeedReconnector:
+    """Test retries, metrics and stopping."""
+
+    @pytest.mark.asyncio
+    async def test_retries_until_connected_and_records_outage(self):
+        connect = AsyncMock(side_effect=[ConnectionError("refused"), ConnectionError("refused"), None])
+        reconnector = FeedReconnector("stock", connect, lambda: True, FAST)
+
+        reconnector.trigger(last_frame_at=None)
+        reconnector.trigger()  # already retrying
+        await reconnector._task
+
+        stats = reconnector.get_stats()
+        assert (stats["drops"], stats["attempts"], stats["failures"], stats["reconnects"]) == (1, 3, 2, 1)
+        assert stats["outage"]["count"] == 1
+        assert stats["reconnect_latency"]["count"] == 1
+        assert stats["retrying"] is False
+
+    @pytest.mark.asyncio
+    async def test_stops_when_feed_no_longer_needed(self):
+        connect = AsyncMock(side_effect=ConnectionError("refused"))
+        wanted = iter([True, True, False])
+        reconnector = FeedReconnector("stock", connect, lambda: next(wanted, False), FAST)
+
+        reconnector.trigger()
+        await reconnector._task
+
+        assert connect.await_count == 1
+        assert reconnector.reconnects == 0
+
+
+class TestManagerReconnect:
+    """Test a dropped upstream is reconnected right away and resubscribed in one frame."""
+
+    @pytest.mark.asyncio
+    async def test_connection_closed_reconnects_and_resubscribes(self):
+        from app.websocket_routes import ws_manager
+
+        dropped_ws = AsyncMock()
+        dropped_ws.recv.side_effect = websockets.exceptions.ConnectionClosed(None, None)
+        new_ws = AsyncMock()
+
+        async def recv():
+            if new_ws.recv.await_count == 1:
+                return json.dumps([{"T": "success", "msg": "authenticated"}])
+            await asyncio.sleep(3600)
+        new_ws.recv.side_effect = recv
+
+        reconnector = FeedReconnector("stock", lambda: ws_manager._ensure_stock_connection(),
+                                      ws_manager._stock_should_reconnect, FAST)
+        with patch("app.websocket_routes.websockets.connect", AsyncMock(return_value=new_ws)), \
+                patch.object(ws_manager, "stock_ws", dropped_ws), \
+                patch.object(ws_manager, "stock_connected", True), \
+                patch.object(ws_manager, "_stock_listener", None), \
+                patch.object(ws_manager, "_stock_account", {"name": "stock_ws", "api_key": "k", "secret_key": "s"}), \
+                patch.object(ws_manager, "_stock_desired", {"AAPL", "MSFT"}), \
+                patch.object(ws_manager, "_upstream_symbols", {"stock": {"AAPL", "MSFT"}, "option": set()}), \
+                patch.object(ws_manager, "_stock_reconnector", reconnector):
+            await ws_manager._listen_stock_data()
+            await reconnector._task
+
+            assert ws_manager.stock_connected is True
+            assert ws_manager._upstream_symbols["stock"] == {"AAPL", "MSFT"}
+            await ws_manager._cleanup_stock_connection()
+
+        frames = [json.loads(call.args[0]) for call in new_ws.send.await_args_list]
+        assert [frame["action"] for frame in frames] == ["auth", "subscribe"]
+        assert frames[1]["quotes"] == ["AAPL", "MSFT"]
+        assert (reconnector.drops, reconnector.reconnects) == (1, 1)
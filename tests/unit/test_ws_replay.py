@@ -0,0 +1,107 @@
+"""Unit tests for the sequenced tick ring buffer and WebSocket resume."""
+
+import pytest
+import json
+from unittest.mock import patch, AsyncMock
+
+from app.ws_replay import TickRingBuffer
+from app.ws_encoding import build_message
+from app.ws_cache import LastValueCache
+from app.ws_subscriptions import SubscriptionRegistry
+from app.ws_clients import ClientSession
+
+
+def stamped(buffer: TickRingBuffer, symbol: str, price: float = 1.0):
+    message = build_message({"T": "t", "S": symbol, "p": price, "s": 1}, "stock")
+    buffer.stamp(message)
+    buffer.append(message)
+    return message
+
+
+class TestTickRingBuffer:
+    """Test sequencing and replay boundaries."""
+
+    def test_sequences_increase_and_follow_relayed_ticks(self):
+        buffer = TickRingBuffer(capacity=10)
+        first = stamped(buffer, "AAPL")
+        second = stamped(buffer, "AAPL")
+        assert second.seq == first.seq + 1
+
+        # A tick relayed from a leader whose counter is ahead
+        relayed = build_message({"T": "t", "S": "AAPL", "p": 1.0, "s": 1}, "stock")
+        relayed.seq = second.seq + 1000
+        buffer.append(relayed)
+
+        assert stamped(buffer, "AAPL").seq == relayed.seq + 1
+
+    def test_replay_returns_missed_ticks_of_requested_symbols(self):
+        buffer = TickRingBuffer(capacity=10)
+        seen = stamped(buffer, "AAPL")
+        stamped(buffer, "TSLA")
+        missed = stamped(buffer, "AAPL", price=2.0)
+
+        assert buffer.replay(seen.seq, ["AAPL"]) == [missed]
+        assert buffer.replay(missed.seq, ["AAPL"]) == []
+
+    def test_gap_older_than_buffer_needs_snapshot(self):
+        buffer = TickRingBuffer(capacity=3)
+        first = stamped(buffer, "AAPL")
+        for _ in range(3):
+            stamped(buffer, "AAPL")
+        # The tick right after first is still buffered: nothing lost yet
+        assert buffer.replay(first.seq, ["AAPL"]) is not None
+        stamped(buffer, "AAPL")
+
+        assert buffer.replay(first.seq, ["AAPL"]) is None
+        assert buffer.replay(first.seq + 1000, ["AAPL"]) is None
+        assert TickRingBuffer().replay(5, ["AAPL"]) is None
+        assert buffer.get_stats()["gaps"] == 2
+
+
+class TestResumeOnSubscribe:
+    """Test the manager replays missed ticks or falls back to a snapshot."""
+
+    def _send(self, buffer, resume_from):
+        from app.websocket_routes import ws_manager
+
+        cache = LastValueCache()
+        cache.update(build_message({"T": "q", "S": "AAPL", "bp": 1.0, "ap": 1.1}, "stock"))
+        registry = SubscriptionRegistry()
+        session = ClientSession("c1", AsyncMock())
+        registry.add_client("c1", session)
+
+        with patch("app.websocket_routes.tick_buffer", buffer), \
+                patch("app.websocket_routes.last_value_cache", cache), \
+                patch("app.websocket_routes.subscription_registry", registry):
+            ws_manager.send_snapshot("c1", ["AAPL"], resume_from)
+        return [json.loads(message) for _, message in session._pending.values()]
+
+    def test_replay_replaces_snapshot(self):
+        buffer = TickRingBuffer(capacity=10)
+        seen = stamped(buffer, "AAPL")
+        missed = stamped(buffer, "AAPL", price=2.0)
+
+        frames = self._send(buffer, seen.seq)
+
+        assert len(frames) == 1
+        assert frames[0]["type"] == "replay"
+        assert frames[0]["complete"] is True
+        assert [(m["seq"], m["price"]) for m in frames[0]["messages"]] == [(missed.seq, 2.0)]
+
+    def test_gap_sends_incomplete_replay_then_snapshot(self):
+        frames = self._send(TickRingBuffer(capacity=10), 12345)
+
+        assert [frame["type"] for frame in frames] == ["replay", "snapshot"]
+        assert frames[0]["complete"] is False
+
+    @pytest.mark.asyncio
+    async def test_broadcast_stamps_and_buffers(self):
+        from app.websocket_routes import ws_manager
+
+        buffer = TickRingBuffer(capacity=10)
+        with patch("app.websocket_routes.tick_buffer", buffer), \
+                patch("app.websocket_routes.subscription_registry", SubscriptionRegistry()):
+            await ws_manager._broadcast_message(build_message({"T": "q", "S": "AAPL", "bp": 1.0, "ap": 1.1}, "stock"))
+
+        assert buffer.get_stats()["buffered"] == 1
+        assert buffer.last_seq is not None
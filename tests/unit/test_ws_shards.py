@@ -0,0 +1,107 @@
+"""Unit tests for sharded upstream option connections."""
+
+import pytest
+import msgpack
+import websockets
+from unittest.mock import patch, MagicMock, AsyncMock
+
+from app.ws_shards import ConsistentHashRing, OptionShard, option_shard_accounts
+from app.ws_pipeline import FeedPipeline
+from app.ws_reconnect import FeedReconnector
+
+
+SYMBOLS = [f"SPY250620C{strike:05d}000" for strike in range(400, 2400)]
+
+
+def connected_shard(shard_id: str) -> OptionShard:
+    shard = OptionShard(shard_id, {"name": shard_id, "api_key": "k", "secret_key": "s"})
+    shard.ws = AsyncMock()
+    shard.connected = True
+    shard.reconnector = FeedReconnector(shard_id, AsyncMock(), lambda: False)
+    return shard
+
+
+class TestConsistentHashRing:
+    """Test placement balance and stability."""
+
+    def test_symbols_spread_over_all_shards(self):
+        ring = ConsistentHashRing(["option_ws", "option_ws_2", "option_ws_3"])
+        placement = ring.partition(SYMBOLS)
+
+        assert sorted(placement) == ring.nodes
+        assert sum(len(symbols) for symbols in placement.values()) == len(SYMBOLS)
+        assert min(len(symbols) for symbols in placement.values()) > len(SYMBOLS) / 3 * 0.7
+
+    def test_adding_a_shard_moves_only_its_share(self):
+        ring = ConsistentHashRing(["option_ws", "option_ws_2", "option_ws_3"])
+        before = {symbol: ring.node_for(symbol) for symbol in SYMBOLS}
+        ring.add("option_ws_4")
+        moved = [symbol for symbol in SYMBOLS if ring.node_for(symbol) != before[symbol]]
+
+        assert all(ring.node_for(symbol) == "option_ws_4" for symbol in moved)
+        assert len(moved) < len(SYMBOLS) * 0.4
+
+        ring.remove("option_ws_4")
+        assert {symbol: ring.node_for(symbol) for symbol in SYMBOLS} == before
+        assert ConsistentHashRing().node_for("SPY") is None
+
+    def test_only_enabled_option_ws_accounts_are_shards(self):
+        def config(enabled=True, name=None):
+            return MagicMock(enabled=enabled, account_name=name, api_key="k", secret_key="s")
+
+        accounts = option_shard_accounts({
+            "option_ws_2": config(), "option_ws": config(name="Options 1"), "option_ws_off": config(enabled=False),
+            "stock_ws": config(), "option_wsx": config()
+        })
+
+        assert [(shard_id, account["name"]) for shard_id, account in accounts] == [
+            ("option_ws", "Options 1"), ("option_ws_2", "option_ws_2")]
+
+
+class TestShardedSubscriptions:
+    """Test the manager subscribes each shard's share and listens per shard."""
+
+    @pytest.mark.asyncio
+    async def test_each_shard_subscribes_its_placed_symbols(self):
+        from app.websocket_routes import ws_manager
+
+        shards = {shard_id: connected_shard(shard_id) for shard_id in ("option_ws", "option_ws_2")}
+        ring = ConsistentHashRing(shards)
+        desired = set(SYMBOLS[:50])
+
+        with patch.object(ws_manager, "_option_shards", shards), \
+                patch.object(ws_manager, "_option_ring", ring), \
+                patch.object(ws_manager, "_upstream_symbols", {"stock": set(), "option": set()}):
+            await ws_manager._sync_stream_subscriptions("option", desired)
+            assert ws_manager._upstream_symbols["option"] == desired
+            assert ws_manager.option_connected is True
+
+            await ws_manager._sync_stream_subscriptions("option", desired - {SYMBOLS[0]})
+            assert SYMBOLS[0] not in ws_manager._upstream_symbols["option"]
+
+        for shard_id, shard in shards.items():
+            frame = msgpack.unpackb(shard.ws.send.await_args_list[0].args[0])
+            assert frame["action"] == "subscribe"
+            assert set(frame["quotes"]) == {symbol for symbol in desired if ring.node_for(symbol) == shard_id}
+        owner = shards[ring.node_for(SYMBOLS[0])]
+        assert msgpack.unpackb(owner.ws.send.await_args.args[0]) == {
+            "action": "unsubscribe", "quotes": [SYMBOLS[0]], "trades": [SYMBOLS[0]]}
+
+    @pytest.mark.asyncio
+    async def test_shard_listener_feeds_common_broadcast(self):
+        from app.websocket_routes import ws_manager
+
+        shard = connected_shard("option_ws_2")
+        shard.symbols = {SYMBOLS[0]}
+        emit = AsyncMock()
+        shard.pipeline = FeedPipeline("option[option_ws_2]", "option", emit)
+        quote = {"T": "q", "S": SYMBOLS[0], "bp": 1.0, "ap": 1.1}
+        shard.ws.recv.side_effect = [msgpack.packb([quote, quote]), websockets.exceptions.ConnectionClosed(None, None)]
+
+        with patch.object(ws_manager, "_invalidate_cache") as invalidate:
+            await ws_manager._listen_option_data(shard)
+
+        assert emit.await_count == 2
+        assert emit.await_args.args[0].symbol == SYMBOLS[0]
+        assert (shard.connected, shard.disconnects, shard.get_stats()["pipeline"]["ticks"]) == (False, 1, 2)
+        invalidate.assert_called_once_with({SYMBOLS[0]})
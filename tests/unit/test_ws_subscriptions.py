@@ -0,0 +1,165 @@
+"""Unit tests for the WebSocket subscription registry and broadcast fan-out."""
+
+import pytest
+import asyncio
+import json
+from unittest.mock import patch, MagicMock, AsyncMock
+
+from app.ws_encoding import build_message
+from app.ws_subscriptions import SubscriptionRegistry
+from app.ws_clients import ClientSession
+
+
+class TestSubscriptionRegistry:
+    """Test the symbol -> subscribers index."""
+
+    def test_subscribe_reports_first_subscribers_only(self):
+        """Test only symbols without previous subscribers need an upstream subscribe."""
+        registry = SubscriptionRegistry()
+        ws_a, ws_b = MagicMock(), MagicMock()
+        registry.add_client("a", ws_a)
+        registry.add_client("b", ws_b)
+
+        assert registry.subscribe("a", ["AAPL", "TSLA"]) == {"AAPL", "TSLA"}
+        assert registry.subscribe("b", ["AAPL", "SPY"]) == {"SPY"}
+        assert registry.subscribe("a", ["AAPL"]) == set()
+
+        assert registry.subscribers("AAPL") == (("a", ws_a), ("b", ws_b))
+        assert registry.subscribers("TSLA") == (("a", ws_a),)
+        assert registry.subscribers("MSFT") == ()
+        assert registry.symbols() == {"AAPL", "TSLA", "SPY"}
+
+    def test_remove_client_returns_orphaned_symbols(self):
+        """Test disconnect drops the client everywhere and reports symbols nobody needs."""
+        registry = SubscriptionRegistry()
+        registry.add_client("a", MagicMock())
+        registry.add_client("b", MagicMock())
+        registry.subscribe("a", ["AAPL", "TSLA"])
+        registry.subscribe("b", ["AAPL"])
+
+        assert registry.remove_client("a") == {"TSLA"}
+        assert [client_id for client_id, _ in registry.subscribers("AAPL")] == ["b"]
+        assert registry.symbols() == {"AAPL"}
+        assert registry.client_count == 1
+        assert registry.remove_client("a") == set()
+
+    def test_published_snapshots_are_not_mutated(self):
+        """Test a snapshot held by a broadcast reader is unaffected by later writes."""
+        registry = SubscriptionRegistry()
+        registry.add_client("a", MagicMock())
+        registry.add_client("b", MagicMock())
+        registry.subscribe("a", ["AAPL"])
+
+        snapshot = registry.subscribers("AAPL")
+        version = registry.version
+        registry.subscribe("b", ["AAPL"])
+        registry.remove_client("a")
+
+        assert [client_id for client_id, _ in snapshot] == ["a"]
+        assert [client_id for client_id, _ in registry.subscribers("AAPL")] == ["b"]
+        assert registry.version == version + 2
+
+    def test_unsubscribe_decrements_refcount(self):
+        """Test a symbol is orphaned only when its last subscriber leaves."""
+        registry = SubscriptionRegistry()
+        registry.add_client("a", MagicMock())
+        registry.add_client("b", MagicMock())
+        registry.subscribe("a", ["AAPL", "TSLA"])
+        registry.subscribe("b", ["AAPL"])
+
+        assert registry.unsubscribe("a", ["AAPL", "MSFT"]) == set()
+        assert registry.subscriber_count("AAPL") == 1
+        assert registry.unsubscribe("b", ["AAPL"]) == {"AAPL"}
+        assert registry.client_symbols("a") == {"TSLA"}
+        assert registry.symbols() == {"TSLA"}
+
+    def test_unregistered_client_cannot_subscribe(self):
+        """Test subscriptions require a registered connection."""
+        registry = SubscriptionRegistry()
+
+        assert registry.subscribe("ghost", ["AAPL"]) == set()
+        assert not registry.has_symbols()
+
+
+class TestBroadcastFanOut:
+    """Test the fan-out stage only touches subscribers of the tick's symbol."""
+
+    @pytest.mark.asyncio
+    async def test_broadcast_enqueues_for_symbol_subscribers(self):
+        from app.websocket_routes import ws_manager
+
+        registry = SubscriptionRegistry()
+        aapl_session = ClientSession("aapl_client", AsyncMock())
+        tsla_session = ClientSession("tsla_client", AsyncMock())
+        registry.add_client("aapl_client", aapl_session)
+        registry.add_client("tsla_client", tsla_session)
+        registry.subscribe("aapl_client", ["AAPL"])
+        registry.subscribe("tsla_client", ["TSLA"])
+
+        with patch("app.websocket_routes.subscription_registry", registry):
+            await ws_manager._broadcast_message(build_message({"T": "t", "S": "AAPL", "p": 190.5, "s": 100}, "stock"))
+
+        assert aapl_session.pending == 1
+        assert tsla_session.pending == 0
+
+    @pytest.mark.asyncio
+    async def test_closed_session_is_removed(self):
+        from app.websocket_routes import ws_manager
+
+        registry = SubscriptionRegistry()
+        broken = ClientSession("broken", AsyncMock())
+        broken.closed = True
+        registry.add_client("broken", broken)
+        registry.subscribe("broken", ["AAPL"])
+
+        with patch("app.websocket_routes.subscription_registry", registry), \
+                patch.object(ws_manager, "_schedule_subscription_sync"):
+            await ws_manager._broadcast_message(build_message({"T": "q", "S": "AAPL", "bp": 1.0, "ap": 1.1}, "stock"))
+            await asyncio.gather(*ws_manager._close_tasks)
+
+        assert registry.client_count == 0
+        assert registry.subscribers("AAPL") == ()
+        broken.websocket.close.assert_awaited_once()
+
+
+class TestUpstreamSubscriptionSync:
+    """Test debounced, diff-only subscribe/unsubscribe frames to Alpaca."""
+
+    @pytest.mark.asyncio
+    async def test_changes_are_debounced_into_diff_frames(self):
+        from app.websocket_routes import ws_manager
+
+        registry = SubscriptionRegistry()
+        stock_ws = AsyncMock()
+        upstream = {"stock": set(), "option": set()}
+
+        with patch("app.websocket_routes.subscription_registry", registry), \
+                patch.object(ws_manager, "ensure_initialized", AsyncMock()), \
+                patch.object(ws_manager, "_ensure_stock_connection", AsyncMock()), \
+                patch.object(ws_manager, "stock_ws", stock_ws), \
+                patch.object(ws_manager, "stock_connected", True), \
+                patch.object(ws_manager, "_upstream_symbols", upstream), \
+                patch.object(ws_manager, "subscription_debounce_seconds", 0.01):
+            for client_id in ("a", "b", "c"):
+                registry.add_client(client_id, MagicMock())
+            await ws_manager.add_client_subscription("a", ["AAPL", "TSLA"])
+            await ws_manager.add_client_subscription("b", ["AAPL", "MSFT"])
+            await ws_manager.add_client_subscription("c", ["TSLA"])
+            await ws_manager._subscription_sync_task
+
+            # One frame for three client changes
+            assert stock_ws.send.await_count == 1
+            frame = json.loads(stock_ws.send.await_args.args[0])
+            assert frame == {"action": "subscribe", "quotes": ["AAPL", "MSFT", "TSLA"],
+                             "trades": ["AAPL", "MSFT", "TSLA"]}
+
+            removed = await ws_manager.remove_client_symbols("a", ["AAPL", "TSLA", "SPY"])
+            await ws_manager.remove_client_subscription("b")
+            await ws_manager._subscription_sync_task
+
+            assert removed == {"AAPL", "TSLA"}
+            assert stock_ws.send.await_count == 2
+            frame = json.loads(stock_ws.send.await_args.args[0])
+            # TSLA is still held by client c
+            assert frame == {"action": "unsubscribe", "quotes": ["AAPL", "MSFT"], "trades": ["AAPL", "MSFT"]}
+            assert upstream["stock"] == {"TSLA"}
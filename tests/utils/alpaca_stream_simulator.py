@@ -0,0 +1,228 @@
+"""
+Local stand-in for the Alpaca market data streams (stock JSON, option msgpack)
+
+Speaks the parts of the stream protocol the WebSocket manager uses: the connected/auth handshake,
+subscribe/unsubscribe acknowledgements and quote/trade ticks for the subscribed symbols at a
+configurable rate. Paths under /v1beta1 behave like the option feed (msgpack), anything else like
+the stock feed (JSON text). Tick timestamps are the send time, so clients can measure latency.
+
+Run standalone and point the service at it:
+
+    python -m tests.utils.alpaca_stream_simulator --port 8765 --rate 2000
+
+    websocket:
+      stock_url: "ws://127.0.0.1:8765/v2/iex"
+      option_url: "ws://127.0.0.1:8765/v1beta1/indicative"
+"""
+
+import argparse
+import asyncio
+import json
+import random
+import time
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional, Set
+
+import msgpack
+import websockets
+
+
+@dataclass
+class SimulatorConfig:
+    """Simulator settings"""
+    ticks_per_second: float = 1000.0     # per upstream connection, spread over its subscribed symbols
+    quote_ratio: float = 0.8             # share of ticks that are quotes (the rest are trades)
+    batch_interval: float = 0.01         # seconds between frames; each frame carries the ticks due
+    api_key: Optional[str] = None        # credentials to accept (None = accept any)
+    secret_key: Optional[str] = None
+    seed: Optional[int] = None
+
+
+@dataclass(eq=False)
+class _StreamConnection:
+    websocket: Any
+    binary: bool
+    authenticated: bool = False
+    quotes: Set[str] = field(default_factory=set)
+    trades: Set[str] = field(default_factory=set)
+
+
+class AlpacaStreamSimulator:
+    """In-process stream server; start() binds (port 0 picks a free port)"""
+
+    def __init__(self, config: Optional[SimulatorConfig] = None, host: str = "127.0.0.1", port: int = 0):
+        self.config = config or SimulatorConfig()
+        self.host = host
+        self.port = port
+        self._server = None
+        self._connections: Set[_StreamConnection] = set()
+        self._rng = random.Random(self.config.seed)
+        self._prices: Dict[str, float] = {}
+        self._trade_id = 0
+
+        self.connections_total = 0
+        self.auth_failures = 0
+        self.frames_sent = 0
+        self.ticks_sent = 0
+        self.subscribe_frames = 0
+
+    @property
+    def stock_url(self) -> str:
+        return f"ws://{self.host}:{self.port}/v2/iex"
+
+    @property
+    def option_url(self) -> str:
+        return f"ws://{self.host}:{self.port}/v1beta1/indicative"
+
+    @property
+    def connection_count(self) -> int:
+        return len(self._connections)
+
+    async def start(self):
+        self._server = await websockets.serve(self._handle, self.host, self.port, max_size=2**20)
+        self.port = next(iter(self._server.sockets)).getsockname()[1]
+
+    async def stop(self):
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+            self._server = None
+
+    async def drop_connections(self, code: int = 1012):
+        """Close every upstream connection (as during an Alpaca restart) to exercise reconnects"""
+        await asyncio.gather(*(connection.websocket.close(code=code) for connection in list(self._connections)),
+                             return_exceptions=True)
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            "connections": self.connection_count,
+            "connections_total": self.connections_total,
+            "auth_failures": self.auth_failures,
+            "subscribe_frames": self.subscribe_frames,
+            "frames_sent": self.frames_sent,
+            "ticks_sent": self.ticks_sent
+        }
+
+    async def _handle(self, websocket, path: Optional[str] = None):
+        # websockets < 14 exposes .path, newer versions .request.path
+        path = path or getattr(websocket, "path", None) or websocket.request.path
+        connection = _StreamConnection(websocket, binary=path.startswith("/v1beta1"))
+        self._connections.add(connection)
+        self.connections_total += 1
+        producer = asyncio.get_running_loop().create_task(self._produce(connection))
+        try:
+            await self._send(connection, [{"T": "success", "msg": "connected"}])
+            async for raw in websocket:
+                message = msgpack.unpackb(raw) if isinstance(raw, bytes) else json.loads(raw)
+                await self._on_message(connection, message)
+        except websockets.exceptions.ConnectionClosed:
+            pass
+        finally:
+            producer.cancel()
+            self._connections.discard(connection)
+
+    async def _on_message(self, connection: _StreamConnection, message: Dict[str, Any]):
+        action = message.get("action")
+        if action == "auth":
+            if ((self.config.api_key is None or message.get("key") == self.config.api_key)
+                    and (self.config.secret_key is None or message.get("secret") == self.config.secret_key)):
+                connection.authenticated = True
+                await self._send(connection, [{"T": "success", "msg": "authenticated"}])
+            else:
+                self.auth_failures += 1
+                await self._send(connection, [{"T": "error", "code": 402, "msg": "auth failed"}])
+                await connection.websocket.close()
+            return
+        if action not in ("subscribe", "unsubscribe"):
+            await self._send(connection, [{"T": "error", "code": 400, "msg": "invalid syntax"}])
+            return
+        if not connection.authenticated:
+            await self._send(connection, [{"T": "error", "code": 401, "msg": "not authenticated"}])
+            return
+        self.subscribe_frames += 1
+        for channel in ("quotes", "trades"):
+            symbols = set(message.get(channel) or ())
+            target = getattr(connection, channel)
+            if action == "subscribe":
+                target.update(symbols)
+            else:
+                target.difference_update(symbols)
+        await self._send(connection, [{"T": "subscription", "trades": sorted(connection.trades),
+                                       "quotes": sorted(connection.quotes)}])
+
+    async def _send(self, connection: _StreamConnection, items: List[Dict[str, Any]]):
+        await connection.websocket.send(msgpack.packb(items, datetime=True) if connection.binary
+                                        else json.dumps(items))
+
+    async def _produce(self, connection: _StreamConnection):
+        """Emit ticks for the connection's symbols at the configured rate, one frame per interval"""
+        loop = asyncio.get_running_loop()
+        interval = self.config.batch_interval
+        due = 0.0
+        next_at = loop.time()
+        try:
+            while True:
+                next_at += interval
+                await asyncio.sleep(max(0.0, next_at - loop.time()))
+                symbols = sorted(connection.quotes | connection.trades)
+                if not connection.authenticated or not symbols:
+                    due = 0.0
+                    continue
+                due += self.config.ticks_per_second * interval
+                count = int(due)
+                if not count:
+                    continue
+                due -= count
+                items = [self._tick(self._rng.choice(symbols), connection.binary) for _ in range(count)]
+                await self._send(connection, items)
+                self.frames_sent += 1
+                self.ticks_sent += count
+        except (asyncio.CancelledError, websockets.exceptions.ConnectionClosed):
+            pass
+
+    def _tick(self, symbol: str, binary: bool) -> Dict[str, Any]:
+        price = self._prices.get(symbol) or round(self._rng.uniform(5, 500), 2)
+        price = self._prices[symbol] = max(0.01, round(price + self._rng.choice((-0.01, 0, 0.01)), 2))
+        now = datetime.now(timezone.utc)
+        timestamp = now if binary else now.isoformat(timespec="microseconds").replace("+00:00", "Z")
+        if self._rng.random() < self.config.quote_ratio:
+            return {"T": "q", "S": symbol, "bx": "V", "bp": price, "bs": self._rng.randint(1, 20),
+                    "ax": "V", "ap": round(price + 0.01, 2), "as": self._rng.randint(1, 20),
+                    "c": ["R"], "z": "C", "t": timestamp}
+        self._trade_id += 1
+        return {"T": "t", "S": symbol, "i": self._trade_id, "x": "V", "p": price,
+                "s": self._rng.randint(1, 500), "c": ["@"], "z": "C", "t": timestamp}
+
+
+async def _serve_forever(simulator: AlpacaStreamSimulator):
+    await simulator.start()
+    print(f"Stock stream:  {simulator.stock_url}")
+    print(f"Option stream: {simulator.option_url}")
+    try:
+        while True:
+            await asyncio.sleep(10)
+            print(f"{time.strftime('%H:%M:%S')} {simulator.get_stats()}")
+    finally:
+        await simulator.stop()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Local Alpaca market data stream simulator")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--rate", type=float, default=1000.0, help="ticks per second per connection")
+    parser.add_argument("--quote-ratio", type=float, default=0.8)
+    parser.add_argument("--batch-interval", type=float, default=0.01)
+    args = parser.parse_args()
+
+    config = SimulatorConfig(ticks_per_second=args.rate, quote_ratio=args.quote_ratio,
+                             batch_interval=args.batch_interval)
+    try:
+        asyncio.run(_serve_forever(AlpacaStreamSimulator(config, args.host, args.port)))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()